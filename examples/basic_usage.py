@@ -251,6 +251,33 @@ def example_load_test():
     end_time = time.time()
     logger.info(f"Нагрузочное тестирование завершено за {end_time - start_time:.2f} секунд")
 
+def example_parallel_client():
+    """Пример параллельных запросов через GigaChatClient (без прокси)"""
+    logger.info("=== Параллельные запросы через GigaChatClient ===")
+    
+    import asyncio
+    from src.litellm_gigachat.core.client import GigaChatClient
+    
+    questions = [f"Назови {i} интересный факт о Python" for i in range(1, 21)]
+    
+    def report(progress):
+        logger.info(f"Выполнено {progress.done}/{progress.total} ({progress.rate:.1f} запросов/с)")
+    
+    async def run():
+        # Токен, преобразование контента и маршрутизация - как в прокси, соединения переиспользуются
+        async with GigaChatClient() as client:
+            return await client.map(questions, model="GigaChat", concurrency=8, on_progress=report, max_tokens=100)
+    
+    start_time = time.time()
+    answers = asyncio.run(run())
+    
+    for question, answer in zip(questions[:3], answers):
+        if isinstance(answer, Exception):
+            print(f"{question}: ошибка {answer}")
+        else:
+            print(f"{question}: {answer.choices[0].message.content[:100]}...")
+    logger.info(f"{len(questions)} запросов выполнено за {time.time() - start_time:.2f} секунд")
+
 def main():
     """Главная функция с меню примеров"""
     
@@ -268,7 +295,8 @@ def main():
         "6": ("Потоковый ответ", example_streaming),
         "7": ("Параметры запроса", example_with_parameters),
         "8": ("Нагрузочное тестирование", example_load_test),
-        "9": ("Все примеры", None)
+        "9": ("Параллельные запросы (GigaChatClient)", example_parallel_client),
+        "10": ("Все примеры", None)
     }
     
     print("Выберите пример для запуска:")
@@ -278,9 +306,9 @@ def main():
     choice = input("\nВведите номер примера (или Enter для всех): ").strip()
     
     if not choice:
-        choice = "9"
+        choice = "10"
     
-    if choice == "9":
+    if choice == "10":
         # Запуск всех примеров
         for key, (name, func) in examples.items():
             if func:
@@ -2,40 +2,54 @@
 LiteLLM GigaChat Integration
 
 Полнофункциональная интеграция GigaChat API с LiteLLM.
+
+Подмодули импортируются при первом обращении к атрибуту пакета (PEP 562):
+`import litellm_gigachat` не загружает LiteLLM Proxy, пока не понадобятся
+callbacks или прокси-сервер.
 """
 
-from .core import TokenManager, get_global_token_manager, get_gigachat_token
-from .callbacks import (
-    GigaChatTokenCallback, 
-    get_gigachat_callback, 
-    setup_litellm_gigachat_integration,
-    GigaChatTransformer,
-    get_gigachat_transformer,
-    setup_gigachat_transformer,
-    get_gigachat_transformer_stats
-)
-from .proxy import start_proxy_server
-from .cli.main import cli, main as cli_main
+from importlib import import_module
 
 __version__ = "0.1.4"
 __author__ = "LiteLLM GigaChat Team"
 
-__all__ = [
+# Публичное имя -> (модуль относительно пакета, имя атрибута)
+_LAZY_ATTRIBUTES = {
     # Core
-    'TokenManager',
-    'get_global_token_manager', 
-    'get_gigachat_token',
+    'TokenManager': ('.core.token_manager', 'TokenManager'),
+    'get_global_token_manager': ('.core.token_manager', 'get_global_token_manager'),
+    'get_gigachat_token': ('.core.token_manager', 'get_gigachat_token'),
+    'GigaChatClient': ('.core.client', 'GigaChatClient'),
     # Callbacks
-    'GigaChatTokenCallback',
-    'get_gigachat_callback',
-    'setup_litellm_gigachat_integration',
-    'GigaChatTransformer',
-    'get_gigachat_transformer',
-    'setup_gigachat_transformer',
-    'get_gigachat_transformer_stats',
+    'GigaChatTokenCallback': ('.callbacks.token_callback', 'GigaChatTokenCallback'),
+    'get_gigachat_callback': ('.callbacks.token_callback', 'get_gigachat_callback'),
+    'setup_litellm_gigachat_integration': ('.callbacks.token_callback', 'setup_litellm_gigachat_integration'),
+    'GigaChatTransformer': ('.callbacks.content_handler', 'GigaChatTransformer'),
+    'get_gigachat_transformer': ('.callbacks.content_handler', 'get_gigachat_transformer'),
+    'setup_gigachat_transformer': ('.callbacks.content_handler', 'setup_gigachat_transformer'),
+    'get_gigachat_transformer_stats': ('.callbacks.content_handler', 'get_gigachat_transformer_stats'),
     # Proxy
-    'start_proxy_server',
+    'start_proxy_server': ('.proxy.server', 'start_proxy_server'),
     # CLI
-    'cli',
-    'cli_main'
-]
+    'cli': ('.cli.main', 'cli'),
+    'cli_main': ('.cli.main', 'main'),
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    """Ленивая загрузка публичных атрибутов пакета."""
+    try:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(import_module(module_name, __name__), attribute)
+    # Кэшируем, чтобы следующие обращения не проходили через __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,16 +1,34 @@
 """
 LiteLLM callbacks для интеграции с GigaChat.
+
+Модули callbacks зависят от LiteLLM Proxy, поэтому импортируются лениво -
+при первом обращении к атрибуту пакета.
 """
 
-from .token_callback import GigaChatTokenCallback, get_gigachat_callback, setup_litellm_gigachat_integration
-from .content_handler import GigaChatTransformer, get_gigachat_transformer, setup_gigachat_transformer, get_gigachat_transformer_stats
-
-__all__ = [
-    'GigaChatTokenCallback',
-    'get_gigachat_callback',
-    'setup_litellm_gigachat_integration',
-    'GigaChatTransformer',
-    'get_gigachat_transformer',
-    'setup_gigachat_transformer',
-    'get_gigachat_transformer_stats'
-]
+from importlib import import_module
+
+_LAZY_ATTRIBUTES = {
+    'GigaChatTokenCallback': '.token_callback',
+    'get_gigachat_callback': '.token_callback',
+    'setup_litellm_gigachat_integration': '.token_callback',
+    'GigaChatTransformer': '.content_handler',
+    'get_gigachat_transformer': '.content_handler',
+    'setup_gigachat_transformer': '.content_handler',
+    'get_gigachat_transformer_stats': '.content_handler',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    """Ленивая загрузка callbacks."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
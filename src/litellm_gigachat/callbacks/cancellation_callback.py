@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Literal, Optional
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..core.cancellation import get_current_scope
+from ..core.rate_limits import DEFAULT_COMPLETION_ESTIMATE
+from ..core.token_estimator import get_token_estimator
+from ..core.ttft import close_stream
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
+logger = logging.getLogger(__name__)
+
+
+def get_chunk_text(chunk: Any) -> str:
+    """Текст chunk streaming-ответа (delta.content первого варианта)"""
+    choices = getattr(chunk, "choices", None) or []
+    delta = getattr(choices[0], "delta", None) if choices else None
+    content = getattr(delta, "content", None) if delta is not None else None
+    return content if isinstance(content, str) else ""
+
+
+class CancellationCallback(CustomLogger):
+    """
+    Callback для LiteLLM Proxy, закрывающий streaming-ответ модели, если его
+    передача клиенту прервана (клиент отключился), и учитывающий
+    сгенерированные до отмены токены.
+
+    Подключается последним в litellm_settings.callbacks: в запросе уже
+    выбран deployment. Отмену запроса выполняет CancelOnDisconnectMiddleware.
+    """
+
+    async def async_pre_call_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        cache: DualCache,
+        data: dict,
+        call_type: Literal[
+            "completion",
+            "text_completion",
+            "embeddings",
+            "image_generation",
+            "moderation",
+            "audio_transcription",
+        ]
+    ) -> dict:
+        """Запоминает модель и ожидаемый размер ответа для учёта отмены"""
+        scope = get_current_scope()
+        if scope is None:
+            return data
+
+        scope.model = data.get('model', '')
+        scope.stream = bool(data.get('stream'))
+        if call_type == "embeddings":
+            scope.expected_tokens = 0
+        else:
+            # Та же оценка ответа, что и при резервировании квоты токенов
+            max_tokens = data.get('max_tokens') or data.get('max_completion_tokens')
+            scope.expected_tokens = (
+                min(int(max_tokens), DEFAULT_COMPLETION_ESTIMATE) if max_tokens else DEFAULT_COMPLETION_ESTIMATE
+            )
+        return data
+
+    async def async_post_call_streaming_iterator_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        response: Any,
+        request_data: dict,
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Передаёт chunk клиенту; если передача прервана до конца ответа,
+        закрывает соединение с моделью.
+        """
+        scope = get_current_scope()
+        estimator = get_token_estimator() if scope is not None else None
+        finished = False
+        try:
+            async for chunk in response:
+                if scope is not None:
+                    text = get_chunk_text(chunk)
+                    scope.generated_chars += len(text)
+                    scope.generated_token_estimate += estimator.estimate_text(text)
+                yield chunk
+            finished = True
+        finally:
+            if not finished:
+                logger.debug(f"Передача ответа {request_data.get('model')} прервана, закрываем поток модели")
+                await close_stream(response)
+
+
+# Глобальный экземпляр callback
+_cancellation_callback: Optional[CancellationCallback] = None
+
+
+def get_cancellation_callback() -> CancellationCallback:
+    """Получение глобального экземпляра CancellationCallback"""
+    global _cancellation_callback
+    if _cancellation_callback is None:
+        _cancellation_callback = CancellationCallback()
+    return _cancellation_callback
+
+
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+cancellation_callback_instance = LazyCallback(get_cancellation_callback, "CancellationCallback")
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Tuple
+
+from fastapi import HTTPException
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..core.admission import AdmissionRejected, get_global_admission_controller
+from ..core.cancellation import on_cancel
+from ..core.concurrency import (
+    CANCELLED,
+    ERROR,
+    SUCCESS,
+    AIMDLimiter,
+    ConcurrencyLimitExceeded,
+    classify_outcome,
+    get_global_concurrency_limiters,
+)
+from ..core.deployment_stats import get_global_deployment_stats
+from ..core.retry import DEPLOYMENT_METADATA_KEY
+from ..core.scheduler import get_global_fair_scheduler
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
+logger = logging.getLogger(__name__)
+
+# Ключ в metadata запроса с идентификатором занятого слота
+METADATA_KEY = "gigachat_concurrency_slot"
+
+# Слоты, не освобождённые за это время, считаются потерянными
+STALE_SLOT_SECONDS = 600.0
+
+
+def get_normalized_latency(response_obj: Any, latency: float) -> float:
+    """
+    Задержка на один сгенерированный токен (если usage известен).
+
+    Args:
+        response_obj: Ответ модели
+        latency: Полная задержка в секундах
+
+    Returns:
+        Нормированная задержка
+    """
+    usage = getattr(response_obj, "usage", None)
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    if isinstance(completion_tokens, int) and completion_tokens > 0:
+        return latency / completion_tokens
+    return latency
+
+
+class ConcurrencyLimitCallback(CustomLogger):
+    """
+    Callback для LiteLLM Proxy, ограничивающий число одновременных запросов
+    к каждому deployment адаптивным лимитом (AIMD).
+
+    Подключается после ModelGroupCallback: лимит применяется к выбранному deployment.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._slots: Dict[str, Tuple[AIMDLimiter, float]] = {}
+        self._slots_lock = threading.Lock()
+
+    async def async_pre_call_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        cache: DualCache,
+        data: dict,
+        call_type: Literal[
+            "completion",
+            "text_completion",
+            "embeddings",
+            "image_generation",
+            "moderation",
+            "audio_transcription",
+        ]
+    ) -> dict:
+        """
+        Занимает слот deployment; при отсутствии свободных ждёт в очереди
+        (справедливой по ключам и полосам приоритета, если настроен scheduler).
+        Переполнение очереди или истечение ожидания - ответ 429; если ответ
+        заведомо не уложится в SLO модели (секция admission) - сразу 503.
+        """
+        model = data.get('model', '')
+        registry = get_global_concurrency_limiters()
+        # Лимиты не настроены (нет секции concurrency_limits) - запрос проходит без ограничений
+        limiter = registry.get(model) if registry is not None and model else None
+        if limiter is None:
+            return data
+
+        admission = get_global_admission_controller()
+        if admission is not None:
+            info = (data.get('metadata') or {}).get(DEPLOYMENT_METADATA_KEY) or {}
+            try:
+                admission.check(model, limiter, info.get('group'))
+            except AdmissionRejected as exc:
+                logger.warning(str(exc))
+                raise HTTPException(
+                    status_code=503,
+                    detail=str(exc),
+                    headers={"Retry-After": str(int(exc.retry_after))},
+                )
+
+        started = time.monotonic()
+        try:
+            scheduler = get_global_fair_scheduler()
+            if scheduler is None:
+                await limiter.acquire()
+            else:
+                stats = get_global_deployment_stats().get(model)
+                ticket = scheduler.get_ticket(data, user_api_key_dict, stats.ewma_latency if stats else None)
+                await scheduler.admit(limiter, ticket)
+        except ConcurrencyLimitExceeded as exc:
+            logger.warning(str(exc))
+            raise HTTPException(
+                status_code=429,
+                detail=str(exc),
+                headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+            )
+        if admission is not None:
+            admission.record_wait(model, time.monotonic() - started)
+
+        slot_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._slots_lock:
+            self._expire_stale_slots(now)
+            self._slots[slot_id] = (limiter, now)
+        metadata = data.setdefault('metadata', {})
+        metadata[METADATA_KEY] = slot_id
+        # Клиент отключился до ответа - слот освобождается сразу
+        on_cancel(lambda scope: self._release(metadata, CANCELLED))
+        return data
+
+    def _release(self, metadata: Optional[Dict[str, Any]], outcome: str, latency: Optional[float] = None) -> None:
+        """Освободить слот запроса (повторное освобождение игнорируется)"""
+        slot_id = (metadata or {}).get(METADATA_KEY)
+        if not slot_id:
+            return
+        with self._slots_lock:
+            slot = self._slots.pop(slot_id, None)
+        if slot is not None:
+            slot[0].release(outcome, latency)
+
+    def detach(self, metadata: Dict[str, Any], release: bool = True) -> None:
+        """
+        Отвязать слот от запроса при переключении на другой deployment.
+
+        Args:
+            metadata: metadata запроса
+            release: Освободить слот (False - слот остаётся за исходным
+                запросом, например основным запросом hedging)
+        """
+        if release:
+            self._release(metadata, CANCELLED)
+        metadata.pop(METADATA_KEY, None)
+
+    def _expire_stale_slots(self, now: float) -> None:
+        """Освободить слоты запросов без завершения (вызывается под блокировкой)"""
+        stale = [slot_id for slot_id, (_, acquired_at) in self._slots.items()
+                 if now - acquired_at > STALE_SLOT_SECONDS]
+        for slot_id in stale:
+            limiter, _ = self._slots.pop(slot_id)
+            limiter.release(CANCELLED)
+        if stale:
+            logger.debug(f"Освобождено {len(stale)} потерянных слотов")
+
+    @staticmethod
+    def _get_metadata(kwargs: dict) -> Optional[Dict[str, Any]]:
+        """metadata запроса из kwargs логирования LiteLLM"""
+        litellm_params = kwargs.get('litellm_params') or {}
+        return litellm_params.get('metadata') or kwargs.get('metadata')
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """Успешный ответ: аддитивный рост лимита (или снижение при всплеске задержки)"""
+        try:
+            latency = get_normalized_latency(response_obj, (end_time - start_time).total_seconds())
+            self._release(self._get_metadata(kwargs), SUCCESS, latency)
+        except Exception as e:
+            logger.error(f"Ошибка освобождения слота: {e}")
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        """Ошибка: 429/503 снижают лимит, остальные ошибки его не меняют"""
+        try:
+            self._release(self._get_metadata(kwargs), classify_outcome(kwargs.get('exception') or Exception()))
+        except Exception as e:
+            logger.error(f"Ошибка освобождения слота: {e}")
+
+    async def async_post_call_failure_hook(
+        self,
+        request_data: dict,
+        original_exception: Exception,
+        user_api_key_dict: UserAPIKeyAuth,
+        traceback_str: Optional[str] = None,
+    ):
+        """Ошибка на уровне прокси - освобождаем слот, если он ещё занят"""
+        try:
+            self._release(request_data.get('metadata'), ERROR)
+        except Exception as e:
+            logger.error(f"Ошибка в async_post_call_failure_hook лимитера: {e}")
+
+
+# Глобальный экземпляр callback
+_concurrency_limit_callback: Optional[ConcurrencyLimitCallback] = None
+
+
+def get_concurrency_limit_callback() -> ConcurrencyLimitCallback:
+    """Получение глобального экземпляра ConcurrencyLimitCallback"""
+    global _concurrency_limit_callback
+    if _concurrency_limit_callback is None:
+        _concurrency_limit_callback = ConcurrencyLimitCallback()
+    return _concurrency_limit_callback
+
+
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+concurrency_limit_callback_instance = LazyCallback(get_concurrency_limit_callback, "ConcurrencyLimitCallback")
@@ -1,12 +1,21 @@
+from __future__ import annotations
+
 import logging
-from typing import Any, Dict, List, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Union
 from litellm.integrations.custom_logger import CustomLogger
-from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
 from typing import Literal
 import json
 import uuid
 import time
 
+from fastapi import HTTPException
+
+from ..core.context_window import ContextWindowExceeded, get_global_context_window_manager
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
 logger = logging.getLogger(__name__)
 
 class GigaChatTransformer(CustomLogger):
@@ -18,6 +27,7 @@ class GigaChatTransformer(CustomLogger):
     - Трансформирует tools в functions
     - Преобразует tool_choice в function_call
     - Адаптирует параметры запроса
+    - Приводит промпт к окну контекста модели (секция context_window)
     
     Трансформация ответов (GigaChat → OpenAI):
     - Преобразует function_call в tool_calls
@@ -36,6 +46,11 @@ class GigaChatTransformer(CustomLogger):
             'errors': 0
         }
 
+    @staticmethod
+    def _is_embeddings_request(data: Dict[str, Any]) -> bool:
+        """Проверяет, является ли запрос запросом эмбеддингов (input без messages)"""
+        return 'input' in data and 'messages' not in data
+
     def _is_gigachat_request(self, data: Dict[str, Any]) -> bool:
         """Проверяет, является ли запрос запросом к GigaChat"""
         try:
@@ -392,6 +407,10 @@ class GigaChatTransformer(CustomLogger):
         try:
             self.processed_requests += 1
             
+            # Эмбеддинги передаются без преобразования (нет сообщений)
+            if self._is_embeddings_request(data):
+                return data
+            
             # Проверяем, является ли это запросом к GigaChat
             if not self._is_gigachat_request(data):
                 if self.debug_mode:
@@ -407,7 +426,10 @@ class GigaChatTransformer(CustomLogger):
             # 1. Обрабатываем сообщения (преобразование контента)
             converted_count = self._process_messages(processed_data)
             
-            # 2. Подготавливаем полный GigaChat payload (включая tools/functions)
+            # 2. Приводим промпт к окну контекста модели (до отправки запроса)
+            processed_data = apply_context_window(processed_data)
+            
+            # 3. Подготавливаем полный GigaChat payload (включая tools/functions)
             gigachat_payload = self._prepare_gigachat_payload(processed_data)
             
             # Обновляем данные запроса
@@ -421,6 +443,8 @@ class GigaChatTransformer(CustomLogger):
             
             return processed_data
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Критическая ошибка в GigaChatTransformer: {e}")
             self.conversion_stats['errors'] += 1
@@ -438,7 +462,7 @@ class GigaChatTransformer(CustomLogger):
         """
         try:
             # Проверяем, является ли это ответом от GigaChat
-            if not self._is_gigachat_request(data):
+            if self._is_embeddings_request(data) or not self._is_gigachat_request(data):
                 if self.debug_mode:
                     logger.debug("Ответ не от GigaChat, пропускаем трансформацию")
                 return response
@@ -479,6 +503,29 @@ class GigaChatTransformer(CustomLogger):
         }
 
 
+def apply_context_window(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Привести промпт запроса к окну контекста модели (секция context_window).
+
+    Args:
+        data: Параметры запроса
+
+    Returns:
+        Параметры запроса
+
+    Raises:
+        HTTPException: 400, если промпт не удалось уместить в окно
+    """
+    context_window = get_global_context_window_manager()
+    if context_window is None:
+        return data
+    try:
+        return context_window.apply(data)
+    except ContextWindowExceeded as exc:
+        logger.warning(str(exc))
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+
 # Глобальный экземпляр для подключения в конфиге
 _gigachat_transformer = None
 
@@ -489,8 +536,8 @@ def get_gigachat_transformer(debug_mode: bool = True) -> GigaChatTransformer:
         _gigachat_transformer = GigaChatTransformer(debug_mode=debug_mode)
     return _gigachat_transformer
 
-# Экземпляр для подключения в конфиге
-gigachat_transformer_instance = get_gigachat_transformer()
+# Экземпляр для подключения в конфиге (создаётся при первом вызове хука)
+gigachat_transformer_instance = LazyCallback(get_gigachat_transformer, "GigaChatTransformer")
 
 def setup_gigachat_transformer():
     """
@@ -498,7 +545,7 @@ def setup_gigachat_transformer():
     """
     import litellm
     
-    transformer = get_gigachat_transformer()
+    transformer = gigachat_transformer_instance
     
     # Проверяем, не добавлен ли уже transformer
     if transformer not in litellm.callbacks:
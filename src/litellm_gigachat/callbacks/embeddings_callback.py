@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+import os
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Tuple
+
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..core.embeddings import get_global_embedding_batcher
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
+logger = logging.getLogger(__name__)
+
+# Клиентов OpenAI SDK в кэше (ключ - адрес и токен, токен GigaChat периодически меняется)
+MAX_CLIENTS = 64
+
+
+def get_deployment_params(model: str) -> Optional[Dict[str, Any]]:
+    """
+    Параметры deployment модели из LiteLLM Router.
+
+    Args:
+        model: Имя модели запроса
+
+    Returns:
+        litellm_params, если у всех deployments модели один api_base
+        и OpenAI-совместимый API, иначе None
+    """
+    import litellm.proxy.proxy_server as proxy_server
+
+    router = getattr(proxy_server, "llm_router", None)
+    if router is None or not model:
+        return None
+    deployments = router.get_model_list(model_name=model) or []
+    params = [deployment.get("litellm_params") or {} for deployment in deployments]
+    if not params or len({p.get("api_base") for p in params}) != 1:
+        return None
+    if not all(str(p.get("model", "")).startswith("openai/") for p in params):
+        return None
+    return params[0]
+
+
+class EmbeddingsCallback(CustomLogger):
+    """
+    Callback для LiteLLM Proxy, направляющий запросы эмбеддингов через
+    MicroBatchTransport: одновременные запросы объединяются в пакеты,
+    известные векторы берутся из кэша.
+
+    Подключается после token и proxy_provider callbacks: в запросе уже
+    есть токен GigaChat, адрес и заголовки прокси-провайдера. Запросу
+    передаётся клиент OpenAI SDK на транспорте объединения; повторы,
+    квоты и лимиты параллельности по-прежнему учитываются по каждому
+    запросу.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._clients: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._http_client = None
+
+    def _get_client(self, transport, api_base: str, api_key: str):
+        """Клиент OpenAI SDK на транспорте объединения (кэшируется по адресу и ключу)"""
+        import httpx
+        from openai import AsyncOpenAI
+
+        key = (api_base, api_key)
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            return client
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                transport=transport, limits=httpx.Limits(max_connections=None, max_keepalive_connections=None)
+            )
+        # Повторы выполняет Router, клиент только отправляет запрос
+        client = self._clients[key] = AsyncOpenAI(
+            api_key=api_key, base_url=api_base, http_client=self._http_client, max_retries=0
+        )
+        while len(self._clients) > MAX_CLIENTS:
+            self._clients.popitem(last=False)
+        return client
+
+    async def async_pre_call_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        cache: DualCache,
+        data: dict,
+        call_type: Literal[
+            "completion",
+            "text_completion",
+            "embeddings",
+            "image_generation",
+            "moderation",
+            "audio_transcription",
+        ]
+    ) -> dict:
+        """Передаёт запросу эмбеддингов клиента OpenAI SDK на транспорте объединения"""
+        transport = get_global_embedding_batcher()
+        if call_type != "embeddings" or transport is None or data.get("client") is not None:
+            return data
+
+        try:
+            litellm_params = data.get("litellm_params") or {}
+            deployment = get_deployment_params(data.get("model", "")) or {}
+            api_base = data.get("api_base") or litellm_params.get("api_base") or deployment.get("api_base")
+            api_key = data.get("api_key") or litellm_params.get("api_key") or deployment.get("api_key")
+            if isinstance(api_key, str) and api_key.startswith("os.environ/"):
+                api_key = os.environ.get(api_key.split("/", 1)[1])
+            if not deployment and not data.get("api_base"):
+                # Модель не найдена или deployments различаются - без объединения
+                return data
+            if not api_base or not api_key:
+                return data
+            data["client"] = self._get_client(transport, api_base, api_key)
+        except Exception as e:
+            logger.error(f"Ошибка подключения объединения эмбеддингов: {e}")
+        return data
+
+
+# Глобальный экземпляр callback
+_embeddings_callback: Optional[EmbeddingsCallback] = None
+
+
+def get_embeddings_callback() -> EmbeddingsCallback:
+    """Получение глобального экземпляра EmbeddingsCallback"""
+    global _embeddings_callback
+    if _embeddings_callback is None:
+        _embeddings_callback = EmbeddingsCallback()
+    return _embeddings_callback
+
+
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+embeddings_callback_instance = LazyCallback(get_embeddings_callback, "EmbeddingsCallback")
@@ -0,0 +1,91 @@
+"""
+Отложенная инициализация callback-экземпляров для конфигурации LiteLLM.
+
+Модули callbacks экспортируют `*_instance` для `litellm_settings.callbacks`.
+LazyCallback создаёт настоящий экземпляр только при первом обращении к его
+атрибутам (то есть при первом вызове хука), поэтому импорт модуля не
+создаёт TokenManager и другое глобальное состояние.
+"""
+
+import logging
+import threading
+from typing import Any, Callable
+
+from litellm.integrations.custom_logger import CustomLogger
+
+logger = logging.getLogger(__name__)
+
+
+class LazyCallback(CustomLogger):
+    """
+    Прокси CustomLogger, создающий целевой callback при первом использовании.
+
+    Все атрибуты, кроме служебных, берутся у целевого экземпляра.
+    """
+
+    _OWN_ATTRIBUTES = frozenset({
+        "callback_name",
+        "get_instance",
+        "is_initialized",
+        "_factory",
+        "_instance",
+        "_instance_lock",
+    })
+
+    def __init__(self, factory: Callable[[], CustomLogger], callback_name: str):
+        """
+        Args:
+            factory: Функция, возвращающая экземпляр callback
+            callback_name: Имя callback (LiteLLM различает callbacks по имени
+                класса и публичным полям, поэтому имя хранится в экземпляре)
+        """
+        # CustomLogger.__init__ не вызывается: его поля есть у целевого экземпляра
+        object.__setattr__(self, "callback_name", callback_name)
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_instance_lock", threading.Lock())
+
+    def get_instance(self) -> CustomLogger:
+        """
+        Получить целевой callback (создаётся при первом вызове).
+
+        Returns:
+            Экземпляр callback
+        """
+        instance = object.__getattribute__(self, "_instance")
+        if instance is not None:
+            return instance
+
+        with object.__getattribute__(self, "_instance_lock"):
+            instance = object.__getattribute__(self, "_instance")
+            if instance is None:
+                callback_name = object.__getattribute__(self, "callback_name")
+                logger.debug(f"Инициализация callback {callback_name}")
+                instance = object.__getattribute__(self, "_factory")()
+                object.__setattr__(self, "_instance", instance)
+        return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        """Создан ли целевой callback"""
+        return object.__getattribute__(self, "_instance") is not None
+
+    def __getattribute__(self, name: str) -> Any:
+        if name.startswith("__") or name in LazyCallback._OWN_ATTRIBUTES:
+            return object.__getattribute__(self, name)
+        return getattr(object.__getattribute__(self, "get_instance")(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in LazyCallback._OWN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.get_instance(), name, value)
+
+    # LiteLLM вызывает async_pre_call_hook только если метод определён в самом
+    # классе callback, поэтому он объявлен явно и делегирует целевому экземпляру
+    async def async_pre_call_hook(self, *args, **kwargs):
+        return await self.get_instance().async_pre_call_hook(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        callback_name = object.__getattribute__(self, "callback_name")
+        return f"<LazyCallback {callback_name} initialized={self.is_initialized}>"
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional
+
+from fastapi import HTTPException
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..core.cancellation import on_cancel
+from ..core.context_window import get_global_context_window_manager
+from ..core.deployment_stats import get_global_deployment_stats
+from ..core.model_groups import get_global_model_group_router
+from ..core.proxy_provider_manager import get_global_multi_proxy_provider_manager
+from ..core.token_estimator import estimate_prompt_tokens
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
+logger = logging.getLogger(__name__)
+
+# Ключ в metadata запроса, по которому хуки завершения находят запрос в статистике
+METADATA_KEY = "gigachat_deployment"
+
+
+class ModelGroupCallback(CustomLogger):
+    """
+    Callback для LiteLLM Proxy, который направляет запросы к группам моделей
+    в лучший deployment и собирает статистику задержек и ошибок.
+
+    Промпт, который не помещается в окно контекста выбранного deployment,
+    переключается на deployment с большим окном (стратегия escalate секции
+    context_window).
+
+    Должен стоять первым в litellm_settings.callbacks: остальные callbacks
+    (квоты, лимиты параллельности, токен GigaChat, заголовки прокси-провайдера)
+    работают уже с выбранным deployment.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stats = get_global_deployment_stats()
+
+    async def async_pre_call_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        cache: DualCache,
+        data: dict,
+        call_type: Literal[
+            "completion",
+            "text_completion",
+            "embeddings",
+            "image_generation",
+            "moderation",
+            "audio_transcription",
+        ]
+    ) -> dict:
+        """
+        Заменяет имя группы моделей на выбранный deployment и регистрирует
+        начало запроса в статистике.
+        """
+        model = data.get('model', '')
+        if not model:
+            return data
+
+        group_name = None
+        metadata = data.setdefault('metadata', {})
+        router = get_global_model_group_router()
+        group = router.get_group(model) if router else None
+        if group is not None:
+            # Оценка промпта сохраняется в metadata и переиспользуется квотами и повторами
+            deployment = router.choose(group, prompt_tokens=estimate_prompt_tokens(data))
+            if deployment is None:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"В группе моделей {model} нет доступных deployments",
+                )
+            logger.debug(f"Группа {model}: выбран deployment {deployment}")
+            group_name, model = model, deployment
+            data['model'] = deployment
+
+        context_window = get_global_context_window_manager()
+        if context_window is not None:
+            model = context_window.escalate(data, group) or model
+
+        metadata[METADATA_KEY] = {
+            "deployment": model,
+            "group": group_name,
+            "request_id": self.stats.start_request(model),
+        }
+        # Отменённый клиентом запрос не учитывается в статистике deployment
+        on_cancel(lambda scope: self.stats.cancel_request(metadata[METADATA_KEY]["request_id"]))
+        return data
+
+    def _finish(self, metadata: Optional[Dict[str, Any]], success: bool, latency: Optional[float] = None,
+                error: Optional[str] = None) -> None:
+        """Завершить запрос в статистике (повторное завершение игнорируется)"""
+        info = (metadata or {}).get(METADATA_KEY)
+        if not info:
+            return
+        self.stats.finish_request(info["request_id"], success, latency=latency, error=error)
+
+    @staticmethod
+    def _get_metadata(kwargs: dict) -> Optional[Dict[str, Any]]:
+        """metadata запроса из kwargs логирования LiteLLM"""
+        litellm_params = kwargs.get('litellm_params') or {}
+        return litellm_params.get('metadata') or kwargs.get('metadata')
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """Успешный ответ (для streaming - после последнего чанка)"""
+        try:
+            latency = (end_time - start_time).total_seconds()
+            self._finish(self._get_metadata(kwargs), True, latency=latency)
+        except Exception as e:
+            logger.error(f"Ошибка учёта успешного запроса: {e}")
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        """Ошибка вызова модели"""
+        try:
+            exception = kwargs.get('exception')
+            self._finish(self._get_metadata(kwargs), False, error=str(exception) if exception else None)
+        except Exception as e:
+            logger.error(f"Ошибка учёта неуспешного запроса: {e}")
+
+    async def async_post_call_failure_hook(
+        self,
+        request_data: dict,
+        original_exception: Exception,
+        user_api_key_dict: UserAPIKeyAuth,
+        traceback_str: Optional[str] = None,
+    ):
+        """
+        Ошибка на уровне прокси (в т.ч. до вызова модели) - освобождаем
+        запрос, если он ещё не завершён.
+        """
+        try:
+            self._finish(request_data.get('metadata'), False, error=str(original_exception))
+        except Exception as e:
+            logger.error(f"Ошибка в async_post_call_failure_hook групп моделей: {e}")
+
+
+async def prepare_request_for_deployment(data: dict, previous_model: str, deployment: str,
+                                         release_previous: bool = True) -> dict:
+    """
+    Перенастроить параметры запроса с одного deployment группы на другой
+    (повтор с переключением или дублирующий запрос hedging).
+
+    Резервирование квоты и слот параллельности прежнего deployment
+    освобождаются, параметры, которые callbacks выставили для него (api_base
+    и заголовки прокси-провайдера, токен GigaChat), удаляются. Затем к новому
+    deployment применяются хуки в порядке litellm_settings.callbacks: квоты,
+    лимит параллельности (с проверкой допуска), окно контекста, токен и
+    прокси-провайдер. Отказ любого из них (HTTPException) передаётся вызывающему.
+
+    Args:
+        data: Параметры вызова Router (изменяются на месте)
+        previous_model: Прежний deployment
+        deployment: Новый deployment
+        release_previous: Освободить квоту и слот прежнего deployment
+            (False - они остаются за исходным запросом, который ещё выполняется)
+
+    Returns:
+        Параметры вызова для нового deployment
+    """
+    from .concurrency_callback import get_concurrency_limit_callback
+    from .content_handler import apply_context_window
+    from .proxy_provider_callback import get_proxy_provider_callback
+    from .rate_limit_callback import get_rate_limit_callback
+    from .token_callback import get_gigachat_callback
+
+    limiters = (get_rate_limit_callback(), get_concurrency_limit_callback())
+    metadata = data.setdefault('metadata', {})
+    for callback in limiters:
+        callback.detach(metadata, release=release_previous)
+
+    previous_provider = get_global_multi_proxy_provider_manager().get_provider_by_suffix(previous_model)
+    if previous_provider is not None:
+        data.pop('api_base', None)
+        for header in previous_provider.get_auth_headers():
+            (data.get('extra_headers') or {}).pop(header, None)
+    data.pop('api_key', None)
+
+    data['model'] = deployment
+    for callback in limiters:
+        data = await callback.async_pre_call_hook(None, None, data, "completion")
+    data = apply_context_window(data)
+    for callback in (get_gigachat_callback(), get_proxy_provider_callback()):
+        data = await callback.async_pre_call_hook(None, None, data, "completion")
+    return data
+
+
+def release_request_for_deployment(data: dict) -> None:
+    """
+    Освободить квоту и слот параллельности вызова, отменённого до завершения
+    (проигравший запрос hedging): хуки логирования LiteLLM для него не вызываются.
+
+    Args:
+        data: Параметры вызова Router
+    """
+    from .concurrency_callback import get_concurrency_limit_callback
+    from .rate_limit_callback import get_rate_limit_callback
+
+    metadata = data.get('metadata')
+    if isinstance(metadata, dict):
+        for callback in (get_rate_limit_callback(), get_concurrency_limit_callback()):
+            callback.detach(metadata)
+
+
+# Глобальный экземпляр callback
+_model_group_callback: Optional[ModelGroupCallback] = None
+
+
+def get_model_group_callback() -> ModelGroupCallback:
+    """Получение глобального экземпляра ModelGroupCallback"""
+    global _model_group_callback
+    if _model_group_callback is None:
+        _model_group_callback = ModelGroupCallback()
+    return _model_group_callback
+
+
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+model_group_callback_instance = LazyCallback(get_model_group_callback, "ModelGroupCallback")
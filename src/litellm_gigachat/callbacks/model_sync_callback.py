@@ -57,6 +57,7 @@ def update_models_in_router(models: List[Dict[str, Any]], provider_name: str = "
                 ]
                 
                 deleted_count = original_count - len(proxy_server.llm_router.model_list)
+                _sync_model_names(proxy_server.llm_router)
                 if deleted_count > 0:
                     logger.info(f"Удалено {deleted_count} старых deployments провайдера {provider_name} с суффиксом {model_suffix}")
             
@@ -83,6 +84,8 @@ def update_models_in_router(models: List[Dict[str, Any]], provider_name: str = "
                         if d.get("model_name") != model_name
                     ]
                     was_existing = len(proxy_server.llm_router.model_list) < existing_count
+                    if was_existing:
+                        _sync_model_names(proxy_server.llm_router)
                     
                     # Создаём LiteLLM_Params
                     litellm_params = LiteLLM_Params(
@@ -130,5 +133,190 @@ def update_models_in_router(models: List[Dict[str, Any]], provider_name: str = "
             logger.error(f"Критическая ошибка обновления: {exc}", exc_info=True)
 
 
+def register_wildcard_deployment(provider) -> bool:
+    """
+    Зарегистрировать в LiteLLM Router один шаблонный deployment для провайдера.
+
+    Запрос вида ``<name>-<suffix>`` маршрутизируется в ``openai/<name>`` на URL
+    провайдера в момент вызова, поэтому размер Router не зависит от размера каталога
+    и не меняется при синхронизации.
+
+    Args:
+        provider: Конфигурация прокси-провайдера (ProxyProviderConfig)
+
+    Returns:
+        True если deployment зарегистрирован
+    """
+    with _update_lock:
+        try:
+            import litellm.proxy.proxy_server as proxy_server
+            from litellm.types.router import Deployment, LiteLLM_Params, ModelInfo
+
+            if not hasattr(proxy_server, "llm_router") or proxy_server.llm_router is None:
+                logger.warning("Router ещё не инициализирован, шаблонный deployment не зарегистрирован")
+                return False
+
+            pattern = provider.get_wildcard_pattern()
+            deployment = Deployment(
+                model_name=pattern,
+                litellm_params=LiteLLM_Params(
+                    model="openai/*",
+                    api_base=provider.url,
+                    api_key="none",
+                    timeout=provider.timeout,
+                ),
+                model_info=ModelInfo(id=hashlib.sha256(f"{pattern}:{provider.url}".encode()).hexdigest()),
+            )
+            proxy_server.llm_router.upsert_deployment(deployment)
+            _install_catalog_model_names(proxy_server.llm_router)
+
+            logger.info(f"Зарегистрирован шаблонный deployment {pattern} -> openai/* (провайдер: {provider.name})")
+            return True
+
+        except Exception as exc:
+            logger.error(f"Ошибка регистрации шаблонного deployment для {provider.name}: {exc}", exc_info=True)
+            return False
+
+
+def unregister_provider_deployments(provider) -> int:
+    """
+    Удалить из LiteLLM Router все deployments провайдера (включая шаблонный).
+
+    Args:
+        provider: Конфигурация прокси-провайдера (ProxyProviderConfig)
+
+    Returns:
+        Количество удалённых deployments
+    """
+    with _update_lock:
+        try:
+            import litellm.proxy.proxy_server as proxy_server
+
+            router = getattr(proxy_server, "llm_router", None)
+            if router is None:
+                return 0
+
+            suffix = f"-{provider.suffix}"
+            original_count = len(router.model_list)
+            router.model_list = [
+                d for d in router.model_list
+                if not d.get("model_name", "").endswith(suffix)
+            ]
+            _sync_model_names(router)
+
+            # Шаблонный deployment хранится ещё и в pattern_router
+            pattern_router = getattr(router, "pattern_router", None)
+            if pattern_router is not None:
+                regex = pattern_router._pattern_to_regex(provider.get_wildcard_pattern())
+                pattern_router.patterns.pop(regex, None)
+
+            deleted_count = original_count - len(router.model_list)
+            logger.info(f"Удалено {deleted_count} deployments провайдера {provider.name}")
+            return deleted_count
+
+        except Exception as exc:
+            logger.error(f"Ошибка удаления deployments провайдера {provider.name}: {exc}")
+            return 0
+
+
+def _sync_model_names(router) -> None:
+    """
+    Пересобрать router.model_names после удаления deployments из model_list.
+
+    Router ищет deployment по имени через model_names и обращается к шаблонам
+    (pattern_router) только для отсутствующих там имён: без пересборки имя
+    удалённого deployment перекрывает шаблонный deployment, и запрос
+    отклоняется с 400.
+    """
+    router.model_names = [d.get("model_name") for d in router.model_list]
+
+
+def apply_provider_changes(old_providers, new_providers, changes: Dict[str, List[str]]) -> None:
+    """
+    Применить перезагруженную конфигурацию провайдеров к Router и синхронизации.
+
+    Используется как обработчик MultiProxyProviderManager.add_reload_listener.
+
+    Args:
+        old_providers: Прежний список ProxyProviderConfig
+        new_providers: Новый список ProxyProviderConfig
+        changes: Имена провайдеров по категориям added/removed/changed/unchanged
+    """
+    from ..core.multi_model_sync import get_global_multi_model_sync_manager
+
+    old_by_name = {p.name: p for p in old_providers}
+    new_by_name = {p.name: p for p in new_providers}
+
+    # Deployments удалённых провайдеров и провайдеров со сменой суффикса/режима
+    for name in changes.get("removed", []):
+        unregister_provider_deployments(old_by_name[name])
+    for name in changes.get("changed", []):
+        old, new = old_by_name[name], new_by_name[name]
+        if old.suffix != new.suffix or old.routing_mode != new.routing_mode or old.is_wildcard():
+            unregister_provider_deployments(old)
+
+    for name in changes.get("added", []) + changes.get("changed", []):
+        if new_by_name[name].is_wildcard():
+            register_wildcard_deployment(new_by_name[name])
+
+    multi_sync_manager = get_global_multi_model_sync_manager()
+    if multi_sync_manager is not None:
+        result = multi_sync_manager.reconcile_providers(new_providers)
+        logger.info(
+            f"Синхронизация моделей перенастроена: запущено {result['started']}, остановлено {result['stopped']}"
+        )
+
+
+def _install_catalog_model_names(router) -> None:
+    """
+    Дополнить список моделей Router каталогами wildcard-провайдеров и группами моделей.
+
+    Шаблонные deployments не попадают в /v1/models, поэтому имена моделей
+    берутся из синхронизированного каталога MultiModelSyncManager. Группы
+    моделей не являются deployments Router и добавляются по именам.
+    """
+    if getattr(router, "_gigachat_catalog_names_installed", False):
+        return
+
+    from ..core.model_groups import get_global_model_group_router
+    from ..core.multi_model_sync import get_global_multi_model_sync_manager
+
+    original_get_model_names = router.get_model_names
+
+    def get_model_names(*args, **kwargs) -> List[str]:
+        model_names = original_get_model_names(*args, **kwargs)
+        multi_sync_manager = get_global_multi_model_sync_manager()
+        if multi_sync_manager:
+            known = set(model_names)
+            model_names.extend(
+                name for name in multi_sync_manager.get_wildcard_model_names() if name not in known
+            )
+        model_group_router = get_global_model_group_router()
+        if model_group_router:
+            known = set(model_names)
+            model_names.extend(name for name in model_group_router.get_group_names() if name not in known)
+        return model_names
+
+    router.get_model_names = get_model_names
+    router._gigachat_catalog_names_installed = True
+
+
+def register_model_group_names() -> bool:
+    """
+    Показать группы моделей в /v1/models.
+
+    Returns:
+        True если Router инициализирован и список моделей дополнен
+    """
+    import litellm.proxy.proxy_server as proxy_server
+
+    if getattr(proxy_server, "llm_router", None) is None:
+        logger.warning("Router ещё не инициализирован, группы моделей не добавлены в список моделей")
+        return False
+
+    _install_catalog_model_names(proxy_server.llm_router)
+    return True
+
+
 def get_update_callback() -> callable:
     return update_models_in_router
@@ -1,8 +1,17 @@
+from __future__ import annotations
+
+import asyncio
 import logging
-from typing import Optional, Dict, Any, Literal
+from typing import TYPE_CHECKING, Optional, Dict, Any, Literal
+from fastapi import HTTPException
 from litellm.integrations.custom_logger import CustomLogger
-from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
 from ..core.proxy_provider_manager import get_global_multi_proxy_provider_manager
+from ..core.multi_model_sync import get_global_multi_model_sync_manager
+from ..core.health import get_global_provider_health_manager, is_local_rejection
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +54,21 @@ class ProxyProviderCallback(CustomLogger):
             provider = self.multi_manager.get_provider_by_suffix(model)
             
             if provider:
+                try:
+                    self._check_circuit(provider, data)
+                except HTTPException:
+                    # Запрос к группе моделей переходит на другой deployment группы
+                    rerouted = await self._reroute(data, model)
+                    if rerouted is None:
+                        raise
+                    return rerouted
+
+                if provider.sync_enabled and provider.sync_on_miss:
+                    await self._ensure_model_synced(model, provider.sync_on_miss_timeout)
+
+                if provider.is_wildcard():
+                    model = self._resolve_wildcard_model(data, model, provider)
+
                 logger.info(f"Добавляем заголовки для модели {model} (провайдер: {provider.name})")
                 
                 # Получаем заголовки аутентификации для этого провайдера
@@ -94,12 +118,160 @@ class ProxyProviderCallback(CustomLogger):
             else:
                 logger.debug(f"Модель {model} не является моделью прокси-провайдера")
                 
+        except HTTPException:
+            # Неизвестная модель wildcard-провайдера или недоступный провайдер -
+            # отклоняем запрос до обращения к upstream
+            raise
         except Exception as e:
             logger.error(f"Ошибка при настройке заголовков для модели прокси-провайдера: {e}")
             # Не прерываем выполнение, позволяем LiteLLM попробовать с текущими настройками
         
         return data
     
+    def _check_circuit(self, provider, data: dict) -> None:
+        """
+        Отклоняет запрос сразу, если circuit breaker провайдера открыт,
+        вместо ожидания таймаута недоступного провайдера. Занятое запросом
+        место пробного запроса запоминается в metadata, чтобы освободить его,
+        если запрос затем отклонит сам прокси.
+        """
+        health_manager = get_global_provider_health_manager()
+        if health_manager is None or health_manager.acquire(provider, data.setdefault('metadata', {})):
+            return
+
+        status = health_manager.get_health(provider).get_status()
+        retry_in = status["retry_in"] if status["retry_in"] is not None else provider.circuit_open_seconds
+        logger.warning(f"Провайдер {provider.name} недоступен, запрос отклонён (circuit breaker)")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Провайдер {provider.name} временно недоступен: {status['last_error'] or 'circuit open'}",
+            headers={"Retry-After": str(max(1, int(retry_in)))},
+        )
+
+    async def _reroute(self, data: dict, model: str) -> Optional[dict]:
+        """
+        Переключить запрос к группе моделей с deployment отклонённого провайдера
+        на другой deployment группы: circuit breaker мог открыться после того,
+        как ModelGroupCallback выбрал deployment.
+
+        Returns:
+            Параметры запроса для другого deployment или None, если запрос
+            не к группе моделей или в группе нет других доступных deployments
+        """
+        from ..core.model_groups import get_global_model_group_router
+        from ..core.retry import DEPLOYMENT_METADATA_KEY
+        from ..core.token_estimator import PROMPT_TOKENS_KEY
+        from .model_group_callback import prepare_request_for_deployment
+
+        metadata = data.get('metadata') or {}
+        info = metadata.get(DEPLOYMENT_METADATA_KEY) or {}
+        group_router = get_global_model_group_router()
+        group = group_router.get_group(info["group"]) if info.get("group") and group_router else None
+        if group is None:
+            return None
+
+        rejected = list(info.get("rejected") or []) + [model]
+        deployment = group_router.choose(group, exclude=rejected, prompt_tokens=metadata.get(PROMPT_TOKENS_KEY))
+        if deployment is None:
+            return None
+
+        # Отклонённый до отправки запрос не учитывается в статистике deployment
+        stats = group_router.stats
+        stats.cancel_request(info["request_id"])
+        metadata[DEPLOYMENT_METADATA_KEY] = {
+            **info,
+            "deployment": deployment,
+            "rejected": rejected,
+            "request_id": stats.start_request(deployment),
+        }
+        logger.info(f"Группа {group.name}: провайдер {model} недоступен, запрос переключён на {deployment}")
+        return await prepare_request_for_deployment(data, model, deployment)
+
+    def _record_result(self, kwargs: dict, exception: Optional[BaseException] = None) -> None:
+        """Учитывает результат вызова модели в состоянии провайдера"""
+        health_manager = get_global_provider_health_manager()
+        if health_manager is None:
+            return
+
+        metadata = (kwargs.get('litellm_params') or {}).get('metadata') or {}
+        model = metadata.get('model_group') or kwargs.get('model') or ''
+        provider = self.multi_manager.get_provider_by_suffix(model)
+        if provider:
+            if is_local_rejection(exception):
+                health_manager.release_local_rejection(provider, metadata)
+            health_manager.record_result(provider, exception)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """Успешный вызов модели прокси-провайдера"""
+        try:
+            self._record_result(kwargs)
+        except Exception as e:
+            logger.error(f"Ошибка учёта успешного запроса прокси-провайдера: {e}")
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        """Ошибка вызова модели прокси-провайдера (ошибки 5xx и таймауты открывают circuit breaker)"""
+        try:
+            self._record_result(kwargs, kwargs.get('exception') or Exception("unknown error"))
+        except Exception as e:
+            logger.error(f"Ошибка учёта неуспешного запроса прокси-провайдера: {e}")
+
+    async def _ensure_model_synced(self, model: str, wait_timeout: float) -> None:
+        """
+        Запускает внеплановую синхронизацию провайдера, если модель ещё не известна.
+        Ожидание выполняется в пуле потоков, чтобы не блокировать event loop.
+        """
+        multi_sync_manager = get_global_multi_model_sync_manager()
+        if not multi_sync_manager:
+            return
+
+        sync_manager = multi_sync_manager.get_manager_for_model(model)
+        if not sync_manager or sync_manager.has_model(model):
+            return
+
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(
+            None, multi_sync_manager.sync_on_miss, model, wait_timeout
+        )
+        if found:
+            logger.info(f"Модель {model} найдена после внеплановой синхронизации")
+        else:
+            logger.warning(f"Модель {model} не найдена у провайдера после синхронизации")
+
+    def _resolve_wildcard_model(self, data: dict, model: str, provider) -> str:
+        """
+        Сопоставляет запрошенную модель wildcard-провайдера с его каталогом.
+
+        Имя модели заменяется на ``<исходный id>-<суффикс>``, чтобы шаблонный deployment
+        передал провайдеру идентификатор в исходном регистре. Если каталог уже
+        синхронизирован и модели в нём нет, запрос отклоняется с 404.
+
+        Returns:
+            Имя модели после сопоставления
+        """
+        multi_sync_manager = get_global_multi_model_sync_manager()
+        if not multi_sync_manager:
+            return model
+
+        sync_manager = multi_sync_manager.get_manager_for_model(model)
+        if not sync_manager:
+            return model
+
+        original_id = sync_manager.get_original_id(model)
+        if original_id is None:
+            if sync_manager.get_known_models():
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Модель {model} не найдена у провайдера {provider.name}",
+                )
+            # Каталог ещё не получен - передаём имя как есть
+            logger.debug(f"Каталог провайдера {provider.name} пуст, модель {model} не проверена")
+            return model
+
+        resolved_model = f"{original_id}-{provider.suffix}"
+        data['model'] = resolved_model
+        logger.debug(f"Модель {model} сопоставлена с {resolved_model} (wildcard)")
+        return resolved_model
+
     async def async_post_call_failure_hook(
         self,
         request_data: dict,
@@ -119,6 +291,12 @@ class ProxyProviderCallback(CustomLogger):
             provider = self.multi_manager.get_provider_by_suffix(model)
             
             if provider:
+                # Запрос отклонён прокси до обращения к провайдеру (в том числе
+                # хуками после этого callback) - место пробного запроса освобождается
+                health_manager = get_global_provider_health_manager()
+                if health_manager is not None and is_local_rejection(original_exception):
+                    health_manager.release_local_rejection(provider, request_data.get('metadata'))
+                
                 # Проверяем различные типы ошибок
                 error_message = str(original_exception).lower()
                 
@@ -167,8 +345,8 @@ def get_proxy_provider_callback() -> ProxyProviderCallback:
         _proxy_provider_callback = ProxyProviderCallback()
     return _proxy_provider_callback
 
-# Создаем экземпляр для использования в конфигурации
-proxy_provider_callback_instance = get_proxy_provider_callback()
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+proxy_provider_callback_instance = LazyCallback(get_proxy_provider_callback, "ProxyProviderCallback")
 
 def setup_litellm_proxy_provider_integration():
     """
@@ -176,8 +354,8 @@ def setup_litellm_proxy_provider_integration():
     """
     import litellm
     
-    # Добавляем callback в LiteLLM
-    callback = get_proxy_provider_callback()
+    # Добавляем тот же экземпляр, что подключается через конфигурацию
+    callback = proxy_provider_callback_instance
     
     # Проверяем, не добавлен ли уже callback
     if callback not in litellm.callbacks:
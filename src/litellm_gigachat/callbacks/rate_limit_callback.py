@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Literal, Mapping, Optional
+
+from fastapi import HTTPException
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..core.cancellation import on_cancel
+from ..core.health import is_local_rejection
+from ..core.rate_limits import (
+    RateLimitExceeded,
+    estimate_request_tokens,
+    get_credential,
+    get_exception_headers,
+    get_global_rate_limiters,
+    init_global_rate_limiters,
+)
+from ..core.token_estimator import estimate_prompt_tokens, estimate_response_tokens
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
+
+logger = logging.getLogger(__name__)
+
+# Ключ в metadata запроса с параметрами резервирования квоты
+METADATA_KEY = "gigachat_rate_limit"
+
+
+def get_response_headers(response_obj: Any) -> Optional[Mapping[str, Any]]:
+    """Заголовки ответа провайдера из ответа LiteLLM"""
+    hidden_params = getattr(response_obj, "_hidden_params", None) or {}
+    return hidden_params.get("additional_headers")
+
+
+class RateLimitCallback(CustomLogger):
+    """
+    Callback для LiteLLM Proxy, соблюдающий квоты RPM/TPM учётных данных
+    на стороне клиента (token bucket с калибровкой по заголовкам ответа).
+
+    Подключается после ModelGroupCallback и до ConcurrencyLimitCallback:
+    ожидание квоты не занимает слоты параллельности.
+    """
+
+    async def async_pre_call_hook(
+        self,
+        user_api_key_dict: UserAPIKeyAuth,
+        cache: DualCache,
+        data: dict,
+        call_type: Literal[
+            "completion",
+            "text_completion",
+            "embeddings",
+            "image_generation",
+            "moderation",
+            "audio_transcription",
+        ]
+    ) -> dict:
+        """
+        Ждёт квоту запросов и токенов; если ждать дольше max_wait - ответ 429.
+        """
+        model = data.get('model', '')
+        registry = get_global_rate_limiters() or init_global_rate_limiters()
+        credential = get_credential(model, data.get('api_base') or "") if model else None
+        limiter = registry.get(credential, model) if credential else None
+        if limiter is None:
+            return data
+
+        estimated_tokens = estimate_request_tokens(data)
+        try:
+            await limiter.acquire(estimated_tokens)
+        except RateLimitExceeded as exc:
+            logger.warning(str(exc))
+            raise HTTPException(
+                status_code=429,
+                detail=str(exc),
+                headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+            )
+
+        reservation = {
+            "credential": credential,
+            "model": model,
+            "estimated_tokens": estimated_tokens,
+            "prompt_tokens": estimate_prompt_tokens(data),
+        }
+        data.setdefault('metadata', {})[METADATA_KEY] = reservation
+        # Клиент отключился до ответа - возвращаем несгенерированные токены ответа
+        on_cancel(lambda scope: self._settle(reservation, max(0, estimated_tokens - scope.saved_tokens)))
+        return data
+
+    def _settle(self, reservation: Dict[str, Any], actual_tokens: int) -> None:
+        """Учесть фактические токены резервирования (повторный учёт игнорируется)"""
+        limiter = self._get_limiter(reservation)
+        if limiter is None or reservation.get("settled"):
+            return
+        reservation["settled"] = True
+        limiter.settle(reservation["estimated_tokens"], actual_tokens)
+
+    def detach(self, metadata: Dict[str, Any], release: bool = True) -> None:
+        """
+        Отвязать резервирование квоты от запроса при переключении на другой deployment.
+
+        Args:
+            metadata: metadata запроса
+            release: Вернуть зарезервированные токены (False - резервирование
+                остаётся за исходным запросом, например основным запросом hedging)
+        """
+        reservation = metadata.pop(METADATA_KEY, None)
+        if reservation and release:
+            self._settle(reservation, 0)
+
+    @staticmethod
+    def _get_reservation(kwargs: dict) -> Optional[Dict[str, Any]]:
+        """Параметры резервирования из kwargs логирования LiteLLM"""
+        litellm_params = kwargs.get('litellm_params') or {}
+        metadata = litellm_params.get('metadata') or kwargs.get('metadata') or {}
+        return metadata.get(METADATA_KEY)
+
+    @staticmethod
+    def _get_limiter(reservation: Dict[str, Any]):
+        registry = get_global_rate_limiters()
+        return registry.get(reservation["credential"], reservation["model"]) if registry else None
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """Калибровка по заголовкам ответа и учёт фактических токенов"""
+        try:
+            reservation = self._get_reservation(kwargs)
+            limiter = self._get_limiter(reservation) if reservation else None
+            if limiter is None:
+                return
+            limiter.observe_headers(get_response_headers(response_obj))
+            usage = getattr(response_obj, "usage", None)
+            total_tokens = getattr(usage, "total_tokens", None) if usage is not None else None
+            if not isinstance(total_tokens, int):
+                # Ответ без usage - учитываем локальную оценку промпта и ответа
+                total_tokens = reservation.get("prompt_tokens", 0) + estimate_response_tokens(response_obj)
+            self._settle(reservation, total_tokens)
+        except Exception as e:
+            logger.error(f"Ошибка учёта квоты: {e}")
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        """429 провайдера приостанавливает запросы на Retry-After; токены неуспешного запроса возвращаются"""
+        try:
+            reservation = self._get_reservation(kwargs)
+            limiter = self._get_limiter(reservation) if reservation else None
+            if limiter is None:
+                return
+            exception = kwargs.get('exception')
+            # Retry-After отказов самого прокси (circuit breaker, лимиты) к квоте провайдера не относится
+            if not is_local_rejection(exception):
+                limiter.observe_headers(get_exception_headers(exception), getattr(exception, "status_code", None))
+            self._settle(reservation, 0)
+        except Exception as e:
+            logger.error(f"Ошибка учёта квоты: {e}")
+
+
+# Глобальный экземпляр callback
+_rate_limit_callback: Optional[RateLimitCallback] = None
+
+
+def get_rate_limit_callback() -> RateLimitCallback:
+    """Получение глобального экземпляра RateLimitCallback"""
+    global _rate_limit_callback
+    if _rate_limit_callback is None:
+        _rate_limit_callback = RateLimitCallback()
+    return _rate_limit_callback
+
+
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+rate_limit_callback_instance = LazyCallback(get_rate_limit_callback, "RateLimitCallback")
@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 import logging
-from typing import Optional, Dict, Any, Literal
+from typing import TYPE_CHECKING, Optional, Dict, Any, Literal
 from litellm.integrations.custom_logger import CustomLogger
-from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
 from ..core.token_manager import get_global_token_manager
+from .lazy_callback import LazyCallback
+
+if TYPE_CHECKING:
+    from litellm.proxy.proxy_server import UserAPIKeyAuth, DualCache
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +18,18 @@ class GigaChatTokenCallback(CustomLogger):
     
     def __init__(self):
         super().__init__()
-        self.token_manager = get_global_token_manager()
+        self._token_manager = None
+    
+    @property
+    def token_manager(self):
+        """TokenManager (создаётся при первом запросе к GigaChat модели)"""
+        if self._token_manager is None:
+            self._token_manager = get_global_token_manager()
+        return self._token_manager
+    
+    @token_manager.setter
+    def token_manager(self, value):
+        self._token_manager = value
         
     async def async_pre_call_hook(
         self, 
@@ -142,8 +158,8 @@ def get_gigachat_callback() -> GigaChatTokenCallback:
         _gigachat_callback = GigaChatTokenCallback()
     return _gigachat_callback
 
-# Создаем экземпляр для использования в конфигурации
-gigachat_callback_instance = get_gigachat_callback()
+# Экземпляр для использования в конфигурации (создаётся при первом вызове хука)
+gigachat_callback_instance = LazyCallback(get_gigachat_callback, "GigaChatTokenCallback")
 
 def setup_litellm_gigachat_integration():
     """
@@ -151,8 +167,8 @@ def setup_litellm_gigachat_integration():
     """
     import litellm
     
-    # Добавляем callback в LiteLLM
-    callback = get_gigachat_callback()
+    # Добавляем тот же экземпляр, что подключается через конфигурацию
+    callback = gigachat_callback_instance
     
     # Проверяем, не добавлен ли уже callback
     if callback not in litellm.callbacks:
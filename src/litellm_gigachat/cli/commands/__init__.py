@@ -1,19 +1,43 @@
 """
 CLI команды для litellm-gigachat.
+
+Каждая команда живёт в отдельном модуле, который импортируется при первом
+обращении к команде (PEP 562): `from litellm_gigachat.cli.commands import start`
+работает как раньше, а группа CLI загружает только вызванную команду
+(см. LazyGroup в cli.main).
 """
 
-from .start import start
-from .test import test
-from .token_info import token_info
-from .refresh_token import refresh_token
-from .examples import examples
-from .version import version_cmd
-
-__all__ = [
-    'start',
-    'test', 
-    'token_info',
-    'refresh_token',
-    'examples',
-    'version_cmd'
-]
+from importlib import import_module
+
+# Публичное имя -> (модуль относительно пакета, имя атрибута)
+_LAZY_ATTRIBUTES = {
+    'start': ('.start', 'start'),
+    'test': ('.test', 'test'),
+    'token_info': ('.token_info', 'token_info'),
+    'refresh_token': ('.refresh_token', 'refresh_token'),
+    'examples': ('.examples', 'examples'),
+    'version_cmd': ('.version', 'version_cmd'),
+    'help_examples': ('.help_examples', 'help_examples'),
+    'env_check': ('.env_check', 'env_check'),
+    'batch': ('.batch', 'batch'),
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    """Ленивая загрузка команд."""
+    try:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(import_module(module_name, __name__), attribute)
+    # Импорт подмодуля записывает в пакет сам модуль (start, test, batch...),
+    # заменяем его командой, как делал прежний `from .start import start`
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
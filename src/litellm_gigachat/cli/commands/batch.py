@@ -0,0 +1,85 @@
+"""
+Команда batch для пакетной обработки JSONL через прокси.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+
+import click
+from dotenv import load_dotenv
+
+from ...core.batch import BatchInputError, BatchProgress, BatchRunner, HTTPBatchCaller, validate_batch_file
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_batch(input_path: str, output_path: str, base_url: str, api_key: str, concurrency: int,
+                    max_attempts: int, retry_failed: bool, show_progress: bool) -> BatchProgress:
+    """Выполнить задание через HTTP API прокси."""
+    caller = HTTPBatchCaller(base_url, api_key=api_key, max_connections=concurrency,
+                             headers={"X-Priority": "batch"})
+    runner = BatchRunner(caller, concurrency=concurrency, max_attempts=max_attempts)
+
+    def on_progress(progress: BatchProgress) -> None:
+        if show_progress:
+            click.echo(
+                f"\r⏳ {progress.done + progress.skipped}/{progress.total}+ "
+                f"(ошибок {progress.failed}, повторов {progress.retries}, {progress.rate:.1f} запросов/с)",
+                nl=False, err=True,
+            )
+
+    try:
+        return await runner.run(input_path, output_path, on_progress, retry_failed=retry_failed)
+    finally:
+        await caller.aclose()
+
+
+@click.command()
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output', 'output_path', type=click.Path(dir_okay=False),
+              help='Выходной JSONL (по умолчанию <input>.output.jsonl); выполненные запросы пропускаются')
+@click.option('--base-url', default='http://localhost:4000', show_default=True, help='Адрес прокси')
+@click.option('--api-key', envvar=['LITELLM_API_KEY', 'LITELLM_MASTER_KEY'], help='Ключ API прокси')
+@click.option('-c', '--concurrency', default=8, show_default=True, type=click.IntRange(1, 256),
+              help='Одновременных запросов')
+@click.option('--max-attempts', default=5, show_default=True, type=click.IntRange(1, 100),
+              help='Попыток на запрос')
+@click.option('--retry-failed', is_flag=True, help='Повторить запросы, завершившиеся ошибкой в прошлом запуске')
+@click.pass_context
+def batch(ctx, input_path, output_path, base_url, api_key, concurrency, max_attempts, retry_failed):
+    """Выполнить запросы из JSONL (формат OpenAI Batch) через прокси.
+
+    Ответы пишутся в выходной JSONL по мере выполнения; повторный запуск
+    продолжает прерванное задание. Ответы 429/503 приостанавливают все
+    запросы на Retry-After.
+    """
+    debug = ctx.obj.get('debug', False)
+
+    load_dotenv()
+    output_path = output_path or f"{os.path.splitext(input_path)[0]}.output.jsonl"
+
+    try:
+        total = validate_batch_file(input_path)
+    except BatchInputError as exc:
+        click.echo(f"❌ {exc}", err=True)
+        sys.exit(2)
+
+    click.echo(f"📦 Запросов: {total}, параллельно: {concurrency}, результат: {output_path}", err=True)
+    try:
+        progress = asyncio.run(run_batch(
+            input_path, output_path, base_url, api_key, concurrency, max_attempts, retry_failed,
+            show_progress=not debug,
+        ))
+    except KeyboardInterrupt:
+        click.echo("\n⏹ Прервано; повторный запуск продолжит задание", err=True)
+        sys.exit(130)
+
+    click.echo(
+        f"\n✅ Выполнено {progress.completed}, ошибок {progress.failed}, пропущено {progress.skipped} "
+        f"({progress.rate:.1f} запросов/с)",
+        err=True,
+    )
+    sys.exit(1 if progress.failed else 0)
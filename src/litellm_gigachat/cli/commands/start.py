@@ -36,8 +36,14 @@ logger = logging.getLogger(__name__)
     default='config.yml',
     help='Путь к файлу конфигурации [default: config.yml]'
 )
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    default=1,
+    help='Количество worker-процессов [default: 1]'
+)
 @click.pass_context
-def start(ctx, host, port, config):
+def start(ctx, host, port, config, workers):
     """Запустить LiteLLM прокси-сервер для GigaChat."""
     
     verbose = ctx.obj.get('verbose', False)
@@ -49,6 +55,7 @@ def start(ctx, host, port, config):
         click.echo(f"🔍 Host: {host}")
         click.echo(f"🔍 Port: {port}")
         click.echo(f"🔍 Config: {config}")
+        click.echo(f"🔍 Workers: {workers}")
     
     # Загружаем переменные окружения
     load_dotenv()
@@ -98,7 +105,8 @@ def start(ctx, host, port, config):
             port=port,
             config_file=config,
             verbose=verbose,
-            debug=debug
+            debug=debug,
+            workers=workers
         )
         
         if success:
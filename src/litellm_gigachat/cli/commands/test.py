@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 
 from ..utils import check_environment_variables
 from ...core.token_manager import get_global_token_manager
+from ...core.http_client import get_global_http_client
 
 
 logger = logging.getLogger(__name__)
@@ -76,8 +77,6 @@ def test_gigachat_api() -> bool:
     logger.info("Тестирование GigaChat API...")
     
     try:
-        import requests
-        
         # Получаем токен
         token_manager = get_global_token_manager()
         token = token_manager.get_token()
@@ -101,7 +100,7 @@ def test_gigachat_api() -> bool:
             "max_tokens": 100
         }
         
-        response = requests.post(
+        response = get_global_http_client().post(
             "https://gigachat.devices.sberbank.ru/api/v1/chat/completions",
             headers=headers,
             json=data,
@@ -5,19 +5,54 @@
 
 import click
 import sys
+from importlib import import_module
 
-from .commands.start import start
-from .commands.test import test
-from .commands.token_info import token_info
-from .commands.refresh_token import refresh_token
-from .commands.examples import examples
-from .commands.version import version_cmd
-from .commands.help_examples import help_examples
-from .commands.env_check import env_check
 from .utils import setup_logging, get_package_version
 
 
-@click.group(invoke_without_command=True)
+class LazyGroup(click.Group):
+    """
+    Группа команд, импортирующая модуль команды только при её вызове.
+
+    Команды вроде start тянут за собой LiteLLM Proxy, поэтому `--version`,
+    `env-check` и `token-info` не должны загружать их модули.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        """
+        Args:
+            lazy_commands: Имя команды -> "модуль:атрибут" относительно пакета cli
+        """
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(':')
+            command = getattr(import_module(module_name, __package__), attribute)
+            self.add_command(command, name=cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+
+# Команды загружаются лениво (см. LazyGroup) через пакет commands, чтобы его
+# атрибуты оставались командами, а не одноимёнными модулями
+LAZY_COMMANDS = {
+    'start': '.commands:start',
+    'test': '.commands:test',
+    'token-info': '.commands:token_info',
+    'refresh-token': '.commands:refresh_token',
+    'examples': '.commands:examples',
+    'version': '.commands:version_cmd',
+    'help-examples': '.commands:help_examples',
+    'env-check': '.commands:env_check',
+    'batch': '.commands:batch',
+}
+
+
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS, invoke_without_command=True)
 @click.option('--version', is_flag=True, help='Показать версию и выйти')
 @click.option('-v', '--verbose', is_flag=True, help='Подробная информация о выполнении')
 @click.option('-d', '--debug', is_flag=True, help='Максимальная отладка с сохранением логов')
@@ -46,17 +81,6 @@ def cli(ctx, version, verbose, debug):
         click.echo(ctx.get_help())
 
 
-# Добавляем команды
-cli.add_command(start)
-cli.add_command(test)
-cli.add_command(token_info)
-cli.add_command(refresh_token)
-cli.add_command(examples)
-cli.add_command(version_cmd, name='version')
-cli.add_command(help_examples, name='help-examples')
-cli.add_command(env_check, name='env-check')
-
-
 def main():
     """Точка входа для CLI."""
     try:
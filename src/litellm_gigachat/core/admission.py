@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Контроль допуска запросов по SLO моделей (load shedding).
+
+При перегрузке запрос, который заведомо не получит ответ за целевое время
+(slo), сразу получает 503 с Retry-After, а не ждёт в очереди и не расходует
+токены на ответ, который клиент уже не дождётся.
+
+Оценка времени ответа deployment = ожидание слота + задержка ответа:
+    - задержка ответа - EWMA задержки успешных запросов deployment;
+    - ожидание слота - 0, если у лимитера параллельности есть свободный слот,
+      иначе max((запросов в очереди + 1) * задержка / лимит, EWMA фактического
+      ожидания слота последними запросами).
+
+Запрос отклоняется, только если ему придётся ждать слот; пока у deployment
+меньше min_samples завершённых запросов, запросы допускаются без оценки.
+"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+from .deployment_stats import DeploymentStatsRegistry, get_global_deployment_stats
+
+logger = logging.getLogger(__name__)
+
+# Коэффициент сглаживания EWMA фактического ожидания слота
+WAIT_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Запрос отклонён: оценка времени ответа превышает SLO модели"""
+
+    def __init__(self, model: str, estimated: float, slo: float, retry_after: float):
+        self.model = model
+        self.estimated = estimated
+        self.slo = slo
+        self.retry_after = retry_after
+        super().__init__(
+            f"Deployment {model} перегружен: ожидаемое время ответа {estimated:.1f}s превышает SLO {slo:.1f}s"
+        )
+
+
+@dataclass
+class SLOConfig:
+    """Целевое время ответа модели"""
+    enabled: bool = True
+    slo: float = 60.0
+    min_samples: int = 10
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["SLOConfig"] = None) -> "SLOConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            SLOConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+
+class AdmissionController:
+    """Допуск запросов к deployments по оценке времени ответа"""
+
+    def __init__(self, default: Optional[SLOConfig] = None, models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 stats: Optional[DeploymentStatsRegistry] = None):
+        """
+        Args:
+            default: SLO по умолчанию
+            models: Переопределения для моделей (deployments или групп моделей)
+            stats: Статистика deployments (по умолчанию глобальная)
+        """
+        self.default = default or SLOConfig()
+        self.models = models or {}
+        self.stats = stats or get_global_deployment_stats()
+
+        self._lock = threading.Lock()
+        self._wait_ewma: Dict[str, float] = {}
+        self.admitted: Dict[str, int] = {}
+        self.shed: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "AdmissionController":
+        """
+        Создать из секции admission config.yml.
+
+        Args:
+            section: {"default": {...}, "models": {...}}
+
+        Returns:
+            AdmissionController
+        """
+        section = section or {}
+        return cls(default=SLOConfig.from_dict(section.get("default")), models=section.get("models") or {})
+
+    def get_config(self, model: str, group: Optional[str] = None) -> SLOConfig:
+        """SLO модели: default <- models[группа] <- models[deployment]"""
+        config = self.default
+        for name in (group, model):
+            if name and name in self.models:
+                config = SLOConfig.from_dict(self.models[name], base=config)
+        return config
+
+    def estimate_wait(self, model: str, limiter: Any, latency: float) -> float:
+        """
+        Оценка ожидания слота deployment.
+
+        Args:
+            model: Deployment
+            limiter: AIMDLimiter deployment
+            latency: Задержка ответа deployment
+
+        Returns:
+            Секунды ожидания
+        """
+        if limiter.has_free_slot():
+            return 0.0
+        backlog = (limiter.queued + 1) * latency / max(limiter.limit, 1.0)
+        with self._lock:
+            return max(backlog, self._wait_ewma.get(model, 0.0))
+
+    def record_wait(self, model: str, waited: float) -> None:
+        """Учесть фактическое ожидание слота запросом"""
+        with self._lock:
+            previous = self._wait_ewma.get(model)
+            self._wait_ewma[model] = waited if previous is None else previous + WAIT_EWMA_ALPHA * (waited - previous)
+
+    def check(self, model: str, limiter: Any, group: Optional[str] = None) -> None:
+        """
+        Проверить, успеет ли deployment ответить в пределах SLO.
+
+        Args:
+            model: Deployment
+            limiter: AIMDLimiter deployment
+            group: Группа моделей запроса
+
+        Raises:
+            AdmissionRejected: Оценка времени ответа превышает SLO
+        """
+        config = self.get_config(model, group)
+        stats = self.stats.get(model)
+        if not config.enabled or stats is None or stats.ewma_latency is None or stats.requests < config.min_samples:
+            return
+
+        wait = self.estimate_wait(model, limiter, stats.ewma_latency)
+        estimated = wait + stats.ewma_latency
+        with self._lock:
+            # Без очереди отказ не ускорит ответ: медленный deployment - не перегрузка
+            if wait == 0.0 or estimated <= config.slo:
+                self.admitted[model] = self.admitted.get(model, 0) + 1
+                return
+            self.shed[model] = self.shed.get(model, 0) + 1
+
+        # Повтор имеет смысл, когда очередь сократится на превышение
+        retry_after = max(1.0, math.ceil(estimated - config.slo))
+        raise AdmissionRejected(model, estimated, config.slo, retry_after)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Счётчики допуска и оценка ожидания слота.
+
+        Returns:
+            Словарь: deployment -> допущено, отклонено, текущая оценка ожидания слота, SLO
+        """
+        from .concurrency import get_global_concurrency_limiters
+
+        limiters = get_global_concurrency_limiters()
+        with self._lock:
+            models = sorted(set(self.admitted) | set(self.shed) | set(self._wait_ewma))
+        metrics = {}
+        for model in models:
+            stats = self.stats.get(model)
+            limiter = limiters.get(model) if limiters else None
+            wait = 0.0
+            if limiter is not None and stats is not None and stats.ewma_latency is not None:
+                wait = self.estimate_wait(model, limiter, stats.ewma_latency)
+            with self._lock:
+                metrics[model] = {
+                    "admitted": self.admitted.get(model, 0),
+                    "shed": self.shed.get(model, 0),
+                    "estimated_wait": round(wait, 3),
+                    "slo": self.get_config(model).slo,
+                }
+        return metrics
+
+
+# Глобальный экземпляр
+_global_admission_controller: Optional[AdmissionController] = None
+
+
+def get_global_admission_controller() -> Optional[AdmissionController]:
+    """
+    Получить глобальный AdmissionController.
+
+    Returns:
+        Глобальный экземпляр или None если контроль допуска не настроен
+    """
+    return _global_admission_controller
+
+
+def init_global_admission_controller(section: Optional[Dict[str, Any]] = None) -> AdmissionController:
+    """
+    Инициализировать глобальный AdmissionController.
+
+    Args:
+        section: Секция admission config.yml
+
+    Returns:
+        Инициализированный AdmissionController
+    """
+    global _global_admission_controller
+
+    _global_admission_controller = AdmissionController.from_config(section)
+
+    return _global_admission_controller
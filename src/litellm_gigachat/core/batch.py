@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Пакетная обработка запросов из JSONL-файла (аналог OpenAI Batch API).
+
+Строка входного файла - запрос в формате OpenAI Batch:
+    {"custom_id": "q1", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+(строка без body считается телом запроса, custom_id - номер строки).
+
+BatchRunner выполняет запросы ограниченным пулом асинхронных worker:
+    - число одновременных запросов - не больше concurrency и регулируется
+      AIMD (как лимит deployment в прокси): ответ 429/503 (квоты, перегрузка,
+      недоступность провайдера) уменьшает его вдвое и приостанавливает весь
+      пул на Retry-After, успешные ответы постепенно возвращают;
+    - прочие временные ошибки повторяются с экспоненциальной задержкой;
+    - результат каждого запроса сразу дописывается в выходной JSONL, он же
+      служит контрольной точкой: повторный запуск пропускает выполненные
+      custom_id, поэтому прерванное задание продолжается с места остановки.
+
+BatchJobManager хранит задания прокси (/gigachat/batches) в каталоге:
+<directory>/<id>/{job.json, input.jsonl, output.jsonl}; незавершённые задания
+продолжаются после перезапуска прокси.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set
+
+from .concurrency import ERROR, SUCCESS, THROTTLED, AIMDLimiter, ConcurrencyConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = "/v1/chat/completions"
+SUPPORTED_ENDPOINTS = ("/v1/chat/completions", "/v1/completions", "/v1/embeddings")
+
+# Статусы, после которых запрос повторяется
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+# Статусы перегрузки: приостанавливают весь пул worker
+PAUSE_STATUS_CODES = (429, 503)
+
+# Статусы заданий (как в OpenAI Batch API)
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLING = "cancelling"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (IN_PROGRESS, CANCELLING)
+
+
+class BatchInputError(ValueError):
+    """Некорректный входной файл задания"""
+
+
+class BatchCallError(Exception):
+    """Ошибка выполнения запроса задания"""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None,
+                 body: Optional[Any] = None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.body = body
+        super().__init__(message)
+
+
+@dataclass
+class BatchItem:
+    """Один запрос задания"""
+    custom_id: str
+    body: Dict[str, Any]
+    url: str = DEFAULT_ENDPOINT
+
+
+def parse_batch_line(line: str, index: int) -> BatchItem:
+    """
+    Разобрать строку входного JSONL.
+
+    Args:
+        line: Строка файла
+        index: Номер строки (с 1) для custom_id по умолчанию и сообщений
+
+    Returns:
+        BatchItem
+
+    Raises:
+        BatchInputError: Строка не является запросом
+    """
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise BatchInputError(f"Строка {index}: некорректный JSON ({e})") from None
+    if not isinstance(record, dict):
+        raise BatchInputError(f"Строка {index}: ожидается объект JSON")
+
+    body = record.get("body") if "body" in record else record
+    if not isinstance(body, dict) or not body.get("model"):
+        raise BatchInputError(f"Строка {index}: в теле запроса нет model")
+    url = record.get("url") or DEFAULT_ENDPOINT
+    if url not in SUPPORTED_ENDPOINTS:
+        raise BatchInputError(f"Строка {index}: endpoint {url} не поддерживается")
+    custom_id = record.get("custom_id") if "body" in record else None
+    return BatchItem(custom_id=str(custom_id or f"line-{index}"), body=body, url=url)
+
+
+def iter_batch_items(path: str) -> Iterator[BatchItem]:
+    """Запросы входного файла (пустые строки пропускаются)"""
+    with open(path, "r", encoding="utf-8") as file:
+        for index, line in enumerate(file, start=1):
+            if line.strip():
+                yield parse_batch_line(line, index)
+
+
+def validate_batch_file(path: str) -> int:
+    """
+    Проверить входной файл.
+
+    Args:
+        path: Путь к JSONL
+
+    Returns:
+        Число запросов
+
+    Raises:
+        BatchInputError: Некорректная строка или повтор custom_id
+    """
+    seen: Set[str] = set()
+    for item in iter_batch_items(path):
+        if item.custom_id in seen:
+            raise BatchInputError(f"Повторяющийся custom_id: {item.custom_id}")
+        seen.add(item.custom_id)
+    if not seen:
+        raise BatchInputError("Входной файл не содержит запросов")
+    return len(seen)
+
+
+def load_completed(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """
+    custom_id запросов, уже записанных в выходной файл (контрольная точка).
+
+    Недописанная последняя строка (задание прервано во время записи) удаляется.
+
+    Args:
+        output_path: Путь к выходному JSONL
+        retry_failed: Не считать выполненными запросы с ошибкой
+
+    Returns:
+        Множество custom_id
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    completed: Set[str] = set()
+    valid_size = 0
+    with open(output_path, "rb") as file:
+        for raw in file:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            if not raw.endswith(b"\n"):
+                break
+            valid_size += len(raw)
+            if retry_failed and record.get("error"):
+                continue
+            completed.add(str(record.get("custom_id")))
+
+    if valid_size < os.path.getsize(output_path):
+        logger.warning(f"Выходной файл {output_path} обрезан до последней полной строки")
+        with open(output_path, "r+b") as file:
+            file.truncate(valid_size)
+    return completed
+
+
+@dataclass
+class BatchProgress:
+    """Ход выполнения задания"""
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic, repr=False)
+
+    @property
+    def done(self) -> int:
+        """Выполнено в этом запуске (успешно или с ошибкой)"""
+        return self.completed + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Запросов в секунду в этом запуске"""
+        elapsed = time.monotonic() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "completed": self.completed + self.skipped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "requests_per_second": round(self.rate, 2),
+        }
+
+
+class BatchRunner:
+    """Пул асинхронных worker, выполняющий запросы задания"""
+
+    def __init__(self, call: Callable[[BatchItem], Awaitable[Any]], concurrency: int = 8,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Args:
+            call: Выполнение одного запроса (возвращает тело ответа или BatchCallError)
+            concurrency: Число одновременных запросов
+            max_attempts: Попыток на запрос
+            base_delay: Начальная задержка повтора в секундах
+            max_delay: Максимальная задержка повтора в секундах
+        """
+        self.call = call
+        self.concurrency = max(1, int(concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Задержка ответов LLM зависит от длины ответа - лимит снижают только 429/503;
+        # короткий cooldown: отказы после снижения не должны ждать, пока рост лимита вернёт перегрузку
+        self.limiter = AIMDLimiter("batch", ConcurrencyConfig(
+            initial_limit=self.concurrency, max_limit=self.concurrency, max_queue=self.concurrency,
+            queue_timeout=86400.0, latency_spike_factor=float("inf"), decrease_cooldown=0.1,
+        ))
+
+        self._paused_until = 0.0
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        """Не начинать новые запросы (выполняемые завершаются)"""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def pause(self, seconds: float) -> None:
+        """Приостановить запуск новых запросов всеми worker"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_pause(self) -> None:
+        while True:
+            remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def _get_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return min(float(retry_after), self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _execute(self, item: BatchItem, progress: BatchProgress) -> Dict[str, Any]:
+        """Выполнить запрос с повторами; результат - строка выходного файла"""
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._wait_pause()
+            await self.limiter.acquire()
+            try:
+                body = await self.call(item)
+                self.limiter.release(SUCCESS)
+                return {"status_code": 200, "body": body, "error": None}
+            except Exception as e:
+                status_code = getattr(e, "status_code", None) or 500
+                self.limiter.release(THROTTLED if status_code in PAUSE_STATUS_CODES else ERROR)
+                retryable = status_code in RETRYABLE_STATUS_CODES and not self._cancelled
+                if not retryable or attempt >= self.max_attempts:
+                    return {
+                        "status_code": status_code,
+                        "body": getattr(e, "body", None),
+                        "error": {"code": str(status_code), "message": str(e)},
+                    }
+                delay = self._get_delay(e, attempt)
+                progress.retries += 1
+                if status_code in PAUSE_STATUS_CODES:
+                    logger.info(f"Задание приостановлено на {delay:.1f}s: {e}")
+                    self.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    async def run(self, input_path: str, output_path: str,
+                  on_progress: Optional[Callable[[BatchProgress], None]] = None,
+                  retry_failed: bool = False) -> BatchProgress:
+        """
+        Выполнить задание.
+
+        Args:
+            input_path: Входной JSONL
+            output_path: Выходной JSONL (дописывается; выполненные запросы пропускаются)
+            on_progress: Вызывается после каждого запроса
+            retry_failed: Повторить запросы, завершившиеся ошибкой в прошлых запусках
+
+        Returns:
+            BatchProgress
+        """
+        completed = load_completed(output_path, retry_failed=retry_failed)
+        progress = BatchProgress()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        with open(output_path, "a", encoding="utf-8") as output:
+
+            def write(item: BatchItem, result: Dict[str, Any]) -> None:
+                record = {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": item.custom_id,
+                    "response": {"status_code": result["status_code"], "body": result["body"]}
+                    if result["error"] is None else None,
+                    "error": result["error"],
+                }
+                output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                output.flush()
+                if result["error"] is None:
+                    progress.completed += 1
+                else:
+                    progress.failed += 1
+                if on_progress is not None:
+                    on_progress(progress)
+
+            async def worker() -> None:
+                while True:
+                    item = await queue.get()
+                    try:
+                        if item is None:
+                            return
+                        if not self._cancelled:
+                            write(item, await self._execute(item, progress))
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+            try:
+                for item in iter_batch_items(input_path):
+                    progress.total += 1
+                    if item.custom_id in completed:
+                        progress.skipped += 1
+                        continue
+                    if self._cancelled:
+                        break
+                    await queue.put(item)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+        logger.info(
+            f"Задание {input_path}: выполнено {progress.completed}, ошибок {progress.failed}, "
+            f"пропущено {progress.skipped} ({progress.rate:.1f} запросов/с)"
+        )
+        return progress
+
+
+class HTTPBatchCaller:
+    """Выполнение запросов задания через HTTP API прокси (пул соединений httpx)"""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 600.0,
+                 max_connections: int = 8, headers: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            base_url: Адрес прокси (например, http://localhost:4000)
+            api_key: Ключ API прокси
+            timeout: Таймаут запроса в секундах
+            max_connections: Размер пула соединений
+            headers: Дополнительные заголовки
+        """
+        import httpx
+
+        request_headers = dict(headers or {})
+        if api_key:
+            request_headers["Authorization"] = f"Bearer {api_key}"
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=request_headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def __call__(self, item: BatchItem) -> Any:
+        body = dict(item.body)
+        body["stream"] = False
+        try:
+            response = await self._client.post(item.url, json=body)
+        except Exception as e:
+            raise BatchCallError(503, f"Ошибка соединения: {e}") from None
+        if response.status_code >= 400:
+            retry_after = response.headers.get("retry-after")
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            raise BatchCallError(response.status_code, response.text[:500], retry_after=retry_after)
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class BatchJobManager:
+    """Задания пакетной обработки прокси с хранением в каталоге"""
+
+    def __init__(self, directory: str, call_factory: Callable[[Dict[str, Any]], Callable[[BatchItem], Awaitable[Any]]],
+                 concurrency: int = 8, max_attempts: int = 5, max_requests: int = 100000):
+        """
+        Args:
+            directory: Каталог заданий
+            call_factory: По описанию задания возвращает функцию выполнения запроса
+            concurrency: Одновременных запросов на задание
+            max_attempts: Попыток на запрос
+            max_requests: Максимум запросов в задании
+        """
+        self.directory = directory
+        self.call_factory = call_factory
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.max_requests = max_requests
+        self._tasks: Dict[str, asyncio.Future] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        """Атомарная запись описания задания"""
+        path = self._path(job["id"], "job.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(job, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Описание задания или None"""
+        if os.sep in job_id or job_id.startswith("."):
+            return None
+        try:
+            with open(self._path(job_id, "job.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Все задания (новые первыми)"""
+        jobs = [self.get(name) for name in os.listdir(self.directory)]
+        return sorted((job for job in jobs if job), key=lambda job: job["created_at"], reverse=True)
+
+    def output_path(self, job_id: str) -> str:
+        return self._path(job_id, "output.jsonl")
+
+    def create(self, content: bytes, endpoint: str = DEFAULT_ENDPOINT,
+               owner: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Создать и запустить задание.
+
+        Args:
+            content: Входной JSONL
+            endpoint: Endpoint запросов без url
+            owner: Данные ключа API, от имени которого выполняются запросы
+            metadata: Произвольные метки задания
+
+        Returns:
+            Описание задания
+
+        Raises:
+            BatchInputError: Некорректный входной файл
+        """
+        job_id = f"batch_{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, job_id))
+        input_path = self._path(job_id, "input.jsonl")
+        with open(input_path, "wb") as file:
+            file.write(content)
+
+        try:
+            total = validate_batch_file(input_path)
+            if total > self.max_requests:
+                raise BatchInputError(f"Запросов в задании больше {self.max_requests}")
+        except BatchInputError:
+            for name in os.listdir(os.path.join(self.directory, job_id)):
+                os.remove(self._path(job_id, name))
+            os.rmdir(os.path.join(self.directory, job_id))
+            raise
+
+        job = {
+            "id": job_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "status": IN_PROGRESS,
+            "created_at": int(time.time()),
+            "completed_at": None,
+            "request_counts": {"total": total, "completed": 0, "failed": 0},
+            "metadata": metadata or {},
+            "owner": owner or {},
+        }
+        self._save(job)
+        self.start(job_id)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Запросить отмену задания (выполняется worker, в котором оно запущено)"""
+        job = self.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        open(self._path(job_id, "cancel"), "w").close()
+        job["status"] = CANCELLING
+        self._save(job)
+        return job
+
+    def start(self, job_id: str) -> None:
+        """Запустить задание в текущем цикле событий (если оно ещё не выполняется)"""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            self._tasks[job_id] = asyncio.ensure_future(self._run(job_id))
+
+    async def resume(self) -> None:
+        """Продолжить незавершённые задания (при запуске прокси)"""
+        for job in self.list():
+            if job["status"] in ACTIVE_STATUSES:
+                logger.info(f"Продолжение задания {job['id']}")
+                self.start(job["id"])
+
+    async def _run(self, job_id: str) -> None:
+        lock_file = open(self._path(job_id, "lock"), "w")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    logger.debug(f"Задание {job_id} выполняет другой процесс")
+                    return
+            await self._execute(job_id)
+        except Exception as e:
+            logger.error(f"Ошибка выполнения задания {job_id}: {e}")
+            job = self.get(job_id)
+            if job is not None:
+                job.update(status=FAILED, completed_at=int(time.time()), errors=[str(e)])
+                self._save(job)
+        finally:
+            lock_file.close()
+
+    async def _execute(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return
+        runner = BatchRunner(self.call_factory(job), concurrency=self.concurrency, max_attempts=self.max_attempts)
+        cancel_path = self._path(job_id, "cancel")
+        last_saved = 0.0
+
+        def on_progress(progress: BatchProgress) -> None:
+            nonlocal last_saved
+            now = time.monotonic()
+            if now - last_saved < 1.0:
+                return
+            last_saved = now
+            if os.path.exists(cancel_path):
+                runner.cancel()
+            job["request_counts"] = progress.to_dict()
+            job["status"] = CANCELLING if runner.cancelled else IN_PROGRESS
+            self._save(job)
+
+        if os.path.exists(cancel_path):
+            runner.cancel()
+        progress = await runner.run(self._path(job_id, "input.jsonl"), self.output_path(job_id), on_progress)
+        job["request_counts"] = progress.to_dict()
+        job["status"] = CANCELLED if runner.cancelled or os.path.exists(cancel_path) else COMPLETED
+        job["completed_at"] = int(time.time())
+        self._save(job)
+        logger.info(f"Задание {job_id}: {job['status']}, {job['request_counts']}")
+
+
+# Глобальный экземпляр
+_global_batch_manager: Optional[BatchJobManager] = None
+
+
+def get_global_batch_manager() -> Optional[BatchJobManager]:
+    """
+    Получить глобальный BatchJobManager.
+
+    Returns:
+        Глобальный экземпляр или None если пакетная обработка не настроена
+    """
+    return _global_batch_manager
+
+
+def init_global_batch_manager(section: Optional[Dict[str, Any]],
+                              call_factory: Callable[[Dict[str, Any]], Callable[[BatchItem], Awaitable[Any]]]
+                              ) -> BatchJobManager:
+    """
+    Инициализировать глобальный BatchJobManager.
+
+    Args:
+        section: Секция batches config.yml
+        call_factory: По описанию задания возвращает функцию выполнения запроса
+
+    Returns:
+        Инициализированный BatchJobManager
+    """
+    global _global_batch_manager
+
+    section = section or {}
+    directory = section.get("directory") or os.environ.get("GIGACHAT_BATCH_DIR") or ".litellm_gigachat/batches"
+    _global_batch_manager = BatchJobManager(
+        directory=os.path.expanduser(directory),
+        call_factory=call_factory,
+        concurrency=int(section.get("concurrency", 8)),
+        max_attempts=int(section.get("max_attempts", 5)),
+        max_requests=int(section.get("max_requests", 100000)),
+    )
+
+    return _global_batch_manager
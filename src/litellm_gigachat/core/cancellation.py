@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Отмена запроса к модели при отключении клиента.
+
+Клиент (например, Cline по кнопке отмены) разрывает соединение, а запрос
+к GigaChat или прокси-провайдеру продолжает генерировать ответ, расходуя
+квоту и слот параллельности. CancelOnDisconnectMiddleware следит за
+соединением клиента (сообщение http.disconnect ASGI) и, если ответ ещё не
+отправлен целиком, отменяет обработку запроса: ожидание ответа модели
+прерывается, streaming-ответ закрывается (CancellationCallback), после чего
+выполняются действия отмены, зарегистрированные хуками (освобождение слотов
+параллельности, возврат квоты токенов, завершение запроса в статистике).
+
+Состояние запроса (RequestScope) доступно хукам через contextvars: хуки
+LiteLLM выполняются в той же задаче, что и обработка запроса.
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Действие отмены: получает состояние отменённого запроса
+CancelAction = Callable[["RequestScope"], None]
+
+
+@dataclass
+class CancellationConfig:
+    """Параметры отмены запросов"""
+    enabled: bool = True
+    # Окончания путей запросов к моделям, для которых отслеживается соединение
+    paths: Tuple[str, ...] = ("/chat/completions", "/completions", "/embeddings")
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "CancellationConfig":
+        """
+        Создать конфигурацию из словаря (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+
+        Returns:
+            CancellationConfig
+        """
+        names = {f.name for f in fields(cls)}
+        values = {key: value for key, value in (data or {}).items() if key in names}
+        if "paths" in values:
+            values["paths"] = tuple(values["paths"] or ())
+        return cls(**values)
+
+
+@dataclass
+class RequestScope:
+    """Состояние запроса клиента, доступное хукам"""
+    path: str = ""
+    model: str = ""
+    stream: bool = False
+    # Оценка токенов ответа до отправки запроса и сгенерированный текст (символы и оценка токенов)
+    expected_tokens: int = 0
+    generated_chars: int = 0
+    generated_token_estimate: float = 0.0
+    completed: bool = False
+    cancelled: bool = False
+    _actions: List[CancelAction] = field(default_factory=list, repr=False)
+
+    @property
+    def generated_tokens(self) -> int:
+        """Оценка токенов, отправленных клиенту до отмены (без оценки TokenEstimator - ~4 символа на токен)"""
+        if self.generated_token_estimate > 0:
+            return math.ceil(self.generated_token_estimate)
+        return (self.generated_chars + 3) // 4
+
+    @property
+    def saved_tokens(self) -> int:
+        """Оценка токенов ответа, которые не пришлось генерировать"""
+        return max(0, self.expected_tokens - self.generated_tokens)
+
+    def on_cancel(self, action: CancelAction) -> None:
+        """Зарегистрировать действие, выполняемое при отмене запроса"""
+        self._actions.append(action)
+
+    def run_cancel_actions(self) -> None:
+        """Выполнить действия отмены (ошибки логируются и не прерывают остальные)"""
+        actions, self._actions = self._actions, []
+        for action in actions:
+            try:
+                action(self)
+            except Exception as e:
+                logger.error(f"Ошибка действия отмены запроса {self.path}: {e}")
+
+
+_current_scope: contextvars.ContextVar[Optional[RequestScope]] = contextvars.ContextVar(
+    "gigachat_request_scope", default=None
+)
+
+
+def get_current_scope() -> Optional[RequestScope]:
+    """
+    Состояние текущего запроса клиента.
+
+    Returns:
+        RequestScope или None вне запроса, отслеживаемого CancelOnDisconnectMiddleware
+    """
+    return _current_scope.get()
+
+
+def on_cancel(action: CancelAction) -> None:
+    """
+    Зарегистрировать действие при отмене текущего запроса (вне запроса - ничего не делает).
+
+    Действие должно быть идемпотентным: оно выполняется и тогда, когда запрос
+    уже частично завершён штатными хуками.
+
+    Args:
+        action: Функция, получающая RequestScope отменённого запроса
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.on_cancel(action)
+
+
+class CancellationStats:
+    """Счётчики отменённых запросов"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "cancelled_streaming": 0,
+            "cancelled_non_streaming": 0,
+            "generated_tokens": 0,
+        }
+        self.saved_tokens: Dict[str, int] = {}
+
+    def record(self, scope: RequestScope) -> None:
+        """Учесть отменённый запрос"""
+        with self._lock:
+            self.counters["cancelled_streaming" if scope.stream else "cancelled_non_streaming"] += 1
+            self.counters["generated_tokens"] += scope.generated_tokens
+            model = scope.model or "unknown"
+            self.saved_tokens[model] = self.saved_tokens.get(model, 0) + scope.saved_tokens
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики отмен.
+
+        Returns:
+            Словарь: счётчики и сэкономленные токены по моделям
+        """
+        with self._lock:
+            return {**self.counters, "saved_tokens": dict(self.saved_tokens)}
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    ASGI middleware: отменяет обработку запроса к модели, если клиент
+    отключился до получения ответа целиком.
+
+    После чтения тела запроса соединение клиента слушает только middleware;
+    приложение при вызове receive получает http.disconnect после отключения.
+    """
+
+    def __init__(self, app: Any, config: Optional[CancellationConfig] = None,
+                 stats: Optional[CancellationStats] = None):
+        """
+        Args:
+            app: ASGI приложение
+            config: Параметры отмены
+            stats: Счётчики (по умолчанию глобальные)
+        """
+        self.app = app
+        self.config = config or CancellationConfig()
+        self.stats = stats
+
+    def _is_tracked(self, scope: Dict[str, Any]) -> bool:
+        return (
+            self.config.enabled
+            and scope.get("type") == "http"
+            and scope.get("method") == "POST"
+            and str(scope.get("path", "")).rstrip("/").endswith(self.config.paths)
+        )
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if not self._is_tracked(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestScope(path=scope["path"])
+        body_received = asyncio.Event()
+        disconnected = asyncio.Event()
+
+        async def app_receive() -> Dict[str, Any]:
+            if body_received.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                body_received.set()
+            elif not message.get("more_body"):
+                body_received.set()
+            return message
+
+        async def app_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                request.completed = True
+            await send(message)
+
+        token = _current_scope.set(request)
+        try:
+            # Задача копирует контекст: хуки видят тот же RequestScope
+            app_task = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+        finally:
+            _current_scope.reset(token)
+        watcher = asyncio.ensure_future(self._watch(receive, body_received, disconnected, request, app_task))
+
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not app_task.done():
+                # Отменена сама обработка соединения (остановка сервера)
+                app_task.cancel()
+                raise
+            if not request.cancelled:
+                raise
+        finally:
+            watcher.cancel()
+
+        if request.cancelled:
+            request.run_cancel_actions()
+            stats = self.stats or get_global_cancellation_stats()
+            if stats is not None:
+                stats.record(request)
+            logger.info(
+                f"Клиент отключился, запрос {request.path} к {request.model or '?'} отменён "
+                f"(сэкономлено ~{request.saved_tokens} токенов)"
+            )
+
+    @staticmethod
+    async def _watch(receive: Callable, body_received: asyncio.Event, disconnected: asyncio.Event,
+                     request: RequestScope, app_task: asyncio.Future) -> None:
+        """Дождаться отключения клиента и отменить незавершённую обработку запроса"""
+        await body_received.wait()
+        if disconnected.is_set():
+            # Клиент отключился до конца тела запроса - обработку прервёт приложение
+            return
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+        if request.completed or app_task.done():
+            return
+        request.cancelled = True
+        app_task.cancel()
+
+
+# Глобальный экземпляр
+_global_cancellation_stats: Optional[CancellationStats] = None
+
+
+def get_global_cancellation_stats() -> Optional[CancellationStats]:
+    """
+    Получить глобальные счётчики отмен.
+
+    Returns:
+        Глобальный экземпляр или None если отмена запросов не настроена
+    """
+    return _global_cancellation_stats
+
+
+def init_global_cancellation_stats() -> CancellationStats:
+    """
+    Инициализировать глобальные счётчики отмен.
+
+    Returns:
+        Инициализированный CancellationStats
+    """
+    global _global_cancellation_stats
+
+    _global_cancellation_stats = CancellationStats()
+
+    return _global_cancellation_stats
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Асинхронный клиент GigaChat для использования в коде (без прокси).
+
+GigaChatClient выполняет запросы через LiteLLM в текущем процессе, используя
+те же компоненты, что и прокси:
+    - токен GigaChat из TokenManager (при 401 токен обновляется и запрос
+      повторяется);
+    - преобразование контента и tools в формат GigaChat (GigaChatTransformer);
+    - маршрутизацию к прокси-провайдерам по суффиксу модели (URL, заголовки
+      аутентификации, circuit breaker);
+    - квоты RPM/TPM (RateLimiterRegistry) с калибровкой по заголовкам ответа.
+
+Соединения переиспользуются: все запросы клиента идут через один
+httpx.AsyncClient с пулом keep-alive соединений.
+
+map() выполняет множество запросов с ограниченной параллельностью, повторами
+429/5xx и отчётом о ходе выполнения:
+
+    async with GigaChatClient() as client:
+        answers = await client.map(prompts, model="GigaChat-2-Max", concurrency=16)
+"""
+
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from .batch import RETRYABLE_STATUS_CODES, BatchProgress
+from .rate_limits import (
+    GIGACHAT_CREDENTIAL,
+    RateLimiterRegistry,
+    estimate_request_tokens,
+    get_exception_headers,
+    get_global_rate_limiters,
+    parse_rate_limit_headers,
+)
+
+logger = logging.getLogger(__name__)
+
+GIGACHAT_API_BASE = "https://gigachat.devices.sberbank.ru/api/v1"
+
+# Ошибки авторизации GigaChat: токен обновляется и запрос повторяется один раз
+AUTH_STATUS_CODES = (401,)
+
+
+class ProviderUnavailableError(Exception):
+    """Прокси-провайдер модели недоступен (circuit breaker открыт)"""
+
+    status_code = 503
+
+    def __init__(self, provider: str, retry_after: float, reason: str = "circuit open"):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"Провайдер {provider} временно недоступен: {reason}")
+
+
+@dataclass
+class Route:
+    """Куда и с какими учётными данными отправляется запрос"""
+    model: str
+    api_base: str
+    credential: str
+    api_key: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    provider: Any = None
+
+
+class GigaChatClient:
+    """Асинхронный клиент GigaChat и прокси-провайдеров с пулом соединений"""
+
+    def __init__(self, api_base: str = GIGACHAT_API_BASE, token_manager: Any = None, transformer: Any = None,
+                 provider_manager: Any = None, rate_limiters: Optional[RateLimiterRegistry] = None,
+                 max_connections: int = 32, timeout: float = 120.0, max_attempts: int = 4,
+                 http_client: Any = None):
+        """
+        Args:
+            api_base: URL API GigaChat
+            token_manager: TokenManager (по умолчанию глобальный, создаётся при первом запросе к GigaChat)
+            transformer: GigaChatTransformer (по умолчанию создаётся без отладочного логирования)
+            provider_manager: MultiProxyProviderManager (по умолчанию глобальный)
+            rate_limiters: Квоты RPM/TPM (по умолчанию глобальный реестр, если настроен)
+            max_connections: Размер пула соединений
+            timeout: Таймаут запроса в секундах
+            max_attempts: Попыток на запрос при 429/5xx и ошибках соединения
+            http_client: Готовый httpx.AsyncClient (например, с тестовым transport)
+        """
+        self.api_base = api_base.rstrip("/")
+        self._token_manager = token_manager
+        self._transformer = transformer
+        self._provider_manager = provider_manager
+        self.rate_limiters = rate_limiters if rate_limiters is not None else get_global_rate_limiters()
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._http = http_client
+        self._owns_http = http_client is None
+        self._openai_clients: Dict[tuple, Any] = {}
+
+    async def __aenter__(self) -> "GigaChatClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Закрыть пул соединений"""
+        if self._http is not None and self._owns_http:
+            await self._http.aclose()
+            self._http = None
+        self._openai_clients.clear()
+
+    @property
+    def token_manager(self):
+        if self._token_manager is None:
+            from .token_manager import get_global_token_manager
+            self._token_manager = get_global_token_manager()
+        return self._token_manager
+
+    @property
+    def transformer(self):
+        if self._transformer is None:
+            from ..callbacks.content_handler import GigaChatTransformer
+            self._transformer = GigaChatTransformer(debug_mode=False)
+        return self._transformer
+
+    @property
+    def provider_manager(self):
+        if self._provider_manager is None:
+            from .proxy_provider_manager import get_global_multi_proxy_provider_manager
+            self._provider_manager = get_global_multi_proxy_provider_manager()
+        return self._provider_manager
+
+    def _get_http(self):
+        if self._http is None:
+            import httpx
+            from .http_client import get_default_verify
+
+            self._http = httpx.AsyncClient(
+                verify=get_default_verify(),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._http
+
+    def _get_openai_client(self, route: Route, api_key: str):
+        """Клиент OpenAI SDK поверх общего пула соединений (на пару URL и ключа)"""
+        key = (route.api_base, api_key, tuple(sorted(route.headers.items())))
+        client = self._openai_clients.get(key)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            # Прежний токен GigaChat больше не нужен
+            for stale in [k for k in self._openai_clients if k[0] == route.api_base and k[2] == key[2]]:
+                del self._openai_clients[stale]
+            client = self._openai_clients[key] = AsyncOpenAI(
+                api_key=api_key, base_url=route.api_base, http_client=self._get_http(),
+                default_headers=route.headers or None, max_retries=0,
+            )
+        return client
+
+    def resolve_route(self, model: str) -> Route:
+        """
+        Маршрут запроса к модели: прокси-провайдер по суффиксу или GigaChat API.
+
+        Args:
+            model: Имя модели (GigaChat-2-Max, openai/GigaChat, <модель>-<суффикс провайдера>)
+
+        Returns:
+            Route
+
+        Raises:
+            ProviderUnavailableError: circuit breaker провайдера открыт
+        """
+        provider = self.provider_manager.get_provider_by_suffix(model)
+        if provider is None:
+            upstream = model.split("/", 1)[1] if model.startswith("openai/") else model
+            return Route(model=f"openai/{upstream}", api_base=self.api_base, credential=GIGACHAT_CREDENTIAL)
+
+        from .health import get_global_provider_health_manager
+        from .multi_model_sync import get_global_multi_model_sync_manager
+
+        health_manager = get_global_provider_health_manager()
+        if health_manager is not None and not health_manager.allow_request(provider):
+            status = health_manager.get_health(provider).get_status()
+            retry_in = status["retry_in"] if status["retry_in"] is not None else provider.circuit_open_seconds
+            raise ProviderUnavailableError(provider.name, retry_in, status["last_error"] or "circuit open")
+
+        upstream = None
+        multi_sync_manager = get_global_multi_model_sync_manager()
+        sync_manager = multi_sync_manager.get_manager_for_model(model) if multi_sync_manager else None
+        if sync_manager is not None:
+            upstream = sync_manager.get_original_id(model)
+        if upstream is None:
+            upstream = model[:-len(provider.suffix) - 1]
+        return Route(model=f"openai/{upstream}", api_base=provider.url.rstrip("/"), credential=provider.name,
+                     api_key="none", headers=provider.get_auth_headers(), provider=provider)
+
+    async def _get_token(self, force_refresh: bool = False) -> str:
+        """Токен GigaChat (получение нового - блокирующий запрос, выполняется в потоке)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.token_manager.get_token(force_refresh=force_refresh))
+
+    def _record_health(self, route: Route, exception: Optional[BaseException] = None) -> None:
+        if route.provider is None:
+            return
+        from .health import get_global_provider_health_manager
+
+        health_manager = get_global_provider_health_manager()
+        if health_manager is not None:
+            health_manager.record_result(route.provider, exception)
+
+    def _get_delay(self, exception: BaseException, attempt: int) -> float:
+        retry_after = parse_rate_limit_headers(get_exception_headers(exception)).get("retry_after")
+        if retry_after is not None:
+            return min(float(retry_after), 60.0)
+        delay = min(30.0, 0.5 * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _call(self, method: str, data: Dict[str, Any]) -> Any:
+        """Выполнить запрос с квотами, обновлением токена и повторами"""
+        import litellm
+
+        model = data["model"]
+        route = self.resolve_route(model)
+        limiter = self.rate_limiters.get(route.credential, model) if self.rate_limiters else None
+        estimated_tokens = estimate_request_tokens(data)
+        call = getattr(litellm, method)
+        params = {key: value for key, value in data.items() if key != "model"}
+
+        attempt = 0
+        refreshed = False
+        while True:
+            attempt += 1
+            if limiter is not None:
+                await limiter.acquire(estimated_tokens)
+            api_key = route.api_key or await self._get_token()
+            try:
+                response = await call(
+                    model=route.model,
+                    client=self._get_openai_client(route, api_key),
+                    timeout=self.timeout,
+                    max_retries=0,
+                    **params,
+                )
+            except Exception as e:
+                status_code = getattr(e, "status_code", None)
+                self._record_health(route, e)
+                if limiter is not None:
+                    limiter.observe_headers(get_exception_headers(e), status_code)
+                    limiter.settle(estimated_tokens, 0)
+
+                if status_code in AUTH_STATUS_CODES and route.api_key is None and not refreshed:
+                    logger.warning("Ошибка авторизации GigaChat, токен обновляется")
+                    self.token_manager.invalidate_token()
+                    refreshed = True
+                    continue
+                retryable = status_code in RETRYABLE_STATUS_CODES or status_code is None
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+                delay = self._get_delay(e, attempt)
+                logger.debug(f"Повтор запроса к {model} через {delay:.2f}s ({e})")
+                await asyncio.sleep(delay)
+                continue
+
+            self._record_health(route)
+            if limiter is not None:
+                hidden_params = getattr(response, "_hidden_params", None) or {}
+                limiter.observe_headers(hidden_params.get("additional_headers"))
+                usage = getattr(response, "usage", None)
+                limiter.settle(estimated_tokens, getattr(usage, "total_tokens", None))
+            return response
+
+    async def acompletion(self, model: str, messages: List[Dict[str, Any]], **params: Any) -> Any:
+        """
+        Chat completion (без streaming).
+
+        Args:
+            model: Имя модели
+            messages: Сообщения в формате OpenAI (контент-массивы и tools преобразуются для GigaChat)
+            **params: Прочие параметры (temperature, max_tokens, tools, ...)
+
+        Returns:
+            litellm.ModelResponse
+        """
+        data = await self.transformer.async_pre_call_hook(
+            None, None, {"model": model, "messages": messages, **params}, "completion"
+        )
+        response = await self._call("acompletion", data)
+        transformed = await self.transformer.async_post_call_success_hook(data, None, response)
+        if isinstance(transformed, dict):
+            # Ответ GigaChat с function_call преобразован в формат OpenAI (tool_calls)
+            import litellm
+            transformed = litellm.ModelResponse(**transformed) if transformed else response
+        return transformed
+
+    async def aembedding(self, model: str, input: Union[str, List[str]], **params: Any) -> Any:
+        """
+        Эмбеддинги.
+
+        Args:
+            model: Имя модели (например, Embeddings)
+            input: Текст или список текстов
+            **params: Прочие параметры
+
+        Returns:
+            litellm.EmbeddingResponse
+        """
+        return await self._call("aembedding", {"model": model, "input": input, **params})
+
+    async def map(self, requests: Iterable[Union[str, Dict[str, Any]]], model: Optional[str] = None,
+                  concurrency: int = 8, on_progress: Optional[Callable[[BatchProgress], None]] = None,
+                  return_exceptions: bool = True, **params: Any) -> List[Any]:
+        """
+        Выполнить множество запросов с ограниченной параллельностью.
+
+        Args:
+            requests: Промпты (строки) или параметры запросов (словари с messages или input)
+            model: Модель по умолчанию
+            concurrency: Одновременных запросов
+            on_progress: Вызывается после каждого запроса
+            return_exceptions: Возвращать исключения в результатах вместо прерывания
+            **params: Параметры по умолчанию для всех запросов
+
+        Returns:
+            Ответы в порядке запросов
+
+        Raises:
+            Exception: Первая ошибка запроса, если return_exceptions=False
+        """
+        items = list(requests)
+        results: List[Any] = [None] * len(items)
+        progress = BatchProgress(total=len(items))
+        queue = iter(enumerate(items))
+
+        async def run_one(item: Union[str, Dict[str, Any]]) -> Any:
+            request = {"messages": [{"role": "user", "content": item}]} if isinstance(item, str) else dict(item)
+            request = {**params, **request}
+            request.setdefault("model", model)
+            if not request["model"]:
+                raise ValueError("Не указана модель запроса")
+            if "input" in request and "messages" not in request:
+                return await self.aembedding(**request)
+            return await self.acompletion(**request)
+
+        async def worker() -> None:
+            for index, item in queue:
+                try:
+                    results[index] = await run_one(item)
+                    progress.completed += 1
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[index] = e
+                    progress.failed += 1
+                if on_progress is not None:
+                    on_progress(progress)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return results
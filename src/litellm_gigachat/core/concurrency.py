@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Адаптивное ограничение параллельных запросов к deployments (AIMD).
+
+Для каждого deployment поддерживается лимит одновременных запросов:
+    - каждый успешный ответ увеличивает лимит на 1/limit (примерно +1 за
+      "окно" из limit запросов - аддитивный рост);
+    - ответ 429/503 или всплеск задержки уменьшает лимит в decrease_factor
+      раз (мультипликативное снижение), не чаще одного раза за
+      decrease_cooldown, чтобы пачка отказов из одного окна не обнулила лимит.
+
+Запросы сверх лимита ждут в ограниченной очереди не дольше queue_timeout
+(FIFO, либо справедливая очередь по ключам и полосам приоритета - см. scheduler); при переполнении очереди или истечении ожидания запрос
+отклоняется, не доходя до перегруженного провайдера.
+
+Задержка для обнаружения всплесков нормируется на число сгенерированных
+токенов (если оно известно), потому что время ответа LLM зависит от длины ответа.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+from .scheduler import FairQueue
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "success"
+THROTTLED = "throttled"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+# Статусы, означающие перегрузку провайдера
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Запрос отклонён: очередь переполнена или истекло ожидание"""
+
+    def __init__(self, deployment: str, reason: str, retry_after: float = 1.0):
+        self.deployment = deployment
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Deployment {deployment} перегружен: {reason}")
+
+
+@dataclass
+class ConcurrencyConfig:
+    """Параметры лимитера одного deployment"""
+    enabled: bool = True
+    initial_limit: int = 8
+    min_limit: int = 1
+    max_limit: int = 128
+    decrease_factor: float = 0.5
+    decrease_cooldown: float = 1.0
+    latency_spike_factor: float = 3.0
+    max_queue: int = 100
+    queue_timeout: float = 30.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["ConcurrencyConfig"] = None) -> "ConcurrencyConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            ConcurrencyConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+
+def classify_outcome(exception: Optional[BaseException]) -> str:
+    """
+    Результат запроса для лимитера.
+
+    Args:
+        exception: Исключение вызова модели (None при успехе)
+
+    Returns:
+        SUCCESS, THROTTLED (429/503) или ERROR
+    """
+    if exception is None:
+        return SUCCESS
+    if getattr(exception, "status_code", None) in THROTTLE_STATUS_CODES:
+        return THROTTLED
+    return ERROR
+
+
+class AIMDLimiter:
+    """Лимит одновременных запросов одного deployment с очередью ожидания"""
+
+    def __init__(self, name: str, config: Optional[ConcurrencyConfig] = None):
+        """
+        Args:
+            name: Имя deployment
+            config: Параметры лимитера
+        """
+        self.name = name
+        self.config = config or ConcurrencyConfig()
+        self.limit = float(min(max(self.config.initial_limit, self.config.min_limit), self.config.max_limit))
+        self.inflight = 0
+
+        self._waiters = FairQueue()
+        self._baseline_latency: Optional[float] = None
+        self._latency_samples = 0
+        self._last_decrease_at = 0.0
+        self._lock = threading.Lock()
+
+        # Счётчики для метрик
+        self.acquired = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    @property
+    def queued(self) -> int:
+        """Число запросов в очереди"""
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < max(int(self.limit), self.config.min_limit)
+
+    def has_free_slot(self) -> bool:
+        """Получит ли новый запрос слот без ожидания"""
+        with self._lock:
+            return not self._waiters and self._has_capacity()
+
+    async def acquire(self, timeout: Optional[float] = None, flow: str = "", weight: float = 1.0) -> None:
+        """
+        Занять слот; при отсутствии свободных - ждать в очереди.
+
+        Args:
+            timeout: Максимальное ожидание в секундах (по умолчанию queue_timeout)
+            flow: Поток справедливой очереди (ключ API и полоса приоритета)
+            weight: Вес потока
+
+        Raises:
+            ConcurrencyLimitExceeded: Очередь переполнена или время ожидания истекло
+        """
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self.inflight += 1
+                self.acquired += 1
+                return
+            if len(self._waiters) >= self.config.max_queue:
+                self.rejected += 1
+                raise ConcurrencyLimitExceeded(self.name, f"очередь заполнена ({self.config.max_queue})")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.push(waiter, flow, weight)
+
+        timeout = self.config.queue_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(timeout, 0.0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            with self._lock:
+                if waiter.done() and not waiter.cancelled():
+                    # Слот уже передан этому запросу - возвращаем его следующему
+                    self.inflight -= 1
+                    self._wake_waiters()
+                else:
+                    waiter.cancel()
+                    self._remove_waiter(waiter)
+                if isinstance(exc, asyncio.TimeoutError):
+                    self.timeouts += 1
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise ConcurrencyLimitExceeded(self.name, f"ожидание в очереди дольше {timeout:.1f}s") from None
+
+        with self._lock:
+            self.acquired += 1
+
+    def release(self, outcome: str = SUCCESS, latency: Optional[float] = None) -> None:
+        """
+        Освободить слот и скорректировать лимит.
+
+        Args:
+            outcome: SUCCESS, THROTTLED, ERROR или CANCELLED
+            latency: Задержка успешного запроса (желательно нормированная на токены)
+        """
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+            now = time.monotonic()
+
+            if outcome == THROTTLED:
+                self.throttled += 1
+                self._decrease(now, "провайдер ограничивает запросы")
+            elif outcome == SUCCESS:
+                if latency is not None and self._is_latency_spike(latency):
+                    self._decrease(now, f"всплеск задержки {latency:.3f}s")
+                else:
+                    self.limit = min(self.limit + 1.0 / self.limit, float(self.config.max_limit))
+
+            self._wake_waiters()
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        """Обновить базовую задержку и проверить всплеск (вызывается под блокировкой)"""
+        baseline = self._baseline_latency
+        self._latency_samples += 1
+        if baseline is None:
+            self._baseline_latency = latency
+            return False
+
+        spike = self._latency_samples > 10 and latency > baseline * self.config.latency_spike_factor
+        if not spike:
+            # Медленная EWMA: базовая задержка без нагрузки меняется медленно
+            self._baseline_latency = baseline + 0.05 * (latency - baseline)
+        return spike
+
+    def _decrease(self, now: float, reason: str) -> None:
+        """Мультипликативное снижение лимита (вызывается под блокировкой)"""
+        if now - self._last_decrease_at < self.config.decrease_cooldown:
+            return
+        self._last_decrease_at = now
+        previous = self.limit
+        self.limit = max(float(self.config.min_limit), self.limit * self.config.decrease_factor)
+        self.decreases += 1
+        logger.info(f"Лимит параллельных запросов {self.name}: {previous:.1f} -> {self.limit:.1f} ({reason})")
+
+    def _remove_waiter(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _wake_waiters(self) -> None:
+        """Передать освободившиеся слоты ожидающим (вызывается под блокировкой)"""
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.inflight += 1
+            loop = waiter.get_loop()
+            loop.call_soon_threadsafe(self._resolve, waiter)
+
+    def _resolve(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # Ожидание отменено до передачи слота - возвращаем слот
+            with self._lock:
+                self.inflight = max(0, self.inflight - 1)
+                self._wake_waiters()
+            return
+        waiter.set_result(True)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Метрики лимитера.
+
+        Returns:
+            Словарь: текущий лимит, запросы в работе и в очереди, счётчики
+        """
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "queued": len(self._waiters),
+                "max_queue": self.config.max_queue,
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+            }
+
+
+class ConcurrencyLimiterRegistry:
+    """Лимитеры по deployments с общими настройками и переопределениями"""
+
+    def __init__(self, default: Optional[ConcurrencyConfig] = None,
+                 overrides: Optional[Dict[str, ConcurrencyConfig]] = None):
+        """
+        Args:
+            default: Параметры по умолчанию
+            overrides: Параметры для отдельных deployments
+        """
+        self.default = default or ConcurrencyConfig()
+        self.overrides = overrides or {}
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "ConcurrencyLimiterRegistry":
+        """
+        Создать реестр из секции concurrency_limits config.yml.
+
+        Args:
+            section: {"default": {...}, "deployments": {имя: {...}}}
+
+        Returns:
+            ConcurrencyLimiterRegistry
+        """
+        section = section or {}
+        default = ConcurrencyConfig.from_dict(section.get("default"))
+        overrides = {
+            name: ConcurrencyConfig.from_dict(options, base=default)
+            for name, options in (section.get("deployments") or {}).items()
+        }
+        return cls(default, overrides)
+
+    def get(self, deployment: str) -> Optional[AIMDLimiter]:
+        """
+        Получить лимитер deployment (создаётся при первом обращении).
+
+        Args:
+            deployment: Имя deployment
+
+        Returns:
+            AIMDLimiter или None, если ограничение для deployment отключено
+        """
+        limiter = self._limiters.get(deployment)
+        if limiter is not None:
+            return limiter
+
+        config = self.overrides.get(deployment, self.default)
+        if not config.enabled:
+            return None
+
+        with self._lock:
+            limiter = self._limiters.get(deployment)
+            if limiter is None:
+                limiter = self._limiters[deployment] = AIMDLimiter(deployment, config)
+            return limiter
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Метрики всех лимитеров.
+
+        Returns:
+            Словарь: имя deployment -> метрики
+        """
+        return {name: limiter.get_metrics() for name, limiter in list(self._limiters.items())}
+
+
+# Глобальный реестр лимитеров
+_global_concurrency_limiters: Optional[ConcurrencyLimiterRegistry] = None
+
+
+def get_global_concurrency_limiters() -> Optional[ConcurrencyLimiterRegistry]:
+    """
+    Получить глобальный реестр лимитеров.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_concurrency_limiters
+
+
+def init_global_concurrency_limiters(section: Optional[Dict[str, Any]] = None) -> ConcurrencyLimiterRegistry:
+    """
+    Инициализировать глобальный реестр лимитеров.
+
+    Args:
+        section: Секция concurrency_limits config.yml
+
+    Returns:
+        Инициализированный ConcurrencyLimiterRegistry
+    """
+    global _global_concurrency_limiters
+
+    _global_concurrency_limiters = ConcurrencyLimiterRegistry.from_config(section)
+
+    return _global_concurrency_limiters
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Единая загрузка config.yml.
+
+Файл разбирается один раз (C-загрузчиком libyaml, если он доступен),
+переменные окружения ${VAR} подставляются, схема проверяется, и один и тот же
+объект конфигурации получают проверка окружения, менеджер прокси-провайдеров
+и LiteLLM Proxy. Повторный вызов load_config для неизменённого файла
+возвращает закэшированный результат.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# C-загрузчик в несколько раз быстрее чистого Python SafeLoader
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+ENV_VAR_PATTERN = re.compile(r"\$\{([^}:]+)(?::-([^}]*))?\}")
+
+ROUTING_MODES = ("deployments", "wildcard")
+MAPPING_SECTIONS = (
+    "litellm_settings", "general_settings", "router_settings", "environment_variables", "concurrency_limits",
+    "scheduler", "admission", "rate_limits", "retries", "hedging", "ttft", "timeouts", "cancellation", "batches",
+    "embeddings", "token_estimator", "context_window",
+)
+
+
+class ConfigError(ValueError):
+    """Ошибка загрузки или проверки конфигурации"""
+
+    def __init__(self, path: str, errors: List[str]):
+        self.path = path
+        self.errors = errors
+        super().__init__(f"Некорректная конфигурация {path}: " + "; ".join(errors))
+
+
+def expand_env_vars(value: Any, missing: Optional[Set[str]] = None) -> Any:
+    """
+    Рекурсивная подстановка переменных окружения ${VAR} и ${VAR:-default}.
+
+    Не установленная переменная без значения по умолчанию заменяется пустой строкой.
+
+    Args:
+        value: Значение конфигурации (строка, список или словарь)
+        missing: Множество, в которое добавляются имена не установленных переменных
+
+    Returns:
+        Значение с подставленными переменными
+    """
+    if isinstance(value, str):
+        if "${" not in value:
+            return value
+
+        def replace_var(match):
+            var_name, default = match.group(1), match.group(2)
+            if var_name in os.environ:
+                return os.environ[var_name]
+            if default is None and missing is not None:
+                missing.add(var_name)
+            return default or ""
+
+        return ENV_VAR_PATTERN.sub(replace_var, value)
+
+    if isinstance(value, dict):
+        return {key: expand_env_vars(item, missing) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand_env_vars(item, missing) for item in value]
+    return value
+
+
+def validate_config(config: Any) -> List[str]:
+    """
+    Проверка структуры конфигурации.
+
+    Args:
+        config: Разобранная конфигурация
+
+    Returns:
+        Список ошибок (пустой, если конфигурация корректна)
+    """
+    if not isinstance(config, dict):
+        return ["корень конфигурации должен быть словарём"]
+
+    errors = []
+
+    for section in MAPPING_SECTIONS:
+        if config.get(section) is not None and not isinstance(config[section], dict):
+            errors.append(f"{section} должен быть словарём")
+
+    model_list = config.get("model_list") or []
+    if not isinstance(model_list, list):
+        errors.append("model_list должен быть списком")
+        model_list = []
+
+    for index, model in enumerate(model_list):
+        if not isinstance(model, dict):
+            errors.append(f"model_list[{index}] должен быть словарём")
+            continue
+        if not isinstance(model.get("model_name"), str) or not model["model_name"]:
+            errors.append(f"model_list[{index}]: не указан model_name")
+        litellm_params = model.get("litellm_params")
+        if not isinstance(litellm_params, dict) or not isinstance(litellm_params.get("model"), str):
+            errors.append(f"model_list[{index}]: litellm_params.model обязателен")
+
+    providers = config.get("proxy_providers") or []
+    if not isinstance(providers, list):
+        errors.append("proxy_providers должен быть списком")
+        providers = []
+
+    suffixes: Dict[str, str] = {}
+    for index, provider in enumerate(providers):
+        if not isinstance(provider, dict):
+            errors.append(f"proxy_providers[{index}] должен быть словарём")
+            continue
+        name = provider.get("name") or f"proxy_providers[{index}]"
+        for field in ("name", "url", "suffix"):
+            if not isinstance(provider.get(field), str) or not provider[field]:
+                errors.append(f"{name}: поле {field} обязательно")
+        suffix = provider.get("suffix")
+        if isinstance(suffix, str) and suffix:
+            if suffix in suffixes:
+                errors.append(f"{name}: суффикс -{suffix} уже используется провайдером {suffixes[suffix]}")
+            suffixes[suffix] = name
+        if provider.get("routing_mode", "deployments") not in ROUTING_MODES:
+            errors.append(f"{name}: неизвестный routing_mode '{provider['routing_mode']}'")
+
+    errors.extend(_validate_model_groups(config, model_list))
+    return errors
+
+
+def _validate_model_groups(config: Dict[str, Any], model_list: List[Any]) -> List[str]:
+    """Проверка секции model_groups"""
+    groups = config.get("model_groups") or []
+    if not isinstance(groups, list):
+        return ["model_groups должен быть списком"]
+
+    errors = []
+    model_names = {m.get("model_name") for m in model_list if isinstance(m, dict)}
+    group_names: Set[str] = set()
+    for index, group in enumerate(groups):
+        if not isinstance(group, dict):
+            errors.append(f"model_groups[{index}] должен быть словарём")
+            continue
+        name = group.get("name")
+        if not isinstance(name, str) or not name:
+            errors.append(f"model_groups[{index}]: поле name обязательно")
+            continue
+        if name in group_names:
+            errors.append(f"{name}: группа моделей уже объявлена")
+        if name in model_names:
+            errors.append(f"{name}: имя группы совпадает с model_name из model_list")
+        group_names.add(name)
+
+        models = group.get("models")
+        if models is not None and (
+            not isinstance(models, list) or not all(isinstance(m, str) and m for m in models)
+        ):
+            errors.append(f"{name}: models должен быть списком имён моделей")
+        if not models and not group.get("model_id"):
+            errors.append(f"{name}: укажите models и/или model_id")
+
+    return errors
+
+
+def _process_includes(config: Dict[str, Any], base_dir: Path) -> Dict[str, Any]:
+    """
+    Подключение файлов из секции include (та же семантика, что у LiteLLM Proxy).
+
+    Args:
+        config: Основная конфигурация
+        base_dir: Каталог основного файла
+
+    Returns:
+        Конфигурация без секции include
+    """
+    includes = config.pop("include", None)
+    if includes is None:
+        return config
+    if not isinstance(includes, list):
+        raise ValueError("'include' должен быть списком путей")
+
+    for include_file in includes:
+        include_path = base_dir / include_file
+        with open(include_path, "r", encoding="utf-8") as f:
+            included = yaml.load(f, Loader=YAML_LOADER) or {}
+        for key, value in included.items():
+            if isinstance(value, list) and isinstance(config.get(key), list):
+                config[key].extend(value)
+            else:
+                config[key] = value
+    return config
+
+
+def parse_config_file(config_path: str) -> Dict[str, Any]:
+    """
+    Разбор и проверка файла конфигурации (без кэша).
+
+    Args:
+        config_path: Путь к файлу конфигурации
+
+    Returns:
+        Конфигурация с подставленными переменными окружения
+
+    Raises:
+        ConfigError: Если файл не разбирается или не проходит проверку
+    """
+    path = Path(config_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.load(f, Loader=YAML_LOADER) or {}
+        if isinstance(config, dict):
+            config = _process_includes(config, path.parent)
+    except (OSError, ValueError, yaml.YAMLError) as exc:
+        raise ConfigError(str(config_path), [str(exc)]) from exc
+
+    missing: Set[str] = set()
+    config = expand_env_vars(config, missing)
+    if missing:
+        logger.warning(f"Переменные окружения не установлены: {', '.join(sorted(missing))}")
+
+    errors = validate_config(config)
+    if errors:
+        raise ConfigError(str(config_path), errors)
+    return config
+
+
+# Кэш: абсолютный путь -> ((mtime_ns, size), конфигурация)
+_config_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_config_cache_lock = threading.Lock()
+
+
+def load_config(config_path: str = "config.yml") -> Dict[str, Any]:
+    """
+    Получить конфигурацию, разобрав файл не более одного раза на каждую его версию.
+
+    Все потребители получают один и тот же объект - его нельзя изменять;
+    для изменений используйте copy.deepcopy.
+
+    Args:
+        config_path: Путь к файлу конфигурации
+
+    Returns:
+        Конфигурация
+
+    Raises:
+        FileNotFoundError: Если файл не найден
+        ConfigError: Если файл не разбирается или не проходит проверку
+    """
+    path = Path(config_path).resolve()
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = str(path)
+
+    with _config_cache_lock:
+        cached = _config_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        config = parse_config_file(key)
+        _config_cache[key] = (version, config)
+        logger.debug(f"Конфигурация {config_path} загружена")
+        return config
+
+
+def clear_config_cache() -> None:
+    """Сбросить кэш конфигураций"""
+    with _config_cache_lock:
+        _config_cache.clear()
+
+
+def copy_config(config_path: str = "config.yml") -> Dict[str, Any]:
+    """
+    Получить изменяемую копию конфигурации (для потребителей, меняющих её на месте).
+
+    Args:
+        config_path: Путь к файлу конфигурации
+
+    Returns:
+        Глубокая копия конфигурации
+    """
+    return copy.deepcopy(load_config(config_path))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Отслеживание изменений файла конфигурации.
+
+На Linux используется inotify (через ctypes, без внешних зависимостей):
+наблюдается каталог файла, поэтому замена файла редактором или
+`kubectl`/ConfigMap (запись во временный файл + rename) тоже замечается.
+На других платформах или при ошибке inotify - периодический опрос mtime.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Маски событий inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """Загрузка функций inotify из libc (None если недоступны)"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ConfigWatcher:
+    """
+    Фоновый поток, вызывающий callback при изменении файла.
+
+    Изменение определяется по (mtime, size, inode), поэтому события inotify
+    для других файлов каталога и повторные события для того же содержимого
+    не приводят к лишним вызовам.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Callable[[], None],
+        poll_interval: float = 2.0,
+        debounce: float = 0.5,
+        use_inotify: bool = True,
+    ):
+        """
+        Инициализация наблюдателя.
+
+        Args:
+            path: Путь к файлу конфигурации
+            on_change: Функция, вызываемая после изменения файла
+            poll_interval: Период опроса в секундах (режим polling)
+            debounce: Пауза после события перед вызовом on_change, чтобы
+                дождаться окончания записи файла
+            use_inotify: Использовать inotify, если он доступен
+        """
+        self.path = Path(path).resolve()
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+
+        self.mode: Optional[str] = None
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = self._get_signature()
+
+    def _get_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Отпечаток файла: (mtime_ns, size, inode) или None если файла нет"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _check_changed(self) -> None:
+        """Вызвать on_change, если отпечаток файла изменился"""
+        if self.debounce and self._stop_event.wait(self.debounce):
+            return
+
+        signature = self._get_signature()
+        if signature is None or signature == self._signature:
+            return
+
+        self._signature = signature
+        logger.info(f"Файл конфигурации {self.path} изменён")
+        try:
+            self.on_change()
+        except Exception as exc:
+            logger.error(f"Ошибка обработки изменения конфигурации: {exc}")
+
+    def _open_inotify(self) -> Optional[int]:
+        """Создать inotify и наблюдение за каталогом файла (None при ошибке)"""
+        libc = _load_inotify() if self.use_inotify else None
+        if libc is None:
+            return None
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug(f"inotify_init1 не удался: errno {ctypes.get_errno()}")
+            return None
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, str(self.path.parent).encode(), mask) < 0:
+            logger.debug(f"inotify_add_watch не удался: errno {ctypes.get_errno()}")
+            os.close(fd)
+            return None
+        return fd
+
+    def _run_inotify(self, fd: int) -> None:
+        """Цикл ожидания событий inotify"""
+        try:
+            while self._running:
+                readable, _, _ = select.select([fd], [], [], 1.0)
+                if not readable:
+                    continue
+
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                relevant = False
+                offset = 0
+                while offset + _EVENT_HEADER.size <= len(data):
+                    _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                    name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_len]
+                    offset += _EVENT_HEADER.size + name_len
+                    if name.rstrip(b"\0").decode(errors="replace") == self.path.name:
+                        relevant = True
+
+                if relevant:
+                    self._check_changed()
+        finally:
+            os.close(fd)
+
+    def _run_polling(self) -> None:
+        """Цикл периодического опроса файла"""
+        while self._running:
+            if self._stop_event.wait(self.poll_interval):
+                break
+            if self._get_signature() != self._signature:
+                self._check_changed()
+
+    def start(self) -> None:
+        """Запустить наблюдение в фоновом потоке"""
+        if self._running:
+            return
+
+        self._running = True
+        self._stop_event.clear()
+        self._signature = self._get_signature()
+
+        fd = self._open_inotify()
+        if fd is not None:
+            self.mode = "inotify"
+            target, args = self._run_inotify, (fd,)
+        else:
+            self.mode = "polling"
+            target, args = self._run_polling, ()
+
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+        logger.info(f"Отслеживание изменений {self.path} запущено ({self.mode})")
+
+    def stop(self) -> None:
+        """Остановить наблюдение"""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
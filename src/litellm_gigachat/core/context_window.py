@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Управление окном контекста длинных диалогов.
+
+Перед отправкой запроса чата его промпт (оценка token_estimator)
+сравнивается с окном контекста модели. Окно берётся из секции
+context_window.models (по имени deployment или id модели) или из
+model_info.max_input_tokens в model_list. Если промпт не помещается,
+применяются стратегии из context_window.strategies:
+    - escalate - переключить запрос на deployment с большим окном
+      (context_window.escalation или участник той же группы моделей).
+      Выполняется в ModelGroupCallback при выборе deployment, до квот,
+      лимитов параллельности и circuit breaker: они применяются уже
+      к новому deployment;
+    - truncate_tool_outputs - обрезать старые результаты функций;
+    - drop_old_messages - удалить старые сообщения.
+Обрезка выполняется в GigaChatTransformer (в порядке strategies).
+Системные сообщения и последние keep_recent_messages сообщений не
+изменяются. Если промпт так и не поместился, запрос отклоняется сразу,
+без отправки модели (или передаётся как есть при reject_overflow: false).
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from .model_groups import ModelGroupConfig, get_global_model_group_router, get_model_id
+from .token_estimator import PROMPT_TOKENS_KEY, estimate_prompt_tokens, get_token_estimator
+
+logger = logging.getLogger(__name__)
+
+ESCALATE = "escalate"
+TRUNCATE_TOOL_OUTPUTS = "truncate_tool_outputs"
+DROP_OLD_MESSAGES = "drop_old_messages"
+STRATEGIES = (ESCALATE, TRUNCATE_TOOL_OUTPUTS, DROP_OLD_MESSAGES)
+
+# Роли сообщений с результатами функций
+TOOL_ROLES = ("tool", "function")
+
+
+class ContextWindowExceeded(Exception):
+    """Промпт не помещается в окно контекста модели"""
+    status_code = 400
+
+    def __init__(self, model: str, prompt_tokens: int, limit: int):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.limit = limit
+        super().__init__(
+            f"Промпт (~{prompt_tokens} токенов) не помещается в окно контекста модели {model} ({limit} токенов)"
+        )
+
+
+@dataclass
+class ContextWindowConfig:
+    """Параметры управления окном контекста"""
+    enabled: bool = True
+    # Стратегии в порядке применения
+    strategies: List[str] = field(default_factory=lambda: list(STRATEGIES))
+    # Запас на неточность оценки токенов (доля окна)
+    safety_margin: float = 0.05
+    # Последних сообщений, которые не изменяются
+    keep_recent_messages: int = 6
+    # Длина старого результата функции после обрезки, символов
+    tool_output_max_chars: int = 2000
+    # Отклонять запрос, если промпт не удалось уместить
+    reject_overflow: bool = True
+    # Окно контекста по имени deployment или id модели
+    models: Dict[str, int] = field(default_factory=dict)
+    # Deployments с большим окном по имени deployment
+    escalation: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ContextWindowConfig":
+        """
+        Создать конфигурацию из словаря (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+
+        Returns:
+            ContextWindowConfig
+        """
+        names = {f.name for f in fields(cls)}
+        config = cls(**{key: value for key, value in (data or {}).items() if key in names and value is not None})
+        unknown = [name for name in config.strategies if name not in STRATEGIES]
+        if unknown:
+            logger.warning(f"Неизвестные стратегии context_window: {', '.join(unknown)}")
+        return config
+
+
+class ContextWindowManager:
+    """
+    Приводит промпт запроса чата к окну контекста модели.
+
+    escalate вызывается из ModelGroupCallback до остальных callbacks,
+    apply - из GigaChatTransformer после преобразования контента сообщений
+    (и при переключении запроса на другой deployment группы).
+    """
+
+    def __init__(self, config: Optional[ContextWindowConfig] = None):
+        """
+        Args:
+            config: Параметры управления окном контекста
+        """
+        self.config = config or ContextWindowConfig()
+        self._lock = threading.Lock()
+        self.counters = {
+            "checked": 0,
+            "over_limit": 0,
+            "escalated": 0,
+            "truncated_messages": 0,
+            "dropped_messages": 0,
+            "fitted": 0,
+            "rejected": 0,
+        }
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def get_context_window(self, model: str) -> Optional[int]:
+        """
+        Окно контекста модели.
+
+        Args:
+            model: Имя deployment
+
+        Returns:
+            Число токенов или None, если окно неизвестно
+        """
+        if model in self.config.models:
+            return int(self.config.models[model])
+
+        import litellm.proxy.proxy_server as proxy_server
+
+        router = getattr(proxy_server, "llm_router", None)
+        deployments = (router.get_model_list(model_name=model) or []) if router is not None and model else []
+        limits = []
+        for deployment in deployments:
+            value = (deployment.get("model_info") or {}).get("max_input_tokens")
+            if not value:
+                model_id = get_model_id((deployment.get("litellm_params") or {}).get("model", ""))
+                value = self.config.models.get(model_id)
+            if value:
+                limits.append(int(value))
+        # Запрос может уйти в любой deployment модели - берём наименьшее окно
+        return min(limits) if limits else None
+
+    def _budget(self, limit: int) -> int:
+        return int(limit * (1 - self.config.safety_margin))
+
+    def escalate(self, data: Dict[str, Any], group: Optional[ModelGroupConfig] = None) -> Optional[str]:
+        """
+        Переключить запрос на deployment, в окно которого помещается промпт.
+
+        Args:
+            data: Параметры запроса чата (model изменяется)
+            group: Группа моделей запроса (кандидаты - её участники)
+
+        Returns:
+            Новый deployment или None, если переключение не требуется или невозможно
+        """
+        messages = data.get("messages")
+        model = data.get("model") or ""
+        if ESCALATE not in self.config.strategies or not isinstance(messages, list) or not messages:
+            return None
+        limit = self.get_context_window(model)
+        if limit is None:
+            return None
+        prompt_tokens = estimate_prompt_tokens(data)
+        if prompt_tokens <= self._budget(limit):
+            return None
+
+        def fits(name: str) -> bool:
+            limit = self.get_context_window(name)
+            return limit is not None and self._budget(limit) >= prompt_tokens
+
+        deployment = None
+        group_router = get_global_model_group_router()
+        if group is not None and group_router is not None:
+            members = group_router.get_members(group)
+            unfit = [name for name in members if name == model or not fits(name)]
+            if len(unfit) < len(members):
+                deployment = group_router.choose(group, exclude=unfit, prompt_tokens=prompt_tokens)
+        if deployment is None:
+            deployment = next(
+                (name for name in self.config.escalation.get(model) or [] if name != model and fits(name)), None
+            )
+        if deployment is None:
+            return None
+
+        data["model"] = deployment
+        self._count("escalated")
+        logger.info(f"Промпт ~{prompt_tokens} токенов: запрос переключён с {model} на {deployment}")
+        return deployment
+
+    def _recent_start(self, messages: List[Any]) -> int:
+        """Индекс, начиная с которого сообщения не изменяются"""
+        keep = max(1, self.config.keep_recent_messages)
+        regular = [index for index, message in enumerate(messages) if _role(message) != "system"]
+        return regular[-keep] if len(regular) > keep else (regular[0] if regular else len(messages))
+
+    def _truncate_tool_outputs(self, messages: List[Any], costs: List[int], total: int, budget: int) -> int:
+        """Обрезать старые результаты функций (начиная с самых старых)"""
+        estimator = get_token_estimator()
+        limit = self.config.tool_output_max_chars
+        for index in range(self._recent_start(messages)):
+            if total <= budget:
+                break
+            message = messages[index]
+            content = message.get("content") if isinstance(message, dict) else None
+            if _role(message) not in TOOL_ROLES or not isinstance(content, str) or len(content) <= limit:
+                continue
+            messages[index] = {
+                **message,
+                "content": f"{content[:limit]}\n...[обрезано {len(content) - limit} символов]",
+            }
+            cost = estimator.count_messages([messages[index]])
+            total -= costs[index] - cost
+            costs[index] = cost
+            self._count("truncated_messages")
+        return total
+
+    def _drop_old_messages(self, messages: List[Any], costs: List[int], total: int, budget: int) -> int:
+        """Удалить старые сообщения, кроме системных (результаты функций - вместе с вызовом)"""
+        recent_start = self._recent_start(messages)
+        dropped = set()
+        for index in range(recent_start):
+            if _role(messages[index]) == "system":
+                continue
+            # Результаты функций без вызова не оставляем
+            if total <= budget and _role(messages[index]) not in TOOL_ROLES:
+                break
+            dropped.add(index)
+            total -= costs[index]
+        if dropped:
+            messages[:] = [message for index, message in enumerate(messages) if index not in dropped]
+            costs[:] = [cost for index, cost in enumerate(costs) if index not in dropped]
+            self._count("dropped_messages", len(dropped))
+        return total
+
+    def apply(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Привести промпт запроса к окну контекста модели обрезкой сообщений
+        (переключение deployment выполняет escalate).
+
+        Args:
+            data: Параметры запроса чата (messages и metadata изменяются)
+
+        Returns:
+            Параметры запроса
+
+        Raises:
+            ContextWindowExceeded: Промпт не удалось уместить и reject_overflow включён
+        """
+        messages = data.get("messages")
+        model = data.get("model") or ""
+        if not isinstance(messages, list) or not messages:
+            return data
+        limit = self.get_context_window(model)
+        if limit is None:
+            return data
+        self._count("checked")
+
+        total = estimate_prompt_tokens(data)
+        if total <= self._budget(limit):
+            return data
+        self._count("over_limit")
+
+        messages = list(messages)
+        costs: Optional[List[int]] = None
+        for strategy in self.config.strategies:
+            if strategy not in (TRUNCATE_TOOL_OUTPUTS, DROP_OLD_MESSAGES):
+                continue
+            if costs is None:
+                estimator = get_token_estimator()
+                costs = [estimator.count_messages([message]) for message in messages]
+            trim = self._truncate_tool_outputs if strategy == TRUNCATE_TOOL_OUTPUTS else self._drop_old_messages
+            total = trim(messages, costs, total, self._budget(limit))
+            if total <= self._budget(limit):
+                break
+
+        data["messages"] = messages
+        if isinstance(data.get("metadata"), dict):
+            # Следующие этапы (квоты, учёт) используют оценку после изменений
+            data["metadata"][PROMPT_TOKENS_KEY] = total
+        if total <= self._budget(limit):
+            self._count("fitted")
+            return data
+
+        if self.config.reject_overflow:
+            self._count("rejected")
+            raise ContextWindowExceeded(model, total, limit)
+        logger.warning(f"Промпт ~{total} токенов превышает окно {limit} модели {model}, запрос передан как есть")
+        return data
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики запросов и изменений промпта.
+
+        Returns:
+            Словарь метрик
+        """
+        with self._lock:
+            return dict(self.counters)
+
+
+def _role(message: Any) -> Optional[str]:
+    return message.get("role") if isinstance(message, dict) else None
+
+
+# Глобальный экземпляр
+_global_context_window_manager: Optional[ContextWindowManager] = None
+
+
+def get_global_context_window_manager() -> Optional[ContextWindowManager]:
+    """
+    Получить глобальный ContextWindowManager.
+
+    Returns:
+        Глобальный экземпляр или None если управление окном не настроено
+    """
+    return _global_context_window_manager
+
+
+def init_global_context_window_manager(section: Optional[Dict[str, Any]] = None) -> Optional[ContextWindowManager]:
+    """
+    Инициализировать глобальный ContextWindowManager.
+
+    Args:
+        section: Секция context_window config.yml
+
+    Returns:
+        ContextWindowManager или None если управление окном выключено
+    """
+    global _global_context_window_manager
+
+    config = ContextWindowConfig.from_dict(section)
+    _global_context_window_manager = ContextWindowManager(config) if config.enabled else None
+
+    return _global_context_window_manager
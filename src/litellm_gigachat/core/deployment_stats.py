@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Статистика запросов по deployments (публичным именам моделей в Router).
+
+Для каждого deployment хранятся экспоненциально сглаженные (EWMA) задержка и
+доля ошибок, число запросов в работе, гистограммы задержек успешных запросов
+и времени до первого chunk streaming-ответов (перцентили по последним
+запросам). Эти данные использует маршрутизация групп моделей (model_groups),
+hedging и дедлайны первого токена (ttft).
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Незавершённые запросы старше этого значения считаются потерянными
+# (например, ошибка произошла до вызова модели и завершающий хук не сработал)
+STALE_REQUEST_SECONDS = 600.0
+
+# Границы корзин гистограмм задержек (секунды, формат Prometheus)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Число последних значений для расчёта перцентилей
+PERCENTILE_WINDOW = 200
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек: накопительные корзины (для метрик) и окно
+    последних значений (для перцентилей). Не потокобезопасна - вызывается
+    под блокировкой владельца.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS, window: int = PERCENTILE_WINDOW):
+        """
+        Args:
+            buckets: Верхние границы корзин по возрастанию
+            window: Число последних значений для перцентилей
+        """
+        self.buckets = tuple(buckets)
+        self.bucket_counts: List[int] = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def record(self, value: float) -> None:
+        """Учесть значение"""
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Перцентиль по окну последних значений.
+
+        Args:
+            q: Квантиль от 0 до 1
+
+        Returns:
+            Значение или None, если значений нет
+        """
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """Накопительные счётчики корзин (le, count), включая +Inf"""
+        result, total = [], 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            total += count
+            result.append((bound, total))
+        result.append((float("inf"), self.count))
+        return result
+
+    def copy(self) -> "LatencyHistogram":
+        """Копия гистограммы"""
+        histogram = LatencyHistogram(self.buckets, self.recent.maxlen or PERCENTILE_WINDOW)
+        histogram.bucket_counts = list(self.bucket_counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.recent.extend(self.recent)
+        return histogram
+
+
+@dataclass
+class DeploymentStats:
+    """Сглаженная статистика одного deployment"""
+    name: str
+    ewma_latency: Optional[float] = None
+    ewma_error_rate: float = 0.0
+    inflight: int = 0
+    requests: int = 0
+    failures: int = 0
+    last_latency: Optional[float] = None
+    last_error: Optional[str] = None
+    last_error_at: Optional[float] = None
+    updated_at: Optional[float] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Статистика в виде словаря (для статуса и логов)"""
+        return {
+            "ewma_latency": round(self.ewma_latency, 4) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_latency": round(self.last_latency, 4) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+
+class DeploymentStatsRegistry:
+    """
+    Потокобезопасный реестр статистики deployments.
+
+    Запрос регистрируется через start_request, который возвращает идентификатор;
+    finish_request по этому идентификатору идемпотентен, поэтому завершение из
+    нескольких хуков (успех, ошибка) не искажает счётчик запросов в работе.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        """
+        Args:
+            alpha: Вес нового наблюдения в EWMA (0 < alpha <= 1)
+        """
+        self.alpha = alpha
+        self._stats: Dict[str, DeploymentStats] = {}
+        self._latencies: Dict[str, LatencyHistogram] = {}
+        self._ttft: Dict[str, LatencyHistogram] = {}
+        self._open_requests: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str) -> DeploymentStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = DeploymentStats(name=name)
+        return stats
+
+    def start_request(self, name: str) -> str:
+        """
+        Отметить начало запроса к deployment.
+
+        Args:
+            name: Имя deployment
+
+        Returns:
+            Идентификатор запроса для finish_request
+        """
+        request_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._expire_stale(now)
+            self._get_or_create(name).inflight += 1
+            self._open_requests[request_id] = (name, now)
+        return request_id
+
+    def finish_request(
+        self,
+        request_id: str,
+        success: bool,
+        latency: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Отметить завершение запроса.
+
+        Args:
+            request_id: Идентификатор из start_request
+            success: Успешен ли запрос
+            latency: Задержка в секундах (по умолчанию - время с start_request)
+            error: Описание ошибки
+
+        Returns:
+            Имя deployment или None, если запрос уже завершён
+        """
+        with self._lock:
+            entry = self._open_requests.pop(request_id, None)
+            if entry is None:
+                return None
+            name, started_at = entry
+            stats = self._get_or_create(name)
+            stats.inflight = max(0, stats.inflight - 1)
+            if latency is None:
+                latency = time.monotonic() - started_at
+            self._observe(stats, success, latency, error)
+            return name
+
+    def cancel_request(self, request_id: str) -> Optional[str]:
+        """
+        Завершить отменённый запрос без учёта в статистике
+        (например, проигравший дублирующий запрос hedging).
+
+        Args:
+            request_id: Идентификатор из start_request
+
+        Returns:
+            Имя deployment или None, если запрос уже завершён
+        """
+        with self._lock:
+            entry = self._open_requests.pop(request_id, None)
+            if entry is None:
+                return None
+            stats = self._get_or_create(entry[0])
+            stats.inflight = max(0, stats.inflight - 1)
+            return entry[0]
+
+    def record(self, name: str, success: bool, latency: float, error: Optional[str] = None) -> None:
+        """
+        Учесть завершённый запрос без отслеживания запросов в работе.
+
+        Args:
+            name: Имя deployment
+            success: Успешен ли запрос
+            latency: Задержка в секундах
+            error: Описание ошибки
+        """
+        with self._lock:
+            self._observe(self._get_or_create(name), success, latency, error)
+
+    def record_ttft(self, name: str, ttft: float) -> None:
+        """
+        Учесть время до первого chunk streaming-ответа.
+
+        Args:
+            name: Имя deployment
+            ttft: Время до первого chunk в секундах
+        """
+        with self._lock:
+            histogram = self._ttft.get(name)
+            if histogram is None:
+                histogram = self._ttft[name] = LatencyHistogram()
+            histogram.record(ttft)
+
+    def _observe(self, stats: DeploymentStats, success: bool, latency: float, error: Optional[str]) -> None:
+        """Обновить EWMA (вызывается под блокировкой)"""
+        stats.requests += 1
+        stats.updated_at = time.time()
+        stats.ewma_error_rate += self.alpha * ((0.0 if success else 1.0) - stats.ewma_error_rate)
+
+        if success:
+            # Задержка неуспешных запросов (таймаут, быстрый отказ) не отражает скорость модели
+            stats.last_latency = latency
+            histogram = self._latencies.get(stats.name)
+            if histogram is None:
+                histogram = self._latencies[stats.name] = LatencyHistogram()
+            histogram.record(latency)
+            if stats.ewma_latency is None:
+                stats.ewma_latency = latency
+            else:
+                stats.ewma_latency += self.alpha * (latency - stats.ewma_latency)
+        else:
+            stats.failures += 1
+            stats.last_error = error
+            stats.last_error_at = stats.updated_at
+
+    def _expire_stale(self, now: float) -> None:
+        """Освободить запросы, завершение которых так и не пришло"""
+        stale = [
+            request_id for request_id, (_, started_at) in self._open_requests.items()
+            if now - started_at > STALE_REQUEST_SECONDS
+        ]
+        for request_id in stale:
+            name, _ = self._open_requests.pop(request_id)
+            stats = self._stats.get(name)
+            if stats is not None:
+                stats.inflight = max(0, stats.inflight - 1)
+        if stale:
+            logger.debug(f"Освобождено {len(stale)} незавершённых запросов")
+
+    def get(self, name: str) -> Optional[DeploymentStats]:
+        """
+        Получить копию статистики deployment.
+
+        Args:
+            name: Имя deployment
+
+        Returns:
+            Статистика или None, если запросов ещё не было
+        """
+        with self._lock:
+            stats = self._stats.get(name)
+            return DeploymentStats(**vars(stats)) if stats is not None else None
+
+    def get_latency_percentile(self, name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Перцентиль задержки успешных запросов deployment.
+
+        Args:
+            name: Имя deployment
+            q: Квантиль от 0 до 1
+            min_samples: Минимальное число значений в окне
+
+        Returns:
+            Задержка в секундах или None, если значений недостаточно
+        """
+        return self._get_percentile(self._latencies, name, q, min_samples)
+
+    def get_ttft_percentile(self, name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Перцентиль времени до первого chunk streaming-ответов deployment.
+
+        Args:
+            name: Имя deployment
+            q: Квантиль от 0 до 1
+            min_samples: Минимальное число значений в окне
+
+        Returns:
+            Время в секундах или None, если значений недостаточно
+        """
+        return self._get_percentile(self._ttft, name, q, min_samples)
+
+    def _get_percentile(self, histograms: Dict[str, LatencyHistogram], name: str,
+                        q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            histogram = histograms.get(name)
+            if histogram is None or len(histogram.recent) < min_samples:
+                return None
+            return histogram.percentile(q)
+
+    def get_latency_histograms(self) -> Dict[str, LatencyHistogram]:
+        """
+        Копии гистограмм задержек всех deployments.
+
+        Returns:
+            Словарь: имя deployment -> LatencyHistogram
+        """
+        with self._lock:
+            return {name: histogram.copy() for name, histogram in self._latencies.items()}
+
+    def get_ttft_histograms(self) -> Dict[str, LatencyHistogram]:
+        """
+        Копии гистограмм времени до первого chunk всех deployments.
+
+        Returns:
+            Словарь: имя deployment -> LatencyHistogram
+        """
+        with self._lock:
+            return {name: histogram.copy() for name, histogram in self._ttft.items()}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Статистика всех deployments.
+
+        Returns:
+            Словарь: имя deployment -> статистика
+        """
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        """Сбросить всю статистику"""
+        with self._lock:
+            self._stats.clear()
+            self._latencies.clear()
+            self._ttft.clear()
+            self._open_requests.clear()
+
+
+# Глобальный экземпляр реестра
+_global_deployment_stats: Optional[DeploymentStatsRegistry] = None
+_global_lock = threading.Lock()
+
+
+def get_global_deployment_stats() -> DeploymentStatsRegistry:
+    """
+    Получить глобальный реестр статистики (создаётся при первом обращении).
+
+    Returns:
+        Глобальный экземпляр DeploymentStatsRegistry
+    """
+    global _global_deployment_stats
+    if _global_deployment_stats is None:
+        with _global_lock:
+            if _global_deployment_stats is None:
+                _global_deployment_stats = DeploymentStatsRegistry()
+    return _global_deployment_stats
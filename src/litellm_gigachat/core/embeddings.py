@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""
+Эмбеддинги: объединение запросов в пакеты и кэш векторов.
+
+RAG-нагрузка обычно отправляет тексты по одному, параллельно. MicroBatchTransport
+(транспорт httpx под клиентом OpenAI SDK, которым LiteLLM вызывает модель)
+перехватывает POST */embeddings и:
+    - отдаёт векторы уже известных текстов из кэша, не обращаясь к модели;
+    - собирает остальные тексты одновременных запросов (тот же URL, ключ и
+      параметры) в течение batch_window_ms или до max_batch_size текстов
+      и отправляет их одним запросом с массивом input;
+    - каждому исходному запросу возвращает отдельный ответ OpenAI с его
+      векторами и долей usage.
+
+Поскольку объединение выполняется ниже LiteLLM, каждый запрос клиента
+по-прежнему проходит свои хуки: токен GigaChat, квоты, лимиты
+параллельности, повторы и учёт доступности провайдера.
+
+VectorCache хранит векторы float32 в memory-mapped файле (отдельный файл на
+размерность) с вытеснением давно не использованных (LRU). Ключ - SHA-256
+URL модели, параметров запроса (model, dimensions, user...) и текста. Без каталога кэша и в worker, не получивших файл
+(его использует один процесс - файловая блокировка), векторы хранятся
+в анонимной памяти.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Заголовки, не влияющие на объединение запросов (служебные заголовки OpenAI SDK и httpx)
+IGNORED_HEADERS = frozenset({
+    "content-length", "content-type", "accept", "accept-encoding", "connection", "host", "user-agent",
+})
+IGNORED_HEADER_PREFIXES = ("x-stainless-",)
+# Заголовки ответа модели, которые не копируются в ответы исходным запросам
+DROPPED_RESPONSE_HEADERS = frozenset({"content-length", "content-encoding", "transfer-encoding"})
+
+_MAGIC = b"GCVEC001"
+_HEADER = struct.Struct("<8sII")
+_KEY_SIZE = 16
+_EMPTY_KEY = bytes(_KEY_SIZE)
+
+
+@dataclass
+class EmbeddingsConfig:
+    """Параметры объединения запросов эмбеддингов и кэша векторов"""
+    enabled: bool = True
+    # Ожидание других запросов перед отправкой пакета
+    batch_window_ms: float = 5.0
+    max_batch_size: int = 16
+    # Векторов в кэше на размерность (0 - кэш выключен)
+    cache_max_entries: int = 20000
+    # Каталог файлов кэша (по умолчанию GIGACHAT_EMBEDDINGS_CACHE_DIR, без него - только память)
+    cache_directory: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "EmbeddingsConfig":
+        """
+        Создать конфигурацию из словаря (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+
+        Returns:
+            EmbeddingsConfig
+        """
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+
+def floats_to_bytes(values: List[float]) -> bytes:
+    """Вектор в байты float32 little-endian (формат base64-ответа OpenAI)"""
+    vector = array("f", values)
+    if sys.byteorder == "big":
+        vector.byteswap()
+    return vector.tobytes()
+
+
+def bytes_to_floats(data: bytes) -> List[float]:
+    """Байты float32 little-endian в список чисел"""
+    vector = array("f")
+    vector.frombytes(data)
+    if sys.byteorder == "big":
+        vector.byteswap()
+    return vector.tolist()
+
+
+def embedding_to_bytes(embedding: Any) -> Optional[bytes]:
+    """
+    Вектор из ответа модели (список чисел или base64) в байты float32.
+
+    Returns:
+        Байты или None, если формат не распознан
+    """
+    if isinstance(embedding, str):
+        try:
+            data = base64.b64decode(embedding)
+        except ValueError:
+            return None
+        return data if data and len(data) % 4 == 0 else None
+    if isinstance(embedding, list) and embedding:
+        try:
+            return floats_to_bytes(embedding)
+        except TypeError:
+            return None
+    return None
+
+
+def encode_embedding(data: bytes, encoding_format: Optional[str]) -> Any:
+    """Вектор в формате ответа, запрошенном клиентом"""
+    if encoding_format == "base64":
+        return base64.b64encode(data).decode("ascii")
+    return bytes_to_floats(data)
+
+
+class _VectorStore:
+    """
+    Векторы одной размерности в memory-mapped области фиксированного размера.
+
+    Формат: заголовок, capacity ключей по 16 байт, capacity векторов float32.
+    Индекс ключей восстанавливается при открытии файла; порядок LRU после
+    перезапуска - порядок слотов.
+    """
+
+    def __init__(self, dim: int, capacity: int, path: Optional[str] = None):
+        self.dim = dim
+        self.capacity = capacity
+        self.path = path
+        self.vector_size = dim * 4
+        self.keys_offset = _HEADER.size
+        self.vectors_offset = self.keys_offset + capacity * _KEY_SIZE
+        self.size = self.vectors_offset + capacity * self.vector_size
+        self._fd: Optional[int] = None
+        self._index: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._mm = self._open_file() if path else None
+        if self._mm is None:
+            self.path = None
+            self._mm = mmap.mmap(-1, self.size)
+            self._free = list(range(capacity - 1, -1, -1))
+
+    def _open_file(self) -> Optional[mmap.mmap]:
+        """Открыть файл кэша под блокировкой; None - файл занят другим процессом или недоступен"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning(f"Файл кэша эмбеддингов {self.path} недоступен: {e}, кэш в памяти")
+            return None
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                logger.info(f"Файл кэша эмбеддингов {self.path} используется другим процессом, кэш в памяти")
+                return None
+
+        header = os.pread(fd, _HEADER.size, 0)
+        valid = (
+            len(header) == _HEADER.size
+            and _HEADER.unpack(header) == (_MAGIC, self.dim, self.capacity)
+            and os.fstat(fd).st_size == self.size
+        )
+        if not valid:
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, _HEADER.pack(_MAGIC, self.dim, self.capacity), 0)
+
+        self._fd = fd
+        mm = mmap.mmap(fd, self.size)
+        for slot in range(self.capacity):
+            offset = self.keys_offset + slot * _KEY_SIZE
+            key = mm[offset:offset + _KEY_SIZE]
+            if key == _EMPTY_KEY:
+                self._free.append(slot)
+            else:
+                self._index[key] = slot
+        self._free.reverse()
+        if self._index:
+            logger.info(f"Кэш эмбеддингов {self.path}: загружено {len(self._index)} векторов")
+        return mm
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+        self._index.move_to_end(key)
+        offset = self.vectors_offset + slot * self.vector_size
+        return self._mm[offset:offset + self.vector_size]
+
+    def put(self, key: bytes, vector: bytes) -> bool:
+        """Сохранить вектор; True если вытеснен другой вектор"""
+        evicted = False
+        slot = self._index.get(key)
+        if slot is not None:
+            self._index.move_to_end(key)
+        else:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, slot = self._index.popitem(last=False)
+                evicted = True
+            self._index[key] = slot
+        offset = self.vectors_offset + slot * self.vector_size
+        self._mm[offset:offset + self.vector_size] = vector
+        key_offset = self.keys_offset + slot * _KEY_SIZE
+        self._mm[key_offset:key_offset + _KEY_SIZE] = key
+        return evicted
+
+    def close(self) -> None:
+        self._mm.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class VectorCache:
+    """
+    Кэш векторов по хэшу URL модели, параметров запроса и текста с вытеснением LRU.
+
+    Хранилище каждой размерности создаётся при первом векторе; в каталоге
+    directory это файл vectors-<dim>.f32, без каталога - анонимная память.
+    """
+
+    def __init__(self, max_entries: int = 20000, directory: Optional[str] = None):
+        """
+        Args:
+            max_entries: Векторов на размерность
+            directory: Каталог файлов кэша (None - только память)
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._stores: Dict[int, _VectorStore] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(text: str, params: Dict[str, Any], url: str = "") -> bytes:
+        """
+        Ключ кэша: первые 16 байт SHA-256 URL модели, параметров запроса и текста.
+
+        Args:
+            text: Текст
+            params: Параметры запроса без input (model, dimensions, user...);
+                encoding_format не влияет на вектор и не учитывается
+            url: URL эмбеддингов модели
+        """
+        canonical = json.dumps(
+            {key: value for key, value in params.items() if key not in ("input", "encoding_format")},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(f"{url}\0{canonical}\0{text}".encode("utf-8")).digest()[:_KEY_SIZE]
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """
+        Вектор по ключу.
+
+        Returns:
+            Байты float32 или None
+        """
+        with self._lock:
+            for store in self._stores.values():
+                vector = store.get(key)
+                if vector is not None:
+                    self.hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, vector: bytes) -> None:
+        """Сохранить вектор (байты float32)"""
+        dim = len(vector) // 4
+        with self._lock:
+            store = self._stores.get(dim)
+            if store is None:
+                path = os.path.join(self.directory, f"vectors-{dim}.f32") if self.directory else None
+                store = self._stores[dim] = _VectorStore(dim, self.max_entries, path)
+            if store.put(key, vector):
+                self.evictions += 1
+
+    def close(self) -> None:
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": sum(len(store) for store in self._stores.values()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "files": [store.path for store in self._stores.values() if store.path],
+            }
+
+
+class _Batch:
+    """Тексты, накопленные для одного запроса к модели"""
+
+    def __init__(self, url: httpx.URL, headers: List[Tuple[str, str]], params: Dict[str, Any],
+                 extensions: Dict[str, Any]):
+        self.url = url
+        self.headers = headers
+        self.params = params
+        self.extensions = extensions
+        self.waiters: Dict[str, List[asyncio.Future]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, text: str, future: asyncio.Future) -> None:
+        self.waiters.setdefault(text, []).append(future)
+
+
+@dataclass
+class _UpstreamError:
+    """Ответ модели с ошибкой: возвращается каждому запросу пакета"""
+    status_code: int
+    headers: List[Tuple[str, str]]
+    content: bytes
+
+
+class MicroBatchTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт httpx: объединяет одновременные запросы */embeddings в пакеты
+    и отдаёт известные векторы из кэша. Остальные запросы передаются
+    вложенному транспорту без изменений.
+    """
+
+    def __init__(self, config: Optional[EmbeddingsConfig] = None, cache: Optional[VectorCache] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            config: Параметры объединения
+            cache: Кэш векторов (None - без кэша)
+            transport: Транспорт запросов к модели (по умолчанию httpx.AsyncHTTPTransport)
+        """
+        self.config = config or EmbeddingsConfig()
+        self.cache = cache
+        self._transport = transport
+        self._batches: Dict[Tuple, _Batch] = {}
+        self._tasks: set = set()
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "texts": 0,
+            "cached_texts": 0,
+            "upstream_requests": 0,
+            "upstream_texts": 0,
+            "upstream_errors": 0,
+        }
+
+    def _get_transport(self) -> httpx.AsyncBaseTransport:
+        if self._transport is None:
+            from .http_client import get_default_verify
+            self._transport = httpx.AsyncHTTPTransport(verify=get_default_verify())
+        return self._transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith("/embeddings"):
+            return await self._get_transport().handle_async_request(request)
+
+        try:
+            body = json.loads(await request.aread())
+        except ValueError:
+            body = None
+        texts = self._get_texts(body)
+        if texts is None:
+            # Токены вместо текста и прочие форматы - без объединения
+            return await self._get_transport().handle_async_request(request)
+        return await self._handle_embeddings(request, body, texts)
+
+    @staticmethod
+    def _get_texts(body: Any) -> Optional[List[str]]:
+        if not isinstance(body, dict):
+            return None
+        value = body.get("input")
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+            return value
+        return None
+
+    async def _handle_embeddings(self, request: httpx.Request, body: Dict[str, Any],
+                                 texts: List[str]) -> httpx.Response:
+        model = str(body.get("model", ""))
+        encoding_format = body.get("encoding_format")
+        params = {key: value for key, value in body.items() if key != "input"}
+        self.counters["requests"] += 1
+        self.counters["texts"] += len(texts)
+
+        vectors: List[Any] = [None] * len(texts)
+        tokens = 0
+        pending: List[Tuple[int, asyncio.Future]] = []
+        for index, text in enumerate(texts):
+            cached = self.cache.get(VectorCache.make_key(text, params, str(request.url))) if self.cache else None
+            if cached is not None:
+                vectors[index] = encode_embedding(cached, encoding_format)
+                self.counters["cached_texts"] += 1
+            else:
+                pending.append((index, self._enqueue(request, params, text)))
+
+        headers: List[Tuple[str, str]] = []
+        if pending:
+            results = await asyncio.gather(*(future for _, future in pending))
+            for (index, _), result in zip(pending, results):
+                if isinstance(result, _UpstreamError):
+                    return httpx.Response(result.status_code, headers=result.headers, content=result.content)
+                vectors[index], text_tokens, headers = result
+                tokens += text_tokens
+
+        content = {
+            "object": "list",
+            "data": [{"object": "embedding", "index": index, "embedding": vector}
+                     for index, vector in enumerate(vectors)],
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+        headers = [(name, value) for name, value in headers if name.lower() not in ("content-type",)]
+        return httpx.Response(200, headers=headers, json=content)
+
+    def _batch_key(self, request: httpx.Request, params: Dict[str, Any]) -> Tuple:
+        headers = tuple(sorted(
+            (name.lower(), value) for name, value in request.headers.items()
+            if name.lower() not in IGNORED_HEADERS and not name.lower().startswith(IGNORED_HEADER_PREFIXES)
+        ))
+        return str(request.url), headers, json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+    def _enqueue(self, request: httpx.Request, params: Dict[str, Any], text: str) -> asyncio.Future:
+        """Добавить текст в пакет одновременных запросов с теми же URL, заголовками и параметрами"""
+        loop = asyncio.get_running_loop()
+        key = self._batch_key(request, params)
+        batch = self._batches.get(key)
+        if batch is None:
+            headers = [(name, value) for name, value in request.headers.items()
+                       if name.lower() != "content-length"]
+            batch = self._batches[key] = _Batch(request.url, headers, params, dict(request.extensions))
+            batch.timer = loop.call_later(max(self.config.batch_window_ms, 0) / 1000, self._flush, key)
+
+        future = loop.create_future()
+        batch.add(text, future)
+        if len(batch.waiters) >= max(self.config.max_batch_size, 1):
+            self._flush(key)
+        return future
+
+    def _flush(self, key: Tuple) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        """Отправить пакет модели и раздать результаты ожидающим запросам"""
+        texts = list(batch.waiters)
+        self.counters["upstream_requests"] += 1
+        self.counters["upstream_texts"] += len(texts)
+        try:
+            response = await self._post(batch, texts)
+            try:
+                content = await response.aread()
+            finally:
+                await response.aclose()
+        except asyncio.CancelledError:
+            self._resolve(batch, cancel=True)
+            raise
+        except Exception as exc:
+            self.counters["upstream_errors"] += 1
+            self._resolve(batch, exception=exc)
+            return
+
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_RESPONSE_HEADERS]
+        if response.status_code >= 400:
+            self.counters["upstream_errors"] += 1
+            self._resolve(batch, result=_UpstreamError(response.status_code, headers, content))
+            return
+
+        try:
+            data = json.loads(content)
+            items = {item["index"]: item["embedding"] for item in data["data"]}
+            embeddings = [items[index] for index in range(len(texts))]
+        except (ValueError, KeyError, TypeError) as exc:
+            self.counters["upstream_errors"] += 1
+            self._resolve(batch, exception=httpx.DecodingError(f"Некорректный ответ эмбеддингов: {exc}"))
+            return
+
+        shares = self._split_tokens(texts, (data.get("usage") or {}).get("prompt_tokens") or 0)
+        for text, embedding, share in zip(texts, embeddings, shares):
+            if self.cache is not None:
+                vector = embedding_to_bytes(embedding)
+                if vector is not None:
+                    self.cache.put(VectorCache.make_key(text, batch.params, str(batch.url)), vector)
+            for future in batch.waiters[text]:
+                if not future.done():
+                    future.set_result((embedding, share, headers))
+                # Повтор текста в пакете не расходует токены повторно
+                share = 0
+
+    async def _post(self, batch: _Batch, texts: List[str]) -> httpx.Response:
+        body = json.dumps({**batch.params, "input": texts}, ensure_ascii=False).encode("utf-8")
+        headers = [(name, value) for name, value in batch.headers if name.lower() != "content-type"]
+        headers += [("content-type", "application/json"), ("content-length", str(len(body)))]
+        request = httpx.Request("POST", batch.url, headers=headers, content=body, extensions=batch.extensions)
+        return await self._get_transport().handle_async_request(request)
+
+    @staticmethod
+    def _split_tokens(texts: List[str], total: int) -> List[int]:
+        """Usage пакета по текстам пропорционально длине"""
+        lengths = [max(len(text), 1) for text in texts]
+        scale = total / sum(lengths)
+        shares = [int(length * scale) for length in lengths]
+        for index in range(total - sum(shares)):
+            shares[index % len(shares)] += 1
+        return shares
+
+    @staticmethod
+    def _resolve(batch: _Batch, result: Any = None, exception: Optional[Exception] = None,
+                 cancel: bool = False) -> None:
+        for futures in batch.waiters.values():
+            for future in futures:
+                if future.done():
+                    continue
+                if cancel:
+                    future.cancel()
+                elif exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
+
+    async def aclose(self) -> None:
+        if self._transport is not None:
+            await self._transport.aclose()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики объединения и кэша.
+
+        Returns:
+            Словарь: счётчики, средний размер пакета и метрики кэша
+        """
+        upstream = self.counters["upstream_requests"]
+        return {
+            **self.counters,
+            "avg_batch_size": round(self.counters["upstream_texts"] / upstream, 2) if upstream else 0.0,
+            "cache": self.cache.get_metrics() if self.cache else None,
+        }
+
+
+# Глобальный экземпляр
+_global_embedding_batcher: Optional[MicroBatchTransport] = None
+
+
+def get_global_embedding_batcher() -> Optional[MicroBatchTransport]:
+    """
+    Получить глобальный транспорт объединения эмбеддингов.
+
+    Returns:
+        Глобальный экземпляр или None если объединение не настроено
+    """
+    return _global_embedding_batcher
+
+
+def init_global_embedding_batcher(section: Optional[Dict[str, Any]]) -> Optional[MicroBatchTransport]:
+    """
+    Инициализировать глобальный транспорт объединения эмбеддингов.
+
+    Args:
+        section: Секция embeddings config.yml
+
+    Returns:
+        MicroBatchTransport или None если объединение выключено
+    """
+    global _global_embedding_batcher
+
+    config = EmbeddingsConfig.from_dict(section)
+    if not config.enabled:
+        _global_embedding_batcher = None
+        return None
+
+    cache = None
+    if config.cache_max_entries > 0:
+        directory = config.cache_directory
+        if directory is None:
+            directory = os.environ.get("GIGACHAT_EMBEDDINGS_CACHE_DIR")
+        cache = VectorCache(config.cache_max_entries, os.path.expanduser(directory) if directory else None)
+    _global_embedding_batcher = MicroBatchTransport(config, cache)
+
+    return _global_embedding_batcher
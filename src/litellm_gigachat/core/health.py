@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+Отслеживание доступности прокси-провайдеров и circuit breaker.
+
+Состояние провайдера определяется пассивно - по результатам запросов
+(ошибки соединения, таймауты и ответы 5xx) - и активно, лёгкими проверками
+`GET <url><health_check_path>` в фоновом потоке. Проверки выполняются для
+недоступных провайдеров и для провайдеров без трафика; если запросы идут,
+их результатов достаточно.
+
+Состояния circuit breaker:
+    closed    - запросы проходят;
+    open      - запросы отклоняются сразу, без ожидания таймаута провайдера;
+    half_open - после паузы (или успешной активной проверки) пропускается
+                один пробный запрос: успех закрывает цепь, ошибка снова
+                открывает её с удвоенной паузой. Если пробный запрос
+                отклонил сам прокси, место пробного запроса освобождается.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .http_client import get_global_http_client
+from .proxy_provider_manager import ProxyProviderConfig
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Окно для расчёта доли ошибок и минимальное число запросов в нём
+ERROR_WINDOW_SECONDS = 60.0
+MIN_WINDOW_REQUESTS = 10
+# Максимальная пауза открытой цепи при повторных срабатываниях
+MAX_OPEN_SECONDS = 300.0
+# Период проверки открытых цепей и таймаут одной проверки
+OPEN_PROBE_INTERVAL = 5.0
+PROBE_TIMEOUT = 5.0
+
+# Ключ в metadata запроса, занявшего место пробного запроса: {provider, started_at}
+TRIAL_METADATA_KEY = "gigachat_circuit_trial"
+
+
+def is_local_rejection(exception: Optional[BaseException]) -> bool:
+    """
+    Отклонён ли запрос самим прокси, без обращения к провайдеру.
+
+    HTTPException выбрасывают хуки прокси (circuit breaker, квоты RPM/TPM,
+    лимиты параллельности, допуск по SLO); ответа провайдера за ними нет,
+    поэтому в состоянии провайдера они не учитываются.
+
+    Args:
+        exception: Исключение вызова модели
+
+    Returns:
+        True для исключений, созданных прокси
+    """
+    from starlette.exceptions import HTTPException
+
+    return isinstance(exception, HTTPException)
+
+
+def is_provider_failure(exception: Optional[BaseException]) -> bool:
+    """
+    Считается ли ошибка признаком недоступности провайдера.
+
+    Ошибки соединения, таймауты и ответы 5xx - да; ошибки запроса клиента
+    (4xx, в том числе 429) - нет: провайдер отвечает.
+
+    Args:
+        exception: Исключение вызова модели
+
+    Returns:
+        True если ошибка указывает на проблему у провайдера
+    """
+    if exception is None:
+        return True
+    status_code = getattr(exception, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code >= 500
+    return True
+
+
+class ProviderHealth:
+    """Состояние доступности и circuit breaker одного провайдера"""
+
+    def __init__(self, provider: ProxyProviderConfig):
+        """
+        Args:
+            provider: Конфигурация прокси-провайдера
+        """
+        self.provider_name = provider.name
+        self.url = provider.url
+        self.configure(provider)
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.open_seconds = self.base_open_seconds
+        self.trial_started_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok: Optional[bool] = None
+        self.last_checked_at: Optional[float] = None
+        self.rejected = 0
+
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def configure(self, provider: ProxyProviderConfig) -> None:
+        """Применить параметры circuit breaker из конфигурации провайдера"""
+        self.provider = provider
+        self.failure_threshold = provider.circuit_failure_threshold
+        self.error_rate_threshold = provider.circuit_error_rate
+        self.base_open_seconds = provider.circuit_open_seconds
+        # Пробный запрос, не завершившийся за таймаут провайдера, считается потерянным
+        self.trial_timeout = float(provider.timeout)
+
+    def allow_request(self) -> bool:
+        """
+        Можно ли отправить запрос провайдеру.
+
+        Returns:
+            True если запрос разрешён (в half_open - только один пробный)
+        """
+        return self.acquire() is not None
+
+    def acquire(self) -> Optional[float]:
+        """
+        Разрешить запрос провайдеру (см. allow_request).
+
+        Returns:
+            None если запрос отклонён, время начала пробного запроса, если запрос
+            занял место пробного, иначе 0.0
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN, "истекла пауза")
+
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == HALF_OPEN and (
+                self.trial_started_at is None or now - self.trial_started_at > self.trial_timeout
+            ):
+                self.trial_started_at = now
+                return now
+
+            self.rejected += 1
+            return None
+
+    def release_trial(self, started_at: float) -> None:
+        """
+        Освободить место пробного запроса, который отклонил сам прокси
+        (квоты, допуск, окно контекста): ответа провайдера не было.
+
+        Args:
+            started_at: Время начала пробного запроса (результат acquire)
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self.trial_started_at == started_at:
+                self.trial_started_at = None
+                logger.debug(f"Провайдер {self.provider_name}: пробный запрос отклонён прокси, место освобождено")
+
+    def is_available(self) -> bool:
+        """Примет ли провайдер запрос (без резервирования пробного запроса)"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                return now - self.opened_at >= self.open_seconds
+            if self.state == HALF_OPEN:
+                return self.trial_started_at is None or now - self.trial_started_at > self.trial_timeout
+            return True
+
+    def record_success(self) -> None:
+        """Учесть успешный запрос"""
+        now = time.monotonic()
+        with self._lock:
+            self.last_checked_at = now
+            self.last_success_at = time.time()
+            self.consecutive_failures = 0
+            self._add_to_window(now, True)
+            if self.state != CLOSED:
+                self.open_seconds = self.base_open_seconds
+                self._set_state(CLOSED, "успешный запрос")
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        """Учесть запрос, завершившийся ошибкой провайдера"""
+        now = time.monotonic()
+        with self._lock:
+            self.last_checked_at = now
+            self.last_failure_at = time.time()
+            self.last_error = error
+            self.consecutive_failures += 1
+            self._add_to_window(now, False)
+
+            if self.state == HALF_OPEN:
+                # Пробный запрос не прошёл - пауза удваивается
+                self.open_seconds = min(self.open_seconds * 2, MAX_OPEN_SECONDS)
+                self._open(now, "пробный запрос не прошёл")
+            elif self.state == CLOSED:
+                if self.consecutive_failures >= self.failure_threshold:
+                    self._open(now, f"{self.consecutive_failures} ошибок подряд")
+                elif self._error_rate_exceeded():
+                    self._open(now, f"доля ошибок {self._error_rate():.0%}")
+
+    def record_probe(self, ok: bool, error: Optional[str] = None) -> None:
+        """
+        Учесть результат активной проверки.
+
+        Успешная проверка переводит открытую цепь в half_open (следующий
+        запрос пробный); неуспешная считается ошибкой провайдера.
+        """
+        with self._lock:
+            self.last_checked_at = time.monotonic()
+            self.last_probe_at = time.time()
+            self.last_probe_ok = ok
+            if ok and self.state == OPEN:
+                self._set_state(HALF_OPEN, "активная проверка прошла")
+                return
+        if not ok:
+            self.record_failure(error)
+
+    def needs_probe(self, interval: float) -> bool:
+        """
+        Нужна ли активная проверка.
+
+        Args:
+            interval: Период проверки провайдера без трафика
+
+        Returns:
+            True для открытой цепи и для провайдера без запросов и проверок за interval
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                return True
+            return self.last_checked_at is None or now - self.last_checked_at >= interval
+
+    def _open(self, now: float, reason: str) -> None:
+        """Открыть цепь (вызывается под блокировкой)"""
+        self.opened_at = now
+        self.trial_started_at = None
+        self._set_state(OPEN, reason)
+
+    def _set_state(self, state: str, reason: str) -> None:
+        """Сменить состояние (вызывается под блокировкой)"""
+        if state == self.state:
+            return
+        if state == OPEN:
+            logger.warning(
+                f"Провайдер {self.provider_name} недоступен ({reason}), "
+                f"запросы отклоняются {self.open_seconds:.0f}s"
+            )
+        else:
+            logger.info(f"Провайдер {self.provider_name}: {self.state} -> {state} ({reason})")
+        if state == HALF_OPEN:
+            self.trial_started_at = None
+        self.state = state
+
+    def _add_to_window(self, now: float, success: bool) -> None:
+        self._window.append((now, success))
+        while self._window and now - self._window[0][0] > ERROR_WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(1 for _, success in self._window if not success) / len(self._window)
+
+    def _error_rate_exceeded(self) -> bool:
+        return len(self._window) >= MIN_WINDOW_REQUESTS and self._error_rate() >= self.error_rate_threshold
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Состояние провайдера.
+
+        Returns:
+            Словарь с состоянием цепи, долей ошибок и результатами проверок
+        """
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, round(self.open_seconds - (time.monotonic() - self.opened_at), 1))
+            return {
+                "state": self.state,
+                "error_rate": round(self._error_rate(), 3),
+                "window_requests": len(self._window),
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in": retry_in,
+                "rejected": self.rejected,
+                "last_success_at": self.last_success_at,
+                "last_failure_at": self.last_failure_at,
+                "last_error": self.last_error,
+                "last_probe_at": self.last_probe_at,
+                "last_probe_ok": self.last_probe_ok,
+            }
+
+
+class ProviderHealthManager:
+    """
+    Реестр состояния провайдеров и фоновые активные проверки.
+
+    Список провайдеров берётся из MultiProxyProviderManager на каждом цикле,
+    поэтому изменения proxy_providers (горячая перезагрузка) учитываются
+    автоматически; при смене URL провайдера его состояние сбрасывается.
+    """
+
+    def __init__(self, provider_manager=None):
+        """
+        Args:
+            provider_manager: MultiProxyProviderManager (по умолчанию - глобальный)
+        """
+        if provider_manager is None:
+            from .proxy_provider_manager import get_global_multi_proxy_provider_manager
+            provider_manager = get_global_multi_proxy_provider_manager()
+        self.provider_manager = provider_manager
+
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get_health(self, provider: ProxyProviderConfig) -> ProviderHealth:
+        """
+        Получить состояние провайдера (создаётся при первом обращении).
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+
+        Returns:
+            ProviderHealth провайдера
+        """
+        health = self._health.get(provider.name)
+        if health is not None and health.provider is provider:
+            return health
+
+        with self._lock:
+            health = self._health.get(provider.name)
+            if health is None or health.url != provider.url:
+                # Новый провайдер или новый URL - состояние начинается заново
+                health = self._health[provider.name] = ProviderHealth(provider)
+            elif health.provider is not provider:
+                health.configure(provider)
+            return health
+
+    def allow_request(self, provider: ProxyProviderConfig) -> bool:
+        """Можно ли отправить запрос провайдеру (см. ProviderHealth.allow_request)"""
+        return self.get_health(provider).allow_request()
+
+    def acquire(self, provider: ProxyProviderConfig, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Разрешить запрос провайдеру и запомнить в metadata запроса занятое место
+        пробного запроса (см. release_local_rejection).
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+            metadata: metadata запроса
+
+        Returns:
+            True если запрос разрешён
+        """
+        started_at = self.get_health(provider).acquire()
+        if started_at and metadata is not None:
+            metadata[TRIAL_METADATA_KEY] = {"provider": provider.name, "started_at": started_at}
+        return started_at is not None
+
+    def release_local_rejection(self, provider: ProxyProviderConfig, metadata: Optional[Dict[str, Any]]) -> None:
+        """
+        Освободить место пробного запроса, если его занимал запрос, отклонённый самим прокси.
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+            metadata: metadata запроса
+        """
+        trial = (metadata or {}).pop(TRIAL_METADATA_KEY, None)
+        if trial and trial.get("provider") == provider.name:
+            self.get_health(provider).release_trial(trial["started_at"])
+
+    def is_available(self, provider: ProxyProviderConfig) -> bool:
+        """Доступен ли провайдер"""
+        return self.get_health(provider).is_available()
+
+    def record_result(self, provider: ProxyProviderConfig, exception: Optional[BaseException] = None) -> None:
+        """
+        Учесть результат запроса к провайдеру (отказы самого прокси
+        не учитываются, см. is_local_rejection).
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+            exception: Исключение (None при успехе)
+        """
+        if is_local_rejection(exception):
+            return
+        health = self.get_health(provider)
+        if exception is None or not is_provider_failure(exception):
+            health.record_success()
+        else:
+            health.record_failure(str(exception)[:200])
+
+    def probe(self, provider: ProxyProviderConfig) -> bool:
+        """
+        Активная проверка провайдера: GET <url><health_check_path>.
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+
+        Returns:
+            True если провайдер ответил без ошибки 5xx
+        """
+        url = f"{provider.url}{provider.health_check_path}"
+        try:
+            response = get_global_http_client().get(
+                url,
+                headers=provider.get_auth_headers(),
+                timeout=min(PROBE_TIMEOUT, float(provider.timeout)),
+                verify=provider.ssl_verify,
+            )
+            ok = response.status_code < 500
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as exc:
+            ok, error = False, str(exc)[:200]
+
+        logger.debug(f"Проверка {provider.name} ({url}): {'ok' if ok else error}")
+        self.get_health(provider).record_probe(ok, error)
+        return ok
+
+    def check_all(self) -> None:
+        """Проверить провайдеров, которым нужна активная проверка"""
+        providers = self.provider_manager.get_all_providers()
+        names = {p.name for p in providers}
+        with self._lock:
+            for name in [n for n in self._health if n not in names]:
+                del self._health[name]
+
+        for provider in providers:
+            if provider.health_check_interval <= 0:
+                continue
+            if self.get_health(provider).needs_probe(provider.health_check_interval):
+                self.probe(provider)
+
+    def _run(self) -> None:
+        """Цикл активных проверок"""
+        while self._running:
+            try:
+                self.check_all()
+            except Exception as exc:
+                logger.error(f"Ошибка активной проверки провайдеров: {exc}")
+            if self._stop_event.wait(OPEN_PROBE_INTERVAL):
+                break
+
+    def start(self) -> None:
+        """Запустить активные проверки в фоновом потоке"""
+        if self._running:
+            return
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("Активные проверки прокси-провайдеров запущены")
+
+    def stop(self) -> None:
+        """Остановить активные проверки"""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Состояние всех провайдеров.
+
+        Returns:
+            Словарь: имя провайдера -> состояние
+        """
+        return {
+            provider.name: self.get_health(provider).get_status()
+            for provider in self.provider_manager.get_all_providers()
+        }
+
+    def get_unavailable(self) -> List[str]:
+        """Имена провайдеров с открытой цепью"""
+        return [
+            provider.name for provider in self.provider_manager.get_all_providers()
+            if not self.is_available(provider)
+        ]
+
+
+# Глобальный экземпляр менеджера
+_global_provider_health_manager: Optional[ProviderHealthManager] = None
+
+
+def get_global_provider_health_manager() -> Optional[ProviderHealthManager]:
+    """
+    Получить глобальный экземпляр ProviderHealthManager.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_provider_health_manager
+
+
+def init_global_provider_health_manager(provider_manager=None) -> ProviderHealthManager:
+    """
+    Инициализировать глобальный экземпляр ProviderHealthManager.
+
+    Args:
+        provider_manager: MultiProxyProviderManager (по умолчанию - глобальный)
+
+    Returns:
+        Инициализированный экземпляр ProviderHealthManager
+    """
+    global _global_provider_health_manager
+
+    if _global_provider_health_manager is not None:
+        _global_provider_health_manager.stop()
+    _global_provider_health_manager = ProviderHealthManager(provider_manager)
+
+    return _global_provider_health_manager
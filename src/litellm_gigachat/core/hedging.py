@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Дублирующие запросы (hedging) для сокращения хвостовых задержек.
+
+Если deployment группы моделей не ответил за перцентиль своей наблюдаемой
+задержки (percentile, по умолчанию p95), тот же запрос отправляется в другой
+deployment группы (другой прокси-провайдер или учётные данные). Используется
+первый успешный ответ, второй запрос отменяется.
+
+Дублируются только запросы без streaming к группам моделей. Доля дублирующих
+запросов ограничена бюджетом (budget_ratio от запросов за окно), чтобы
+при общей деградации hedging не удваивал нагрузку на провайдеров.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .retry import DEPLOYMENT_METADATA_KEY, RetryBudget
+from .token_estimator import PROMPT_TOKENS_KEY
+
+logger = logging.getLogger(__name__)
+
+# Параметры вызова LiteLLM, которые нельзя разделять между двумя запросами
+PER_CALL_KWARGS = ("litellm_logging_obj", "litellm_call_id")
+
+
+@dataclass
+class HedgingConfig:
+    """Параметры hedging для группы моделей"""
+    enabled: bool = True
+    percentile: float = 0.95
+    min_delay: float = 0.1
+    min_samples: int = 20
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["HedgingConfig"] = None) -> "HedgingConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            HedgingConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+
+class Hedger:
+    """Запуск дублирующих запросов к эквивалентным deployments"""
+
+    def __init__(self, default: Optional[HedgingConfig] = None,
+                 groups: Optional[Dict[str, Dict[str, Any]]] = None,
+                 budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            default: Параметры по умолчанию
+            groups: Переопределения для групп моделей
+            budget: Бюджет дублирующих запросов (по умолчанию 5% запросов за 10 секунд)
+        """
+        self.default = default or HedgingConfig()
+        self.groups = groups or {}
+        self.budget = budget or RetryBudget(ratio=0.05, min_retries_per_second=0.0)
+
+        self._counters_lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "eligible": 0,
+            "hedged": 0,
+            "hedge_won": 0,
+            "budget_exhausted": 0,
+        }
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "Hedger":
+        """
+        Создать из секции hedging config.yml.
+
+        Args:
+            section: {"budget_ratio", "budget_window", "default": {...}, "groups": {...}}
+
+        Returns:
+            Hedger
+        """
+        section = section or {}
+        return cls(
+            default=HedgingConfig.from_dict(section.get("default")),
+            groups=section.get("groups") or {},
+            budget=RetryBudget(
+                ratio=float(section.get("budget_ratio", 0.05)),
+                min_retries_per_second=0.0,
+                window=float(section.get("budget_window", 10.0)),
+            ),
+        )
+
+    def get_config(self, group: str) -> HedgingConfig:
+        """Параметры группы: default <- groups[group]"""
+        return HedgingConfig.from_dict(self.groups.get(group), base=self.default)
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def get_delay(self, deployment: str, config: HedgingConfig) -> Optional[float]:
+        """
+        Через сколько секунд отправлять дублирующий запрос.
+
+        Args:
+            deployment: Deployment основного запроса
+            config: Параметры hedging группы
+
+        Returns:
+            Задержка или None, если статистики deployment недостаточно
+        """
+        from .model_groups import get_global_model_group_router
+
+        group_router = get_global_model_group_router()
+        if group_router is None:
+            return None
+        percentile = group_router.stats.get_latency_percentile(
+            deployment, config.percentile, min_samples=config.min_samples
+        )
+        return None if percentile is None else max(config.min_delay, percentile)
+
+    async def call(self, function: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any],
+                   prepare_deployment: Optional[Callable[..., Awaitable[Any]]] = None,
+                   release_deployment: Optional[Callable[[Dict[str, Any]], None]] = None) -> Any:
+        """
+        Выполнить вызов; при долгом ответе - продублировать в другой deployment группы.
+
+        Args:
+            function: Асинхронная функция вызова модели (принимает kwargs)
+            kwargs: Аргументы вызова
+            prepare_deployment: Перенастройка параметров на другой deployment
+                (квота и слот основного запроса за ним сохраняются)
+            release_deployment: Освобождение квоты и слота отменённого вызова
+
+        Returns:
+            Первый успешный ответ
+
+        Raises:
+            Exception: Ошибка основного запроса, если оба запроса неуспешны
+        """
+        from .model_groups import get_global_model_group_router
+
+        info = (kwargs.get("metadata") or {}).get(DEPLOYMENT_METADATA_KEY) or {}
+        group_router = get_global_model_group_router()
+        group = group_router.get_group(info["group"]) if info.get("group") and group_router else None
+        config = self.get_config(group.name) if group else None
+        if group is None or not config.enabled or kwargs.get("stream"):
+            return await function(**kwargs)
+
+        primary_model = kwargs.get("model") or ""
+        delay = self.get_delay(primary_model, config)
+        if delay is None:
+            return await function(**kwargs)
+
+        self._count("eligible")
+        self.budget.record_request()
+        primary = asyncio.ensure_future(function(**kwargs))
+        hedge: Optional[asyncio.Future] = None
+        hedge_kwargs: Dict[str, Any] = {}
+        hedge_request_id: Optional[str] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            prompt_tokens = (kwargs.get("metadata") or {}).get(PROMPT_TOKENS_KEY)
+            deployment = group_router.choose(group, exclude=[primary_model], prompt_tokens=prompt_tokens)
+            if deployment is None:
+                return await primary
+            if not self.budget.try_spend():
+                self._count("budget_exhausted")
+                return await primary
+
+            hedge_kwargs = {key: value for key, value in kwargs.items() if key not in PER_CALL_KWARGS}
+            hedge_kwargs["metadata"] = copy.copy(kwargs.get("metadata") or {})
+            hedge_kwargs["litellm_call_id"] = str(uuid.uuid4())
+            hedge_request_id = group_router.stats.start_request(deployment)
+            hedge_kwargs["metadata"][DEPLOYMENT_METADATA_KEY] = {
+                "deployment": deployment,
+                "group": group.name,
+                "request_id": hedge_request_id,
+            }
+            if "extra_headers" in hedge_kwargs:
+                hedge_kwargs["extra_headers"] = dict(hedge_kwargs["extra_headers"] or {})
+            hedge_kwargs["model"] = deployment
+            if prepare_deployment is not None:
+                try:
+                    await prepare_deployment(hedge_kwargs, primary_model, deployment, release_previous=False)
+                except Exception as exc:
+                    # Квота или лимит deployment не пропускают дублирующий запрос
+                    logger.info(f"Дублирующий запрос в {deployment} не отправлен: {exc}")
+                    group_router.stats.cancel_request(hedge_request_id)
+                    if release_deployment is not None:
+                        release_deployment(hedge_kwargs)
+                    return await primary
+
+            self._count("hedged")
+            logger.info(f"Запрос к {primary_model} не ответил за {delay:.2f}s, дублируем в {deployment}")
+            hedge = asyncio.ensure_future(function(**hedge_kwargs))
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_won")
+                        return task.result()
+            # Оба запроса неуспешны - возвращаем ошибку основного
+            return primary.result()
+        finally:
+            calls = ((primary, kwargs, info.get("request_id")), (hedge, hedge_kwargs, hedge_request_id))
+            for task, task_kwargs, request_id in calls:
+                if task is not None and not task.done():
+                    task.cancel()
+                    if request_id:
+                        group_router.stats.cancel_request(request_id)
+                    if release_deployment is not None:
+                        release_deployment(task_kwargs)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики hedging.
+
+        Returns:
+            Словарь: счётчики и состояние бюджета
+        """
+        with self._counters_lock:
+            return {**self.counters, "budget": self.budget.get_status()}
+
+
+# Глобальный экземпляр
+_global_hedger: Optional[Hedger] = None
+
+
+def get_global_hedger() -> Optional[Hedger]:
+    """
+    Получить глобальный Hedger.
+
+    Returns:
+        Глобальный экземпляр или None если hedging не настроен
+    """
+    return _global_hedger
+
+
+def init_global_hedger(section: Optional[Dict[str, Any]] = None) -> Hedger:
+    """
+    Инициализировать глобальный Hedger.
+
+    Args:
+        section: Секция hedging config.yml
+
+    Returns:
+        Инициализированный Hedger
+    """
+    global _global_hedger
+
+    _global_hedger = Hedger.from_config(section)
+
+    return _global_hedger
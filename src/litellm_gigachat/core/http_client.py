@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Общий HTTP клиент для служебных запросов (токены, каталоги моделей, проверки).
+
+Все исходящие запросы control-plane идут через одну сессию requests с пулом
+соединений на каждый хост и keep-alive, поэтому TCP+TLS рукопожатие выполняется
+один раз на соединение, а не на каждый запрос.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Union
+from urllib.parse import urlsplit
+
+import certifi
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+def get_default_verify() -> Union[bool, str]:
+    """
+    Получить настройку проверки TLS для исходящих запросов.
+
+    Порядок: GIGACHAT_SSL_VERIFY=false отключает проверку, затем GIGACHAT_CA_BUNDLE
+    и REQUESTS_CA_BUNDLE, иначе используется bundle certifi (в него setup_certificates
+    добавляет российский корневой сертификат).
+
+    Returns:
+        False или путь к файлу CA bundle
+    """
+    if os.environ.get("GIGACHAT_SSL_VERIFY", "true").lower() == "false":
+        return False
+    return (
+        os.environ.get("GIGACHAT_CA_BUNDLE")
+        or os.environ.get("REQUESTS_CA_BUNDLE")
+        or certifi.where()
+    )
+
+
+class HTTPClient:
+    """
+    Управляемый HTTP клиент с пулами соединений.
+
+    Пулы создаются на каждый хост (до pool_connections хостов),
+    в каждом пуле держится до pool_maxsize keep-alive соединений.
+    """
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        verify: Optional[Union[bool, str]] = None,
+    ):
+        """
+        Инициализация клиента.
+
+        Args:
+            pool_connections: Количество хостов с собственным пулом
+                (по умолчанию: GIGACHAT_HTTP_POOL_CONNECTIONS или 10)
+            pool_maxsize: Размер пула соединений на хост
+                (по умолчанию: GIGACHAT_HTTP_POOL_MAXSIZE или 10)
+            verify: Проверка TLS - False или путь к CA bundle (по умолчанию: get_default_verify())
+        """
+        self.pool_connections = pool_connections or int(os.environ.get("GIGACHAT_HTTP_POOL_CONNECTIONS", 10))
+        self.pool_maxsize = pool_maxsize or int(os.environ.get("GIGACHAT_HTTP_POOL_MAXSIZE", 10))
+        self.verify = get_default_verify() if verify is None else verify
+
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._requests_by_host: Dict[str, int] = {}
+
+    def _create_session(self) -> requests.Session:
+        """Создание сессии с адаптерами пулов соединений"""
+        session = requests.Session()
+        session.verify = self.verify
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        logger.debug(
+            f"Создана HTTP сессия: pool_connections={self.pool_connections}, pool_maxsize={self.pool_maxsize}"
+        )
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        """Общая сессия (создаётся при первом обращении)"""
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Выполнить HTTP запрос через пул соединений.
+
+        Args:
+            method: HTTP метод
+            url: URL запроса
+            **kwargs: Параметры requests (headers, data, json, timeout, verify...).
+                verify=True означает проверку с общей TLS настройкой клиента
+
+        Returns:
+            Ответ requests
+        """
+        host = urlsplit(url).netloc
+        # verify передаётся явно: иначе requests подставит REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE
+        # из окружения вместо общей TLS настройки клиента
+        if kwargs.get("verify") in (None, True):
+            kwargs["verify"] = self.verify
+        with self._lock:
+            self._requests_by_host[host] = self._requests_by_host.get(host, 0) + 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """GET запрос через пул соединений"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        """POST запрос через пул соединений"""
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """Закрыть все соединения пулов"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика клиента для отладки"""
+        with self._lock:
+            return {
+                "pool_connections": self.pool_connections,
+                "pool_maxsize": self.pool_maxsize,
+                "verify": self.verify,
+                "requests_by_host": dict(self._requests_by_host),
+            }
+
+
+# Глобальный экземпляр клиента
+_global_http_client: Optional[HTTPClient] = None
+_global_http_client_lock = threading.Lock()
+
+
+def get_global_http_client() -> HTTPClient:
+    """Получение глобального экземпляра HTTPClient"""
+    global _global_http_client
+    with _global_http_client_lock:
+        if _global_http_client is None:
+            _global_http_client = HTTPClient()
+        return _global_http_client
+
+
+def reset_global_http_client() -> None:
+    """
+    Закрыть и сбросить глобальный клиент.
+
+    Нужно после изменения TLS настроек (например, установки сертификатов),
+    чтобы новые соединения использовали актуальный CA bundle.
+    """
+    global _global_http_client
+    with _global_http_client_lock:
+        if _global_http_client is not None:
+            _global_http_client.close()
+        _global_http_client = None
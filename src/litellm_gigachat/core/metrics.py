@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Метрики litellm-gigachat в текстовом формате Prometheus.
+
+Значения собираются при каждом запросе /gigachat/metrics из глобальных
+компонентов (лимитеры параллельности, справедливая очередь, допуск по SLO, квоты RPM/TPM, повторы, hedging,
+дедлайны первого токена и запросов, отмены запросов, статистика deployments, состояние
+провайдеров); отдельного хранилища метрик нет.
+"""
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    from .deployment_stats import LatencyHistogram
+
+# Одно значение метрики: (метки, значение)
+Sample = Tuple[Dict[str, str], float]
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def format_metric(name: str, metric_type: str, description: str, samples: Iterable[Sample]) -> List[str]:
+    """
+    Строки одной метрики в формате Prometheus.
+
+    Args:
+        name: Имя метрики
+        metric_type: gauge или counter
+        description: Описание (HELP)
+        samples: Пары (метки, значение)
+
+    Returns:
+        Список строк
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+def format_histograms(name: str, description: str, histograms: Dict[str, "LatencyHistogram"]) -> List[str]:
+    """
+    Строки гистограмм deployments в формате Prometheus.
+
+    Args:
+        name: Имя метрики
+        description: Описание (HELP)
+        histograms: Имя deployment -> LatencyHistogram
+
+    Returns:
+        Список строк
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+    for deployment, histogram in sorted(histograms.items()):
+        label = _escape(deployment)
+        for bound, count in histogram.cumulative_buckets():
+            lines.append(f'{name}_bucket{{deployment="{label}",le="{_format_bound(bound)}"}} {count}')
+        lines.append(f'{name}_sum{{deployment="{label}"}} {histogram.sum}')
+        lines.append(f'{name}_count{{deployment="{label}"}} {histogram.count}')
+    return lines
+
+
+def collect_concurrency_metrics() -> List[str]:
+    """Метрики адаптивных лимитов параллельности"""
+    from .concurrency import get_global_concurrency_limiters
+
+    registry = get_global_concurrency_limiters()
+    if registry is None:
+        return []
+
+    metrics = registry.get_metrics()
+    lines: List[str] = []
+    for key, metric_type, description in (
+        ("limit", "gauge", "Текущий адаптивный лимит одновременных запросов"),
+        ("inflight", "gauge", "Запросы в работе"),
+        ("queued", "gauge", "Запросы в очереди ожидания"),
+        ("max_queue", "gauge", "Максимальная длина очереди"),
+        ("rejected", "counter", "Запросы, отклонённые из-за переполнения очереди"),
+        ("timeouts", "counter", "Запросы, не дождавшиеся слота"),
+        ("throttled", "counter", "Ответы 429/503 от провайдера"),
+        ("decreases", "counter", "Мультипликативные снижения лимита"),
+    ):
+        lines += format_metric(
+            f"gigachat_concurrency_{key}", metric_type, description,
+            (({"deployment": name}, values[key]) for name, values in metrics.items()),
+        )
+    return lines
+
+
+def collect_scheduler_metrics() -> List[str]:
+    """Метрики справедливой очереди по полосам приоритета"""
+    from .scheduler import get_global_fair_scheduler
+
+    scheduler = get_global_fair_scheduler()
+    if scheduler is None:
+        return []
+
+    metrics = scheduler.get_metrics()
+    lines: List[str] = []
+    for name, key, description in (
+        ("gigachat_scheduler_admitted_total", "admitted", "Запросы, получившие слот deployment"),
+        ("gigachat_scheduler_queued_total", "queued", "Запросы, ждавшие слот в очереди"),
+        ("gigachat_scheduler_shed_total", "shed", "Запросы, отклонённые очередью (переполнение или дедлайн)"),
+        ("gigachat_scheduler_wait_seconds_total", "wait_seconds", "Суммарное ожидание слота в очереди"),
+    ):
+        lines += format_metric(
+            name, "counter", description,
+            (({"lane": lane}, counters[key]) for lane, counters in metrics.items()),
+        )
+    return lines
+
+
+def collect_admission_metrics() -> List[str]:
+    """Метрики контроля допуска по SLO"""
+    from .admission import get_global_admission_controller
+
+    admission = get_global_admission_controller()
+    if admission is None:
+        return []
+
+    metrics = admission.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_admission_shed_total", "counter", "Запросы, отклонённые 503 из-за превышения SLO",
+        (({"deployment": name}, m["shed"]) for name, m in metrics.items()),
+    )
+    lines += format_metric(
+        "gigachat_admission_admitted_total", "counter", "Запросы, допущенные после проверки SLO",
+        (({"deployment": name}, m["admitted"]) for name, m in metrics.items()),
+    )
+    lines += format_metric(
+        "gigachat_admission_estimated_wait_seconds", "gauge", "Оценка ожидания слота deployment",
+        (({"deployment": name}, m["estimated_wait"]) for name, m in metrics.items()),
+    )
+    lines += format_metric(
+        "gigachat_admission_slo_seconds", "gauge", "Целевое время ответа deployment",
+        (({"deployment": name}, m["slo"]) for name, m in metrics.items()),
+    )
+    return lines
+
+
+def collect_rate_limit_metrics() -> List[str]:
+    """Метрики клиентских квот RPM/TPM"""
+    from .rate_limits import get_global_rate_limiters
+
+    registry = get_global_rate_limiters()
+    if registry is None:
+        return []
+
+    metrics = registry.get_metrics()
+    lines: List[str] = []
+    for key, metric_type, description in (
+        ("requests_per_minute", "gauge", "Действующая квота запросов в минуту"),
+        ("tokens_per_minute", "gauge", "Действующая квота токенов в минуту"),
+        ("requests_available", "gauge", "Доступные запросы в ведре"),
+        ("tokens_available", "gauge", "Доступные токены в ведре"),
+        ("blocked_for", "gauge", "Оставшаяся пауза по Retry-After в секундах"),
+        ("delayed", "counter", "Запросы, ожидавшие квоту"),
+        ("rejected", "counter", "Запросы, отклонённые из-за долгого ожидания квоты"),
+        ("throttled", "counter", "Ответы 429 от провайдера"),
+    ):
+        lines += format_metric(
+            f"gigachat_rate_limit_{key}", metric_type, description,
+            (({"limiter": name}, values[key]) for name, values in metrics.items() if values[key] is not None),
+        )
+    return lines
+
+
+def collect_retry_metrics() -> List[str]:
+    """Метрики повторов запросов"""
+    from .retry import get_global_retry_engine
+
+    engine = get_global_retry_engine()
+    if engine is None:
+        return []
+
+    metrics = engine.get_metrics()
+    lines: List[str] = []
+    for key, description in (
+        ("requests", "Запросы, прошедшие через RetryEngine"),
+        ("failovers", "Повторы на другом deployment группы"),
+        ("recovered", "Запросы, успешные после повтора"),
+        ("budget_exhausted", "Повторы, не выполненные из-за исчерпания бюджета"),
+        ("gave_up", "Запросы, для которых повторы закончились"),
+    ):
+        lines += format_metric(f"gigachat_retry_{key}_total", "counter", description, [({}, metrics[key])])
+    lines += format_metric(
+        "gigachat_retry_retries_total", "counter", "Выполненные повторы по причинам",
+        (({"reason": reason}, count) for reason, count in sorted(metrics["retries_by_reason"].items())),
+    )
+    lines += format_metric(
+        "gigachat_retry_budget_available", "gauge", "Доступные повторы в окне бюджета",
+        [({}, metrics["budget"]["available"])],
+    )
+    return lines
+
+
+def collect_hedging_metrics() -> List[str]:
+    """Метрики дублирующих запросов"""
+    from .hedging import get_global_hedger
+
+    hedger = get_global_hedger()
+    if hedger is None:
+        return []
+
+    metrics = hedger.get_metrics()
+    lines: List[str] = []
+    for key, description in (
+        ("eligible", "Запросы, для которых возможен дублирующий запрос"),
+        ("hedged", "Отправленные дублирующие запросы"),
+        ("hedge_won", "Дублирующие запросы, ответившие первыми"),
+        ("budget_exhausted", "Дублирующие запросы, не отправленные из-за исчерпания бюджета"),
+    ):
+        lines += format_metric(f"gigachat_hedging_{key}_total", "counter", description, [({}, metrics[key])])
+    return lines
+
+
+def collect_ttft_metrics() -> List[str]:
+    """Метрики дедлайнов первого токена streaming-запросов"""
+    from .ttft import get_global_ttft_watchdog
+
+    watchdog = get_global_ttft_watchdog()
+    if watchdog is None:
+        return []
+
+    metrics = watchdog.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_ttft_streams_total", "counter", "Streaming-запросы с дедлайном первого chunk",
+        [({}, metrics["streams"])],
+    )
+    lines += format_metric(
+        "gigachat_ttft_timeouts_total", "counter", "Streaming-запросы, перезапущенные по дедлайну первого chunk",
+        [({}, metrics["timeouts"])],
+    )
+    lines += format_metric(
+        "gigachat_ttft_deadline_seconds", "gauge", "Текущий дедлайн первого chunk",
+        (({"deployment": name}, deadline) for name, deadline in sorted(metrics["deadlines"].items())),
+    )
+    return lines
+
+
+def collect_timeout_metrics() -> List[str]:
+    """Метрики дедлайнов запросов"""
+    from .timeouts import get_global_timeout_settings
+
+    settings = get_global_timeout_settings()
+    if settings is None:
+        return []
+
+    metrics = settings.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_deadline_exceeded_total", "counter", "Запросы, прерванные по общему таймауту или дедлайну клиента",
+        [({}, metrics["deadline_exceeded"])],
+    )
+    lines += format_metric(
+        "gigachat_client_deadlines_total", "counter", "Запросы с дедлайном клиента в заголовке",
+        [({}, metrics["client_deadlines"])],
+    )
+    return lines
+
+
+def collect_cancellation_metrics() -> List[str]:
+    """Метрики запросов, отменённых при отключении клиента"""
+    from .cancellation import get_global_cancellation_stats
+
+    stats = get_global_cancellation_stats()
+    if stats is None:
+        return []
+
+    metrics = stats.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_cancelled_requests_total", "counter", "Запросы, отменённые при отключении клиента",
+        [({"stream": "true"}, metrics["cancelled_streaming"]), ({"stream": "false"}, metrics["cancelled_non_streaming"])],
+    )
+    lines += format_metric(
+        "gigachat_cancelled_tokens_saved_total", "counter",
+        "Оценка токенов ответа, не сгенерированных благодаря отмене",
+        (({"model": name}, value) for name, value in sorted(metrics["saved_tokens"].items())),
+    )
+    lines += format_metric(
+        "gigachat_cancelled_tokens_generated_total", "counter",
+        "Оценка токенов, сгенерированных до отмены",
+        [({}, metrics["generated_tokens"])],
+    )
+    return lines
+
+
+def collect_embeddings_metrics() -> List[str]:
+    """Метрики объединения запросов эмбеддингов и кэша векторов"""
+    from .embeddings import get_global_embedding_batcher
+
+    batcher = get_global_embedding_batcher()
+    if batcher is None:
+        return []
+
+    metrics = batcher.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_embeddings_requests_total", "counter", "Запросы эмбеддингов",
+        [({}, metrics["requests"])],
+    )
+    lines += format_metric(
+        "gigachat_embeddings_texts_total", "counter", "Тексты в запросах эмбеддингов",
+        [({"source": "cache"}, metrics["cached_texts"]),
+         ({"source": "upstream"}, metrics["upstream_texts"])],
+    )
+    lines += format_metric(
+        "gigachat_embeddings_upstream_requests_total", "counter", "Запросы эмбеддингов к модели (пакеты)",
+        [({}, metrics["upstream_requests"])],
+    )
+    lines += format_metric(
+        "gigachat_embeddings_upstream_errors_total", "counter", "Пакеты эмбеддингов, завершившиеся ошибкой",
+        [({}, metrics["upstream_errors"])],
+    )
+    cache = metrics["cache"]
+    if cache:
+        lines += format_metric(
+            "gigachat_embeddings_cache_entries", "gauge", "Векторов в кэше эмбеддингов", [({}, cache["entries"])],
+        )
+        lines += format_metric(
+            "gigachat_embeddings_cache_evictions_total", "counter", "Векторы, вытесненные из кэша",
+            [({}, cache["evictions"])],
+        )
+    return lines
+
+
+def collect_token_estimator_metrics() -> List[str]:
+    """Метрики локальной оценки токенов и её калибровки"""
+    from .token_estimator import get_global_token_estimator
+
+    estimator = get_global_token_estimator()
+    if estimator is None:
+        return []
+
+    metrics = estimator.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_token_estimator_texts_total", "counter", "Тексты, оценённые локально",
+        [({"source": "estimate"}, metrics["texts"] - metrics["cache_hits"]),
+         ({"source": "cache"}, metrics["cache_hits"])],
+    )
+    lines += format_metric(
+        "gigachat_token_estimator_calibrations_total", "counter", "Калибровки по /tokens/count",
+        [({"result": "ok"}, metrics["calibrations"]), ({"result": "error"}, metrics["calibration_errors"])],
+    )
+    if metrics["last_error"] is not None:
+        lines += format_metric(
+            "gigachat_token_estimator_relative_error", "gauge",
+            "Средняя относительная ошибка оценки на последней калибровке", [({}, metrics["last_error"])],
+        )
+    return lines
+
+
+def collect_context_window_metrics() -> List[str]:
+    """Метрики управления окном контекста"""
+    from .context_window import get_global_context_window_manager
+
+    manager = get_global_context_window_manager()
+    if manager is None:
+        return []
+
+    metrics = manager.get_metrics()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_context_window_requests_total", "counter", "Запросы, проверенные по окну контекста",
+        [({"result": result}, metrics[result]) for result in ("checked", "over_limit", "fitted", "rejected")],
+    )
+    lines += format_metric(
+        "gigachat_context_window_escalations_total", "counter", "Переключения на модель с большим окном",
+        [({}, metrics["escalated"])],
+    )
+    lines += format_metric(
+        "gigachat_context_window_messages_total", "counter", "Сообщения, изменённые для окна контекста",
+        [({"action": "truncated"}, metrics["truncated_messages"]),
+         ({"action": "dropped"}, metrics["dropped_messages"])],
+    )
+    return lines
+
+
+def collect_deployment_metrics() -> List[str]:
+    """Метрики задержек и ошибок deployments"""
+    from .deployment_stats import get_global_deployment_stats
+
+    snapshot = get_global_deployment_stats().snapshot()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_deployment_latency_ewma_seconds", "gauge", "EWMA задержки успешных запросов",
+        (({"deployment": name}, s["ewma_latency"]) for name, s in snapshot.items() if s["ewma_latency"] is not None),
+    )
+    lines += format_metric(
+        "gigachat_deployment_error_rate_ewma", "gauge", "EWMA доли ошибок",
+        (({"deployment": name}, s["ewma_error_rate"]) for name, s in snapshot.items()),
+    )
+    lines += format_metric(
+        "gigachat_deployment_requests_total", "counter", "Завершённые запросы",
+        (({"deployment": name}, s["requests"]) for name, s in snapshot.items()),
+    )
+
+    lines += format_histograms(
+        "gigachat_deployment_latency_seconds", "Задержка успешных запросов",
+        get_global_deployment_stats().get_latency_histograms(),
+    )
+    lines += format_histograms(
+        "gigachat_deployment_ttft_seconds", "Время до первого chunk streaming-ответов",
+        get_global_deployment_stats().get_ttft_histograms(),
+    )
+    return lines
+
+
+def collect_health_metrics() -> List[str]:
+    """Метрики состояния прокси-провайдеров"""
+    from .health import get_global_provider_health_manager
+
+    health_manager = get_global_provider_health_manager()
+    if health_manager is None:
+        return []
+
+    status = health_manager.get_status()
+    lines: List[str] = []
+    lines += format_metric(
+        "gigachat_provider_circuit_state", "gauge", "Состояние circuit breaker (0 closed, 1 half_open, 2 open)",
+        (({"provider": name}, CIRCUIT_STATES[s["state"]]) for name, s in status.items()),
+    )
+    lines += format_metric(
+        "gigachat_provider_rejected_total", "counter", "Запросы, отклонённые circuit breaker",
+        (({"provider": name}, s["rejected"]) for name, s in status.items()),
+    )
+    return lines
+
+
+def render_prometheus() -> str:
+    """
+    Все метрики в текстовом формате Prometheus.
+
+    Returns:
+        Текст для ответа /gigachat/metrics
+    """
+    lines = (
+        collect_concurrency_metrics() + collect_scheduler_metrics() + collect_admission_metrics()
+        + collect_rate_limit_metrics()
+        + collect_retry_metrics() + collect_hedging_metrics() + collect_ttft_metrics() + collect_timeout_metrics()
+        + collect_cancellation_metrics() + collect_embeddings_metrics() + collect_token_estimator_metrics()
+        + collect_context_window_metrics() + collect_deployment_metrics() + collect_health_metrics()
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Группы моделей: одно публичное имя для эквивалентных deployments.
+
+Одна и та же модель (например, GigaChat-2-Max) может быть доступна через
+официальный API (`gigachat-max`) и через прокси-провайдеров
+(`gigachat-2-max-p1`, `gigachat-2-max-p2`). Группа из секции `model_groups`
+config.yml объединяет их под одним именем, а запрос к группе направляется
+в deployment с наименьшей ожидаемой стоимостью:
+
+    стоимость = EWMA задержки * (1 + запросов в работе) / (1 - EWMA доли ошибок)
+
+Небольшая доля запросов направляется в случайный участник группы, чтобы
+оценки медленных или недавно падавших deployments обновлялись. Deployments
+провайдеров с открытым circuit breaker (см. health.py) не выбираются.
+"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config_loader import ConfigError, load_config
+from .deployment_stats import DeploymentStats, DeploymentStatsRegistry, get_global_deployment_stats
+
+logger = logging.getLogger(__name__)
+
+# Нижняя граница доли успешных запросов в формуле стоимости (ограничивает штраф x20)
+MIN_SUCCESS_RATE = 0.05
+
+# Время жизни кэша участников группы (каталоги провайдеров меняются редко)
+MEMBERS_CACHE_TTL = 5.0
+
+
+@dataclass
+class ModelGroupConfig:
+    """Конфигурация одной группы моделей"""
+    name: str
+    models: List[str] = field(default_factory=list)
+    model_id: Optional[str] = None
+    exploration: float = 0.05
+
+
+def get_model_id(litellm_model: str) -> str:
+    """Идентификатор модели без префикса провайдера LiteLLM (openai/GigaChat -> GigaChat)"""
+    return litellm_model.split("/", 1)[-1]
+
+
+def deployment_cost(stats: Optional[DeploymentStats], default_latency: float) -> float:
+    """
+    Ожидаемая стоимость запроса к deployment.
+
+    Args:
+        stats: Статистика deployment (None, если запросов ещё не было)
+        default_latency: Задержка для deployments без измерений
+
+    Returns:
+        Стоимость (чем меньше, тем лучше)
+    """
+    if stats is None:
+        return default_latency
+    latency = stats.ewma_latency if stats.ewma_latency is not None else default_latency
+    success_rate = max(1.0 - stats.ewma_error_rate, MIN_SUCCESS_RATE)
+    return latency * (1 + stats.inflight) / success_rate
+
+
+class ModelGroupRouter:
+    """Выбор deployment для запросов к группам моделей"""
+
+    def __init__(self, stats: Optional[DeploymentStatsRegistry] = None):
+        """
+        Args:
+            stats: Реестр статистики (по умолчанию - глобальный)
+        """
+        self.stats = stats or get_global_deployment_stats()
+        self.config_path: Optional[str] = None
+        self.groups: Dict[str, ModelGroupConfig] = {}
+        self._official_models: List[Dict[str, Any]] = []
+        self._loaded_config: Optional[Dict[str, Any]] = None
+        self._members_cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def load_from_config(self, config_path: str) -> bool:
+        """
+        Загрузка секции model_groups.
+
+        Args:
+            config_path: Путь к файлу конфигурации
+
+        Returns:
+            True если конфигурация загружена успешно
+        """
+        self.config_path = config_path
+        try:
+            self._apply_config(load_config(config_path))
+            return True
+        except (OSError, ConfigError) as exc:
+            logger.error(f"Ошибка загрузки групп моделей: {exc}")
+            return False
+
+    def _apply_config(self, config: Dict[str, Any]) -> None:
+        """Построить таблицу групп по разобранной конфигурации"""
+        groups = {}
+        for data in config.get("model_groups") or []:
+            group = ModelGroupConfig(
+                name=data["name"],
+                models=list(data.get("models") or []),
+                model_id=data.get("model_id"),
+                exploration=float(data.get("exploration", 0.05)),
+            )
+            groups[group.name] = group
+
+        with self._lock:
+            self.groups = groups
+            self._official_models = list(config.get("model_list") or [])
+            self._loaded_config = config
+            self._members_cache = {}
+
+        if groups:
+            logger.info(f"Загружено групп моделей: {len(groups)} ({', '.join(groups)})")
+
+    def _refresh(self) -> None:
+        """Перечитать группы, если файл конфигурации изменился (load_config кэширует результат)"""
+        if self.config_path is None:
+            return
+        try:
+            config = load_config(self.config_path)
+        except (OSError, ConfigError):
+            return  # продолжаем работать с прежними группами
+        if config is not self._loaded_config:
+            self._apply_config(config)
+
+    def get_group(self, name: str) -> Optional[ModelGroupConfig]:
+        """
+        Найти группу по имени.
+
+        Args:
+            name: Имя модели из запроса
+
+        Returns:
+            Конфигурация группы или None
+        """
+        self._refresh()
+        return self.groups.get(name)
+
+    def get_group_names(self) -> List[str]:
+        """Имена всех групп"""
+        self._refresh()
+        return list(self.groups)
+
+    def get_members(self, group: ModelGroupConfig) -> List[str]:
+        """
+        Deployments группы: явный список и все модели с тем же model_id
+        в model_list и каталогах прокси-провайдеров.
+
+        Args:
+            group: Конфигурация группы
+
+        Returns:
+            Имена deployments без повторов
+        """
+        cached = self._members_cache.get(group.name)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+
+        members = list(group.models)
+
+        if group.model_id:
+            model_id = group.model_id.lower()
+            for model in self._official_models:
+                litellm_model = (model.get("litellm_params") or {}).get("model", "")
+                if get_model_id(litellm_model).lower() == model_id:
+                    members.append(model["model_name"])
+
+            from .multi_model_sync import get_global_multi_model_sync_manager
+            multi_sync_manager = get_global_multi_model_sync_manager()
+            if multi_sync_manager:
+                for model in multi_sync_manager.get_all_models():
+                    if (model.get("original_id") or "").lower() == model_id:
+                        members.append(model["model_name"])
+
+        members = list(dict.fromkeys(members))
+        self._members_cache[group.name] = (now + MEMBERS_CACHE_TTL, members)
+        return members
+
+    def get_max_input_tokens(self, deployment: str) -> Optional[int]:
+        """
+        Окно контекста deployment (model_info.max_input_tokens в model_list).
+
+        Args:
+            deployment: Имя deployment
+
+        Returns:
+            Число токенов или None, если не задано
+        """
+        for model in self._official_models:
+            if model.get("model_name") == deployment:
+                value = (model.get("model_info") or {}).get("max_input_tokens")
+                return int(value) if value else None
+        return None
+
+    def choose(self, group: ModelGroupConfig, exclude: Iterable[str] = (),
+               prompt_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Выбрать deployment для запроса к группе.
+
+        Args:
+            group: Конфигурация группы
+            exclude: Deployments, которые не следует выбирать
+            prompt_tokens: Оценка токенов промпта; deployments с меньшим окном
+                контекста не выбираются, если в группе есть подходящие
+
+        Returns:
+            Имя deployment или None, если в группе нет доступных участников
+        """
+        excluded = set(exclude)
+        members = [
+            name for name in self.get_members(group)
+            if name not in excluded and self._is_available(name)
+        ]
+        if not members:
+            return None
+        if prompt_tokens:
+            limits = {name: self.get_max_input_tokens(name) for name in members}
+            fitting = [name for name in members if limits[name] is None or limits[name] >= prompt_tokens]
+            members = fitting or members
+        if len(members) == 1:
+            return members[0]
+
+        if group.exploration and random.random() < group.exploration:
+            return random.choice(members)
+
+        member_stats = {name: self.stats.get(name) for name in members}
+        measured = [s.ewma_latency for s in member_stats.values() if s and s.ewma_latency is not None]
+        # Deployments без измерений оцениваются оптимистично, чтобы они получили запросы
+        default_latency = min(measured) if measured else 0.0
+
+        costs = {name: deployment_cost(stats, default_latency) for name, stats in member_stats.items()}
+        best_cost = min(costs.values())
+        return random.choice([name for name, cost in costs.items() if cost == best_cost])
+
+    @staticmethod
+    def _is_available(deployment: str) -> bool:
+        """Не открыт ли circuit breaker прокси-провайдера deployment"""
+        from .health import get_global_provider_health_manager
+
+        health_manager = get_global_provider_health_manager()
+        if health_manager is None:
+            return True
+        provider = health_manager.provider_manager.get_provider_by_suffix(deployment)
+        return provider is None or health_manager.is_available(provider)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Статус групп: участники и их статистика.
+
+        Returns:
+            Словарь: имя группы -> участники со статистикой
+        """
+        self._refresh()
+        snapshot = self.stats.snapshot()
+        return {
+            name: {
+                "model_id": group.model_id,
+                "members": {member: snapshot.get(member) for member in self.get_members(group)},
+            }
+            for name, group in self.groups.items()
+        }
+
+
+# Глобальный экземпляр маршрутизатора групп
+_global_model_group_router: Optional[ModelGroupRouter] = None
+
+
+def get_global_model_group_router() -> Optional[ModelGroupRouter]:
+    """
+    Получить глобальный экземпляр ModelGroupRouter.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_model_group_router
+
+
+def init_global_model_group_router(config_path: str = "config.yml") -> ModelGroupRouter:
+    """
+    Инициализировать глобальный ModelGroupRouter из файла конфигурации.
+
+    Args:
+        config_path: Путь к файлу конфигурации
+
+    Returns:
+        Инициализированный экземпляр ModelGroupRouter
+    """
+    global _global_model_group_router
+
+    _global_model_group_router = ModelGroupRouter()
+    _global_model_group_router.load_from_config(config_path)
+
+    return _global_model_group_router
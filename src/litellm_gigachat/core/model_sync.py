@@ -9,14 +9,16 @@
 from __future__ import annotations
 
 import logging
+import random
 import threading
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 import requests
 
-logger = logging.getLogger(__name__)
+from .http_client import get_global_http_client
 
+logger = logging.getLogger(__name__)
 
 class ModelSyncManager:
     """
@@ -26,8 +28,17 @@ class ModelSyncManager:
     1. Запрашивает список моделей с API
     2. Сравнивает с текущим списком
     3. Добавляет новые модели / удаляет отсутствующие
+
+    Расписание адаптивное: интервал увеличивается, пока каталог не меняется,
+    и растёт экспоненциально при ошибках провайдера.
     """
 
+    # Множитель интервала после синхронизации без изменений каталога
+    STABLE_INTERVAL_GROWTH = 1.5
+
+    # Предельное число записей negative cache (несуществующих имён моделей)
+    NEGATIVE_CACHE_MAX_ENTRIES = 1024
+
     def __init__(
         self,
         api_base: str,
@@ -37,10 +48,17 @@ class ModelSyncManager:
         model_suffix: str = "-internal",
         timeout: int = 60,
         provider_name: str = "unknown",
+        on_miss_min_interval: float = 10.0,
+        negative_cache_ttl: float = 60.0,
+        register_deployments: bool = True,
+        sync_jitter: float = 0.1,
+        max_sync_interval: Optional[int] = None,
+        max_backoff_interval: Optional[int] = None,
+        ssl_verify: Union[bool, str] = True,
     ):
         """
         Инициализация менеджера синхронизации.
-ß
+
         Args:
             api_base: Базовый URL внутреннего GigaChat API
             auth_header_name: Название заголовка аутентификации
@@ -49,6 +67,15 @@ class ModelSyncManager:
             model_suffix: Суффикс для имен моделей (по умолчанию: "-internal")
             timeout: Таймаут для HTTP запросов в секундах
             provider_name: Имя провайдера для логирования (по умолчанию: "unknown")
+            on_miss_min_interval: Минимальный интервал между внеплановыми синхронизациями в секундах
+            negative_cache_ttl: Время жизни записи об отсутствующей модели в секундах
+            register_deployments: Регистрировать ли каждую модель в LiteLLM Router.
+                При wildcard-маршрутизации каталог используется только для /v1/models и валидации
+            sync_jitter: Доля случайного отклонения интервала (0.1 = ±10%)
+            max_sync_interval: Предельный интервал при стабильном каталоге (по умолчанию: 4 * sync_interval)
+            max_backoff_interval: Предельный интервал при ошибках (по умолчанию: 8 * sync_interval)
+            ssl_verify: Проверка TLS при запросе каталога - True (общая настройка клиента),
+                False или путь к CA bundle
         """
         self.api_base = api_base.rstrip("/")
         self.auth_header_name = auth_header_name
@@ -57,17 +84,48 @@ class ModelSyncManager:
         
         self.model_suffix = model_suffix
         self.timeout = timeout
+        self.ssl_verify = ssl_verify
         self.provider_name = provider_name
+        self.register_deployments = register_deployments
+
+        # Адаптивное расписание
+        self.sync_jitter = sync_jitter
+        self.max_sync_interval = max_sync_interval or sync_interval * 4
+        self.max_backoff_interval = max_backoff_interval or sync_interval * 8
 
         # Состояние
         self._running = False
         self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
         self._known_models: Dict[str, Dict[str, Any]] = {}
         self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Применение каталога к Router; после retire() каталоги не применяются
+        self._apply_lock = threading.Lock()
+        self._retired = False
+
+        # Состояние расписания
+        self._current_interval: float = sync_interval
+        self._failure_streak = 0
+        self._next_run_at: float = 0
+        self._last_sync_at: float = 0
+        self._last_success_at: float = 0
+        self._last_error: Optional[str] = None
+
+        # Внеплановая синхронизация при обращении к неизвестной модели
+        self.on_miss_min_interval = on_miss_min_interval
+        self.negative_cache_ttl = negative_cache_ttl
+        self._miss_lock = threading.Lock()
+        self._miss_sync_done: Optional[threading.Event] = None
+        self._last_miss_sync_at: float = 0
+        self._negative_cache: Dict[str, float] = {}
 
         # Callback для обновления LiteLLM Router
         self._on_models_updated: Optional[callable] = None
 
+        # Callback для публикации полученного каталога (режим нескольких worker)
+        self._on_catalog_fetched: Optional[callable] = None
+
     def set_update_callback(self, callback: callable) -> None:
         """
         Установить callback для обновления моделей в LiteLLM Router.
@@ -77,6 +135,15 @@ class ModelSyncManager:
         """
         self._on_models_updated = callback
 
+    def set_catalog_listener(self, callback: callable) -> None:
+        """
+        Установить callback, получающий каждый успешно загруженный каталог.
+
+        Args:
+            callback: Функция (provider_name, models) -> None
+        """
+        self._on_catalog_fetched = callback
+
     def fetch_models(self) -> Optional[List[Dict[str, Any]]]:
         """
         Запросить список моделей с внутреннего GigaChat API.
@@ -92,11 +159,11 @@ class ModelSyncManager:
             }
 
             logger.debug(f"Запрос списка моделей: {url}")
-            response = requests.get(
+            response = get_global_http_client().get(
                 url,
                 headers=headers,
                 timeout=self.timeout,
-                verify=False,  # SSL verification отключена как в основном коде
+                verify=self.ssl_verify,
             )
             response.raise_for_status()
 
@@ -133,43 +200,115 @@ class ModelSyncManager:
         normalized = f"{api_model_name.lower()}{self.model_suffix}"
         return normalized
 
+    def _catalog_key(self, model_name: str) -> str:
+        """
+        Привести запрошенное имя модели к ключу каталога (имя в lowercase с суффиксом).
+
+        Args:
+            model_name: Имя модели с суффиксом в произвольном регистре
+
+        Returns:
+            Нормализованное имя модели
+        """
+        if self.model_suffix and model_name.endswith(self.model_suffix):
+            return f"{model_name[:-len(self.model_suffix)].lower()}{self.model_suffix}"
+        return model_name.lower()
+
     def sync_models(self) -> bool:
         """
         Синхронизировать модели с API.
 
         Запрашивает список моделей, сравнивает с известными и обновляет конфигурацию.
+        Во время запроса и обновления Router продолжает отдаваться последний
+        успешно полученный каталог (stale-while-revalidate).
 
         Returns:
             True если синхронизация прошла успешно, False при ошибке
         """
-        models = self.fetch_models()
-        if models is None:
-            logger.warning("Не удалось получить список моделей, используется последний известный")
-            return False
+        with self._sync_lock:
+            models = self.fetch_models()
+            if models is None:
+                logger.warning("Не удалось получить список моделей, используется последний известный")
+                self._record_sync_result(success=False, error="fetch_models failed")
+                return False
+
+            if self._retired:
+                # Провайдер перенастроен, пока шёл запрос: каталог относится к прежнему URL
+                return False
+
+            if self._on_catalog_fetched:
+                try:
+                    self._on_catalog_fetched(self.provider_name, models)
+                except Exception as exc:
+                    logger.error(f"Ошибка публикации каталога провайдера {self.provider_name}: {exc}")
 
-        with self._lock:
-            # Создаём словарь новых моделей
-            new_models = {}
-            for model in models:
-                model_id = model.get("id", "")
-                if not model_id:
-                    continue
-
-                # Нормализуем имя модели
-                normalized_name = self._normalize_model_name(model_id)
-
-                # Создаём конфигурацию модели для LiteLLM
-                new_models[normalized_name] = {
-                    "model_name": normalized_name,
-                    "litellm_params": {
-                        "model": f"openai/{model_id}",
-                        "api_base": self.api_base,
-                        "api_key": "none",
-                        "timeout": self.timeout,
-                    },
-                    "original_id": model_id,
-                }
+            return self._apply_catalog(models)
+
+    def apply_catalog(self, models: List[Dict[str, Any]]) -> bool:
+        """
+        Применить каталог моделей, полученный другим процессом.
+
+        Используется worker-процессами, которые не запрашивают провайдера сами,
+        а получают каталог от лидера через общее состояние.
+
+        Args:
+            models: Список моделей в формате OpenAI (как в ответе /models)
 
+        Returns:
+            True если каталог применён успешно
+        """
+        with self._sync_lock:
+            return self._apply_catalog(models)
+
+    def _apply_catalog(self, models: List[Dict[str, Any]]) -> bool:
+        """
+        Применить каталог, если менеджер не выведен из работы (см. retire).
+
+        Args:
+            models: Список моделей в формате OpenAI
+
+        Returns:
+            True если обновление прошло успешно
+        """
+        with self._apply_lock:
+            if self._retired:
+                logger.debug(f"Каталог провайдера {self.provider_name} не применён: менеджер выведен из работы")
+                return False
+            return self._update_catalog(models)
+
+    def _update_catalog(self, models: List[Dict[str, Any]]) -> bool:
+        """
+        Обновить известные модели и Router по списку моделей провайдера.
+
+        Args:
+            models: Список моделей в формате OpenAI
+
+        Returns:
+            True если обновление прошло успешно
+        """
+        # Создаём словарь новых моделей
+        new_models = {}
+        for model in models:
+            model_id = model.get("id", "")
+            if not model_id:
+                continue
+
+            # Нормализуем имя модели
+            normalized_name = self._normalize_model_name(model_id)
+
+            # Создаём конфигурацию модели для LiteLLM
+            new_models[normalized_name] = {
+                "model_name": normalized_name,
+                "litellm_params": {
+                    "model": f"openai/{model_id}",
+                    "api_base": self.api_base,
+                    "api_key": "none",
+                    "timeout": self.timeout,
+                },
+                "original_id": model_id,
+            }
+
+        with self._lock:
             # Определяем изменения (для логирования)
             added = set(new_models.keys()) - set(self._known_models.keys())
             removed = set(self._known_models.keys()) - set(new_models.keys())
@@ -177,48 +316,247 @@ class ModelSyncManager:
             # Обновляем известные модели
             self._known_models = new_models
 
-            # ВСЕГДА вызываем callback для обновления LiteLLM Router
-            # Это гарантирует, что модели будут доступны даже если роутер
-            # не был инициализирован при первой синхронизации
-            if self._on_models_updated:
-                try:
-                    self._on_models_updated(list(new_models.values()), self.provider_name, self.model_suffix)
-                    logger.info("Модели успешно обновлены в LiteLLM Router")
-                except Exception as exc:
-                    logger.error(f"Ошибка обновления моделей в Router: {exc}")
-                    return False
+            # Модели, появившиеся у провайдера, больше не считаются отсутствующими
+            for model_name in added:
+                self._negative_cache.pop(model_name, None)
 
-            # Логируем изменения
-            if added or removed:
-                logger.info(f"Обнаружены изменения в списке моделей:")
-                if added:
-                    logger.info(f"Добавлено: {', '.join(added)}")
-                if removed:
-                    logger.info(f"Удалено: {', '.join(removed)}")
-            else:
-                logger.debug("Изменений в списке моделей не обнаружено, но модели обновлены в роутере")
+        # ВСЕГДА вызываем callback для обновления LiteLLM Router
+        # Это гарантирует, что модели будут доступны даже если роутер
+        # не был инициализирован при первой синхронизации
+        if self._on_models_updated and self.register_deployments:
+            try:
+                self._on_models_updated(list(new_models.values()), self.provider_name, self.model_suffix)
+                logger.info("Модели успешно обновлены в LiteLLM Router")
+            except Exception as exc:
+                logger.error(f"Ошибка обновления моделей в Router: {exc}")
+                self._record_sync_result(success=False, error=str(exc))
+                return False
+
+        # Логируем изменения
+        if added or removed:
+            logger.info(f"Обнаружены изменения в списке моделей:")
+            if added:
+                logger.info(f"Добавлено: {', '.join(added)}")
+            if removed:
+                logger.info(f"Удалено: {', '.join(removed)}")
+        else:
+            logger.debug("Изменений в списке моделей не обнаружено, но модели обновлены в роутере")
+
+        self._record_sync_result(success=True, changed=bool(added or removed))
 
         return True
 
-    def _sync_loop(self) -> None:
+    def _record_sync_result(self, success: bool, changed: bool = False, error: Optional[str] = None) -> None:
         """
-        Основной цикл синхронизации (выполняется в фоновом потоке).
+        Обновить состояние адаптивного расписания по результату синхронизации.
+
+        При ошибках интервал растёт экспоненциально (до max_backoff_interval),
+        при неизменном каталоге плавно увеличивается (до max_sync_interval),
+        при изменениях возвращается к базовому sync_interval.
+
+        Args:
+            success: Успешна ли синхронизация
+            changed: Изменился ли каталог моделей
+            error: Описание ошибки
+        """
+        with self._lock:
+            self._last_sync_at = time.time()
+            if not success:
+                self._failure_streak += 1
+                self._last_error = error
+                self._current_interval = min(
+                    self.sync_interval * (2 ** (self._failure_streak - 1)),
+                    self.max_backoff_interval,
+                )
+                return
+
+            self._failure_streak = 0
+            self._last_error = None
+            self._last_success_at = self._last_sync_at
+            if changed:
+                self._current_interval = self.sync_interval
+            else:
+                self._current_interval = min(
+                    self._current_interval * self.STABLE_INTERVAL_GROWTH,
+                    self.max_sync_interval,
+                )
+
+    def _next_delay(self) -> float:
+        """
+        Вычислить задержку до следующей синхронизации с учётом jitter.
+
+        Returns:
+            Задержка в секундах
+        """
+        with self._lock:
+            interval = self._current_interval
+        if self.sync_jitter > 0:
+            interval *= random.uniform(1 - self.sync_jitter, 1 + self.sync_jitter)
+        return max(interval, 0.0)
+
+    def get_schedule_info(self) -> Dict[str, Any]:
+        """
+        Получить состояние адаптивного расписания синхронизации.
+
+        Returns:
+            Словарь с временем следующего запуска, текущим интервалом и серией ошибок
+        """
+        with self._lock:
+            next_run_in = max(0.0, self._next_run_at - time.time()) if self._next_run_at else None
+            return {
+                "next_run_at": self._next_run_at or None,
+                "next_run_in_seconds": next_run_in,
+                "current_interval": self._current_interval,
+                "failure_streak": self._failure_streak,
+                "last_sync_at": self._last_sync_at or None,
+                "last_success_at": self._last_success_at or None,
+                "last_error": self._last_error,
+            }
+
+    def has_model(self, model_name: str) -> bool:
+        """
+        Проверить, известна ли модель по последней синхронизации.
+
+        Args:
+            model_name: Имя модели с суффиксом (регистр не учитывается)
+
+        Returns:
+            True если модель есть в каталоге провайдера
+        """
+        with self._lock:
+            return self._catalog_key(model_name) in self._known_models
+
+    def get_original_id(self, model_name: str) -> Optional[str]:
+        """
+        Получить исходный идентификатор модели у провайдера.
+
+        Args:
+            model_name: Имя модели с суффиксом (регистр не учитывается)
+
+        Returns:
+            Идентификатор модели в API провайдера или None если модель неизвестна
+        """
+        with self._lock:
+            model = self._known_models.get(self._catalog_key(model_name))
+            return model.get("original_id") if model else None
+
+    def _run_miss_sync(self, done: threading.Event) -> None:
+        """
+        Выполнить внеплановую синхронизацию и оповестить ожидающих.
+
+        Args:
+            done: Событие, которое выставляется по завершении синхронизации
         """
-        # Первая синхронизация сразу при старте
         try:
             self.sync_models()
         except Exception as exc:
-            logger.error(f"Ошибка при первой синхронизации: {exc}")
+            logger.error(f"Ошибка внеплановой синхронизации провайдера {self.provider_name}: {exc}")
+        finally:
+            with self._miss_lock:
+                self._miss_sync_done = None
+            done.set()
+
+    def sync_on_miss(self, model_name: str, wait_timeout: float = 5.0) -> bool:
+        """
+        Синхронизировать каталог по запросу неизвестной модели.
+
+        Одновременные промахи объединяются в одну синхронизацию (single-flight),
+        внеплановые синхронизации выполняются не чаще on_miss_min_interval,
+        а отсутствующие у провайдера модели кэшируются на negative_cache_ttl,
+        чтобы несуществующие имена не вызывали лавину запросов.
+
+        Args:
+            model_name: Имя модели с суффиксом (регистр не учитывается)
+            wait_timeout: Максимальное время ожидания результата в секундах
+
+        Returns:
+            True если модель доступна после синхронизации
+        """
+        model_name = self._catalog_key(model_name)
+        if self.has_model(model_name):
+            return True
+
+        with self._miss_lock:
+            now = time.time()
+            expires_at = self._negative_cache.get(model_name)
+            if expires_at is not None:
+                if expires_at > now:
+                    logger.debug(f"Модель {model_name} отсутствует у провайдера {self.provider_name} (negative cache)")
+                    return False
+                del self._negative_cache[model_name]
+
+            done = self._miss_sync_done
+            if done is None:
+                if now - self._last_miss_sync_at < self.on_miss_min_interval:
+                    # Каталог обновлялся совсем недавно и модели в нём не было
+                    self._remember_missing(model_name, now)
+                    logger.debug(f"Внеплановая синхронизация {self.provider_name} ограничена по частоте")
+                    return False
+
+                logger.info(f"Модель {model_name} не найдена, внеплановая синхронизация провайдера {self.provider_name}")
+                self._last_miss_sync_at = now
+                done = threading.Event()
+                self._miss_sync_done = done
+                threading.Thread(target=self._run_miss_sync, args=(done,), daemon=True).start()
+
+        if not done.wait(wait_timeout):
+            logger.warning(f"Внеплановая синхронизация {self.provider_name} не завершилась за {wait_timeout}s")
+            return self.has_model(model_name)
+
+        if self.has_model(model_name):
+            return True
+
+        with self._miss_lock:
+            self._remember_missing(model_name, time.time())
+        logger.info(f"Модель {model_name} отсутствует у провайдера {self.provider_name}")
+        return False
+
+    def _remember_missing(self, model_name: str, now: float) -> None:
+        """
+        Добавить модель в negative cache (вызывается под _miss_lock).
+
+        Записи добавляются с одинаковым TTL, поэтому порядок словаря совпадает
+        с порядком истечения: устаревшие записи удаляются с начала, а при
+        превышении NEGATIVE_CACHE_MAX_ENTRIES вытесняются самые старые.
+
+        Args:
+            model_name: Нормализованное имя модели (с суффиксом)
+            now: Текущее время
+        """
+        cache = self._negative_cache
+        cache.pop(model_name, None)
+        while cache and next(iter(cache.values())) <= now:
+            cache.pop(next(iter(cache)))
+        while len(cache) >= self.NEGATIVE_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        cache[model_name] = now + self.negative_cache_ttl
+
+    def _sync_loop(self) -> None:
+        """
+        Основной цикл синхронизации (выполняется в фоновом потоке).
+
+        Первая синхронизация выполняется сразу, чтобы модели были доступны
+        после старта; фазы провайдеров разносит jitter последующих интервалов.
+        """
+        delay = 0.0
 
-        # Периодическая синхронизация
         while self._running:
+            with self._lock:
+                self._next_run_at = time.time() + delay
+
+            if self._stop_event.wait(delay) or not self._running:
+                break
+
             try:
-                time.sleep(self.sync_interval)
-                if self._running:  # Проверяем снова после sleep
-                    self.sync_models()
+                self.sync_models()
             except Exception as exc:
                 logger.error(f"Ошибка в цикле синхронизации: {exc}")
+                self._record_sync_result(success=False, error=str(exc))
 
+            delay = self._next_delay()
+
+        with self._lock:
+            self._next_run_at = 0
         logger.info("Фоновый поток синхронизации моделей остановлен")
 
     def start(self) -> None:
@@ -230,6 +568,7 @@ class ModelSyncManager:
             return
 
         self._running = True
+        self._stop_event.clear()
         self._thread = threading.Thread(target=self._sync_loop, daemon=True)
         self._thread.start()
 
@@ -242,12 +581,24 @@ class ModelSyncManager:
 
         logger.info("Остановка синхронизации моделей...")
         self._running = False
+        self._stop_event.set()
 
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=5)
 
         logger.info("Синхронизация моделей остановлена")
 
+    def retire(self) -> None:
+        """
+        Окончательно вывести менеджер из работы (провайдер удалён или перенастроен).
+
+        Дожидается уже начатого применения каталога; синхронизации, завершившиеся
+        позже, не регистрируют в Router модели с прежними URL и auth.
+        """
+        with self._apply_lock:
+            self._retired = True
+        self.stop()
+
     def get_known_models(self) -> List[Dict[str, Any]]:
         """
         Получить список известных моделей.
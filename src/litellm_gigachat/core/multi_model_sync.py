@@ -26,7 +26,10 @@ class MultiModelSyncManager:
     def __init__(self):
         """Инициализация менеджера"""
         self._sync_managers: Dict[str, ModelSyncManager] = {}
+        self._provider_configs: Dict[str, ProxyProviderConfig] = {}
         self._on_models_updated: Optional[callable] = None
+        self._on_catalog_fetched: Optional[callable] = None
+        self._running = False
 
     def add_provider(self, provider: ProxyProviderConfig) -> bool:
         """
@@ -47,28 +50,108 @@ class MultiModelSyncManager:
             return False
 
         try:
-            # Создаём ModelSyncManager для этого провайдера
-            sync_manager = ModelSyncManager(
-                api_base=provider.url,
-                auth_header_name=provider.auth_header,
-                auth_header_value=provider.auth_value,
-                sync_interval=provider.sync_interval,
-                model_suffix=f"-{provider.suffix}",
-                timeout=provider.timeout,
-                provider_name=provider.name
-            )
-
-            # Устанавливаем callback для обновления моделей
-            if self._on_models_updated:
-                sync_manager.set_update_callback(self._on_models_updated)
-
-            self._sync_managers[provider.name] = sync_manager
+            self._sync_managers[provider.name] = self._create_sync_manager(provider)
+            self._provider_configs[provider.name] = provider
             return True
 
         except Exception as exc:
             logger.error(f"Ошибка добавления провайдера {provider.name}: {exc}")
             return False
 
+    def _create_sync_manager(self, provider: ProxyProviderConfig) -> ModelSyncManager:
+        """
+        Создать ModelSyncManager для провайдера с текущими callbacks.
+
+        Args:
+            provider: Конфигурация прокси-провайдера
+
+        Returns:
+            Новый (не запущенный) ModelSyncManager
+        """
+        sync_manager = ModelSyncManager(
+            api_base=provider.url,
+            auth_header_name=provider.auth_header,
+            auth_header_value=provider.auth_value,
+            sync_interval=provider.sync_interval,
+            model_suffix=f"-{provider.suffix}",
+            timeout=provider.timeout,
+            provider_name=provider.name,
+            on_miss_min_interval=provider.sync_on_miss_min_interval,
+            negative_cache_ttl=provider.negative_cache_ttl,
+            register_deployments=not provider.is_wildcard(),
+            sync_jitter=provider.sync_jitter,
+            max_sync_interval=provider.max_sync_interval,
+            max_backoff_interval=provider.max_backoff_interval,
+            ssl_verify=provider.ssl_verify
+        )
+
+        # Устанавливаем callbacks для обновления моделей и публикации каталога
+        if self._on_models_updated:
+            sync_manager.set_update_callback(self._on_models_updated)
+        if self._on_catalog_fetched:
+            sync_manager.set_catalog_listener(self._on_catalog_fetched)
+
+        return sync_manager
+
+    def reconcile_providers(self, providers: List[ProxyProviderConfig]) -> Dict[str, List[str]]:
+        """
+        Привести набор менеджеров синхронизации к новой конфигурации провайдеров.
+
+        Менеджеры неизменённых провайдеров сохраняются вместе с каталогом и расписанием.
+        Прежние менеджеры изменённых и удалённых провайдеров сначала выводятся из работы
+        (retire), затем для изменённых создаётся новый менеджер, в который переносится
+        последний каталог (Router переключается на новый URL без ожидания синхронизации).
+        Таблица менеджеров заменяется атомарно.
+
+        Args:
+            providers: Новый список провайдеров
+
+        Returns:
+            Словарь с именами запущенных (started) и остановленных (stopped) менеджеров
+        """
+        desired = {p.name: p for p in providers if p.sync_enabled}
+        current = self._sync_managers
+
+        kept = {
+            name: current[name] for name, provider in desired.items()
+            if name in current and self._provider_configs.get(name) == provider
+        }
+        stale = [m for name, m in current.items() if kept.get(name) is not m]
+
+        # Синхронизация прежнего менеджера, завершившаяся после этого момента,
+        # не перезапишет Router моделями с прежними URL и auth
+        for sync_manager in stale:
+            sync_manager.retire()
+
+        new_managers: Dict[str, ModelSyncManager] = {}
+        created: List[ModelSyncManager] = []
+        for name, provider in desired.items():
+            if name in kept:
+                new_managers[name] = kept[name]
+                continue
+
+            new_manager = self._create_sync_manager(provider)
+            previous = current.get(name)
+            if previous is not None:
+                catalog = [{"id": m["original_id"]} for m in previous.get_known_models() if m.get("original_id")]
+                if catalog:
+                    new_manager.apply_catalog(catalog)
+            new_managers[name] = new_manager
+            created.append(new_manager)
+
+        # Атомарная замена таблицы: читатели не видят промежуточного состояния
+        self._sync_managers = new_managers
+        self._provider_configs = dict(desired)
+
+        if self._running:
+            for sync_manager in created:
+                sync_manager.start()
+
+        return {
+            "started": [m.provider_name for m in created] if self._running else [],
+            "stopped": [m.provider_name for m in stale],
+        }
+
     def set_update_callback(self, callback: callable) -> None:
         """
         Установить callback для обновления моделей в LiteLLM Router.
@@ -82,8 +165,38 @@ class MultiModelSyncManager:
         for sync_manager in self._sync_managers.values():
             sync_manager.set_update_callback(callback)
 
+    def set_catalog_listener(self, callback: callable) -> None:
+        """
+        Установить callback, получающий каталоги всех провайдеров после загрузки.
+
+        Args:
+            callback: Функция (provider_name, models) -> None
+        """
+        self._on_catalog_fetched = callback
+        for sync_manager in self._sync_managers.values():
+            sync_manager.set_catalog_listener(callback)
+
+    def apply_catalog(self, provider_name: str, models: List[Dict[str, Any]]) -> bool:
+        """
+        Применить каталог провайдера, полученный от другого процесса.
+
+        Args:
+            provider_name: Имя провайдера
+            models: Список моделей в формате OpenAI
+
+        Returns:
+            True если каталог применён
+        """
+        sync_manager = self._sync_managers.get(provider_name)
+        if not sync_manager:
+            logger.debug(f"Провайдер {provider_name} не найден, каталог пропущен")
+            return False
+
+        return sync_manager.apply_catalog(models)
+
     def start_all(self) -> None:
         """Запустить синхронизацию для всех провайдеров"""
+        self._running = True
         if not self._sync_managers:
             logger.info("Нет провайдеров для синхронизации")
             return
@@ -99,6 +212,7 @@ class MultiModelSyncManager:
 
     def stop_all(self) -> None:
         """Остановить синхронизацию для всех провайдеров"""
+        self._running = False
         if not self._sync_managers:
             return
 
@@ -147,6 +261,77 @@ class MultiModelSyncManager:
 
         return sync_manager.get_known_models()
 
+    def get_manager_for_model(self, model_name: str) -> Optional[ModelSyncManager]:
+        """
+        Найти менеджер синхронизации по суффиксу модели.
+
+        Args:
+            model_name: Имя модели с суффиксом провайдера
+
+        Returns:
+            ModelSyncManager провайдера или None если суффикс не распознан
+        """
+        best_match: Optional[ModelSyncManager] = None
+        for sync_manager in self._sync_managers.values():
+            if model_name.endswith(sync_manager.model_suffix):
+                # При пересечении суффиксов выбираем самый длинный
+                if best_match is None or len(sync_manager.model_suffix) > len(best_match.model_suffix):
+                    best_match = sync_manager
+        return best_match
+
+    def resolve_model_id(self, model_name: str) -> Optional[str]:
+        """
+        Получить исходный идентификатор модели у провайдера по имени с суффиксом.
+
+        Args:
+            model_name: Имя модели с суффиксом провайдера
+
+        Returns:
+            Идентификатор модели в API провайдера или None если модель неизвестна
+        """
+        sync_manager = self.get_manager_for_model(model_name)
+        if not sync_manager:
+            return None
+        return sync_manager.get_original_id(model_name)
+
+    def get_wildcard_model_names(self) -> List[str]:
+        """
+        Получить имена моделей провайдеров с wildcard-маршрутизацией.
+
+        Такие модели не регистрируются в Router по отдельности,
+        поэтому для /v1/models они берутся из синхронизированного каталога.
+
+        Returns:
+            Список имён моделей с суффиксами
+        """
+        model_names = []
+        for sync_manager in self._sync_managers.values():
+            if sync_manager.register_deployments:
+                continue
+            model_names.extend(m.get("model_name") for m in sync_manager.get_known_models())
+        return model_names
+
+    def sync_on_miss(self, model_name: str, wait_timeout: float = 5.0) -> bool:
+        """
+        Внеплановая синхронизация провайдера, которому принадлежит неизвестная модель.
+
+        Args:
+            model_name: Имя модели с суффиксом провайдера
+            wait_timeout: Максимальное время ожидания результата в секундах
+
+        Returns:
+            True если модель доступна (сразу или после синхронизации)
+        """
+        sync_manager = self.get_manager_for_model(model_name)
+        if not sync_manager:
+            return False
+
+        try:
+            return sync_manager.sync_on_miss(model_name, wait_timeout=wait_timeout)
+        except Exception as exc:
+            logger.error(f"Ошибка внеплановой синхронизации для {model_name}: {exc}")
+            return False
+
     def sync_all(self) -> bool:
         """
         Выполнить синхронизацию для всех провайдеров.
@@ -174,23 +359,31 @@ class MultiModelSyncManager:
 
     def get_status(self) -> Dict[str, Any]:
         """
-        Получить статус синхронизации для всех провайдеров.
+        Получить статус синхронизации и доступности для всех провайдеров.
 
         Returns:
             Словарь со статусом каждого провайдера
         """
+        from .health import get_global_provider_health_manager
+
         status = {
             "total_providers": len(self._sync_managers),
             "providers": {}
         }
 
+        health_manager = get_global_provider_health_manager()
         for provider_name, sync_manager in self._sync_managers.items():
             models = sync_manager.get_known_models()
             status["providers"][provider_name] = {
                 "running": sync_manager._running,
+                "routing_mode": "deployments" if sync_manager.register_deployments else "wildcard",
                 "models_count": len(models),
-                "models": [m.get("model_name", "unknown") for m in models]
+                "models": [m.get("model_name", "unknown") for m in models],
+                **sync_manager.get_schedule_info()
             }
+            provider = self._provider_configs.get(provider_name)
+            if health_manager is not None and provider is not None:
+                status["providers"][provider_name]["health"] = health_manager.get_health(provider).get_status()
 
         return status
 
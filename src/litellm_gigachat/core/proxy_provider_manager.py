@@ -1,11 +1,14 @@
 import os
 import logging
-from typing import Optional, Dict, List
+import threading
+import time
+from typing import Any, Callable, Optional, Dict, List, Union
 from dataclasses import dataclass
 from pathlib import Path
-import yaml
 from dotenv import load_dotenv
 
+from .config_loader import ConfigError, load_config
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -23,6 +26,32 @@ class ProxyProviderConfig:
     sync_enabled: bool = False
     sync_interval: int = 300
     timeout: int = 60
+    connect_timeout: Optional[float] = None
+    first_byte_timeout: Optional[float] = None
+    idle_timeout: Optional[float] = None
+    total_timeout: Optional[float] = None
+    sync_on_miss: bool = True
+    sync_on_miss_timeout: float = 5.0
+    sync_on_miss_min_interval: float = 10.0
+    negative_cache_ttl: float = 60.0
+    routing_mode: str = "deployments"
+    sync_jitter: float = 0.1
+    max_sync_interval: Optional[int] = None
+    max_backoff_interval: Optional[int] = None
+    health_check_path: str = "/models"
+    health_check_interval: float = 30.0
+    circuit_failure_threshold: int = 5
+    circuit_error_rate: float = 0.5
+    circuit_open_seconds: float = 30.0
+    ssl_verify: Union[bool, str] = True
+    
+    def is_wildcard(self) -> bool:
+        """Проверка, маршрутизируются ли модели провайдера по шаблону суффикса"""
+        return self.routing_mode == "wildcard"
+    
+    def get_wildcard_pattern(self) -> str:
+        """Шаблон имени модели для wildcard-маршрутизации (например, *-p2)"""
+        return f"*-{self.suffix}"
     
     def get_auth_headers(self) -> Dict[str, str]:
         """Получение заголовков аутентификации"""
@@ -41,6 +70,15 @@ class MultiProxyProviderManager:
     def __init__(self):
         """Инициализация менеджера"""
         self.providers: List[ProxyProviderConfig] = []
+        self.config_path: Optional[str] = None
+        
+        # Горячая перезагрузка секции proxy_providers
+        self._reload_lock = threading.Lock()
+        self._reload_listeners: List[Callable] = []
+        self._watcher = None
+        self._last_reload_at: Optional[float] = None
+        self._last_reload_error: Optional[str] = None
+        self._last_reload_changes: Dict[str, List[str]] = {}
     
     def load_from_config(self, config_path: str) -> bool:
         """
@@ -52,14 +90,14 @@ class MultiProxyProviderManager:
         Returns:
             True если конфигурация загружена успешно
         """
+        self.config_path = config_path
         try:
             config_file = Path(config_path)
             if not config_file.exists():
                 logger.warning(f"Файл конфигурации {config_path} не найден")
                 return True
             
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = load_config(config_path)
             
             if not config:
                 logger.warning("Пустой файл конфигурации")
@@ -73,9 +111,10 @@ class MultiProxyProviderManager:
                 return True
             
             # Парсим каждого провайдера
+            default_ssl_verify = self._get_default_ssl_verify(config)
             for provider_data in providers_config:
                 try:
-                    provider = self._parse_provider_config(provider_data)
+                    provider = self._parse_provider_config(provider_data, default_ssl_verify)
                     if provider:
                         self.providers.append(provider)
                         logger.info(f"Загружен провайдер: {provider.name} (суффикс: -{provider.suffix})")
@@ -93,12 +132,165 @@ class MultiProxyProviderManager:
             logger.error(f"Ошибка загрузки конфигурации провайдеров: {exc}")
             return True
     
-    def _parse_provider_config(self, data: Dict) -> Optional[ProxyProviderConfig]:
+    def add_reload_listener(self, callback: Callable) -> None:
+        """
+        Добавить обработчик успешной перезагрузки провайдеров.
+        
+        Args:
+            callback: Функция (old_providers, new_providers, changes) -> None
+        """
+        self._reload_listeners.append(callback)
+    
+    def reload_from_config(self, config_path: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Перечитать секцию proxy_providers и атомарно заменить таблицу провайдеров.
+        
+        Неизменённые провайдеры сохраняют те же объекты ProxyProviderConfig,
+        поэтому их синхронизация, каталоги и соединения не затрагиваются.
+        При ошибке в конфигурации текущая таблица остаётся без изменений.
+        
+        Args:
+            config_path: Путь к файлу конфигурации (по умолчанию - загруженный ранее)
+            
+        Returns:
+            Словарь изменений: added, removed, changed, unchanged (имена провайдеров)
+            
+        Raises:
+            ConfigError: Если конфигурация некорректна
+        """
+        config_path = config_path or self.config_path or "config.yml"
+        
+        with self._reload_lock:
+            try:
+                try:
+                    config = load_config(config_path)
+                except OSError as exc:
+                    raise ConfigError(config_path, [str(exc)]) from exc
+                
+                new_providers: List[ProxyProviderConfig] = []
+                invalid = []
+                default_ssl_verify = self._get_default_ssl_verify(config)
+                for provider_data in config.get('proxy_providers') or []:
+                    provider = self._parse_provider_config(provider_data, default_ssl_verify)
+                    if provider is None:
+                        invalid.append(f"провайдер {provider_data.get('name', 'unknown')}: некорректная конфигурация")
+                    else:
+                        new_providers.append(provider)
+                if invalid:
+                    raise ConfigError(config_path, invalid)
+            except ConfigError as exc:
+                self._last_reload_error = str(exc)
+                logger.error(f"Перезагрузка провайдеров отменена: {exc}")
+                raise
+            
+            old_providers = self.providers
+            old_by_name = {p.name: p for p in old_providers}
+            changes: Dict[str, List[str]] = {"added": [], "removed": [], "changed": [], "unchanged": []}
+            
+            providers = []
+            for provider in new_providers:
+                old = old_by_name.get(provider.name)
+                if old is None:
+                    changes["added"].append(provider.name)
+                elif old == provider:
+                    # Сохраняем прежний объект - на него ссылаются текущие запросы
+                    provider = old
+                    changes["unchanged"].append(provider.name)
+                else:
+                    changes["changed"].append(provider.name)
+                providers.append(provider)
+            
+            new_names = {p.name for p in providers}
+            changes["removed"] = [p.name for p in old_providers if p.name not in new_names]
+            
+            self.config_path = config_path
+            self._last_reload_at = time.time()
+            self._last_reload_error = None
+            self._last_reload_changes = changes
+            
+            if not (changes["added"] or changes["removed"] or changes["changed"]):
+                logger.info("Конфигурация провайдеров не изменилась")
+                return changes
+            
+            # Атомарная замена: читатели видят либо старый, либо новый список целиком
+            self.providers = providers
+            logger.info(
+                f"Провайдеры перезагружены: добавлено {changes['added']}, "
+                f"изменено {changes['changed']}, удалено {changes['removed']}"
+            )
+            
+            for listener in self._reload_listeners:
+                try:
+                    listener(old_providers, providers, changes)
+                except Exception as exc:
+                    logger.error(f"Ошибка применения новой конфигурации провайдеров: {exc}", exc_info=True)
+            
+            return changes
+    
+    def _reload_on_change(self) -> None:
+        """Перезагрузка по событию изменения файла"""
+        try:
+            self.reload_from_config()
+        except ConfigError:
+            pass  # уже залогировано, работаем со старой конфигурацией
+    
+    def watch_config(self, poll_interval: float = 2.0, use_inotify: bool = True) -> None:
+        """
+        Запустить отслеживание изменений файла конфигурации.
+        
+        Args:
+            poll_interval: Период опроса файла, если inotify недоступен
+            use_inotify: Использовать inotify на Linux
+        """
+        from .config_watcher import ConfigWatcher
+        
+        if self._watcher is not None:
+            return
+        
+        self._watcher = ConfigWatcher(
+            self.config_path or "config.yml",
+            self._reload_on_change,
+            poll_interval=poll_interval,
+            use_inotify=use_inotify,
+        )
+        self._watcher.start()
+    
+    def stop_watching(self) -> None:
+        """Остановить отслеживание изменений файла конфигурации"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+    
+    def get_reload_info(self) -> Dict[str, Any]:
+        """
+        Информация о горячей перезагрузке.
+        
+        Returns:
+            Словарь с режимом отслеживания и результатом последней перезагрузки
+        """
+        return {
+            "config_path": self.config_path,
+            "watch_mode": self._watcher.mode if self._watcher else None,
+            "last_reload_at": self._last_reload_at,
+            "last_reload_error": self._last_reload_error,
+            "last_reload_changes": self._last_reload_changes,
+        }
+    
+    @staticmethod
+    def _get_default_ssl_verify(config: Dict) -> Union[bool, str]:
+        """
+        Проверка TLS для провайдеров без ssl_verify - как у вызовов моделей
+        (litellm_settings.ssl_verify, по умолчанию True)
+        """
+        return (config.get('litellm_settings') or {}).get('ssl_verify', True)
+    
+    def _parse_provider_config(self, data: Dict, default_ssl_verify: Union[bool, str] = True) -> Optional[ProxyProviderConfig]:
         """
         Парсинг конфигурации одного провайдера
         
         Args:
             data: Словарь с данными провайдера
+            default_ssl_verify: Проверка TLS, если ssl_verify провайдера не задан
             
         Returns:
             ProxyProviderConfig или None при ошибке
@@ -119,6 +311,11 @@ class MultiProxyProviderManager:
         if not auth_value:
             logger.warning(f"Провайдер {name}: auth_value пустой или переменная окружения не установлена")
         
+        routing_mode = data.get('routing_mode', 'deployments')
+        if routing_mode not in ('deployments', 'wildcard'):
+            logger.error(f"Провайдер {name}: неизвестный routing_mode '{routing_mode}' (допустимо: deployments, wildcard)")
+            return None
+        
         return ProxyProviderConfig(
             name=name,
             url=url.rstrip('/'),
@@ -127,7 +324,25 @@ class MultiProxyProviderManager:
             suffix=suffix,
             sync_enabled=data.get('sync_enabled', False),
             sync_interval=data.get('sync_interval', 300),
-            timeout=data.get('timeout', 60)
+            timeout=data.get('timeout', 60),
+            connect_timeout=data.get('connect_timeout'),
+            first_byte_timeout=data.get('first_byte_timeout'),
+            idle_timeout=data.get('idle_timeout'),
+            total_timeout=data.get('total_timeout'),
+            sync_on_miss=data.get('sync_on_miss', True),
+            sync_on_miss_timeout=data.get('sync_on_miss_timeout', 5.0),
+            sync_on_miss_min_interval=data.get('sync_on_miss_min_interval', 10.0),
+            negative_cache_ttl=data.get('negative_cache_ttl', 60.0),
+            routing_mode=routing_mode,
+            sync_jitter=data.get('sync_jitter', 0.1),
+            max_sync_interval=data.get('max_sync_interval'),
+            max_backoff_interval=data.get('max_backoff_interval'),
+            health_check_path='/' + str(data.get('health_check_path', '/models')).lstrip('/'),
+            health_check_interval=data.get('health_check_interval', 30.0),
+            circuit_failure_threshold=data.get('circuit_failure_threshold', 5),
+            circuit_error_rate=data.get('circuit_error_rate', 0.5),
+            circuit_open_seconds=data.get('circuit_open_seconds', 30.0),
+            ssl_verify=data.get('ssl_verify', default_ssl_verify)
         )
     
     def _expand_env_vars(self, value: str) -> str:
@@ -250,6 +465,7 @@ class MultiProxyProviderManager:
                     "url": p.url,
                     "suffix": p.suffix,
                     "sync_enabled": p.sync_enabled,
+                    "routing_mode": p.routing_mode,
                     "has_auth_value": bool(p.auth_value)
                 }
                 for p in self.providers
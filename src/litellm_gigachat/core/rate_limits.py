@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+Клиентское ограничение частоты запросов (RPM) и токенов (TPM).
+
+GigaChat и прокси-провайдеры ограничивают число запросов и токенов в минуту
+для учётных данных; превышение обнаруживается только по ответу 429. Здесь
+квоты соблюдаются заранее: для каждой пары (учётные данные, модель) ведутся
+два token bucket - запросов и оценочных токенов:
+    - ведро пополняется со скоростью quota * safety_margin / 60 в секунду,
+      его ёмкость - burst_seconds такой скорости, поэтому всплеск запросов
+      растягивается во времени, а не упирается в квоту;
+    - запрос резервирует место заранее (уровень ведра может уйти в минус),
+      так что следующие запросы ждут в порядке поступления; если ожидание
+      больше max_wait, запрос отклоняется сразу;
+    - после ответа оценка токенов заменяется фактическим usage.
+
+Квоты калибруются по заголовкам ответа (x-ratelimit-limit/remaining/reset
+для requests и tokens) и по Retry-After при 429. Состояние можно хранить в
+SharedStateStore, чтобы несколько worker-процессов делили одну квоту.
+"""
+
+import asyncio
+import email.utils
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = "requests"
+TOKENS = "tokens"
+BUCKETS = (REQUESTS, TOKENS)
+
+# Оценка числа токенов ответа, если max_tokens не указан
+DEFAULT_COMPLETION_ESTIMATE = 512
+
+# Пауза после 429 без Retry-After
+DEFAULT_RETRY_AFTER = 1.0
+
+# Учётные данные официального GigaChat API (GIGACHAT_AUTH_KEY)
+GIGACHAT_CREDENTIAL = "gigachat"
+
+# Префикс, с которым LiteLLM передаёт исходные заголовки провайдера
+PROVIDER_HEADER_PREFIX = "llm_provider-"
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceeded(Exception):
+    """Запрос отклонён: ожидание квоты дольше max_wait"""
+
+    def __init__(self, key: str, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"Квота {key} исчерпана, повторите через {retry_after:.1f}s")
+
+
+@dataclass
+class RateLimitConfig:
+    """Параметры ограничения для пары (учётные данные, модель)"""
+    enabled: bool = True
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    burst_seconds: float = 5.0
+    safety_margin: float = 0.9
+    max_wait: float = 30.0
+    calibrate: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["RateLimitConfig"] = None) -> "RateLimitConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            RateLimitConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+    def quota(self, bucket: str) -> Optional[float]:
+        """Настроенная квота ведра в минуту (None - без ограничения)"""
+        return self.requests_per_minute if bucket == REQUESTS else self.tokens_per_minute
+
+
+def parse_duration(value: Any, now: Optional[float] = None) -> Optional[float]:
+    """
+    Разобрать длительность из заголовка ответа.
+
+    Поддерживаются число секунд ("1.5"), длительности вида "6m0s" / "20ms",
+    время UNIX (число больше 10^9) и HTTP-дата (Retry-After).
+
+    Args:
+        value: Значение заголовка
+        now: Текущее время (time.time())
+
+    Returns:
+        Длительность в секундах или None, если значение не распознано
+    """
+    if value is None:
+        return None
+    now = time.time() if now is None else now
+    text = str(value).strip()
+
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is not None:
+        return max(0.0, number - now) if number > 1e9 else max(0.0, number)
+
+    parts = DURATION_PATTERN.findall(text)
+    if parts and "".join(amount + unit for amount, unit in parts) == text:
+        return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+    try:
+        parsed = email.utils.parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - now) if parsed else None
+
+
+def normalize_headers(headers: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Заголовки в нижнем регистре без префикса llm_provider- (LiteLLM)"""
+    normalized: Dict[str, Any] = {}
+    for name, value in (headers or {}).items():
+        name = str(name).lower()
+        if name.startswith(PROVIDER_HEADER_PREFIX):
+            name = name[len(PROVIDER_HEADER_PREFIX):]
+        normalized.setdefault(name, value)
+    return normalized
+
+
+def parse_rate_limit_headers(headers: Optional[Mapping[str, Any]], now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Извлечь сведения о квотах из заголовков ответа.
+
+    Args:
+        headers: Заголовки ответа
+        now: Текущее время (time.time())
+
+    Returns:
+        {"requests": {"limit", "remaining", "reset"}, "tokens": {...}, "retry_after"}
+        (отсутствующие значения не включаются)
+    """
+    headers = normalize_headers(headers)
+    result: Dict[str, Any] = {}
+
+    for bucket in BUCKETS:
+        info: Dict[str, float] = {}
+        for field in ("limit", "remaining"):
+            value = headers.get(f"x-ratelimit-{field}-{bucket}")
+            if value is None and bucket == REQUESTS:
+                value = headers.get(f"x-ratelimit-{field}")
+            try:
+                if value is not None:
+                    info[field] = float(value)
+            except (TypeError, ValueError):
+                pass
+        reset = headers.get(f"x-ratelimit-reset-{bucket}")
+        if reset is None and bucket == REQUESTS:
+            reset = headers.get("x-ratelimit-reset")
+        reset_seconds = parse_duration(reset, now)
+        if reset_seconds is not None:
+            info["reset"] = reset_seconds
+        if info:
+            result[bucket] = info
+
+    retry_after = parse_duration(headers.get("retry-after"), now)
+    if retry_after is None and headers.get("retry-after-ms") is not None:
+        retry_after_ms = parse_duration(headers["retry-after-ms"], now)
+        retry_after = retry_after_ms / 1000 if retry_after_ms is not None else None
+    if retry_after is not None:
+        result["retry_after"] = retry_after
+    return result
+
+
+def get_exception_headers(exception: Optional[BaseException]) -> Optional[Mapping[str, Any]]:
+    """Заголовки ответа провайдера из исключения LiteLLM"""
+    if exception is None:
+        return None
+    headers = getattr(exception, "litellm_response_headers", None) or getattr(exception, "headers", None)
+    if not headers:
+        headers = getattr(getattr(exception, "response", None), "headers", None)
+    return headers
+
+
+def get_credential(model: str, api_base: str = "") -> str:
+    """
+    Идентификатор учётных данных, которыми будет выполнен запрос к модели.
+
+    Args:
+        model: Имя модели
+        api_base: URL API из запроса (если указан)
+
+    Returns:
+        Имя прокси-провайдера, "gigachat" для официального API или "default"
+    """
+    from .proxy_provider_manager import get_global_multi_proxy_provider_manager
+
+    provider = get_global_multi_proxy_provider_manager().get_provider_by_suffix(model)
+    if provider is not None:
+        return provider.name
+    if 'gigachat' in model.lower() or 'gigachat.devices.sberbank.ru' in (api_base or ''):
+        return GIGACHAT_CREDENTIAL
+    return "default"
+
+
+def estimate_request_tokens(data: Dict[str, Any]) -> int:
+    """
+    Оценка числа токенов запроса до отправки (локальная оценка TokenEstimator).
+
+    Args:
+        data: Тело запроса (messages/input, max_tokens)
+
+    Returns:
+        Оценка: токены запроса + ожидаемые токены ответа
+    """
+    from .token_estimator import estimate_prompt_tokens
+
+    max_tokens = data.get("max_tokens") or data.get("max_completion_tokens")
+    completion = min(int(max_tokens), DEFAULT_COMPLETION_ESTIMATE) if max_tokens else DEFAULT_COMPLETION_ESTIMATE
+    if data.get("input") is not None and not data.get("messages"):
+        completion = 0  # embeddings
+    return estimate_prompt_tokens(data) + completion
+
+
+class RateLimiter:
+    """Ведра запросов и токенов одной пары (учётные данные, модель)"""
+
+    def __init__(self, key: str, config: Optional[RateLimitConfig] = None, store=None):
+        """
+        Args:
+            key: Имя лимитера ("<учётные данные>/<модель>")
+            config: Параметры ограничения
+            store: SharedStateStore для общего состояния worker-процессов
+        """
+        self.key = key
+        self.config = config or RateLimitConfig()
+        self._store = store
+        self._store_key = "ratelimit-" + re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+        self._state = self._new_state()
+        self._lock = threading.Lock()
+
+        # Счётчики для метрик (в пределах процесса)
+        self.delayed = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    @staticmethod
+    def _new_state() -> Dict[str, Any]:
+        buckets = {bucket: {"level": None, "updated_at": 0.0, "calibrated": None} for bucket in BUCKETS}
+        return {**buckets, "blocked_until": 0.0}
+
+    def attach_shared_store(self, store) -> None:
+        """Хранить состояние в общем хранилище (SharedStateStore)"""
+        self._store = store
+
+    def _update_state(self, fn):
+        """Выполнить fn(state) над актуальным состоянием (общим или локальным)"""
+        if self._store is not None:
+            def updater(value):
+                state = value if isinstance(value, dict) and REQUESTS in value else self._new_state()
+                return state, fn(state)
+            try:
+                return self._store.update(self._store_key, updater)
+            except OSError as exc:
+                logger.warning(f"Общее состояние квоты {self.key} недоступно, используется локальное: {exc}")
+        with self._lock:
+            return fn(self._state)
+
+    def get_quota(self, state: Dict[str, Any], bucket: str) -> Optional[float]:
+        """Действующая квота ведра в минуту: меньшая из настроенной и полученной от провайдера"""
+        quotas = [q for q in (self.config.quota(bucket), state[bucket]["calibrated"]) if q]
+        return min(quotas) if quotas else None
+
+    def _refill(self, state: Dict[str, Any], bucket: str, now: float) -> Optional[Tuple[float, float]]:
+        """Пополнить ведро; возвращает (скорость в секунду, ёмкость) или None без квоты"""
+        quota = self.get_quota(state, bucket)
+        if quota is None:
+            return None
+        rate = quota * self.config.safety_margin / 60.0
+        capacity = max(1.0, rate * self.config.burst_seconds)
+        entry = state[bucket]
+        if entry["level"] is None:
+            entry["level"] = capacity
+        else:
+            entry["level"] = min(capacity, entry["level"] + max(0.0, now - entry["updated_at"]) * rate)
+        entry["updated_at"] = now
+        return rate, capacity
+
+    def _reserve(self, state: Dict[str, Any], amounts: Dict[str, float], now: float) -> Tuple[float, bool]:
+        """Зарезервировать квоту; возвращает (ожидание, принят ли запрос)"""
+        delay = max(0.0, state["blocked_until"] - now)
+        refilled = {}
+        for bucket in BUCKETS:
+            limits = self._refill(state, bucket, now)
+            if limits is None:
+                continue
+            rate, capacity = limits
+            refilled[bucket] = limits
+            # Запрос больше ёмкости ведра пропускается, когда ведро полное
+            needed = min(amounts[bucket], capacity)
+            delay = max(delay, (needed - state[bucket]["level"]) / rate)
+
+        if delay > self.config.max_wait:
+            return delay, False
+        for bucket in refilled:
+            state[bucket]["level"] -= amounts[bucket]
+        return delay, True
+
+    async def acquire(self, tokens: float = 0) -> float:
+        """
+        Дождаться квоты для запроса.
+
+        Args:
+            tokens: Оценка токенов запроса
+
+        Returns:
+            Время ожидания в секундах
+
+        Raises:
+            RateLimitExceeded: Ожидание дольше max_wait
+        """
+        amounts = {REQUESTS: 1.0, TOKENS: float(tokens)}
+        delay, accepted = self._update_state(lambda state: self._reserve(state, amounts, time.time()))
+        if not accepted:
+            self.rejected += 1
+            raise RateLimitExceeded(self.key, delay)
+        if delay > 0:
+            self.delayed += 1
+            logger.debug(f"Запрос к {self.key} ожидает квоту {delay:.2f}s")
+            await asyncio.sleep(delay)
+        return delay
+
+    def settle(self, estimated_tokens: float, actual_tokens: Optional[float]) -> None:
+        """
+        Заменить оценку токенов фактическим значением.
+
+        Args:
+            estimated_tokens: Зарезервированная оценка
+            actual_tokens: Фактические токены (0 - запрос не выполнен)
+        """
+        if actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+
+        def apply(state):
+            entry = state[TOKENS]
+            if entry["level"] is not None:
+                entry["level"] += estimated_tokens - actual_tokens
+
+        self._update_state(apply)
+
+    def observe_headers(self, headers: Optional[Mapping[str, Any]], status_code: Optional[int] = None) -> None:
+        """
+        Калибровка по заголовкам ответа.
+
+        limit задаёт квоту в минуту, remaining ограничивает уровень ведра,
+        remaining=0 или Retry-After приостанавливают запросы до сброса.
+
+        Args:
+            headers: Заголовки ответа
+            status_code: HTTP статус (429 без Retry-After - пауза DEFAULT_RETRY_AFTER)
+        """
+        info = parse_rate_limit_headers(headers)
+        if status_code == 429:
+            self.throttled += 1
+            info.setdefault("retry_after", DEFAULT_RETRY_AFTER)
+        if not info:
+            return
+
+        def apply(state):
+            now = time.time()
+            for bucket in BUCKETS:
+                bucket_info = info.get(bucket)
+                if not bucket_info:
+                    continue
+                if self.config.calibrate and bucket_info.get("limit"):
+                    previous = state[bucket]["calibrated"]
+                    state[bucket]["calibrated"] = bucket_info["limit"]
+                    if previous != bucket_info["limit"]:
+                        logger.info(f"Квота {bucket} для {self.key} по заголовкам: {bucket_info['limit']:g}/мин")
+                limits = self._refill(state, bucket, now)
+                remaining = bucket_info.get("remaining")
+                if limits is not None and remaining is not None:
+                    state[bucket]["level"] = min(state[bucket]["level"], remaining)
+                if remaining is not None and remaining <= 0 and "reset" in bucket_info:
+                    state["blocked_until"] = max(state["blocked_until"], now + bucket_info["reset"])
+            if "retry_after" in info:
+                state["blocked_until"] = max(state["blocked_until"], now + info["retry_after"])
+
+        self._update_state(apply)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Метрики лимитера.
+
+        Returns:
+            Словарь: действующие квоты, уровни ведер, пауза и счётчики
+        """
+        def collect(state):
+            now = time.time()
+            metrics: Dict[str, Any] = {}
+            for bucket in BUCKETS:
+                self._refill(state, bucket, now)
+                level = state[bucket]["level"]
+                metrics[f"{bucket}_per_minute"] = self.get_quota(state, bucket)
+                metrics[f"{bucket}_available"] = round(level, 2) if level is not None else None
+            metrics["blocked_for"] = round(max(0.0, state["blocked_until"] - now), 3)
+            return metrics
+
+        metrics = self._update_state(collect)
+        metrics.update({"delayed": self.delayed, "rejected": self.rejected, "throttled": self.throttled})
+        return metrics
+
+
+class RateLimiterRegistry:
+    """Лимитеры по парам (учётные данные, модель) с общими настройками и переопределениями"""
+
+    def __init__(self, default: Optional[RateLimitConfig] = None,
+                 credentials: Optional[Dict[str, Dict[str, Any]]] = None,
+                 models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 shared: bool = False):
+        """
+        Args:
+            default: Параметры по умолчанию
+            credentials: Переопределения для учётных данных
+            models: Переопределения для моделей (применяются последними)
+            shared: Делить квоты между worker-процессами через общее хранилище
+        """
+        self.default = default or RateLimitConfig()
+        self.credentials = credentials or {}
+        self.models = models or {}
+        self.shared = shared
+        self._store = None
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "RateLimiterRegistry":
+        """
+        Создать реестр из секции rate_limits config.yml.
+
+        Args:
+            section: {"shared": bool, "default": {...}, "credentials": {...}, "models": {...}}
+
+        Returns:
+            RateLimiterRegistry
+        """
+        section = section or {}
+        return cls(
+            default=RateLimitConfig.from_dict(section.get("default")),
+            credentials=section.get("credentials") or {},
+            models=section.get("models") or {},
+            shared=bool(section.get("shared", False)),
+        )
+
+    def attach_shared_store(self, store) -> None:
+        """
+        Подключить SharedStateStore (режим нескольких worker), если включено shared.
+
+        Args:
+            store: Экземпляр SharedStateStore
+        """
+        if not self.shared:
+            return
+        with self._lock:
+            self._store = store
+            for limiter in self._limiters.values():
+                limiter.attach_shared_store(store)
+
+    def get_config(self, credential: str, model: str) -> RateLimitConfig:
+        """Параметры пары: default <- credentials[credential] <- models[model]"""
+        config = RateLimitConfig.from_dict(self.credentials.get(credential), base=self.default)
+        return RateLimitConfig.from_dict(self.models.get(model), base=config)
+
+    def get(self, credential: str, model: str) -> Optional[RateLimiter]:
+        """
+        Получить лимитер пары (создаётся при первом обращении).
+
+        Args:
+            credential: Идентификатор учётных данных
+            model: Имя модели
+
+        Returns:
+            RateLimiter или None, если ограничение отключено
+        """
+        key = f"{credential}/{model}"
+        limiter = self._limiters.get(key)
+        if limiter is not None:
+            return limiter
+
+        config = self.get_config(credential, model)
+        if not config.enabled:
+            return None
+
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = RateLimiter(key, config, self._store)
+            return limiter
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Метрики всех лимитеров.
+
+        Returns:
+            Словарь: "<учётные данные>/<модель>" -> метрики
+        """
+        return {key: limiter.get_metrics() for key, limiter in list(self._limiters.items())}
+
+
+# Глобальный реестр лимитеров
+_global_rate_limiters: Optional[RateLimiterRegistry] = None
+
+
+def get_global_rate_limiters() -> Optional[RateLimiterRegistry]:
+    """
+    Получить глобальный реестр лимитеров квот.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_rate_limiters
+
+
+def init_global_rate_limiters(section: Optional[Dict[str, Any]] = None) -> RateLimiterRegistry:
+    """
+    Инициализировать глобальный реестр лимитеров квот.
+
+    Args:
+        section: Секция rate_limits config.yml
+
+    Returns:
+        Инициализированный RateLimiterRegistry
+    """
+    global _global_rate_limiters
+
+    _global_rate_limiters = RateLimiterRegistry.from_config(section)
+
+    return _global_rate_limiters
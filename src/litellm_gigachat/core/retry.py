@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Повторные попытки вызовов моделей с политиками по моделям и провайдерам.
+
+RetryEngine заменяет повторы LiteLLM Router (async_function_with_retries):
+    - повторяются только временные ошибки: статусы из retry_on (по
+      умолчанию 408, 429, 5xx) и ошибки соединения; 4xx сразу возвращаются
+      клиенту;
+    - пауза - экспоненциальная с полным jitter (равномерно от 0 до
+      base_delay * 2^попытка, не больше max_delay), но не меньше Retry-After
+      ответа; Retry-After больше max_retry_after означает отказ без повтора;
+    - при повторе запрос к группе моделей переключается на другой deployment
+      группы (Retry-After прежнего deployment тогда не ждём);
+    - общий бюджет повторов: повторы за окно не превышают ratio от числа
+      запросов (плюс небольшой минимум), чтобы при сбое провайдера повторы
+      не умножали нагрузку;
+    - streaming-запрос, не получивший первый chunk до дедлайна (ttft),
+      перезапускается сразу: клиенту ещё ничего не отправлено.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .rate_limits import get_credential, get_exception_headers, parse_rate_limit_headers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# Классы ошибок соединения (httpx, openai, LiteLLM) без HTTP статуса
+CONNECTION_ERROR_NAMES = frozenset({
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "Timeout",
+})
+
+# Ключ metadata, в котором ModelGroupCallback хранит выбранный deployment
+DEPLOYMENT_METADATA_KEY = "gigachat_deployment"
+
+
+@dataclass
+class RetryPolicy:
+    """Политика повторов для модели или провайдера"""
+    max_retries: int = 2
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_retry_after: float = 30.0
+    retry_on: List[int] = field(default_factory=lambda: list(DEFAULT_RETRY_STATUS_CODES))
+    retry_on_connection_errors: bool = True
+    failover: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["RetryPolicy"] = None) -> "RetryPolicy":
+        """
+        Создать политику из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            RetryPolicy
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        values["retry_on"] = list(values.get("retry_on", DEFAULT_RETRY_STATUS_CODES))
+        return cls(**values)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Пауза перед повтором: экспоненциальная с полным jitter.
+
+        Args:
+            attempt: Номер повтора (с 0)
+
+        Returns:
+            Пауза в секундах
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class FirstTokenTimeout(asyncio.TimeoutError):
+    """Первый chunk streaming-ответа не получен до дедлайна (клиенту ещё ничего не отправлено)"""
+
+
+def classify_error(exception: BaseException, policy: RetryPolicy) -> Tuple[bool, str]:
+    """
+    Можно ли повторить запрос после ошибки.
+
+    Args:
+        exception: Исключение вызова модели
+        policy: Политика повторов
+
+    Returns:
+        (повторять ли, причина: "http_<статус>", "ttft_timeout", "connection" или "error")
+    """
+    if isinstance(exception, FirstTokenTimeout):
+        # Повтор безопасен: клиент ещё не получил ни одного chunk
+        return True, "ttft_timeout"
+
+    status_code = getattr(exception, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in policy.retry_on, f"http_{status_code}"
+
+    if isinstance(exception, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or \
+            type(exception).__name__ in CONNECTION_ERROR_NAMES:
+        return policy.retry_on_connection_errors, "connection"
+
+    return False, "error"
+
+
+def get_retry_after(exception: BaseException) -> Optional[float]:
+    """Retry-After из заголовков ответа, сохранённых в исключении"""
+    return parse_rate_limit_headers(get_exception_headers(exception)).get("retry_after")
+
+
+class RetryBudget:
+    """
+    Бюджет повторов: за скользящее окно повторов не больше
+    ratio * запросов + min_retries_per_second * окно.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 1.0, window: float = 10.0):
+        """
+        Args:
+            ratio: Доля запросов, которую могут составлять повторы
+            min_retries_per_second: Повторы, разрешённые при малом трафике
+            window: Окно учёта в секундах
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        """Учесть исходный запрос (пополняет бюджет)"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """
+        Занять повтор из бюджета.
+
+        Returns:
+            True если повтор разрешён
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            allowed = self.ratio * len(self._requests) + self.min_retries_per_second * self.window
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Состояние бюджета.
+
+        Returns:
+            Словарь: запросы и повторы в окне, доступные повторы
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            allowed = self.ratio * len(self._requests) + self.min_retries_per_second * self.window
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "available": max(0.0, round(allowed - len(self._retries), 2)),
+            }
+
+
+class RetryEngine:
+    """Повторы вызовов моделей по политикам с бюджетом и переключением deployment"""
+
+    def __init__(self, default: Optional[RetryPolicy] = None,
+                 providers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            default: Политика по умолчанию
+            providers: Переопределения для провайдеров ("gigachat" - официальный API)
+            models: Переопределения для моделей (применяются последними)
+            budget: Общий бюджет повторов
+        """
+        self.default = default or RetryPolicy()
+        self.providers = providers or {}
+        self.models = models or {}
+        self.budget = budget or RetryBudget()
+        # Перенастройка параметров запроса на другой deployment:
+        # async (kwargs, прежний deployment, новый deployment) -> kwargs
+        self.prepare_deployment: Optional[Callable[..., Awaitable[Any]]] = None
+        # Освобождение квоты и слота вызова, отменённого до завершения: (kwargs) -> None
+        self.release_deployment: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.hedger = None
+        self.ttft_watchdog = None
+        self.timeouts = None
+
+        self._counters_lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "retries": 0,
+            "failovers": 0,
+            "recovered": 0,
+            "budget_exhausted": 0,
+            "gave_up": 0,
+        }
+        self.retries_by_reason: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "RetryEngine":
+        """
+        Создать движок из секции retries config.yml.
+
+        Args:
+            section: {"budget": {...}, "default": {...}, "providers": {...}, "models": {...}}
+
+        Returns:
+            RetryEngine
+        """
+        section = section or {}
+        budget = section.get("budget") or {}
+        return cls(
+            default=RetryPolicy.from_dict(section.get("default")),
+            providers=section.get("providers") or {},
+            models=section.get("models") or {},
+            budget=RetryBudget(
+                ratio=float(budget.get("ratio", 0.2)),
+                min_retries_per_second=float(budget.get("min_retries_per_second", 1.0)),
+                window=float(budget.get("window", 10.0)),
+            ),
+        )
+
+    def get_policy(self, model: str) -> RetryPolicy:
+        """Политика модели: default <- providers[провайдер] <- models[модель]"""
+        policy = RetryPolicy.from_dict(self.providers.get(get_credential(model)), base=self.default)
+        return RetryPolicy.from_dict(self.models.get(model), base=policy)
+
+    def _count(self, name: str, reason: Optional[str] = None) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+            if reason is not None:
+                self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+
+    async def _failover(self, kwargs: Dict[str, Any], tried: List[str], error: str) -> Optional[str]:
+        """Переключить запрос к группе моделей на другой deployment группы"""
+        from .model_groups import get_global_model_group_router
+        from .token_estimator import PROMPT_TOKENS_KEY
+
+        metadata = kwargs.get("metadata") or {}
+        info = metadata.get(DEPLOYMENT_METADATA_KEY)
+        group_router = get_global_model_group_router()
+        if not info or not info.get("group") or group_router is None:
+            return None
+        group = group_router.get_group(info["group"])
+        prompt_tokens = metadata.get(PROMPT_TOKENS_KEY)
+        deployment = group_router.choose(group, exclude=tried, prompt_tokens=prompt_tokens) if group else None
+        if deployment is None:
+            return None
+
+        stats = group_router.stats
+        stats.finish_request(info["request_id"], False, error=error)
+        metadata[DEPLOYMENT_METADATA_KEY] = {
+            "deployment": deployment,
+            "group": info["group"],
+            "request_id": stats.start_request(deployment),
+        }
+        previous_model = kwargs.get("model") or ""
+        kwargs["model"] = deployment
+        if self.prepare_deployment is not None:
+            await self.prepare_deployment(kwargs, previous_model, deployment)
+        return deployment
+
+    async def _attempt(self, function: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any],
+                       deadline: Optional[float] = None) -> Any:
+        """Одна попытка: таймауты deployment; streaming - с дедлайном первого chunk, иначе - с hedging"""
+        if self.timeouts is not None:
+            call = function
+
+            async def function(**call_kwargs):
+                return await self.timeouts.call(call, call_kwargs, deadline)
+
+        if kwargs.get("stream"):
+            if self.ttft_watchdog is not None:
+                return await self.ttft_watchdog.call(function, kwargs)
+        elif self.hedger is not None:
+            return await self.hedger.call(function, kwargs, self.prepare_deployment, self.release_deployment)
+        return await function(**kwargs)
+
+    async def call(self, function: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any]) -> Any:
+        """
+        Выполнить вызов с повторами.
+
+        Args:
+            function: Асинхронная функция вызова модели (принимает kwargs)
+            kwargs: Аргументы вызова; kwargs["model"] меняется при переключении deployment
+
+        Returns:
+            Результат вызова
+
+        Raises:
+            Exception: Ошибка последней попытки
+        """
+        self._count("requests")
+        self.budget.record_request()
+        tried = [kwargs.get("model") or ""]
+        attempt = 0
+        deadline = self.timeouts.start(kwargs) if self.timeouts is not None else None
+
+        while True:
+            try:
+                response = await self._attempt(function, kwargs, deadline)
+            except Exception as exc:
+                model = kwargs.get("model") or ""
+                policy = self.get_policy(model)
+                retryable, reason = classify_error(exc, policy)
+                if not retryable:
+                    raise
+                if attempt >= policy.max_retries:
+                    self._count("gave_up")
+                    raise
+                if not self.budget.try_spend():
+                    self._count("budget_exhausted")
+                    logger.warning(f"Бюджет повторов исчерпан, ошибка {model} ({reason}) возвращается клиенту")
+                    raise
+
+                delay = 0.0 if reason == "ttft_timeout" else policy.backoff(attempt)
+                deployment = await self._failover(kwargs, tried, str(exc)) if policy.failover else None
+                if deployment is not None:
+                    tried.append(deployment)
+                    self._count("failovers")
+                else:
+                    retry_after = get_retry_after(exc)
+                    if retry_after is not None:
+                        if retry_after > policy.max_retry_after:
+                            self._count("gave_up")
+                            raise
+                        delay = max(delay, retry_after)
+
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("gave_up")
+                    logger.warning(f"Повтор запроса к {model} ({reason}) не успеет до дедлайна")
+                    raise
+
+                attempt += 1
+                self._count("retries", reason)
+                logger.info(
+                    f"Повтор {attempt}/{policy.max_retries} запроса к {model} ({reason}) через {delay:.2f}s"
+                    + (f" на {deployment}" if deployment else "")
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if attempt:
+                self._count("recovered")
+            return response
+
+    def install(self, router) -> None:
+        """
+        Заменить повторы LiteLLM Router движком (на экземпляре router).
+
+        Fallbacks между группами моделей LiteLLM (async_function_with_fallbacks)
+        продолжают работать поверх повторов.
+
+        Args:
+            router: litellm.Router
+        """
+        from litellm.router_utils.add_retry_fallback_headers import add_retry_headers_to_response
+
+        engine = self
+
+        async def async_function_with_retries(*args, **kwargs):
+            original_function = kwargs.pop("original_function")
+            for key in ("fallbacks", "context_window_fallbacks", "content_policy_fallbacks", "num_retries"):
+                kwargs.pop(key, None)
+            attempts = {"count": 0}
+
+            async def make_call(**call_kwargs):
+                attempts["count"] += 1
+                return await router.make_call(original_function, *args, **call_kwargs)
+
+            response = await engine.call(make_call, kwargs)
+            return add_retry_headers_to_response(
+                response=response, attempted_retries=attempts["count"] - 1, max_retries=None
+            )
+
+        router.async_function_with_retries = async_function_with_retries
+        logger.info("Повторы запросов LiteLLM Router выполняет RetryEngine")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики повторов.
+
+        Returns:
+            Словарь: счётчики, повторы по причинам и состояние бюджета
+        """
+        with self._counters_lock:
+            return {
+                **self.counters,
+                "retries_by_reason": dict(self.retries_by_reason),
+                "budget": self.budget.get_status(),
+            }
+
+
+# Глобальный движок повторов
+_global_retry_engine: Optional[RetryEngine] = None
+
+
+def get_global_retry_engine() -> Optional[RetryEngine]:
+    """
+    Получить глобальный движок повторов.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_retry_engine
+
+
+def init_global_retry_engine(section: Optional[Dict[str, Any]] = None) -> RetryEngine:
+    """
+    Инициализировать глобальный движок повторов.
+
+    Args:
+        section: Секция retries config.yml
+
+    Returns:
+        Инициализированный RetryEngine
+    """
+    global _global_retry_engine
+
+    _global_retry_engine = RetryEngine.from_config(section)
+
+    return _global_retry_engine
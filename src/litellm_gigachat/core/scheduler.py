@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Справедливая очередь к deployments по ключам API и полосам приоритета.
+
+Запросы, ожидающие слот параллельности deployment (AIMDLimiter), выходят из
+очереди не в порядке поступления, а по взвешенному справедливому обслуживанию
+(start-time fair queuing): каждый поток - пара (полоса, ключ API или команда) -
+получает долю освобождающихся слотов, пропорциональную своему весу
+(вес полосы * вес ключа). Пакетное задание с одним виртуальным ключом
+не может занять очередь целиком: запросы интерактивных пользователей идут
+впереди, пока их доля не исчерпана.
+
+Полоса (interactive, batch, ...) задаётся в metadata ключа или команды
+(priority), иначе заголовком запроса X-Priority, иначе default_lane.
+
+Очередь полосы ограничена queue_timeout; если клиент передал дедлайн
+(X-Request-Timeout / X-Request-Deadline), ожидание ограничено ещё и временем,
+после которого ответ deployment (по EWMA задержки) уже не успеет к дедлайну -
+такой запрос сразу получает 429, а не ждёт заведомого таймаута.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional
+
+from .timeouts import parse_deadline_headers
+
+logger = logging.getLogger(__name__)
+
+# Заголовок запроса с полосой приоритета
+PRIORITY_HEADER = "x-priority"
+
+# Ключи metadata ключа API / команды LiteLLM
+PRIORITY_METADATA_KEY = "priority"
+WEIGHT_METADATA_KEY = "scheduling_weight"
+
+# Поток запросов без ключа API
+ANONYMOUS_FLOW = "anonymous"
+
+
+class FairQueue:
+    """
+    Очередь со взвешенным справедливым обслуживанием (start-time fair queuing).
+
+    Элемент получает стартовую метку max(виртуальное время, финиш предыдущего
+    элемента потока); финиш = старт + cost / weight. Первым выходит элемент
+    с наименьшей стартовой меткой, при равенстве - поступивший раньше.
+    С одним потоком очередь работает как FIFO.
+    """
+
+    def __init__(self):
+        self._heap: List[List[Any]] = []
+        self._entries: Dict[int, List[Any]] = {}
+        self._finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def push(self, item: Any, flow: str = "", weight: float = 1.0, cost: float = 1.0) -> None:
+        """
+        Добавить элемент.
+
+        Args:
+            item: Элемент (например, future ожидающего запроса)
+            flow: Поток (ключ справедливости)
+            weight: Вес потока (> 0)
+            cost: Стоимость элемента
+        """
+        start = max(self._virtual_time, self._finish.get(flow, 0.0))
+        self._finish[flow] = start + cost / max(weight, 1e-6)
+        entry = [start, next(self._sequence), item]
+        self._entries[id(item)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def popleft(self) -> Any:
+        """
+        Извлечь следующий элемент.
+
+        Raises:
+            IndexError: Очередь пуста
+        """
+        while self._heap:
+            start, _, item = heapq.heappop(self._heap)
+            if item is None:
+                continue
+            del self._entries[id(item)]
+            self._virtual_time = start
+            self._forget_idle_flows()
+            return item
+        raise IndexError("pop from an empty FairQueue")
+
+    def remove(self, item: Any) -> None:
+        """
+        Удалить элемент (например, запрос, переставший ждать).
+
+        Raises:
+            ValueError: Элемента нет в очереди
+        """
+        entry = self._entries.pop(id(item), None)
+        if entry is None:
+            raise ValueError("item not in FairQueue")
+        entry[2] = None
+
+    def _forget_idle_flows(self) -> None:
+        """Удалить потоки, чья метка финиша уже в прошлом (они начнут с виртуального времени)"""
+        if len(self._finish) > 2 * len(self._entries) + 64:
+            self._finish = {flow: finish for flow, finish in self._finish.items() if finish > self._virtual_time}
+
+
+@dataclass
+class LaneConfig:
+    """Параметры полосы приоритета"""
+    weight: float = 1.0
+    queue_timeout: float = 30.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["LaneConfig"] = None) -> "LaneConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            LaneConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+
+DEFAULT_LANES = {
+    "interactive": LaneConfig(weight=8.0, queue_timeout=15.0),
+    "batch": LaneConfig(weight=1.0, queue_timeout=300.0),
+}
+
+
+@dataclass
+class Ticket:
+    """Место запроса в справедливой очереди"""
+    lane: str
+    flow: str
+    weight: float
+    # Максимальное ожидание слота в секундах (<= 0 - ждать нельзя)
+    timeout: float
+
+
+class FairScheduler:
+    """Справедливое распределение слотов deployments между ключами и полосами"""
+
+    def __init__(self, lanes: Optional[Dict[str, LaneConfig]] = None, default_lane: str = "interactive",
+                 weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            lanes: Полосы приоритета
+            default_lane: Полоса запросов без указания приоритета
+            weights: Веса ключей API / команд (alias, id команды или "key:<начало токена>")
+        """
+        self.lanes = lanes or dict(DEFAULT_LANES)
+        self.default_lane = default_lane if default_lane in self.lanes else next(iter(self.lanes))
+        self.weights = weights or {}
+
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "FairScheduler":
+        """
+        Создать из секции scheduler config.yml.
+
+        Args:
+            section: {"default_lane": ..., "lanes": {имя: {...}}, "weights": {ключ: вес}}
+
+        Returns:
+            FairScheduler
+        """
+        section = section or {}
+        lanes = {
+            name: LaneConfig.from_dict(options, base=DEFAULT_LANES.get(name))
+            for name, options in (section.get("lanes") or {}).items()
+        }
+        return cls(
+            lanes=lanes or None,
+            default_lane=section.get("default_lane") or "interactive",
+            weights={str(key): float(value) for key, value in (section.get("weights") or {}).items()},
+        )
+
+    @staticmethod
+    def get_flow(user_api_key_dict: Any) -> str:
+        """Поток запроса: команда, иначе ключ API"""
+        team_id = getattr(user_api_key_dict, "team_id", None)
+        if team_id:
+            return f"team:{team_id}"
+        key_alias = getattr(user_api_key_dict, "key_alias", None)
+        if key_alias:
+            return f"key:{key_alias}"
+        token = getattr(user_api_key_dict, "token", None) or getattr(user_api_key_dict, "api_key", None)
+        return f"key:{token[:12]}" if token else ANONYMOUS_FLOW
+
+    def get_lane(self, data: Dict[str, Any], user_api_key_dict: Any) -> str:
+        """Полоса запроса: metadata ключа или команды, затем заголовок X-Priority, затем default_lane"""
+        for metadata in (getattr(user_api_key_dict, "metadata", None),
+                         getattr(user_api_key_dict, "team_metadata", None)):
+            lane = (metadata or {}).get(PRIORITY_METADATA_KEY)
+            if lane in self.lanes:
+                return lane
+
+        headers = (data.get("metadata") or {}).get("headers") or {}
+        normalized = {str(key).lower(): value for key, value in headers.items()}
+        lane = str(normalized.get(PRIORITY_HEADER, "")).strip().lower()
+        return lane if lane in self.lanes else self.default_lane
+
+    def get_weight(self, flow: str, user_api_key_dict: Any) -> float:
+        """Вес потока: metadata ключа (scheduling_weight), затем weights конфигурации"""
+        weight = (getattr(user_api_key_dict, "metadata", None) or {}).get(WEIGHT_METADATA_KEY)
+        if weight is None:
+            name = flow.split(":", 1)[-1]
+            weight = self.weights.get(name, self.weights.get(flow, 1.0))
+        try:
+            return max(float(weight), 1e-3)
+        except (TypeError, ValueError):
+            return 1.0
+
+    def get_ticket(self, data: Dict[str, Any], user_api_key_dict: Any,
+                   expected_latency: Optional[float] = None) -> Ticket:
+        """
+        Место запроса в очереди.
+
+        Args:
+            data: Тело запроса (заголовки клиента в metadata["headers"])
+            user_api_key_dict: Ключ API запроса
+            expected_latency: Ожидаемая длительность ответа deployment
+
+        Returns:
+            Ticket
+        """
+        lane = self.get_lane(data, user_api_key_dict)
+        flow = self.get_flow(user_api_key_dict)
+        config = self.lanes[lane]
+        timeout = config.queue_timeout
+
+        remaining = parse_deadline_headers((data.get("metadata") or {}).get("headers"))
+        if remaining is not None:
+            # Ожидание, после которого ответ уже не успеет к дедлайну клиента
+            timeout = min(timeout, remaining - (expected_latency or 0.0))
+
+        return Ticket(
+            lane=lane,
+            flow=f"{lane}/{flow}",
+            weight=config.weight * self.get_weight(flow, user_api_key_dict),
+            timeout=timeout,
+        )
+
+    def _lane_counters(self, lane: str) -> Dict[str, float]:
+        return self.counters.setdefault(lane, {"admitted": 0, "queued": 0, "shed": 0, "wait_seconds": 0.0})
+
+    async def admit(self, limiter: Any, ticket: Ticket) -> None:
+        """
+        Занять слот deployment в порядке справедливой очереди.
+
+        Args:
+            limiter: AIMDLimiter deployment
+            ticket: Место запроса в очереди
+
+        Raises:
+            ConcurrencyLimitExceeded: Запрос не дождался слота (очередь полна или дедлайн)
+        """
+        from .concurrency import ConcurrencyLimitExceeded
+
+        started = time.monotonic()
+        queued = not limiter.has_free_slot()
+        try:
+            if queued and ticket.timeout <= 0:
+                raise ConcurrencyLimitExceeded(limiter.name, "ответ не успеет к дедлайну клиента")
+            await limiter.acquire(timeout=ticket.timeout, flow=ticket.flow, weight=ticket.weight)
+        except ConcurrencyLimitExceeded:
+            with self._lock:
+                self._lane_counters(ticket.lane)["shed"] += 1
+            raise
+        with self._lock:
+            counters = self._lane_counters(ticket.lane)
+            counters["admitted"] += 1
+            if queued:
+                counters["queued"] += 1
+                counters["wait_seconds"] += time.monotonic() - started
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Счётчики полос.
+
+        Returns:
+            Словарь: полоса -> допущено, ждали в очереди, отклонено, суммарное ожидание
+        """
+        with self._lock:
+            return {
+                lane: {**self._lane_counters(lane), "wait_seconds": round(self._lane_counters(lane)["wait_seconds"], 3)}
+                for lane in self.lanes
+            }
+
+
+# Глобальный экземпляр
+_global_fair_scheduler: Optional[FairScheduler] = None
+
+
+def get_global_fair_scheduler() -> Optional[FairScheduler]:
+    """
+    Получить глобальный FairScheduler.
+
+    Returns:
+        Глобальный экземпляр или None если справедливая очередь не настроена
+    """
+    return _global_fair_scheduler
+
+
+def init_global_fair_scheduler(section: Optional[Dict[str, Any]] = None) -> FairScheduler:
+    """
+    Инициализировать глобальный FairScheduler.
+
+    Args:
+        section: Секция scheduler config.yml
+
+    Returns:
+        Инициализированный FairScheduler
+    """
+    global _global_fair_scheduler
+
+    _global_fair_scheduler = FairScheduler.from_config(section)
+
+    return _global_fair_scheduler
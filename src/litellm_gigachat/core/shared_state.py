@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Общее локальное состояние для нескольких worker-процессов прокси.
+
+SharedStateStore хранит JSON-документы в каталоге (атомарная запись через
+os.replace), LeaderElection выбирает лидера через файловую блокировку flock:
+блокировка снимается ядром при завершении процесса, поэтому при падении
+лидера её сразу может захватить другой worker.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SharedStateStore:
+    """
+    Файловое хранилище JSON-документов, общее для worker-процессов.
+
+    Каждый ключ хранится в отдельном файле ``<key>.json``. Читатели
+    повторно разбирают файл только при изменении его mtime.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Инициализация хранилища.
+
+        Args:
+            directory: Каталог для файлов состояния (создаётся при необходимости)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._cache: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        """Путь к файлу ключа"""
+        return self.directory / f"{key}.json"
+
+    def publish(self, key: str, value: Any) -> None:
+        """
+        Атомарно записать значение ключа.
+
+        Args:
+            key: Имя ключа (используется как имя файла)
+            value: JSON-сериализуемое значение
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_version(self, key: str) -> Optional[int]:
+        """
+        Получить версию ключа (mtime файла в наносекундах).
+
+        Returns:
+            Версия или None если ключ не опубликован
+        """
+        try:
+            return self._path(key).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def read(self, key: str) -> Optional[Any]:
+        """
+        Прочитать значение ключа.
+
+        Returns:
+            Значение или None если ключ не опубликован или повреждён
+        """
+        version = self.get_version(key)
+        if version is None:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Не удалось прочитать общее состояние {key}: {exc}")
+            return None
+
+        with self._lock:
+            self._cache[key] = (version, value)
+        return value
+
+    def update(self, key: str, updater: Callable[[Optional[Any]], Tuple[Any, T]]) -> T:
+        """
+        Атомарно прочитать, изменить и записать значение ключа.
+
+        Чтение и запись выполняются под файловой блокировкой ``.<key>.lock``,
+        поэтому одновременные изменения из разных процессов не теряются.
+
+        Args:
+            key: Имя ключа
+            updater: Функция (текущее значение или None) -> (новое значение, результат)
+
+        Returns:
+            Результат updater
+        """
+        with self._lock:
+            fd = None
+            if fcntl is not None:
+                fd = os.open(self.directory / f".{key}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self._path(key), "r", encoding="utf-8") as f:
+                        current = json.load(f)
+                except (OSError, ValueError):
+                    current = None
+                value, result = updater(current)
+                self.publish(key, value)
+                return result
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+
+    def keys(self, prefix: str = "") -> list:
+        """
+        Список опубликованных ключей.
+
+        Args:
+            prefix: Префикс имени ключа
+
+        Returns:
+            Отсортированный список ключей
+        """
+        return sorted(
+            path.stem for path in self.directory.glob(f"{prefix}*.json")
+            if not path.name.startswith(".")
+        )
+
+
+class LeaderElection:
+    """
+    Выбор лидера среди worker-процессов через неблокирующий flock.
+    """
+
+    def __init__(self, lock_path: str):
+        """
+        Инициализация.
+
+        Args:
+            lock_path: Путь к файлу блокировки
+        """
+        self.lock_path = lock_path
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Удерживает ли текущий процесс блокировку лидера"""
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Попытаться стать лидером.
+
+        Returns:
+            True если процесс является лидером
+        """
+        if self._fd is not None:
+            return True
+
+        if fcntl is None:
+            logger.warning("fcntl недоступен, выбор лидера не поддерживается - процесс считается лидером")
+            self._fd = -1
+            return True
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        logger.info(f"Процесс {os.getpid()} стал лидером")
+        return True
+
+    def release(self) -> None:
+        """Освободить блокировку лидера"""
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Раздельные таймауты запросов к моделям и дедлайн клиента.
+
+Вместо одного timeout на всё задаются:
+    - connect - установка TCP/TLS соединения;
+    - first_byte - ожидание ответа (для streaming - первого chunk, без
+      streaming - всего ответа, который приходит целиком);
+    - idle - пауза между chunk streaming-ответа;
+    - total - весь запрос, включая повторы и ожидание между ними.
+
+Источники (каждый следующий переопределяет предыдущий): секция timeouts
+(default), поля connect_timeout/first_byte_timeout/idle_timeout/total_timeout
+прокси-провайдера, timeouts.models[группа моделей], timeouts.models[модель].
+
+Клиент может передать свой дедлайн заголовком X-Request-Timeout (оставшиеся
+секунды) или X-Request-Deadline (unix time в секундах): запрос, который уже
+не успеет завершиться, не отправляется и не повторяется, а незавершённый
+вызов модели прерывается - мощность провайдера освобождается сразу.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from .retry import DEPLOYMENT_METADATA_KEY, FirstTokenTimeout
+from .ttft import close_stream, prefetch_first_chunk
+
+logger = logging.getLogger(__name__)
+
+# Заголовки дедлайна клиента
+TIMEOUT_HEADER = "x-request-timeout"
+DEADLINE_HEADER = "x-request-deadline"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Запрос не успел завершиться до дедлайна (общий таймаут или дедлайн клиента)"""
+    status_code = 504
+
+
+class StreamIdleTimeout(asyncio.TimeoutError):
+    """Пауза между chunk streaming-ответа превысила idle"""
+    status_code = 504
+
+
+@dataclass
+class TimeoutConfig:
+    """Таймауты запроса в секундах (None - не ограничено)"""
+    connect: Optional[float] = None
+    first_byte: Optional[float] = None
+    idle: Optional[float] = None
+    total: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["TimeoutConfig"] = None) -> "TimeoutConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи и None игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            TimeoutConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({
+            key: float(value) for key, value in (data or {}).items() if key in names and value is not None
+        })
+        return cls(**values)
+
+    def is_split(self) -> bool:
+        """Заданы ли раздельные таймауты соединения и ответа"""
+        return any(value is not None for value in (self.connect, self.first_byte, self.idle))
+
+
+def parse_deadline_headers(headers: Optional[Mapping[str, Any]], now: Optional[float] = None) -> Optional[float]:
+    """
+    Оставшееся время запроса по заголовкам клиента.
+
+    Args:
+        headers: Заголовки запроса
+        now: Текущее время (unix time)
+
+    Returns:
+        Оставшиеся секунды (может быть <= 0) или None, если заголовков нет
+    """
+    normalized = {str(key).lower(): value for key, value in (headers or {}).items()}
+    now = time.time() if now is None else now
+    remaining = []
+    for header, convert in (
+        (TIMEOUT_HEADER, lambda value: value),
+        (DEADLINE_HEADER, lambda value: value - now),
+    ):
+        if header not in normalized:
+            continue
+        try:
+            remaining.append(convert(float(normalized[header])))
+        except (TypeError, ValueError):
+            logger.warning(f"Некорректный заголовок {header}: {normalized[header]}")
+    return min(remaining) if remaining else None
+
+
+def _smallest(*values: Optional[float]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return min(present) if present else None
+
+
+def build_httpx_timeout(config: TimeoutConfig, remaining: Optional[float],
+                        attempt_timeout: Optional[float], stream: bool):
+    """
+    Таймауты HTTP клиента для одной попытки.
+
+    Args:
+        config: Таймауты модели
+        remaining: Время до дедлайна запроса
+        attempt_timeout: Прежний таймаут попытки (timeout модели или провайдера)
+        stream: Streaming-запрос
+
+    Returns:
+        httpx.Timeout
+    """
+    import httpx
+
+    default = _smallest(remaining, attempt_timeout)
+    if stream:
+        # Первое чтение ждёт первый chunk, остальные - паузы между chunk;
+        # точные first_byte и idle проверяет GuardedStream
+        waits = [value for value in (config.first_byte, config.idle) if value is not None]
+        read = _smallest(max(waits) if waits else None, default)
+    else:
+        read = _smallest(config.first_byte, default)
+    return httpx.Timeout(
+        default,
+        connect=_smallest(config.connect, default),
+        read=read,
+        pool=_smallest(config.connect, default),
+    )
+
+
+class GuardedStream:
+    """
+    Streaming-ответ с ограничениями ожидания первого chunk (first_byte),
+    пауз между chunk (idle) и дедлайна запроса. Остальные атрибуты
+    берутся из исходного ответа.
+    """
+
+    def __init__(self, stream: Any, model: str, first_byte: Optional[float] = None,
+                 idle: Optional[float] = None, deadline: Optional[float] = None):
+        """
+        Args:
+            stream: Исходный streaming-ответ
+            model: Deployment (для сообщений)
+            first_byte: Ожидание первого chunk
+            idle: Пауза между chunk
+            deadline: Дедлайн запроса (time.monotonic)
+        """
+        self._stream = stream
+        self._model = model
+        self._first_byte = first_byte
+        self._idle = idle
+        self._deadline = deadline
+        self._first = True
+
+    def __aiter__(self) -> "GuardedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        limit = self._first_byte if self._first else self._idle
+        remaining = None if self._deadline is None else self._deadline - time.monotonic()
+        timeout = _smallest(limit, remaining)
+        if timeout is None:
+            chunk = await self._stream.__anext__()
+        else:
+            try:
+                chunk = await asyncio.wait_for(self._stream.__anext__(), timeout=max(timeout, 0.0))
+            except asyncio.TimeoutError:
+                await close_stream(self._stream)
+                raise self._timeout_error(limit, remaining) from None
+        self._first = False
+        return chunk
+
+    def _timeout_error(self, limit: Optional[float], remaining: Optional[float]) -> Exception:
+        if remaining is not None and (limit is None or remaining <= limit):
+            return DeadlineExceeded(f"Дедлайн запроса к {self._model} истёк во время streaming")
+        if self._first:
+            # Клиенту ещё ничего не отправлено - RetryEngine перезапустит поток
+            return FirstTokenTimeout(f"Первый chunk от {self._model} не получен за {limit:.1f}s")
+        return StreamIdleTimeout(f"Пауза между chunk от {self._model} больше {limit:.1f}s")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+def get_attempt_timeout(model: str) -> Optional[float]:
+    """
+    Прежний таймаут попытки: timeout прокси-провайдера или модели в Router.
+
+    Args:
+        model: Deployment
+
+    Returns:
+        Таймаут в секундах или None
+    """
+    from .proxy_provider_manager import get_global_multi_proxy_provider_manager
+
+    provider = get_global_multi_proxy_provider_manager().get_provider_by_suffix(model)
+    if provider is not None:
+        return float(provider.timeout)
+
+    import litellm.proxy.proxy_server as proxy_server
+
+    router = getattr(proxy_server, "llm_router", None)
+    for deployment in (getattr(router, "model_list", None) or []):
+        if deployment.get("model_name") == model:
+            timeout = (deployment.get("litellm_params") or {}).get("timeout")
+            return float(timeout) if timeout is not None else None
+    return None
+
+
+class TimeoutSettings:
+    """Раздельные таймауты моделей и применение дедлайнов к вызовам"""
+
+    def __init__(self, default: Optional[TimeoutConfig] = None,
+                 models: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Args:
+            default: Таймауты по умолчанию
+            models: Переопределения для моделей (deployments или групп моделей)
+        """
+        self.default = default or TimeoutConfig()
+        self.models = models or {}
+
+        self._counters_lock = threading.Lock()
+        self.counters: Dict[str, int] = {"deadline_exceeded": 0, "client_deadlines": 0}
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "TimeoutSettings":
+        """
+        Создать из секции timeouts config.yml.
+
+        Args:
+            section: {"default": {...}, "models": {...}}
+
+        Returns:
+            TimeoutSettings
+        """
+        section = section or {}
+        return cls(default=TimeoutConfig.from_dict(section.get("default")), models=section.get("models") or {})
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def resolve(self, model: str, group: Optional[str] = None) -> TimeoutConfig:
+        """Таймауты модели: default <- провайдер <- models[группа] <- models[модель]"""
+        from .proxy_provider_manager import get_global_multi_proxy_provider_manager
+
+        config = self.default
+        provider = get_global_multi_proxy_provider_manager().get_provider_by_suffix(model)
+        if provider is not None:
+            config = TimeoutConfig.from_dict({
+                "connect": provider.connect_timeout,
+                "first_byte": provider.first_byte_timeout,
+                "idle": provider.idle_timeout,
+                "total": provider.total_timeout,
+            }, base=config)
+        for name in (group, model):
+            if name and name in self.models:
+                config = TimeoutConfig.from_dict(self.models[name], base=config)
+        return config
+
+    @staticmethod
+    def _get_target(kwargs: Dict[str, Any]):
+        model = kwargs.get("model") or ""
+        info = (kwargs.get("metadata") or {}).get(DEPLOYMENT_METADATA_KEY) or {}
+        return model, info.get("group")
+
+    def start(self, kwargs: Dict[str, Any]) -> Optional[float]:
+        """
+        Дедлайн запроса: total модели и дедлайн клиента из заголовков.
+
+        Args:
+            kwargs: Аргументы вызова Router (заголовки клиента в metadata["headers"])
+
+        Returns:
+            Дедлайн (time.monotonic) или None
+
+        Raises:
+            DeadlineExceeded: Дедлайн клиента уже истёк
+        """
+        config = self.resolve(*self._get_target(kwargs))
+        client_remaining = parse_deadline_headers((kwargs.get("metadata") or {}).get("headers"))
+        if client_remaining is not None:
+            self._count("client_deadlines")
+            if client_remaining <= 0:
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded(f"Дедлайн клиента для {kwargs.get('model')} истёк до отправки запроса")
+        remaining = _smallest(config.total, client_remaining)
+        return None if remaining is None else time.monotonic() + remaining
+
+    def prepare_attempt(self, kwargs: Dict[str, Any], deadline: Optional[float]) -> TimeoutConfig:
+        """
+        Выставить таймауты HTTP клиента для очередной попытки.
+
+        Args:
+            kwargs: Аргументы вызова (timeout и stream_timeout изменяются на месте)
+            deadline: Дедлайн запроса
+
+        Returns:
+            Таймауты deployment попытки
+
+        Raises:
+            DeadlineExceeded: Дедлайн уже истёк
+        """
+        model, group = self._get_target(kwargs)
+        config = self.resolve(model, group)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"Дедлайн запроса к {model} истёк")
+        if remaining is None and not config.is_split():
+            return config
+
+        stream = bool(kwargs.get("stream"))
+        timeout = build_httpx_timeout(config, remaining, get_attempt_timeout(model), stream)
+        kwargs["timeout"] = timeout
+        if stream:
+            kwargs["stream_timeout"] = timeout
+        return config
+
+    async def call(self, function: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any],
+                   deadline: Optional[float]) -> Any:
+        """
+        Выполнить попытку с таймаутами deployment и дедлайном запроса.
+
+        Args:
+            function: Асинхронная функция попытки (принимает kwargs)
+            kwargs: Аргументы вызова
+            deadline: Дедлайн запроса
+
+        Returns:
+            Ответ; streaming-ответ оборачивается в GuardedStream с уже полученным первым chunk
+
+        Raises:
+            DeadlineExceeded: Дедлайн истёк до ответа
+        """
+        config = self.prepare_attempt(kwargs, deadline)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        try:
+            response = await asyncio.wait_for(function(**kwargs), timeout=remaining)
+        except asyncio.TimeoutError:
+            if deadline is None or time.monotonic() < deadline:
+                raise
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"Дедлайн запроса к {kwargs.get('model')} истёк") from None
+
+        if kwargs.get("stream") and (config.first_byte or config.idle or deadline is not None):
+            # Первый chunk ждём здесь: при FirstTokenTimeout RetryEngine перезапустит поток
+            stream = GuardedStream(response, kwargs.get("model") or "", config.first_byte, config.idle, deadline)
+            return await prefetch_first_chunk(stream)
+        return response
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики дедлайнов.
+
+        Returns:
+            Словарь счётчиков
+        """
+        with self._counters_lock:
+            return dict(self.counters)
+
+
+# Глобальный экземпляр
+_global_timeout_settings: Optional[TimeoutSettings] = None
+
+
+def get_global_timeout_settings() -> Optional[TimeoutSettings]:
+    """
+    Получить глобальные настройки таймаутов.
+
+    Returns:
+        Глобальный экземпляр или None если не инициализирован
+    """
+    return _global_timeout_settings
+
+
+def init_global_timeout_settings(section: Optional[Dict[str, Any]] = None) -> TimeoutSettings:
+    """
+    Инициализировать глобальные настройки таймаутов.
+
+    Args:
+        section: Секция timeouts config.yml
+
+    Returns:
+        Инициализированный экземпляр
+    """
+    global _global_timeout_settings
+
+    _global_timeout_settings = TimeoutSettings.from_config(section)
+
+    return _global_timeout_settings
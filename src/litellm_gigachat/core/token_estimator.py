@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Локальная оценка числа токенов GigaChat.
+
+Размер запроса нужен до отправки: для резервирования квоты TPM, выбора
+deployment с подходящим окном контекста и учёта токенов ответов без usage
+(отменённые streaming-ответы). Точный подсчёт - запрос к GigaChat
+(POST /tokens/count), слишком дорогой для каждого сообщения, поэтому
+оценка локальная и линейная по признакам текста:
+
+    токены ≈ w · (кириллица, латиница, цифры, пунктуация, прочие символы, слова)
+
+Признаки считаются за один проход str.translate на текст, а все тексты
+запроса (сообщения, tools) оцениваются одним вызовом count_texts.
+
+Калибровка (включается calibration_enabled): небольшая доля текстов
+(sample_rate) промптов запросов к официальному GigaChat API накапливается
+и не чаще раза в calibration_interval отправляется в /tokens/count одним
+запросом. Тексты запросов к прокси-провайдерам и другим моделям в GigaChat
+не отправляются.
+Точные значения кэшируются по хэшу текста (повторяющийся системный промпт
+считается точно), а веса w пересчитываются гребневой регрессией по
+последним измерениям с притяжением к исходным весам.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import string
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("cyrillic", "latin", "digits", "punctuation", "other", "words")
+# Исходные веса: ~4.5 символа кириллицы и ~5 символов латиницы на токен, цифры и пунктуация дороже
+PRIOR_WEIGHTS = (0.22, 0.2, 0.5, 0.6, 1.0, 0.15)
+
+# Ключ metadata запроса с оценкой токенов промпта (считается один раз на запрос)
+PROMPT_TOKENS_KEY = "gigachat_prompt_tokens"
+
+# Тексты короче не кэшируются (оценка дешевле хэша)
+MIN_CACHED_CHARS = 64
+
+
+def _build_class_table() -> Dict[int, str]:
+    table = {}
+    for code in range(0x0400, 0x0530):
+        table[code] = "c"
+    for char in string.ascii_letters:
+        table[ord(char)] = "l"
+    for char in string.digits:
+        table[ord(char)] = "d"
+    for char in string.punctuation + "«»—–…№":
+        table[ord(char)] = "p"
+    for char in string.whitespace + " ":
+        table[ord(char)] = " "
+    return table
+
+
+_CLASS_TABLE = _build_class_table()
+
+
+def text_features(text: str) -> Tuple[int, ...]:
+    """
+    Признаки текста для линейной оценки.
+
+    Args:
+        text: Текст
+
+    Returns:
+        Числа символов кириллицы, латиницы, цифр, пунктуации, прочих символов и число слов
+    """
+    classes = text.translate(_CLASS_TABLE)
+    cyrillic = classes.count("c")
+    latin = classes.count("l")
+    digits = classes.count("d")
+    punctuation = classes.count("p")
+    other = len(text) - cyrillic - latin - digits - punctuation - classes.count(" ")
+    return cyrillic, latin, digits, punctuation, other, len(text.split())
+
+
+def text_key(text: str) -> bytes:
+    """Ключ кэша точных значений: первые 16 байт SHA-256 текста"""
+    return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+
+def solve_linear(matrix: List[List[float]], vector: List[float]) -> Optional[List[float]]:
+    """Решение системы линейных уравнений методом Гаусса (None - система вырождена)"""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda index: abs(rows[index][column]))
+        if abs(rows[pivot][column]) < 1e-12:
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for index in range(column + 1, size):
+            factor = rows[index][column] / rows[column][column]
+            if factor:
+                for position in range(column, size + 1):
+                    rows[index][position] -= factor * rows[column][position]
+    result = [0.0] * size
+    for column in range(size - 1, -1, -1):
+        total = rows[column][size] - sum(rows[column][k] * result[k] for k in range(column + 1, size))
+        result[column] = total / rows[column][column]
+    return result
+
+
+def fit_weights(samples: Sequence[Tuple[Tuple[int, ...], int]], prior: Sequence[float],
+                regularization: float) -> List[float]:
+    """
+    Веса линейной оценки по измерениям (гребневая регрессия с притяжением к prior).
+
+    Args:
+        samples: Пары (признаки текста, точное число токенов)
+        prior: Исходные веса
+        regularization: Сила притяжения к prior (доля диагонали XᵀX)
+
+    Returns:
+        Неотрицательные веса
+    """
+    size = len(prior)
+    gram = [[0.0] * size for _ in range(size)]
+    target = [0.0] * size
+    for features, tokens in samples:
+        for i in range(size):
+            if features[i]:
+                target[i] += features[i] * tokens
+                for j in range(size):
+                    gram[i][j] += features[i] * features[j]
+    for i in range(size):
+        penalty = regularization * gram[i][i] + 1.0
+        gram[i][i] += penalty
+        target[i] += penalty * prior[i]
+    weights = solve_linear(gram, target)
+    if weights is None:
+        return list(prior)
+    return [max(0.0, weight) for weight in weights]
+
+
+@dataclass
+class TokenEstimatorConfig:
+    """Параметры оценки токенов и калибровки"""
+    # Токены служебной разметки на сообщение
+    message_overhead: int = 4
+    # Отправлять выборку промптов GigaChat в /tokens/count (по умолчанию выключено)
+    calibration_enabled: bool = False
+    # Не чаще одного запроса /tokens/count за интервал, секунд
+    calibration_interval: float = 300.0
+    calibration_batch: int = 32
+    # Доля текстов, отправляемых на калибровку
+    sample_rate: float = 0.05
+    max_sample_chars: int = 20000
+    # Последних измерений для подбора весов
+    max_training_samples: int = 512
+    regularization: float = 0.1
+    # Точных значений в кэше
+    cache_max_entries: int = 10000
+    # Модель для /tokens/count
+    calibration_model: str = "GigaChat"
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "TokenEstimatorConfig":
+        """
+        Создать конфигурацию из словаря (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+
+        Returns:
+            TokenEstimatorConfig
+        """
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+
+class TokenEstimator:
+    """
+    Оценка числа токенов GigaChat с калибровкой по /tokens/count.
+
+    Потокобезопасна; калибровка запускается задачей в текущем event loop
+    при очередной оценке, если есть накопленные тексты и прошёл интервал.
+    """
+
+    def __init__(self, config: Optional[TokenEstimatorConfig] = None,
+                 counter: Optional[Callable[[List[str]], List[int]]] = None):
+        """
+        Args:
+            config: Параметры оценки
+            counter: Точный подсчёт токенов списка текстов (блокирующий, выполняется в потоке);
+                None - без калибровки
+        """
+        self.config = config or TokenEstimatorConfig()
+        self.counter = counter
+        self.weights: List[float] = list(PRIOR_WEIGHTS)
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._samples: Deque[str] = deque(maxlen=max(self.config.calibration_batch, 1) * 4)
+        self._training: Deque[Tuple[Tuple[int, ...], int]] = deque(maxlen=self.config.max_training_samples)
+        self._calibration_task: Optional[asyncio.Task] = None
+        self._last_calibration = -math.inf
+        self.counters: Dict[str, int] = {
+            "texts": 0,
+            "cache_hits": 0,
+            "calibrations": 0,
+            "calibration_errors": 0,
+            "calibrated_texts": 0,
+        }
+        # Средняя относительная ошибка оценки на последнем пакете калибровки (до пересчёта весов)
+        self.last_error: Optional[float] = None
+
+    def estimate_features(self, features: Tuple[int, ...]) -> float:
+        """Оценка по признакам текста (без округления)"""
+        return sum(weight * value for weight, value in zip(self.weights, features))
+
+    def estimate_text(self, text: str) -> float:
+        """
+        Оценка без округления и кэша: сумма оценок частей текста равна оценке
+        целого (с точностью до слов на границах), поэтому подходит для chunk
+        streaming-ответа.
+        """
+        return self.estimate_features(text_features(text)) if text else 0.0
+
+    def count_texts(self, texts: Sequence[str], sample: bool = False) -> List[int]:
+        """
+        Число токенов каждого текста: точное значение из кэша или оценка.
+
+        Args:
+            texts: Тексты (повторы оцениваются один раз)
+            sample: Тексты можно отправить на калибровку (запрос к GigaChat)
+
+        Returns:
+            Список чисел токенов в порядке текстов
+        """
+        unique: Dict[str, int] = {}
+        misses: List[str] = []
+        with self._lock:
+            self.counters["texts"] += len(texts)
+            for text in texts:
+                if text in unique or not text:
+                    unique.setdefault(text, 0)
+                    continue
+                key = text_key(text) if len(text) >= MIN_CACHED_CHARS else None
+                exact = self._cache.get(key) if key is not None else None
+                if exact is not None:
+                    self._cache.move_to_end(key)
+                    self.counters["cache_hits"] += 1
+                    unique[text] = exact
+                else:
+                    unique[text] = -1
+                    misses.append(text)
+            weights = list(self.weights)
+
+        for text in misses:
+            features = text_features(text)
+            unique[text] = max(1, math.ceil(sum(w * value for w, value in zip(weights, features))))
+        if misses and sample:
+            self._sample(misses)
+        return [unique[text] for text in texts]
+
+    def count_text(self, text: str, sample: bool = False) -> int:
+        """Число токенов текста"""
+        return self.count_texts([text], sample)[0]
+
+    def count_messages(self, messages: Sequence[Any], tools: Optional[Sequence[Any]] = None,
+                       sample: bool = False) -> int:
+        """
+        Токены сообщений чата (с разметкой сообщений) и описаний функций.
+
+        Args:
+            messages: Сообщения OpenAI (content - строка или массив частей)
+            tools: tools или functions запроса
+            sample: Тексты можно отправить на калибровку (запрос к GigaChat)
+
+        Returns:
+            Оценка токенов промпта
+        """
+        texts: List[str] = []
+        for message in messages or []:
+            if not isinstance(message, dict):
+                texts.append(str(message))
+                continue
+            content = message.get("content")
+            if isinstance(content, str):
+                texts.append(content)
+            elif isinstance(content, list):
+                texts.extend(part.get("text") or "" for part in content if isinstance(part, dict))
+            for call in message.get("tool_calls") or []:
+                function = (call or {}).get("function") or {}
+                texts.append(f"{function.get('name') or ''} {function.get('arguments') or ''}")
+            function_call = message.get("function_call")
+            if isinstance(function_call, dict):
+                texts.append(f"{function_call.get('name') or ''} {function_call.get('arguments') or ''}")
+        if tools:
+            texts.append(json.dumps(list(tools), ensure_ascii=False))
+        return sum(self.count_texts(texts, sample)) + self.config.message_overhead * len(messages or [])
+
+    def estimate_request(self, data: Dict[str, Any]) -> int:
+        """
+        Токены промпта запроса chat/completions, completions или embeddings.
+        Тексты запроса к официальному GigaChat API могут быть отправлены на калибровку.
+
+        Args:
+            data: Тело запроса
+
+        Returns:
+            Оценка токенов промпта
+        """
+        sample = is_gigachat_request(data)
+        tokens = self.count_messages(data.get("messages") or [], data.get("tools") or data.get("functions"), sample)
+        prompt_input = data.get("input") if data.get("input") is not None else data.get("prompt")
+        if isinstance(prompt_input, str):
+            tokens += self.count_text(prompt_input, sample)
+        elif isinstance(prompt_input, list):
+            tokens += sum(self.count_texts([item for item in prompt_input if isinstance(item, str)], sample))
+        return tokens
+
+    def _sample(self, texts: List[str]) -> None:
+        """Отобрать тексты для калибровки и запустить её, если пора"""
+        if self.counter is None or not self.config.calibration_enabled:
+            return
+        sampled = [text[:self.config.max_sample_chars] for text in texts if random.random() < self.config.sample_rate]
+        if sampled:
+            with self._lock:
+                self._samples.extend(sampled)
+        self._schedule_calibration()
+
+    def _schedule_calibration(self) -> None:
+        if not self._samples or time.monotonic() - self._last_calibration < self.config.calibration_interval:
+            return
+        if self._calibration_task is not None and not self._calibration_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # вне event loop калибровку запустит следующая асинхронная оценка
+        self._last_calibration = time.monotonic()
+        self._calibration_task = loop.create_task(self.calibrate())
+
+    async def calibrate(self) -> bool:
+        """
+        Отправить накопленные тексты в /tokens/count, сохранить точные значения
+        и пересчитать веса.
+
+        Returns:
+            True если калибровка выполнена
+        """
+        if self.counter is None:
+            return False
+        with self._lock:
+            texts = list(dict.fromkeys(
+                self._samples.popleft() for _ in range(min(len(self._samples), self.config.calibration_batch))
+            ))
+        if not texts:
+            return False
+
+        try:
+            loop = asyncio.get_running_loop()
+            actual = await loop.run_in_executor(None, self.counter, texts)
+            if len(actual) != len(texts):
+                raise ValueError(f"ожидалось {len(texts)} значений, получено {len(actual)}")
+        except Exception as e:
+            self.counters["calibration_errors"] += 1
+            logger.warning(f"Ошибка калибровки оценки токенов: {e}")
+            return False
+
+        errors = []
+        with self._lock:
+            for text, tokens in zip(texts, actual):
+                features = text_features(text)
+                if tokens > 0:
+                    errors.append(abs(self.estimate_features(features) - tokens) / tokens)
+                self._training.append((features, int(tokens)))
+                if len(text) >= MIN_CACHED_CHARS:
+                    self._cache[text_key(text)] = int(tokens)
+                    self._cache.move_to_end(text_key(text))
+            while len(self._cache) > self.config.cache_max_entries:
+                self._cache.popitem(last=False)
+            self.weights = fit_weights(list(self._training), PRIOR_WEIGHTS, self.config.regularization)
+            self.counters["calibrations"] += 1
+            self.counters["calibrated_texts"] += len(texts)
+            if errors:
+                self.last_error = sum(errors) / len(errors)
+
+        logger.info(
+            f"Калибровка оценки токенов по {len(texts)} текстам: ошибка до калибровки "
+            f"{(self.last_error or 0) * 100:.1f}%, веса {[round(w, 3) for w in self.weights]}"
+        )
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики, веса и точность оценки.
+
+        Returns:
+            Словарь метрик
+        """
+        with self._lock:
+            return {
+                **self.counters,
+                "cache_entries": len(self._cache),
+                "pending_samples": len(self._samples),
+                "weights": dict(zip(FEATURES, (round(weight, 4) for weight in self.weights))),
+                "last_error": round(self.last_error, 4) if self.last_error is not None else None,
+            }
+
+
+class GigaChatTokenCounter:
+    """Точный подсчёт токенов через POST /tokens/count GigaChat API"""
+
+    def __init__(self, api_base: str = "https://gigachat.devices.sberbank.ru/api/v1", model: str = "GigaChat",
+                 token_manager: Any = None, timeout: float = 30.0):
+        """
+        Args:
+            api_base: Адрес GigaChat API
+            model: Модель, токенизатором которой считаются тексты
+            token_manager: TokenManager (по умолчанию глобальный)
+            timeout: Таймаут запроса, секунд
+        """
+        self.url = f"{api_base.rstrip('/')}/tokens/count"
+        self.model = model
+        self._token_manager = token_manager
+        self.timeout = timeout
+
+    def __call__(self, texts: List[str]) -> List[int]:
+        from .http_client import get_global_http_client
+
+        if self._token_manager is None:
+            from .token_manager import get_global_token_manager
+            self._token_manager = get_global_token_manager()
+
+        for attempt in range(2):
+            response = get_global_http_client().post(
+                self.url,
+                json={"model": self.model, "input": texts},
+                headers={"Authorization": f"Bearer {self._token_manager.get_token()}"},
+                timeout=self.timeout,
+            )
+            if response.status_code == 401 and attempt == 0:
+                self._token_manager.invalidate_token()
+                continue
+            response.raise_for_status()
+            return [int(item["tokens"]) for item in response.json()]
+        raise RuntimeError("токен GigaChat отклонён")
+
+
+def is_gigachat_request(data: Dict[str, Any]) -> bool:
+    """
+    Выполняется ли запрос учётными данными официального GigaChat API.
+
+    Запрос к группе моделей ещё не привязан к deployment и считается
+    запросом не к GigaChat.
+
+    Args:
+        data: Тело запроса
+
+    Returns:
+        True для запросов к GigaChat
+    """
+    from .model_groups import get_global_model_group_router
+    from .rate_limits import GIGACHAT_CREDENTIAL, get_credential
+
+    model = str(data.get("model") or "")
+    group_router = get_global_model_group_router()
+    if not model or (group_router is not None and group_router.get_group(model) is not None):
+        return False
+    return get_credential(model, str(data.get("api_base") or "")) == GIGACHAT_CREDENTIAL
+
+
+def estimate_prompt_tokens(data: Dict[str, Any]) -> int:
+    """
+    Оценка токенов промпта запроса; в прокси сохраняется в metadata и
+    переиспользуется следующими этапами (группы моделей, квоты, учёт).
+
+    Args:
+        data: Тело запроса
+
+    Returns:
+        Оценка токенов промпта
+    """
+    metadata = data.get("metadata")
+    if isinstance(metadata, dict) and isinstance(metadata.get(PROMPT_TOKENS_KEY), int):
+        return metadata[PROMPT_TOKENS_KEY]
+    tokens = get_token_estimator().estimate_request(data)
+    if isinstance(metadata, dict):
+        metadata[PROMPT_TOKENS_KEY] = tokens
+    return tokens
+
+
+def estimate_response_tokens(response: Any) -> int:
+    """
+    Оценка токенов ответа модели без usage (текст и вызовы функций всех вариантов).
+
+    Args:
+        response: ModelResponse LiteLLM или словарь OpenAI
+
+    Returns:
+        Оценка токенов ответа
+    """
+    if isinstance(response, dict):
+        choices = response.get("choices") or []
+    else:
+        choices = getattr(response, "choices", None) or []
+    messages = []
+    for choice in choices:
+        message = choice.get("message") if isinstance(choice, dict) else getattr(choice, "message", None)
+        if message is not None and not isinstance(message, dict):
+            message = message.model_dump() if hasattr(message, "model_dump") else vars(message)
+        if message:
+            messages.append(message)
+    estimator = get_token_estimator()
+    return max(0, estimator.count_messages(messages) - estimator.config.message_overhead * len(messages))
+
+
+# Глобальный экземпляр
+_global_token_estimator: Optional[TokenEstimator] = None
+
+
+def get_global_token_estimator() -> Optional[TokenEstimator]:
+    """
+    Получить глобальный TokenEstimator.
+
+    Returns:
+        Глобальный экземпляр или None если оценка не настроена
+    """
+    return _global_token_estimator
+
+
+def init_global_token_estimator(section: Optional[Dict[str, Any]] = None,
+                                counter: Optional[Callable[[List[str]], List[int]]] = None) -> TokenEstimator:
+    """
+    Инициализировать глобальный TokenEstimator.
+
+    Args:
+        section: Секция token_estimator config.yml
+        counter: Точный подсчёт токенов для калибровки (None - без калибровки)
+
+    Returns:
+        Инициализированный TokenEstimator
+    """
+    global _global_token_estimator
+
+    _global_token_estimator = TokenEstimator(TokenEstimatorConfig.from_dict(section), counter)
+
+    return _global_token_estimator
+
+
+def get_token_estimator() -> TokenEstimator:
+    """Глобальный TokenEstimator (без калибровки, если не настроен)"""
+    return _global_token_estimator or init_global_token_estimator()
@@ -7,6 +7,8 @@ from typing import Optional
 import logging
 from dotenv import load_dotenv
 
+from .http_client import get_global_http_client
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -38,6 +40,65 @@ class TokenManager:
         # Буфер времени для обновления токена (5 минут до истечения)
         self.refresh_buffer_seconds = 300
         
+        # Общее хранилище токена для режима нескольких worker-процессов
+        self._shared_store = None
+        self._shared_key = "gigachat-token"
+        self._invalidated_token: Optional[str] = None
+        
+    def attach_shared_store(self, store, key: str = "gigachat-token"):
+        """
+        Подключить общее хранилище токена (SharedStateStore).
+        
+        Полученные токены публикуются в хранилище, а перед запросом нового
+        токена проверяется, не получил ли его уже другой процесс.
+        
+        Args:
+            store: Экземпляр SharedStateStore
+            key: Ключ токена в хранилище
+        """
+        self._shared_store = store
+        self._shared_key = key
+    
+    def _load_shared_token(self) -> bool:
+        """
+        Взять токен из общего хранилища, если он ещё действителен.
+        
+        Returns:
+            True если токен из хранилища принят
+        """
+        if self._shared_store is None:
+            return False
+        
+        shared = self._shared_store.read(self._shared_key)
+        if not shared or shared.get("scope") != self.scope:
+            return False
+        
+        # Токен, отклонённый API, не берём повторно из хранилища
+        if shared.get("token") == self._invalidated_token:
+            return False
+        
+        expires_at = shared.get("expires_at", 0)
+        if time.time() >= expires_at - self.refresh_buffer_seconds:
+            return False
+        
+        self._current_token = shared.get("token")
+        self._token_expires_at = expires_at
+        logger.debug("Токен получен из общего хранилища")
+        return bool(self._current_token)
+    
+    def _publish_shared_token(self):
+        """Опубликовать текущий токен в общем хранилище"""
+        if self._shared_store is None:
+            return
+        try:
+            self._shared_store.publish(self._shared_key, {
+                "token": self._current_token,
+                "expires_at": self._token_expires_at,
+                "scope": self.scope,
+            })
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать токен в общем хранилище: {e}")
+        
     def _request_new_token(self) -> tuple[str, float]:
         """
         Запрос нового токена от API
@@ -56,7 +117,7 @@ class TokenManager:
         
         try:
             logger.info("Запрос нового токена GigaChat...")
-            response = requests.post(
+            response = get_global_http_client().post(
                 self.token_url,
                 headers=headers,
                 data=data,
@@ -99,9 +160,13 @@ class TokenManager:
             Актуальный access token
         """
         with self._lock:
+            if not force_refresh and self._is_token_expired() and self._load_shared_token():
+                return self._current_token
+            
             if force_refresh or self._is_token_expired():
                 try:
                     self._current_token, self._token_expires_at = self._request_new_token()
+                    self._publish_shared_token()
                 except Exception as e:
                     if self._current_token and not force_refresh:
                         # Если есть старый токен и это не принудительное обновление,
@@ -116,6 +181,7 @@ class TokenManager:
     def invalidate_token(self):
         """Принудительная инвалидация текущего токена"""
         with self._lock:
+            self._invalidated_token = self._current_token
             self._current_token = None
             self._token_expires_at = 0
             logger.info("Токен инвалидирован")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Дедлайн первого токена (time to first token) для streaming-запросов.
+
+Streaming-запрос, не получивший первый chunk до дедлайна, прерывается
+с FirstTokenTimeout; RetryEngine сразу перезапускает его - на другом deployment
+группы моделей или на том же deployment. Это безопасно: клиенту ещё ничего
+не отправлено.
+
+Дедлайн модели - перцентиль (percentile) времени до первого chunk deployment
+по последним запросам, умноженный на multiplier и ограниченный
+min_deadline..max_deadline. Пока значений меньше min_samples, используется
+max_deadline.
+"""
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .deployment_stats import DeploymentStatsRegistry, get_global_deployment_stats
+from .retry import DEPLOYMENT_METADATA_KEY, FirstTokenTimeout
+
+logger = logging.getLogger(__name__)
+
+# Признак streaming-ответа без единого chunk
+_END_OF_STREAM = object()
+
+
+@dataclass
+class TTFTConfig:
+    """Параметры дедлайна первого токена модели"""
+    enabled: bool = True
+    percentile: float = 0.99
+    multiplier: float = 2.0
+    min_deadline: float = 2.0
+    max_deadline: float = 20.0
+    min_samples: int = 20
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], base: Optional["TTFTConfig"] = None) -> "TTFTConfig":
+        """
+        Создать конфигурацию из словаря поверх base (неизвестные ключи игнорируются).
+
+        Args:
+            data: Словарь параметров
+            base: Значения по умолчанию
+
+        Returns:
+            TTFTConfig
+        """
+        values = dict(vars(base)) if base else {}
+        names = {f.name for f in fields(cls)}
+        values.update({key: value for key, value in (data or {}).items() if key in names})
+        return cls(**values)
+
+
+class PrefetchedStream:
+    """
+    Streaming-ответ с уже полученным первым chunk. Итерация начинается
+    с первого chunk, остальные атрибуты берутся из исходного ответа.
+    """
+
+    def __init__(self, stream: Any, first_chunk: Any):
+        self._stream = stream
+        self._first_chunk = first_chunk
+        self._first_pending = True
+
+    def __aiter__(self) -> "PrefetchedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._first_pending:
+            self._first_pending = False
+            chunk, self._first_chunk = self._first_chunk, None
+            if chunk is _END_OF_STREAM:
+                raise StopAsyncIteration
+            return chunk
+        return await self._stream.__anext__()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+async def prefetch_first_chunk(stream: Any) -> PrefetchedStream:
+    """
+    Дождаться первого chunk streaming-ответа.
+
+    Args:
+        stream: Streaming-ответ
+
+    Returns:
+        Ответ, итерация которого начинается с полученного chunk
+    """
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = _END_OF_STREAM
+    except asyncio.CancelledError:
+        # Ожидание прервано по дедлайну - соединение больше не нужно
+        await close_stream(stream)
+        raise
+    return PrefetchedStream(stream, first_chunk)
+
+
+async def close_stream(stream: Any) -> None:
+    """Закрыть соединение брошенного streaming-ответа (ошибки игнорируются)"""
+    for target in (stream, getattr(stream, "completion_stream", None)):
+        close = getattr(target, "aclose", None) or getattr(target, "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.debug(f"Ошибка закрытия streaming-ответа: {e}")
+        return
+
+
+class TTFTWatchdog:
+    """Дедлайны первого chunk streaming-запросов по гистограммам deployments"""
+
+    def __init__(self, default: Optional[TTFTConfig] = None,
+                 models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 stats: Optional[DeploymentStatsRegistry] = None):
+        """
+        Args:
+            default: Параметры по умолчанию
+            models: Переопределения для моделей (deployments или групп моделей)
+            stats: Статистика deployments (по умолчанию глобальная)
+        """
+        self.default = default or TTFTConfig()
+        self.models = models or {}
+        self.stats = stats or get_global_deployment_stats()
+
+        self._counters_lock = threading.Lock()
+        self.counters: Dict[str, int] = {"streams": 0, "timeouts": 0}
+
+    @classmethod
+    def from_config(cls, section: Optional[Dict[str, Any]]) -> "TTFTWatchdog":
+        """
+        Создать из секции ttft config.yml.
+
+        Args:
+            section: {"default": {...}, "models": {...}}
+
+        Returns:
+            TTFTWatchdog
+        """
+        section = section or {}
+        return cls(default=TTFTConfig.from_dict(section.get("default")), models=section.get("models") or {})
+
+    def get_config(self, model: str, group: Optional[str] = None) -> TTFTConfig:
+        """Параметры модели: default <- models[группа] <- models[deployment]"""
+        config = self.default
+        for name in (group, model):
+            if name and name in self.models:
+                config = TTFTConfig.from_dict(self.models[name], base=config)
+        return config
+
+    def get_deadline(self, model: str, config: TTFTConfig) -> float:
+        """
+        Дедлайн первого chunk для deployment.
+
+        Args:
+            model: Deployment
+            config: Параметры модели
+
+        Returns:
+            Дедлайн в секундах
+        """
+        percentile = self.stats.get_ttft_percentile(model, config.percentile, min_samples=config.min_samples)
+        if percentile is None:
+            return config.max_deadline
+        return min(config.max_deadline, max(config.min_deadline, percentile * config.multiplier))
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    async def call(self, function: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any]) -> Any:
+        """
+        Открыть streaming-ответ и дождаться первого chunk до дедлайна.
+
+        Args:
+            function: Асинхронная функция вызова модели (принимает kwargs)
+            kwargs: Аргументы вызова
+
+        Returns:
+            Streaming-ответ, начинающийся с полученного первого chunk
+
+        Raises:
+            FirstTokenTimeout: Первый chunk не получен до дедлайна
+        """
+        model = kwargs.get("model") or ""
+        info = (kwargs.get("metadata") or {}).get(DEPLOYMENT_METADATA_KEY) or {}
+        config = self.get_config(model, info.get("group"))
+        if not config.enabled:
+            return await function(**kwargs)
+
+        self._count("streams")
+        deadline = self.get_deadline(model, config)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def open_stream():
+            return await prefetch_first_chunk(await function(**kwargs))
+
+        try:
+            stream = await asyncio.wait_for(open_stream(), timeout=deadline)
+        except asyncio.TimeoutError:
+            if loop.time() - started < deadline:
+                # Таймаут внутри вызова (таймауты deployment), а не дедлайн первого токена
+                raise
+            self._count("timeouts")
+            logger.warning(f"Первый chunk от {model} не получен за {deadline:.1f}s, запрос будет перезапущен")
+            raise FirstTokenTimeout(f"Первый chunk от {model} не получен за {deadline:.1f}s") from None
+
+        self.stats.record_ttft(model, loop.time() - started)
+        return stream
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Счётчики streaming-запросов и дедлайнов.
+
+        Returns:
+            Словарь: счётчики и текущие дедлайны deployments
+        """
+        deadlines = {}
+        for model in self.stats.get_ttft_histograms():
+            deadlines[model] = round(self.get_deadline(model, self.get_config(model)), 3)
+        with self._counters_lock:
+            return {**self.counters, "deadlines": deadlines}
+
+
+# Глобальный экземпляр
+_global_ttft_watchdog: Optional[TTFTWatchdog] = None
+
+
+def get_global_ttft_watchdog() -> Optional[TTFTWatchdog]:
+    """
+    Получить глобальный TTFTWatchdog.
+
+    Returns:
+        Глобальный экземпляр или None если дедлайны первого токена не настроены
+    """
+    return _global_ttft_watchdog
+
+
+def init_global_ttft_watchdog(section: Optional[Dict[str, Any]] = None) -> TTFTWatchdog:
+    """
+    Инициализировать глобальный TTFTWatchdog.
+
+    Args:
+        section: Секция ttft config.yml
+
+    Returns:
+        Инициализированный TTFTWatchdog
+    """
+    global _global_ttft_watchdog
+
+    _global_ttft_watchdog = TTFTWatchdog.from_config(section)
+
+    return _global_ttft_watchdog
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Координация фоновых задач между worker-процессами прокси.
+
+Синхронизацию моделей и обновление токена выполняет только лидер
+(выбранный через LeaderElection). Лидер публикует каталоги провайдеров
+и токен в SharedStateStore, остальные worker применяют их у себя.
+Если лидер завершается, его блокировку захватывает следующий worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .shared_state import LeaderElection, SharedStateStore
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCoordinator:
+    """
+    Фоновый поток worker-процесса, распределяющий роли лидера и ведомых.
+    """
+
+    CATALOG_PREFIX = "catalog-"
+    # Пауза перед повторным обновлением токена после ошибки
+    TOKEN_RETRY_SECONDS = 30.0
+
+    def __init__(
+        self,
+        store: SharedStateStore,
+        election: LeaderElection,
+        multi_sync_manager=None,
+        token_manager_getter: Optional[Callable[[], Any]] = None,
+        poll_interval: float = 2.0,
+    ):
+        """
+        Инициализация координатора.
+
+        Args:
+            store: Общее хранилище состояния
+            election: Выбор лидера
+            multi_sync_manager: MultiModelSyncManager процесса (если есть прокси-провайдеры)
+            token_manager_getter: Функция, возвращающая TokenManager или None
+            poll_interval: Период проверки лидерства и общего состояния в секундах
+        """
+        self.store = store
+        self.election = election
+        self.multi_sync_manager = multi_sync_manager
+        self.token_manager_getter = token_manager_getter
+        self.poll_interval = poll_interval
+
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._applied_versions: Dict[str, int] = {}
+        self._leader_since: Optional[float] = None
+        self._token_manager = None
+        self._token_retry_at = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        """Является ли процесс лидером"""
+        return self.election.is_leader
+
+    def _get_token_manager(self):
+        """TokenManager процесса с подключённым общим хранилищем (или None)"""
+        if self._token_manager is None and self.token_manager_getter:
+            try:
+                token_manager = self.token_manager_getter()
+            except Exception as exc:
+                logger.debug(f"TokenManager недоступен: {exc}")
+                return None
+            if token_manager is not None:
+                token_manager.attach_shared_store(self.store)
+                self._token_manager = token_manager
+        return self._token_manager
+
+    def _publish_catalog(self, provider_name: str, models: List[Dict[str, Any]]) -> None:
+        """Публикация каталога провайдера для ведомых worker"""
+        self.store.publish(f"{self.CATALOG_PREFIX}{provider_name}", {
+            "provider": provider_name,
+            "models": models,
+            "published_at": time.time(),
+            "leader_pid": os.getpid(),
+        })
+
+    def _become_leader(self) -> None:
+        """Запуск задач лидера: синхронизация моделей и обновление токена"""
+        self._leader_since = time.time()
+        logger.info(f"Worker {os.getpid()} выполняет синхронизацию моделей и обновление токена")
+
+        if self.multi_sync_manager:
+            self.multi_sync_manager.set_catalog_listener(self._publish_catalog)
+            self.multi_sync_manager.start_all()
+
+    def _refresh_token(self) -> None:
+        """Упреждающее обновление токена лидером"""
+        token_manager = self._get_token_manager()
+        if token_manager is None or time.time() < self._token_retry_at:
+            return
+        try:
+            # get_token обновляет токен заранее (за refresh_buffer_seconds) и публикует его
+            token_manager.get_token()
+        except Exception as exc:
+            self._token_retry_at = time.time() + self.TOKEN_RETRY_SECONDS
+            logger.warning(f"Лидер не смог обновить токен: {exc}")
+
+    def _apply_published_catalogs(self) -> None:
+        """Применение каталогов, опубликованных лидером"""
+        if not self.multi_sync_manager:
+            return
+
+        for key in self.store.keys(self.CATALOG_PREFIX):
+            version = self.store.get_version(key)
+            if version is None or self._applied_versions.get(key) == version:
+                continue
+
+            published = self.store.read(key)
+            if not published:
+                continue
+
+            provider_name = published.get("provider", key[len(self.CATALOG_PREFIX):])
+            if self.multi_sync_manager.apply_catalog(provider_name, published.get("models", [])):
+                logger.debug(f"Применён каталог провайдера {provider_name} от лидера")
+            self._applied_versions[key] = version
+
+    def tick(self) -> None:
+        """Одна итерация координации (вызывается из фонового потока)"""
+        if not self.election.is_leader and self.election.try_acquire():
+            self._become_leader()
+
+        if self.election.is_leader:
+            self._refresh_token()
+        else:
+            # Ведомым нужен токен из хранилища - он подхватывается в TokenManager.get_token
+            self._get_token_manager()
+            self._apply_published_catalogs()
+
+    def _loop(self) -> None:
+        """Основной цикл координатора"""
+        while self._running:
+            try:
+                self.tick()
+            except Exception as exc:
+                logger.error(f"Ошибка координации worker: {exc}")
+            if self._stop_event.wait(self.poll_interval):
+                break
+
+    def start(self) -> None:
+        """Запустить координацию в фоновом потоке"""
+        if self._running:
+            return
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановить координацию и освободить лидерство"""
+        self._running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+        if self.election.is_leader and self.multi_sync_manager:
+            self.multi_sync_manager.stop_all()
+        self.election.release()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Получить статус координации.
+
+        Returns:
+            Словарь с ролью процесса и версиями применённых каталогов
+        """
+        return {
+            "pid": os.getpid(),
+            "is_leader": self.is_leader,
+            "leader_since": self._leader_since,
+            "state_dir": str(self.store.directory),
+            "applied_catalogs": sorted(self._applied_versions),
+        }
+
+
+# Глобальный экземпляр координатора (создаётся только в режиме нескольких worker)
+_global_worker_coordinator: Optional[WorkerCoordinator] = None
+
+
+def get_global_worker_coordinator() -> Optional[WorkerCoordinator]:
+    """
+    Получить глобальный экземпляр WorkerCoordinator.
+
+    Returns:
+        Глобальный экземпляр или None если прокси запущен одним процессом
+    """
+    return _global_worker_coordinator
+
+
+def init_global_worker_coordinator(
+    state_dir: str,
+    multi_sync_manager=None,
+    token_manager_getter: Optional[Callable[[], Any]] = None,
+    poll_interval: float = 2.0,
+) -> WorkerCoordinator:
+    """
+    Инициализировать глобальный координатор worker-процесса.
+
+    Args:
+        state_dir: Каталог общего состояния (общий для всех worker)
+        multi_sync_manager: MultiModelSyncManager процесса
+        token_manager_getter: Функция, возвращающая TokenManager или None
+        poll_interval: Период проверки лидерства в секундах
+
+    Returns:
+        Инициализированный WorkerCoordinator
+    """
+    global _global_worker_coordinator
+
+    store = SharedStateStore(state_dir)
+    election = LeaderElection(os.path.join(state_dir, "leader.lock"))
+    _global_worker_coordinator = WorkerCoordinator(
+        store=store,
+        election=election,
+        multi_sync_manager=multi_sync_manager,
+        token_manager_getter=token_manager_getter,
+        poll_interval=poll_interval,
+    )
+    return _global_worker_coordinator
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Маршруты пакетной обработки /gigachat/batches.
+
+Запросы задания выполняются внутри прокси тем же путём, что и запросы
+клиентов: pre-call hooks (квоты RPM/TPM, группы моделей, лимиты
+параллельности, справедливая очередь, токены GigaChat) и LiteLLM Router
+с RetryEngine. Поэтому задание соблюдает лимиты GigaChat и обходит
+недоступных провайдеров; запросы идут в полосе приоритета batch.
+
+Доступ ключа и команды к моделям (user_api_key_auth проверяет только model
+тела запроса) проверяется при создании задания для каждой строки JSONL.
+"""
+
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse
+from litellm.proxy._types import LitellmUserRoles, UserAPIKeyAuth
+from litellm.proxy.auth.user_api_key_auth import user_api_key_auth
+
+from ..core.batch import (
+    DEFAULT_ENDPOINT,
+    SUPPORTED_ENDPOINTS,
+    BatchCallError,
+    BatchInputError,
+    BatchItem,
+    get_global_batch_manager,
+    parse_batch_line,
+)
+
+logger = logging.getLogger(__name__)
+
+# Поля ключа API, от имени которого выполняется задание (в т.ч. после перезапуска)
+OWNER_FIELDS = ("token", "key_alias", "team_id", "user_id", "user_role", "metadata", "team_metadata")
+
+# Полоса приоритета запросов заданий (секция scheduler)
+BATCH_PRIORITY = "batch"
+
+CALL_TYPES = {
+    "/v1/chat/completions": ("completion", "acompletion"),
+    "/v1/completions": ("text_completion", "atext_completion"),
+    "/v1/embeddings": ("embeddings", "aembedding"),
+}
+
+
+def get_owner(user_api_key_dict: UserAPIKeyAuth) -> Dict[str, Any]:
+    """Сохраняемые поля ключа API владельца задания"""
+    owner = {}
+    for name in OWNER_FIELDS:
+        value = getattr(user_api_key_dict, name, None)
+        owner[name] = value.value if hasattr(value, "value") else value
+    return owner
+
+
+def make_proxy_call(job: Dict[str, Any]) -> Callable[[BatchItem], Awaitable[Any]]:
+    """
+    Функция выполнения запросов задания через LiteLLM Proxy.
+
+    Args:
+        job: Описание задания
+
+    Returns:
+        Корутина: BatchItem -> тело ответа
+    """
+    import litellm.proxy.proxy_server as proxy_server
+
+    user_api_key_dict = UserAPIKeyAuth(**{key: value for key, value in job.get("owner", {}).items()
+                                          if value is not None})
+
+    async def call(item: BatchItem) -> Any:
+        call_type, method = CALL_TYPES[item.url]
+        data = dict(item.body)
+        data["stream"] = False
+        metadata = dict(data.get("metadata") or {})
+        metadata.update(
+            headers={"x-priority": BATCH_PRIORITY},
+            user_api_key=user_api_key_dict.token,
+            user_api_key_alias=user_api_key_dict.key_alias,
+            user_api_key_team_id=user_api_key_dict.team_id,
+            user_api_key_user_id=user_api_key_dict.user_id,
+            batch_id=job["id"],
+            batch_custom_id=item.custom_id,
+        )
+        data["metadata"] = metadata
+
+        router = proxy_server.llm_router
+        if router is None:
+            raise BatchCallError(503, "LiteLLM Router не инициализирован")
+        try:
+            data = await proxy_server.proxy_logging_obj.pre_call_hook(
+                user_api_key_dict=user_api_key_dict, data=data, call_type=call_type
+            )
+            response = await getattr(router, method)(**data)
+        except Exception as e:
+            try:
+                await proxy_server.proxy_logging_obj.post_call_failure_hook(
+                    request_data=data, original_exception=e, user_api_key_dict=user_api_key_dict
+                )
+            except Exception as hook_error:
+                logger.debug(f"Ошибка post_call_failure_hook задания: {hook_error}")
+            raise to_batch_error(e) from None
+        return response.model_dump() if hasattr(response, "model_dump") else response
+
+    return call
+
+
+def to_batch_error(error: Exception) -> BatchCallError:
+    """HTTPException / ошибка LiteLLM -> BatchCallError со статусом и Retry-After"""
+    status_code = getattr(error, "status_code", None) or 500
+    headers = getattr(error, "headers", None) or {}
+    if not headers:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+    retry_after = None
+    for key, value in dict(headers).items():
+        if str(key).lower() == "retry-after":
+            try:
+                retry_after = float(value)
+            except (TypeError, ValueError):
+                pass
+    message = getattr(error, "detail", None) or getattr(error, "message", None) or str(error)
+    return BatchCallError(int(status_code), str(message), retry_after=retry_after)
+
+
+async def check_model_access(content: bytes, user_api_key_dict: UserAPIKeyAuth) -> None:
+    """
+    Проверить доступ ключа и команды владельца к моделям всех запросов задания.
+
+    Args:
+        content: Входной JSONL
+        user_api_key_dict: Ключ API владельца задания
+
+    Raises:
+        HTTPException: 400, если модель строки недоступна ключу или команде
+    """
+    import litellm.proxy.proxy_server as proxy_server
+    from litellm.proxy._types import LiteLLM_TeamTable
+    from litellm.proxy.auth.auth_checks import can_key_call_model, can_team_access_model
+
+    models: Dict[str, str] = {}
+    for index, line in enumerate(content.decode("utf-8", errors="replace").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = parse_batch_line(line, index)
+        except BatchInputError:
+            continue  # ошибку формата сообщит создание задания
+        models.setdefault(str(item.body["model"]), item.custom_id)
+
+    router = proxy_server.llm_router
+    team = None
+    if user_api_key_dict.team_id is not None:
+        team = LiteLLM_TeamTable(team_id=user_api_key_dict.team_id, models=user_api_key_dict.team_models or [])
+    # all-team-models - доступ ключа определяется командой (как в user_api_key_auth)
+    check_key = "all-team-models" not in (user_api_key_dict.models or [])
+    for model, custom_id in models.items():
+        try:
+            if check_key:
+                await can_key_call_model(model=model, llm_model_list=None, valid_token=user_api_key_dict,
+                                         llm_router=router)
+            if team is not None:
+                await can_team_access_model(model=model, team_object=team, llm_router=router,
+                                            team_model_aliases=user_api_key_dict.team_model_aliases)
+        except Exception as exc:
+            message = getattr(exc, "message", None) or str(exc)
+            raise HTTPException(status_code=400, detail=f"Запрос {custom_id}: модель {model} недоступна ({message})")
+
+
+def _get_manager():
+    manager = get_global_batch_manager()
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Пакетная обработка не настроена")
+    return manager
+
+
+def _get_job(job_id: str, user_api_key_dict: UserAPIKeyAuth) -> Dict[str, Any]:
+    """Задание, доступное ключу (владельцу или администратору прокси)"""
+    job = _get_manager().get(job_id)
+    if job is None or not _can_access(job, user_api_key_dict):
+        raise HTTPException(status_code=404, detail=f"Задание {job_id} не найдено")
+    return job
+
+
+def _can_access(job: Dict[str, Any], user_api_key_dict: UserAPIKeyAuth) -> bool:
+    if user_api_key_dict.user_role == LitellmUserRoles.PROXY_ADMIN:
+        return True
+    return job.get("owner", {}).get("token") == user_api_key_dict.token
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Описание задания без данных ключа владельца"""
+    return {key: value for key, value in job.items() if key != "owner"}
+
+
+async def create_batch(request: Request, endpoint: str = DEFAULT_ENDPOINT,
+                       user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """
+    Создать задание из JSONL в теле запроса.
+
+    Args:
+        endpoint: Endpoint запросов без url (/v1/chat/completions, /v1/completions, /v1/embeddings)
+
+    Returns:
+        Описание задания
+    """
+    if endpoint not in SUPPORTED_ENDPOINTS:
+        raise HTTPException(status_code=400, detail=f"Endpoint {endpoint} не поддерживается")
+    content = await request.body()
+    await check_model_access(content, user_api_key_dict)
+    try:
+        job = _get_manager().create(content, endpoint=endpoint, owner=get_owner(user_api_key_dict))
+    except BatchInputError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    logger.info(f"Создано задание {job['id']}: {job['request_counts']['total']} запросов")
+    return _public(job)
+
+
+async def list_batches(user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """Задания ключа (администратору - все)"""
+    jobs = [_public(job) for job in _get_manager().list() if _can_access(job, user_api_key_dict)]
+    return {"object": "list", "data": jobs}
+
+
+async def get_batch(batch_id: str, user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """Состояние задания"""
+    return _public(_get_job(batch_id, user_api_key_dict))
+
+
+async def get_batch_output(batch_id: str,
+                           user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> FileResponse:
+    """Выходной JSONL задания (для незавершённого - уже выполненные запросы)"""
+    _get_job(batch_id, user_api_key_dict)
+    path = _get_manager().output_path(batch_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Выходной файл ещё не создан")
+    return FileResponse(path, media_type="application/jsonl", filename=f"{batch_id}_output.jsonl")
+
+
+async def cancel_batch(batch_id: str, user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """Отменить задание: новые запросы не начинаются, выполненные остаются в выходном файле"""
+    _get_job(batch_id, user_api_key_dict)
+    return _public(_get_manager().cancel(batch_id))
+
+
+def register_batch_routes(app: FastAPI) -> None:
+    """
+    Регистрация маршрутов /gigachat/batches.
+
+    Args:
+        app: Приложение LiteLLM Proxy
+    """
+    app.add_api_route("/gigachat/batches", create_batch, methods=["POST"], tags=["gigachat"])
+    app.add_api_route("/gigachat/batches", list_batches, methods=["GET"], tags=["gigachat"])
+    app.add_api_route("/gigachat/batches/{batch_id}", get_batch, methods=["GET"], tags=["gigachat"])
+    app.add_api_route("/gigachat/batches/{batch_id}/output", get_batch_output, methods=["GET"], tags=["gigachat"])
+    app.add_api_route("/gigachat/batches/{batch_id}/cancel", cancel_batch, methods=["POST"], tags=["gigachat"])
+    logger.debug("Маршруты /gigachat/batches зарегистрированы")
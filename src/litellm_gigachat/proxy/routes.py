@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Дополнительные HTTP-маршруты litellm-gigachat в приложении LiteLLM Proxy.
+
+Маршруты /gigachat/admin/* доступны только ключам с ролью proxy_admin
+(или master key), остальные - любому действующему ключу.
+"""
+
+import logging
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from litellm.proxy._types import LitellmUserRoles, UserAPIKeyAuth
+from litellm.proxy.auth.user_api_key_auth import user_api_key_auth
+
+from ..core.admission import get_global_admission_controller
+from ..core.cancellation import get_global_cancellation_stats
+from ..core.context_window import get_global_context_window_manager
+from ..core.embeddings import get_global_embedding_batcher
+from ..core.token_estimator import get_global_token_estimator
+from ..core.config_loader import ConfigError
+from ..core.concurrency import get_global_concurrency_limiters
+from ..core.health import get_global_provider_health_manager
+from ..core.metrics import render_prometheus
+from ..core.model_groups import get_global_model_group_router
+from ..core.multi_model_sync import get_global_multi_model_sync_manager
+from ..core.proxy_provider_manager import get_global_multi_proxy_provider_manager
+from ..core.rate_limits import get_global_rate_limiters
+from ..core.hedging import get_global_hedger
+from ..core.retry import get_global_retry_engine
+from ..core.scheduler import get_global_fair_scheduler
+from ..core.timeouts import get_global_timeout_settings
+from ..core.ttft import get_global_ttft_watchdog
+
+logger = logging.getLogger(__name__)
+
+
+def require_proxy_admin(user_api_key_dict: UserAPIKeyAuth = Depends(user_api_key_auth)) -> UserAPIKeyAuth:
+    """
+    Проверка, что запрос выполнен администратором прокси.
+
+    Raises:
+        HTTPException: 403, если у ключа нет роли proxy_admin
+    """
+    if user_api_key_dict.user_role != LitellmUserRoles.PROXY_ADMIN:
+        raise HTTPException(status_code=403, detail="Требуется роль proxy_admin")
+    return user_api_key_dict
+
+
+async def reload_providers(_: UserAPIKeyAuth = Depends(require_proxy_admin)) -> dict:
+    """
+    Принудительная перезагрузка proxy_providers из файла конфигурации.
+
+    Returns:
+        Изменения (added/removed/changed/unchanged) и состояние перезагрузки
+    """
+    provider_manager = get_global_multi_proxy_provider_manager()
+    if provider_manager.config_path is None:
+        raise HTTPException(status_code=409, detail="Конфигурация прокси-провайдеров не загружена")
+
+    try:
+        changes = provider_manager.reload_from_config()
+    except ConfigError as exc:
+        raise HTTPException(status_code=400, detail={"errors": exc.errors})
+
+    return {"changes": changes, "reload": provider_manager.get_reload_info()}
+
+
+async def gigachat_status(_: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """
+    Состояние прокси-провайдеров: circuit breaker, активные проверки, лимиты
+    параллельности, справедливая очередь, допуск по SLO, квоты RPM/TPM, повторы, hedging, дедлайны первого токена, таймауты,
+    отмены запросов и синхронизация.
+
+    Returns:
+        Словарь со статусом провайдеров и горячей перезагрузки
+    """
+    health_manager = get_global_provider_health_manager()
+    multi_sync_manager = get_global_multi_model_sync_manager()
+    limiters = get_global_concurrency_limiters()
+    scheduler = get_global_fair_scheduler()
+    admission = get_global_admission_controller()
+    rate_limiters = get_global_rate_limiters()
+    retry_engine = get_global_retry_engine()
+    hedger = get_global_hedger()
+    ttft_watchdog = get_global_ttft_watchdog()
+    timeout_settings = get_global_timeout_settings()
+    cancellation_stats = get_global_cancellation_stats()
+    embedding_batcher = get_global_embedding_batcher()
+    token_estimator = get_global_token_estimator()
+    context_window = get_global_context_window_manager()
+    return {
+        "health": health_manager.get_status() if health_manager else {},
+        "concurrency": limiters.get_metrics() if limiters else {},
+        "scheduler": scheduler.get_metrics() if scheduler else None,
+        "admission": admission.get_metrics() if admission else None,
+        "rate_limits": rate_limiters.get_metrics() if rate_limiters else {},
+        "retries": retry_engine.get_metrics() if retry_engine else None,
+        "hedging": hedger.get_metrics() if hedger else None,
+        "ttft": ttft_watchdog.get_metrics() if ttft_watchdog else None,
+        "timeouts": timeout_settings.get_metrics() if timeout_settings else None,
+        "cancellation": cancellation_stats.get_metrics() if cancellation_stats else None,
+        "embeddings": embedding_batcher.get_metrics() if embedding_batcher else None,
+        "token_estimator": token_estimator.get_metrics() if token_estimator else None,
+        "context_window": context_window.get_metrics() if context_window else None,
+        "sync": multi_sync_manager.get_status() if multi_sync_manager else None,
+        "reload": get_global_multi_proxy_provider_manager().get_reload_info(),
+    }
+
+
+async def gigachat_metrics(_: UserAPIKeyAuth = Depends(user_api_key_auth)) -> PlainTextResponse:
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def model_groups_status(_: UserAPIKeyAuth = Depends(user_api_key_auth)) -> dict:
+    """
+    Группы моделей: участники, EWMA задержки, доля ошибок и запросы в работе.
+
+    Returns:
+        Словарь: имя группы -> участники со статистикой
+    """
+    model_group_router = get_global_model_group_router()
+    return {"model_groups": model_group_router.get_status() if model_group_router else {}}
+
+
+def register_gigachat_routes(app: FastAPI) -> None:
+    """
+    Регистрация маршрутов litellm-gigachat.
+
+    Args:
+        app: Приложение LiteLLM Proxy
+    """
+    app.add_api_route(
+        "/gigachat/admin/reload",
+        reload_providers,
+        methods=["POST"],
+        tags=["gigachat"],
+    )
+    app.add_api_route(
+        "/gigachat/status",
+        gigachat_status,
+        methods=["GET"],
+        tags=["gigachat"],
+    )
+    app.add_api_route(
+        "/gigachat/metrics",
+        gigachat_metrics,
+        methods=["GET"],
+        tags=["gigachat"],
+    )
+    app.add_api_route(
+        "/gigachat/model-groups",
+        model_groups_status,
+        methods=["GET"],
+        tags=["gigachat"],
+    )
+    logger.debug("Маршруты /gigachat зарегистрированы")
@@ -43,14 +43,13 @@ def has_official_gigachat_models(config_file: str) -> bool:
         True если есть официальные модели GigaChat, False иначе
     """
     try:
-        import yaml
+        from ..core.config_loader import load_config
         
         if not Path(config_file).exists():
             logger.warning(f"Файл конфигурации {config_file} не найден")
             return False
         
-        with open(config_file, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_config(config_file)
         
         if not config or 'model_list' not in config:
             logger.warning("Конфигурация не содержит model_list")
@@ -193,6 +192,10 @@ def setup_certificates() -> bool:
                 f.write('\n')
             
             logger.info("Российский корневой сертификат успешно добавлен")
+            
+            # Пересоздаём пулы соединений, чтобы они использовали обновлённый CA bundle
+            from ..core.http_client import reset_global_http_client
+            reset_global_http_client()
             return True
             
         except subprocess.TimeoutExpired:
@@ -249,12 +252,14 @@ def setup_gigachat_integration() -> bool:
         return False
 
 
-def setup_model_sync(config_file: str = "config.yml") -> bool:
+def setup_model_sync(config_file: str = "config.yml", start_sync: bool = True) -> bool:
     """
     Настройка автоматической синхронизации моделей для прокси-провайдеров.
     
     Args:
         config_file: Путь к файлу конфигурации
+        start_sync: Запускать ли фоновую синхронизацию сразу. В режиме нескольких
+            worker её запускает только лидер (см. WorkerCoordinator)
     
     Returns:
         True если синхронизация настроена успешно, False если отключена или произошла ошибка
@@ -265,11 +270,25 @@ def setup_model_sync(config_file: str = "config.yml") -> bool:
         # Импортируем необходимые модули
         from ..core.proxy_provider_manager import init_multi_proxy_provider_manager
         from ..core.multi_model_sync import init_global_multi_model_sync_manager
-        from ..callbacks.model_sync_callback import get_update_callback
+        from ..callbacks.model_sync_callback import (
+            apply_provider_changes,
+            get_update_callback,
+            register_wildcard_deployment,
+        )
         
         # Инициализируем менеджер прокси-провайдеров
         provider_manager = init_multi_proxy_provider_manager(config_file)
         
+        # Инициализируем multi sync manager (даже без провайдеров - они могут
+        # появиться при горячей перезагрузке конфигурации)
+        multi_sync_manager = init_global_multi_model_sync_manager()
+        
+        # Устанавливаем callback для обновления моделей
+        multi_sync_manager.set_update_callback(get_update_callback())
+        
+        # Изменения proxy_providers применяются к Router и синхронизации без перезапуска
+        provider_manager.add_reload_listener(apply_provider_changes)
+        
         # Получаем список всех провайдеров
         providers = provider_manager.get_all_providers()
         
@@ -277,18 +296,19 @@ def setup_model_sync(config_file: str = "config.yml") -> bool:
             logger.info("Нет настроенных прокси-провайдеров")
             return True
         
+        # Для wildcard-провайдеров регистрируем один шаблонный deployment вместо каждой модели
+        for provider in providers:
+            if provider.is_wildcard():
+                register_wildcard_deployment(provider)
+        
         # Фильтруем провайдеров с включенной синхронизацией
         sync_providers = [p for p in providers if p.sync_enabled]
         
         if not sync_providers:
             logger.info("Автоматическая синхронизация моделей отключена для всех провайдеров")
+            if start_sync:
+                multi_sync_manager.start_all()
             return True
-
-        # Инициализируем multi sync manager
-        multi_sync_manager = init_global_multi_model_sync_manager()
-        
-        # Устанавливаем callback для обновления моделей
-        multi_sync_manager.set_update_callback(get_update_callback())
         
         # Добавляем каждого провайдера
         added_count = 0
@@ -301,6 +321,10 @@ def setup_model_sync(config_file: str = "config.yml") -> bool:
             logger.warning("Не удалось добавить ни одного провайдера для синхронизации")
             return False
         
+        if not start_sync:
+            logger.info(f"Синхронизация моделей настроена для {added_count} провайдеров (запуск отложен)")
+            return True
+        
         # Запускаем фоновую синхронизацию для всех провайдеров
         multi_sync_manager.start_all()
         
@@ -314,16 +338,574 @@ def setup_model_sync(config_file: str = "config.yml") -> bool:
         return False
 
 
+def setup_model_groups(config_file: str = "config.yml") -> bool:
+    """
+    Настройка групп моделей (секция model_groups).
+
+    Запросы к группам обрабатывает ModelGroupCallback, который должен быть
+    подключён первым в litellm_settings.callbacks.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+
+    Returns:
+        True если группы загружены (или не настроены)
+    """
+    try:
+        from ..core.model_groups import init_global_model_group_router
+        from ..callbacks.model_sync_callback import register_model_group_names
+
+        init_global_model_group_router(config_file)
+        # Группы могут появиться позже при изменении config.yml
+        register_model_group_names()
+        return True
+
+    except Exception as exc:
+        logger.error(f"Ошибка настройки групп моделей: {exc}")
+        return False
+
+
+def setup_concurrency_limits(config_file: str = "config.yml") -> None:
+    """
+    Настройка адаптивных лимитов параллельности (секция concurrency_limits).
+    Лимиты включаются наличием секции; concurrency_limits.enabled: false отключает их.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.concurrency import init_global_concurrency_limiters
+    from ..core.config_loader import load_config
+
+    config = load_config(config_file)
+    if "concurrency_limits" not in config:
+        return
+    section = config.get("concurrency_limits") or {}
+    if section.get("enabled", True):
+        registry = init_global_concurrency_limiters(section)
+        logger.info(f"Адаптивные лимиты параллельности включены (начальный лимит {registry.default.initial_limit})")
+
+
+def setup_scheduler(config_file: str = "config.yml") -> None:
+    """
+    Настройка справедливой очереди к deployments по ключам и полосам приоритета
+    (секция scheduler). Включается параметром scheduler.enabled: true;
+    очередью управляют лимитеры параллельности.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.scheduler import init_global_fair_scheduler
+
+    section = load_config(config_file).get("scheduler") or {}
+    if section.get("enabled"):
+        scheduler = init_global_fair_scheduler(section)
+        logger.info(f"Справедливая очередь включена, полосы: {', '.join(scheduler.lanes)}")
+
+
+def setup_admission(config_file: str = "config.yml") -> None:
+    """
+    Настройка контроля допуска по SLO моделей (секция admission).
+    Включается параметром admission.enabled: true; проверку выполняют
+    лимитеры параллельности.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.admission import init_global_admission_controller
+    from ..core.config_loader import load_config
+
+    section = load_config(config_file).get("admission") or {}
+    if section.get("enabled"):
+        init_global_admission_controller(section)
+        logger.info("Контроль допуска запросов по SLO включен")
+
+
+def setup_rate_limits(config_file: str = "config.yml") -> None:
+    """
+    Настройка клиентских квот RPM/TPM (секция rate_limits).
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.rate_limits import init_global_rate_limiters
+
+    init_global_rate_limiters(load_config(config_file).get("rate_limits"))
+
+
+def setup_hedging(config_file: str = "config.yml") -> None:
+    """
+    Настройка дублирующих запросов к группам моделей (секция hedging).
+    Включается параметром hedging.enabled: true; выполняется RetryEngine.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.hedging import init_global_hedger
+
+    section = load_config(config_file).get("hedging") or {}
+    if section.get("enabled"):
+        init_global_hedger(section)
+        logger.info("Hedging запросов к группам моделей включен")
+
+
+def setup_ttft_watchdog(config_file: str = "config.yml") -> None:
+    """
+    Настройка дедлайнов первого токена streaming-запросов (секция ttft).
+    Включается параметром ttft.enabled: true; выполняется RetryEngine.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.ttft import init_global_ttft_watchdog
+
+    section = load_config(config_file).get("ttft") or {}
+    if section.get("enabled"):
+        init_global_ttft_watchdog(section)
+        logger.info("Дедлайны первого токена streaming-запросов включены")
+
+
+def setup_timeouts(config_file: str = "config.yml") -> None:
+    """
+    Настройка раздельных таймаутов и дедлайнов клиента (секция timeouts
+    и поля *_timeout прокси-провайдеров); выполняется RetryEngine.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.timeouts import init_global_timeout_settings
+
+    init_global_timeout_settings(load_config(config_file).get("timeouts"))
+
+
+def setup_cancellation(app, config_file: str = "config.yml") -> None:
+    """
+    Настройка отмены запросов при отключении клиента (секция cancellation):
+    middleware прерывает обработку запроса и освобождает слоты и квоты.
+
+    Args:
+        app: Приложение LiteLLM Proxy
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.cancellation import CancellationConfig, CancelOnDisconnectMiddleware, init_global_cancellation_stats
+    from ..core.config_loader import load_config
+
+    config = CancellationConfig.from_dict(load_config(config_file).get("cancellation"))
+    if not config.enabled:
+        logger.info("Отмена запросов при отключении клиента выключена")
+        return
+    init_global_cancellation_stats()
+    app.add_middleware(CancelOnDisconnectMiddleware, config=config)
+
+
+def setup_batches(app, config_file: str = "config.yml") -> None:
+    """
+    Настройка пакетной обработки (секция batches): маршруты /gigachat/batches
+    и продолжение незавершённых заданий при запуске каждого worker
+    (задание выполняет один процесс - файловая блокировка задания).
+    Включается параметром batches.enabled: true.
+
+    Args:
+        app: Приложение LiteLLM Proxy
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.batch import init_global_batch_manager
+    from ..core.config_loader import load_config
+    from .batches import make_proxy_call, register_batch_routes
+
+    section = load_config(config_file).get("batches") or {}
+    if not section.get("enabled"):
+        return
+    manager = init_global_batch_manager(section, make_proxy_call)
+    register_batch_routes(app)
+    app.add_event_handler("startup", manager.resume)
+    logger.info(f"Пакетная обработка включена, каталог заданий: {manager.directory}")
+
+
+def setup_embeddings(config_file: str = "config.yml") -> None:
+    """
+    Настройка эмбеддингов (секция embeddings): объединение одновременных
+    запросов в пакеты и кэш векторов. Требуется callback
+    embeddings_callback_instance; отключается параметром embeddings.enabled: false.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.embeddings import init_global_embedding_batcher
+
+    batcher = init_global_embedding_batcher(load_config(config_file).get("embeddings"))
+    if batcher is None:
+        logger.info("Объединение запросов эмбеддингов выключено")
+        return
+    logger.info(
+        f"Объединение эмбеддингов: окно {batcher.config.batch_window_ms} мс, "
+        f"до {batcher.config.max_batch_size} текстов в запросе"
+    )
+    if batcher.cache is not None:
+        logger.info(f"Кэш эмбеддингов: {batcher.cache.max_entries} векторов, {batcher.cache.directory or 'в памяти'}")
+
+
+def setup_token_estimator(config_file: str = "config.yml") -> None:
+    """
+    Настройка локальной оценки токенов (секция token_estimator) и её
+    калибровки по POST /tokens/count GigaChat API (включается явно через
+    calibration_enabled, нужен GIGACHAT_AUTH_KEY).
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.token_estimator import GigaChatTokenCounter, TokenEstimatorConfig, init_global_token_estimator
+
+    section = load_config(config_file).get("token_estimator")
+    config = TokenEstimatorConfig.from_dict(section)
+    counter = None
+    if config.calibration_enabled and os.environ.get("GIGACHAT_AUTH_KEY"):
+        counter = GigaChatTokenCounter(model=config.calibration_model)
+    init_global_token_estimator(section, counter)
+    if counter is not None:
+        logger.info(
+            f"Оценка токенов калибруется по /tokens/count ({config.calibration_model}) "
+            f"не чаще раза в {config.calibration_interval:g}s"
+        )
+    else:
+        logger.info("Оценка токенов без калибровки")
+
+
+def setup_context_window(config_file: str = "config.yml") -> None:
+    """
+    Настройка управления окном контекста (секция context_window): промпт,
+    не помещающийся в окно модели, обрезается или переключается на модель
+    с большим окном до отправки. Отключается параметром context_window.enabled: false.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    from ..core.config_loader import load_config
+    from ..core.context_window import init_global_context_window_manager
+
+    manager = init_global_context_window_manager(load_config(config_file).get("context_window"))
+    if manager is None:
+        logger.info("Управление окном контекста выключено")
+        return
+    logger.info(f"Управление окном контекста: {', '.join(manager.config.strategies)}")
+
+
+def setup_retries(config_file: str = "config.yml") -> bool:
+    """
+    Настройка повторов запросов (секция retries): RetryEngine заменяет
+    повторы LiteLLM Router, выполняет hedging, дедлайны первого токена и
+    раздельные таймауты.
+    Отключается параметром retries.enabled: false.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+
+    Returns:
+        True если движок повторов установлен
+    """
+    import litellm.proxy.proxy_server as proxy_server
+    from ..core.config_loader import load_config
+    from ..core.hedging import get_global_hedger
+    from ..core.retry import init_global_retry_engine
+    from ..core.timeouts import get_global_timeout_settings
+    from ..core.ttft import get_global_ttft_watchdog
+    from ..callbacks.model_group_callback import prepare_request_for_deployment, release_request_for_deployment
+
+    section = load_config(config_file).get("retries") or {}
+    if section.get("enabled") is False:
+        logger.info("RetryEngine отключен, повторы выполняет LiteLLM Router")
+        return False
+    if getattr(proxy_server, "llm_router", None) is None:
+        logger.warning("LiteLLM Router не инициализирован, RetryEngine не установлен")
+        return False
+
+    engine = init_global_retry_engine(section)
+    engine.prepare_deployment = prepare_request_for_deployment
+    engine.release_deployment = release_request_for_deployment
+    engine.hedger = get_global_hedger()
+    engine.ttft_watchdog = get_global_ttft_watchdog()
+    engine.timeouts = get_global_timeout_settings()
+    engine.install(proxy_server.llm_router)
+    return True
+
+
+def start_provider_health_checks() -> None:
+    """
+    Запустить отслеживание доступности прокси-провайдеров (circuit breaker
+    и активные проверки). Выполняется в каждом процессе, обслуживающем запросы.
+    """
+    from ..core.health import init_global_provider_health_manager
+
+    init_global_provider_health_manager().start()
+
+
+def setup_config_reload() -> None:
+    """
+    Включить горячую перезагрузку proxy_providers: отслеживание файла
+    конфигурации и перезагрузку по сигналу SIGHUP.
+
+    Отключается переменной окружения GIGACHAT_CONFIG_WATCH=false.
+    """
+    import signal
+
+    from ..core.config_loader import ConfigError
+    from ..core.proxy_provider_manager import get_global_multi_proxy_provider_manager
+
+    provider_manager = get_global_multi_proxy_provider_manager()
+
+    if os.environ.get("GIGACHAT_CONFIG_WATCH", "true").lower() != "false":
+        provider_manager.watch_config(
+            poll_interval=float(os.environ.get("GIGACHAT_CONFIG_POLL_INTERVAL", 2.0))
+        )
+
+    if hasattr(signal, "SIGHUP"):
+        def reload_on_sighup(_signum, _frame):
+            logger.info("Получен SIGHUP, перезагрузка proxy_providers")
+            try:
+                provider_manager.reload_from_config()
+            except ConfigError:
+                pass  # ошибка уже залогирована, работаем со старой конфигурацией
+
+        signal.signal(signal.SIGHUP, reload_on_sighup)
+
+
 # ─────────────────────────────────────────────  Запуск прокси ─────────────────────────────────────────────
 
+def _get_token_manager_if_configured():
+    """TokenManager, если настроен GIGACHAT_AUTH_KEY (иначе None)."""
+    if "GIGACHAT_AUTH_KEY" not in os.environ:
+        return None
+    from ..core.token_manager import get_global_token_manager
+    return get_global_token_manager()
+
+
+def _run_worker(sock, state_dir: str, log_level: str, access_log: bool) -> None:
+    """
+    Тело worker-процесса: координация фоновых задач и обслуживание запросов.
+
+    Конфигурация LiteLLM и провайдеров уже загружена родительским процессом до fork.
+    """
+    import uvicorn
+    from litellm.proxy.proxy_server import app
+    from ..core.http_client import reset_global_http_client
+    from ..core.multi_model_sync import get_global_multi_model_sync_manager
+    from ..core.rate_limits import get_global_rate_limiters
+    from ..core.worker_coordinator import init_global_worker_coordinator
+
+    # Соединения пула, унаследованные от родителя, не используем
+    reset_global_http_client()
+
+    coordinator = init_global_worker_coordinator(
+        state_dir=state_dir,
+        multi_sync_manager=get_global_multi_model_sync_manager(),
+        token_manager_getter=_get_token_manager_if_configured,
+    )
+    coordinator.start()
+    rate_limiters = get_global_rate_limiters()
+    if rate_limiters is not None:
+        # Квоты с shared: true делятся между worker через общее хранилище
+        rate_limiters.attach_shared_store(coordinator.store)
+    setup_config_reload()
+    start_provider_health_checks()
+
+    try:
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, access_log=access_log))
+        server.run(sockets=[sock])
+    finally:
+        coordinator.stop()
+
+
+# Перезапуск упавших worker: задержка удваивается с каждым перезапуском в окне,
+# при превышении лимита перезапусков за окно главный процесс завершается
+WORKER_RESTART_WINDOW = 60.0
+WORKER_MAX_RESTARTS = 10
+WORKER_RESTART_BACKOFF = 0.5
+WORKER_RESTART_BACKOFF_MAX = 30.0
+
+
+def _serve_workers(
+    host: str,
+    port: int,
+    workers: int,
+    log_level: str,
+    access_log: bool,
+) -> bool:
+    """
+    Запускает worker-процессы на общем сокете и перезапускает упавшие.
+
+    Перезапуски выполняются с экспоненциальной задержкой; если за
+    WORKER_RESTART_WINDOW секунд worker перезапускались WORKER_MAX_RESTARTS раз,
+    остальные worker останавливаются и функция возвращает False.
+
+    Args:
+        host: Хост для прослушивания
+        port: Порт для прослушивания
+        workers: Количество worker-процессов
+        log_level: Уровень логирования uvicorn
+        access_log: Включить access log
+
+    Returns:
+        True при штатной остановке, False при превышении лимита перезапусков
+    """
+    import shutil
+    import signal
+    import socket
+    import tempfile
+    import time
+
+    state_dir = os.environ.get("LITELLM_GIGACHAT_STATE_DIR")
+    created_state_dir = state_dir is None
+    if created_state_dir:
+        state_dir = tempfile.mkdtemp(prefix="litellm-gigachat-")
+    os.makedirs(state_dir, exist_ok=True)
+    logger.info(f"Общее состояние worker-процессов: {state_dir}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = {}
+    restarts = []
+    stopping = False
+    failed = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+                    signal.signal(signum, signal.SIG_DFL)
+                _run_worker(sock, state_dir, log_level, access_log)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error(f"Worker {os.getpid()} завершился с ошибкой: {exc}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = time.time()
+        logger.info(f"Запущен worker {pid}")
+
+    def stop_children() -> None:
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        stop_children()
+
+    def forward_sighup(signum, _frame) -> None:
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    previous_handlers = {
+        signum: signal.signal(signum, shutdown) for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    previous_handlers[signal.SIGHUP] = signal.signal(signal.SIGHUP, forward_sighup)
+
+    try:
+        for _ in range(workers):
+            spawn()
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            children.pop(pid, None)
+            if stopping:
+                continue
+
+            now = time.time()
+            restarts[:] = [started for started in restarts if now - started < WORKER_RESTART_WINDOW]
+            if len(restarts) >= WORKER_MAX_RESTARTS:
+                logger.error(
+                    f"Worker {pid} завершился (статус {status}): {len(restarts)} перезапусков "
+                    f"за {WORKER_RESTART_WINDOW:g}s, остановка"
+                )
+                stopping = failed = True
+                stop_children()
+                continue
+
+            delay = min(WORKER_RESTART_BACKOFF * 2 ** len(restarts), WORKER_RESTART_BACKOFF_MAX)
+            logger.warning(f"Worker {pid} завершился (статус {status}), перезапуск через {delay:g}s")
+            deadline = now + delay
+            while not stopping and time.time() < deadline:
+                time.sleep(min(0.1, deadline - time.time()))
+            if stopping:
+                continue
+            restarts.append(time.time())
+            spawn()
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        sock.close()
+        if created_state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+    return not failed
+
+
+def share_config_with_litellm(config_file: str) -> None:
+    """
+    Передать LiteLLM Proxy уже загруженную конфигурацию вместо повторного разбора файла.
+
+    ProxyConfig._get_config_from_file заменяется на экземпляре: для нашего файла
+    возвращается копия результата load_config (LiteLLM изменяет конфигурацию на месте),
+    остальные пути обрабатываются штатно.
+
+    Args:
+        config_file: Путь к файлу конфигурации
+    """
+    import litellm.proxy.proxy_server as proxy_server
+    from ..core.config_loader import copy_config
+
+    proxy_config = proxy_server.proxy_config
+    original_get_config_from_file = type(proxy_config)._get_config_from_file.__get__(proxy_config)
+    shared_path = Path(config_file).resolve()
+
+    async def get_config_from_file(config_file_path=None):
+        file_path = config_file_path or proxy_server.user_config_file_path
+        if file_path is None or Path(file_path).resolve() != shared_path:
+            return await original_get_config_from_file(config_file_path=config_file_path)
+        if config_file_path is not None:
+            proxy_server.user_config_file_path = config_file_path
+        return copy_config(str(shared_path))
+
+    proxy_config._get_config_from_file = get_config_from_file
+
+
 def start_proxy_server(
     host: str = "0.0.0.0",
     port: int = 4000,
     config_file: str = "config.yml",
     verbose: bool = False,
     debug: bool = False,
+    workers: int = 1,
 ) -> bool:
-    """Запускает LiteLLM Proxy сервер (проверки должны быть выполнены до вызова)."""
+    """
+    Запускает LiteLLM Proxy сервер (проверки должны быть выполнены до вызова).
+
+    При workers > 1 конфигурация загружается один раз, после чего процесс
+    порождает worker-процессы на общем сокете. Синхронизацию моделей и
+    обновление токена выполняет один worker-лидер.
+    """
 
     # Проверка файла конфигурации
     if not Path(config_file).exists():
@@ -336,17 +918,32 @@ def start_proxy_server(
         logger.info("  Host: %s", host)
         logger.info("  Port: %s", port)
         logger.info("  Config: %s", config_file)
+        if workers > 1:
+            logger.info(f"  Workers: {workers}")
         if debug:
             logger.info("  Debug mode: enabled")
         if verbose:
             logger.info("  Verbose mode: enabled")
 
-    # 4. Запуск через uvicorn программно (в том же процессе)
+    # 4. Однократная загрузка и проверка конфигурации
+    from ..core.config_loader import ConfigError, load_config
+    try:
+        load_config(config_file)
+    except ConfigError as exc:
+        logger.error(f"Ошибка в конфигурации {config_file}:")
+        for error in exc.errors:
+            logger.error(f"  - {error}")
+        return False
+
+    # 5. Запуск через uvicorn программно (в том же процессе)
     try:
         import uvicorn
         import asyncio
         from litellm.proxy.proxy_server import app, initialize
         
+        # LiteLLM получает уже разобранную конфигурацию
+        share_config_with_litellm(config_file)
+        
         # Инициализация LiteLLM с конфигом
         async def init_and_start():
             # Инициализируем LiteLLM
@@ -357,15 +954,51 @@ def start_proxy_server(
             )
             
             # Теперь llm_router существует - запускаем синхронизацию моделей
-            if not setup_model_sync(config_file):
+            # (в режиме нескольких worker её запустит лидер после fork)
+            if not setup_model_sync(config_file, start_sync=workers <= 1):
                 logger.warning("Синхронизация моделей не запущена")
+            
+            setup_token_estimator(config_file)
+            setup_model_groups(config_file)
+            setup_context_window(config_file)
+            setup_concurrency_limits(config_file)
+            setup_scheduler(config_file)
+            setup_admission(config_file)
+            setup_rate_limits(config_file)
+            setup_hedging(config_file)
+            setup_ttft_watchdog(config_file)
+            setup_timeouts(config_file)
+            setup_retries(config_file)
+            setup_embeddings(config_file)
         
         # Запускаем инициализацию
         asyncio.run(init_and_start())
         
+        # Маршруты /gigachat (в т.ч. принудительная перезагрузка провайдеров)
+        from .routes import register_gigachat_routes
+        register_gigachat_routes(app)
+        
+        # Отмена запросов к моделям при отключении клиента
+        setup_cancellation(app, config_file)
+        
+        # Пакетная обработка /gigachat/batches
+        setup_batches(app, config_file)
+        
         # Настройка uvicorn
         log_level = "debug" if debug else ("info" if verbose else "info")
         
+        if workers > 1:
+            if not hasattr(os, "fork"):
+                logger.error("Режим нескольких worker не поддерживается на этой платформе")
+                return False
+            logger.info(f"🚀 Запуск {workers} worker-процессов uvicorn на {host}:{port}")
+            return _serve_workers(host, port, workers, log_level, access_log=verbose or debug)
+        
+        # Горячая перезагрузка proxy_providers и проверки доступности провайдеров
+        # (в режиме нескольких worker - в каждом worker после fork, см. _run_worker)
+        setup_config_reload()
+        start_provider_health_checks()
+        
         logger.info(f"🚀 Запуск uvicorn на {host}:{port}")
         
         # Запуск uvicorn
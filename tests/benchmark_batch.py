@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности пакетной обработки.
+
+Выполняет задание из N запросов через BatchRunner и HTTPBatchCaller при
+разной параллельности и выводит запросов в секунду. По умолчанию запросы
+идут во встроенный mock-провайдер (uvicorn в отдельном процессе) с заданной
+задержкой ответа и лимитом параллельности: сверх лимита он отвечает 429
+с Retry-After, как GigaChat при исчерпании квоты. С --url запросы идут
+в запущенный сервер, например mock-провайдер tests/mock_provider_1.py
+(заголовок X-Client-Id) или прокси.
+
+Запуск:
+    python tests/benchmark_batch.py --requests 500 --latency 0.05 --provider-limit 32
+    python tests/benchmark_batch.py --url http://localhost:8001 --header X-Client-Id=test-token-provider1
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.litellm_gigachat.core.batch import BatchRunner, HTTPBatchCaller  # noqa: E402
+
+
+def serve_mock_provider(port: int, latency: float, limit: int) -> None:
+    """Mock-провайдер OpenAI API: задержка ответа и 429 сверх лимита параллельности"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    state = {"active": 0}
+
+    async def chat_completions(request):
+        body = await request.json()
+        if state["active"] >= limit:
+            return JSONResponse({"error": {"message": "rate limit"}}, status_code=429,
+                                headers={"Retry-After": "0.05"})
+        state["active"] += 1
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            state["active"] -= 1
+        return JSONResponse({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+        })
+
+    app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_mock_provider(latency: float, limit: int) -> str:
+    """Запустить mock-провайдер в отдельном процессе (не делит GIL с клиентом); возвращает base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    multiprocessing.Process(target=serve_mock_provider, args=(port, latency, limit), daemon=True).start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def write_input(path: str, count: int, model: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        for index in range(count):
+            file.write(json.dumps({
+                "custom_id": f"q{index}",
+                "url": "/v1/chat/completions",
+                "body": {"model": model, "messages": [{"role": "user", "content": f"Вопрос {index}"}]},
+            }, ensure_ascii=False) + "\n")
+
+
+async def run_batch(args: argparse.Namespace, base_url: str, input_path: str, concurrency: int) -> dict:
+    headers = dict(header.split("=", 1) for header in args.header)
+    caller = HTTPBatchCaller(base_url, api_key=args.api_key, max_connections=concurrency, headers=headers)
+    runner = BatchRunner(caller, concurrency=concurrency, max_attempts=args.max_attempts, base_delay=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "output.jsonl")
+        started = time.monotonic()
+        try:
+            progress = await runner.run(input_path, output_path)
+        finally:
+            await caller.aclose()
+        elapsed = time.monotonic() - started
+    return {"rps": progress.done / elapsed, "failed": progress.failed, "retries": progress.retries,
+            "elapsed": elapsed}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк пропускной способности пакетной обработки")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов в задании")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="Уровни параллельности")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка встроенного mock-провайдера, с")
+    parser.add_argument("--provider-limit", type=int, default=32, help="Лимит параллельности mock-провайдера")
+    parser.add_argument("--max-attempts", type=int, default=20, help="Попыток на запрос")
+    parser.add_argument("--url", help="Адрес запущенного сервера вместо встроенного mock-провайдера")
+    parser.add_argument("--model", default="gigachat", help="Модель запросов")
+    parser.add_argument("--api-key", help="Ключ API (Authorization: Bearer)")
+    parser.add_argument("--header", action="append", default=[], help="Дополнительный заголовок NAME=VALUE")
+    args = parser.parse_args()
+
+    base_url = args.url or start_mock_provider(args.latency, args.provider_limit)
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "input.jsonl")
+        write_input(input_path, args.requests, args.model)
+
+        print(f"{'параллельно':>11} {'запросов/с':>11} {'время, с':>9} {'повторов':>9} {'ошибок':>7}")
+        for concurrency in args.concurrency:
+            result = asyncio.run(run_batch(args, base_url, input_path, concurrency))
+            print(f"{concurrency:>11} {result['rps']:>11.1f} {result['elapsed']:>9.2f} "
+                  f"{result['retries']:>9} {result['failed']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
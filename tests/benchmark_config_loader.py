@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Сравнение времени загрузки config.yml при запуске.
+
+До: файл разбирался три раза чистым Python yaml.safe_load
+(has_official_gigachat_models, MultiProxyProviderManager, LiteLLM initialize).
+После: один разбор load_config (CSafeLoader, если доступен libyaml).
+
+Запуск:
+    python tests/benchmark_config_loader.py --models 5000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.litellm_gigachat.core import config_loader  # noqa: E402
+
+
+def write_config(directory: Path, models: int) -> str:
+    """Конфигурация с большим model_list"""
+    lines = ["model_list:"]
+    for index in range(models):
+        lines += [
+            f"  - model_name: model-{index}",
+            "    litellm_params:",
+            f"      model: openai/model-{index}",
+            "      api_base: ${BENCHMARK_API_BASE:-http://localhost:8001/v1}",
+            "      api_key: os.environ/BENCHMARK_API_KEY",
+            "      timeout: 60",
+            "    model_info:",
+            f"      id: model-{index}",
+        ]
+    config_file = directory / "config.yml"
+    config_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(config_file)
+
+
+def before(config_file: str) -> None:
+    """Три независимых разбора чистым Python загрузчиком"""
+    for _ in range(3):
+        with open(config_file, "r", encoding="utf-8") as f:
+            yaml.safe_load(f)
+
+
+def after(config_file: str) -> None:
+    """Один разбор, остальные потребители получают кэш"""
+    config_loader.clear_config_cache()
+    for _ in range(3):
+        config_loader.load_config(config_file)
+
+
+def measure(func, config_file: str, repeat: int) -> float:
+    """Лучшее время из repeat запусков"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(config_file)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время загрузки конфигурации")
+    parser.add_argument("--models", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = write_config(Path(directory), args.models)
+        before_seconds = measure(before, config_file, args.repeat)
+        after_seconds = measure(after, config_file, args.repeat)
+
+    print(f"model_list: {args.models} моделей, libyaml: {yaml.__with_libyaml__}")
+    print(f"  3 x yaml.safe_load: {before_seconds:.3f} с")
+    print(f"  load_config:        {after_seconds:.3f} с  (x{before_seconds / after_seconds:.1f})")
+
+
+if __name__ == "__main__":
+    main()
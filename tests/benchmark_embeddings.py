@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности эмбеддингов (текстов в секунду).
+
+N клиентов параллельно отправляют запросы с одним текстом. Сравниваются:
+    - без объединения: каждый текст - отдельный запрос к модели;
+    - объединение: MicroBatchTransport собирает одновременные запросы в пакеты;
+    - кэш: повторный прогон тех же текстов (векторы из кэша).
+По умолчанию запросы идут во встроенный mock-провайдер (uvicorn в отдельном
+процессе), время ответа которого - latency на запрос плюс per-text на текст,
+а число одновременных запросов ограничено (сверх лимита - 429). С --url
+запросы идут в запущенный прокси (/v1/embeddings), объединение выполняет он.
+
+Запуск:
+    python tests/benchmark_embeddings.py --texts 2000 --clients 64 --latency 0.05
+    python tests/benchmark_embeddings.py --url http://localhost:4000 --api-key sk-... --model gigachat-embeddings
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.litellm_gigachat.core.embeddings import EmbeddingsConfig, MicroBatchTransport, VectorCache  # noqa: E402
+
+
+def serve_mock_provider(port: int, latency: float, per_text: float, limit: int, dim: int) -> None:
+    """Mock-провайдер эмбеддингов: задержка на запрос и на текст, 429 сверх лимита параллельности"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    state = {"active": 0}
+
+    async def embeddings(request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        if state["active"] >= limit:
+            return JSONResponse({"error": {"message": "rate limit"}}, status_code=429,
+                                headers={"Retry-After": "0.05"})
+        state["active"] += 1
+        try:
+            await asyncio.sleep(latency + per_text * len(texts))
+        finally:
+            state["active"] -= 1
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": index, "embedding": [len(text) / 100] * dim}
+                     for index, text in enumerate(texts)],
+            "usage": {"prompt_tokens": 4 * len(texts), "total_tokens": 4 * len(texts)},
+        })
+
+    app = Starlette(routes=[Route("/v1/embeddings", embeddings, methods=["POST"])])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_mock_provider(args: argparse.Namespace) -> str:
+    """Запустить mock-провайдер в отдельном процессе (не делит GIL с клиентом); возвращает base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    multiprocessing.Process(
+        target=serve_mock_provider,
+        args=(port, args.latency, args.per_text, args.provider_limit, args.dim),
+        daemon=True,
+    ).start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_clients(client: httpx.AsyncClient, url: str, texts: list, clients: int, model: str) -> dict:
+    """Отправить тексты по одному из clients параллельных клиентов; 429 повторяется"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for text in texts:
+        queue.put_nowait(text)
+    counters = {"retries": 0, "failed": 0}
+
+    async def worker():
+        while not queue.empty():
+            text = queue.get_nowait()
+            for _ in range(50):
+                response = await client.post(url, json={"model": model, "input": text})
+                if response.status_code != 429:
+                    break
+                counters["retries"] += 1
+                await asyncio.sleep(float(response.headers.get("retry-after", 0.05)))
+            if response.status_code != 200:
+                counters["failed"] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.monotonic() - started
+    return {"tps": len(texts) / elapsed, "elapsed": elapsed, **counters}
+
+
+async def run_mode(args: argparse.Namespace, base_url: str, texts: list, batching: bool, repeat: bool) -> dict:
+    config = EmbeddingsConfig(batch_window_ms=args.window_ms, max_batch_size=args.batch_size if batching else 1)
+    cache = VectorCache(max_entries=len(texts)) if repeat else None
+    transport = MicroBatchTransport(config, cache)
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(transport=transport, headers=headers, limits=limits, timeout=60) as client:
+        url = f"{base_url}/v1/embeddings"
+        if repeat:
+            await run_clients(client, url, texts, args.clients, args.model)
+        result = await run_clients(client, url, texts, args.clients, args.model)
+    metrics = transport.get_metrics()
+    return {**result, "upstream": metrics["upstream_requests"], "batch": metrics["avg_batch_size"]}
+
+
+async def run_proxy(args: argparse.Namespace, texts: list, repeat: bool) -> dict:
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=120) as client:
+        url = f"{args.url.rstrip('/')}/v1/embeddings"
+        if repeat:
+            await run_clients(client, url, texts, args.clients, args.model)
+        result = await run_clients(client, url, texts, args.clients, args.model)
+    return {**result, "upstream": "-", "batch": "-"}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк пропускной способности эмбеддингов")
+    parser.add_argument("--texts", type=int, default=2000, help="Текстов в прогоне")
+    parser.add_argument("--clients", type=int, default=64, help="Параллельных клиентов")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка mock-провайдера на запрос, с")
+    parser.add_argument("--per-text", type=float, default=0.001, help="Задержка mock-провайдера на текст, с")
+    parser.add_argument("--provider-limit", type=int, default=16, help="Лимит параллельности mock-провайдера")
+    parser.add_argument("--dim", type=int, default=1024, help="Размерность векторов mock-провайдера")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="Окно объединения, мс")
+    parser.add_argument("--batch-size", type=int, default=16, help="Текстов в пакете")
+    parser.add_argument("--url", help="Адрес запущенного прокси вместо встроенного mock-провайдера")
+    parser.add_argument("--model", default="Embeddings", help="Модель запросов")
+    parser.add_argument("--api-key", help="Ключ API (Authorization: Bearer)")
+    args = parser.parse_args()
+
+    texts = [f"Документ {index}: " + "текст " * (index % 50) for index in range(args.texts)]
+    modes = [("без объединения", False, False), ("объединение", True, False), ("кэш (повтор)", True, True)]
+
+    print(f"{'режим':>16} {'текстов/с':>10} {'время, с':>9} {'запросов':>9} {'пакет':>6} {'повторов':>9} {'ошибок':>7}")
+    base_url = None if args.url else start_mock_provider(args)
+    for name, batching, repeat in modes:
+        if args.url:
+            if not batching:
+                continue
+            result = asyncio.run(run_proxy(args, texts, repeat))
+        else:
+            result = asyncio.run(run_mode(args, base_url, texts, batching, repeat))
+        print(f"{name:>16} {result['tps']:>10.1f} {result['elapsed']:>9.2f} {result['upstream']:>9} "
+              f"{result['batch']:>6} {result['retries']:>9} {result['failed']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк дублирующих запросов (hedging).
+
+Моделирует группу из двух deployments с тяжёлым хвостом задержек
+(доля slow_share запросов отвечает в slow_factor раз медленнее) и сравнивает
+перцентили задержки и дополнительную нагрузку без hedging и с ним.
+Прокси и сеть не используются: вызовы модели заменены mock-провайдером
+в процессе, hedging выполняет тот же Hedger, что и в прокси.
+
+Запуск:
+    python tests/benchmark_hedging.py --requests 2000 --concurrency 32 --percentile 0.95
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.litellm_gigachat.core import model_groups  # noqa: E402
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry  # noqa: E402
+from src.litellm_gigachat.core.hedging import Hedger, HedgingConfig  # noqa: E402
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter  # noqa: E402
+from src.litellm_gigachat.core.retry import RetryBudget  # noqa: E402
+
+DEPLOYMENTS = ["deployment-a", "deployment-b"]
+
+
+class MockProvider:
+    """Провайдер с тяжёлым хвостом задержек"""
+
+    def __init__(self, base_latency: float, slow_share: float, slow_factor: float, seed: int):
+        self.base_latency = base_latency
+        self.slow_share = slow_share
+        self.slow_factor = slow_factor
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, **kwargs) -> str:
+        self.calls += 1
+        latency = self.base_latency * self.rng.uniform(0.8, 1.2)
+        if self.rng.random() < self.slow_share:
+            latency *= self.slow_factor
+        await asyncio.sleep(latency)
+        return kwargs["model"]
+
+
+async def run_load(args: argparse.Namespace, hedging: bool) -> dict:
+    """Отправка args.requests запросов с параллельностью args.concurrency"""
+    stats = DeploymentStatsRegistry()
+    router = ModelGroupRouter(stats)
+    router.groups = {"bench": ModelGroupConfig(name="bench", models=list(DEPLOYMENTS), exploration=0.0)}
+    model_groups._global_model_group_router = router
+
+    provider = MockProvider(args.latency, args.slow_share, args.slow_factor, args.seed)
+    hedger = Hedger(
+        default=HedgingConfig(percentile=args.percentile, min_samples=20),
+        budget=RetryBudget(ratio=args.budget_ratio, min_retries_per_second=0.0),
+    )
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def send(index: int) -> None:
+        deployment = DEPLOYMENTS[index % len(DEPLOYMENTS)]
+        request_id = stats.start_request(deployment)
+        kwargs = {
+            "model": deployment,
+            "messages": [{"role": "user", "content": "ping"}],
+            "metadata": {"gigachat_deployment": {"deployment": deployment, "group": "bench", "request_id": request_id}},
+        }
+        async with semaphore:
+            started = loop.time()
+            await (hedger.call(provider, kwargs) if hedging else provider(**kwargs))
+            elapsed = loop.time() - started
+        # Статистика основного запроса (если он не отменён hedging)
+        stats.finish_request(request_id, True, latency=elapsed)
+        latencies.append(elapsed)
+
+    await asyncio.gather(*(send(index) for index in range(args.requests)))
+
+    latencies.sort()
+    metrics = hedger.get_metrics()
+
+    def percentile(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "extra_load": provider.calls / args.requests - 1,
+        "hedged": metrics["hedged"],
+        "hedge_won": metrics["hedge_won"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк hedging запросов к группе моделей")
+    parser.add_argument("--requests", type=int, default=2000, help="Количество запросов")
+    parser.add_argument("--concurrency", type=int, default=32, help="Параллельность")
+    parser.add_argument("--latency", type=float, default=0.02, help="Типичная задержка ответа, с")
+    parser.add_argument("--slow-share", type=float, default=0.03, help="Доля медленных ответов")
+    parser.add_argument("--slow-factor", type=float, default=20.0, help="Во сколько раз медленнее хвост")
+    parser.add_argument("--percentile", type=float, default=0.95, help="Перцентиль задержки для hedging")
+    parser.add_argument("--budget-ratio", type=float, default=0.05, help="Доля дублирующих запросов")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора задержек")
+    args = parser.parse_args()
+
+    print(f"{'режим':<10} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'нагрузка':>9} {'hedged':>7} {'won':>5}")
+    for hedging in (False, True):
+        result = asyncio.run(run_load(args, hedging))
+        print(
+            f"{'hedging' if hedging else 'baseline':<10} {result['p50'] * 1000:>9.1f} "
+            f"{result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+            f"{result['extra_load']:>+8.1%} {result['hedged']:>7} {result['hedge_won']:>5}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк справедливой очереди при потоке пакетных запросов.
+
+Моделирует deployment с фиксированным лимитом параллельности: пакетное
+задание с одним ключом держит в очереди batch_concurrency запросов, а
+интерактивные пользователи IDE отправляют запросы с пуассоновским потоком.
+Сравнивает задержку интерактивных запросов (ожидание слота + ответ) при
+очереди FIFO и при справедливой очереди с полосами приоритета. Прокси и сеть
+не используются: слоты выдаёт тот же AIMDLimiter, что и в прокси.
+
+Запуск:
+    python tests/benchmark_scheduler.py --duration 10 --limit 8 --batch-concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.litellm_gigachat.core.concurrency import AIMDLimiter, ConcurrencyConfig  # noqa: E402
+from src.litellm_gigachat.core.scheduler import FairScheduler  # noqa: E402
+
+
+def make_key(alias: str) -> SimpleNamespace:
+    return SimpleNamespace(team_id=None, key_alias=alias, token=None, metadata={}, team_metadata={})
+
+
+async def run_load(args: argparse.Namespace, fair: bool) -> dict:
+    """Поток пакетных и интерактивных запросов в течение args.duration секунд"""
+    limiter = AIMDLimiter("bench", ConcurrencyConfig(
+        initial_limit=args.limit, min_limit=args.limit, max_limit=args.limit,
+        max_queue=100000, queue_timeout=3600,
+    ))
+    scheduler = FairScheduler()
+    rng = random.Random(args.seed)
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + args.duration
+    latencies = {"interactive": [], "batch": []}
+
+    async def request(lane: str, key: str) -> None:
+        started = loop.time()
+        if fair:
+            data = {"metadata": {"headers": {"x-priority": lane}}}
+            await scheduler.admit(limiter, scheduler.get_ticket(data, make_key(key)))
+        else:
+            await limiter.acquire()
+        try:
+            await asyncio.sleep(args.latency * rng.uniform(0.5, 1.5))
+        finally:
+            limiter.release()
+        latencies[lane].append(loop.time() - started)
+
+    async def batch_worker() -> None:
+        while loop.time() < stop_at:
+            await request("batch", "nightly-job")
+
+    async def interactive_users() -> None:
+        tasks = []
+        while loop.time() < stop_at:
+            await asyncio.sleep(rng.expovariate(args.interactive_rps))
+            tasks.append(asyncio.ensure_future(request("interactive", f"ide-{rng.randrange(args.users)}")))
+        await asyncio.gather(*tasks)
+
+    await asyncio.gather(interactive_users(), *(batch_worker() for _ in range(args.batch_concurrency)))
+
+    def percentile(values: list, q: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+    return {
+        "interactive_p50": percentile(latencies["interactive"], 0.5),
+        "interactive_p95": percentile(latencies["interactive"], 0.95),
+        "interactive": len(latencies["interactive"]),
+        "batch_p95": percentile(latencies["batch"], 0.95),
+        "batch": len(latencies["batch"]),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк справедливой очереди с полосами приоритета")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность нагрузки, с")
+    parser.add_argument("--limit", type=int, default=8, help="Лимит параллельности deployment")
+    parser.add_argument("--latency", type=float, default=0.05, help="Средняя длительность ответа, с")
+    parser.add_argument("--batch-concurrency", type=int, default=64, help="Параллельность пакетного задания")
+    parser.add_argument("--interactive-rps", type=float, default=20.0, help="Интерактивных запросов в секунду")
+    parser.add_argument("--users", type=int, default=10, help="Число интерактивных пользователей")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора")
+    args = parser.parse_args()
+
+    print(f"{'очередь':<8} {'IDE p50, мс':>12} {'IDE p95, мс':>12} {'IDE':>6} {'batch p95, мс':>14} {'batch':>6}")
+    for fair in (False, True):
+        result = asyncio.run(run_load(args, fair))
+        print(
+            f"{'fair' if fair else 'fifo':<8} {result['interactive_p50'] * 1000:>12.1f} "
+            f"{result['interactive_p95'] * 1000:>12.1f} {result['interactive']:>6} "
+            f"{result['batch_p95'] * 1000:>14.1f} {result['batch']:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест режима нескольких worker.
+
+Запускает прокси с разным количеством worker поверх mock-провайдера #1
+и измеряет пропускную способность запросов к модели llama-3.1-70b-p1.
+
+Требуется запущенный mock-провайдер:
+    python tests/mock_provider_1.py
+
+Запуск:
+    python tests/benchmark_workers.py --workers 1 2 4 --requests 2000 --concurrency 64
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def wait_for_proxy(url: str, timeout: float = 60.0) -> bool:
+    """Ожидание готовности прокси"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health/liveliness", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run_load(url: str, model: str, total: int, concurrency: int) -> dict:
+    """Отправка total запросов с заданной параллельностью"""
+    payload = {"model": model, "messages": [{"role": "user", "content": "ping"}]}
+    sessions = {}
+
+    def send(_):
+        session = sessions.setdefault(os.getpid(), requests.Session())
+        try:
+            return session.post(f"{url}/v1/chat/completions", json=payload, timeout=30).status_code == 200
+        except requests.RequestException:
+            return False
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(total)))
+    elapsed = time.time() - started
+
+    return {
+        "ok": sum(results),
+        "failed": len(results) - sum(results),
+        "elapsed": elapsed,
+        "rps": sum(results) / elapsed if elapsed else 0.0,
+    }
+
+
+def benchmark(workers: int, args) -> dict:
+    """Запуск прокси с заданным числом worker и измерение"""
+    url = f"http://localhost:{args.port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.litellm_gigachat.cli.main", "start",
+         "--port", str(args.port), "--config", args.config, "--workers", str(workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for_proxy(url):
+            raise RuntimeError("Прокси не запустился")
+        # Дожидаемся синхронизации каталога провайдера лидером
+        time.sleep(args.warmup)
+        run_load(url, args.model, min(args.requests, 100), args.concurrency)
+        return run_load(url, args.model, args.requests, args.concurrency)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест режима нескольких worker")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument("--model", default="llama-3.1-70b-p1")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'ok':>8} {'failed':>8} {'seconds':>10} {'req/s':>10}")
+    baseline = None
+    for workers in args.workers:
+        result = benchmark(workers, args)
+        baseline = baseline or result["rps"]
+        scale = result["rps"] / baseline if baseline else 0.0
+        print(
+            f"{workers:>8} {result['ok']:>8} {result['failed']:>8} "
+            f"{result['elapsed']:>10.2f} {result['rps']:>10.1f}  x{scale:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
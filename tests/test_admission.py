@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Тесты контроля допуска запросов по SLO моделей
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.litellm_gigachat.core import admission, concurrency
+from src.litellm_gigachat.core.admission import AdmissionController, AdmissionRejected, SLOConfig
+from src.litellm_gigachat.core.concurrency import AIMDLimiter, ConcurrencyConfig
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry
+
+
+def make_stats(model="m", latency=2.0, requests=20):
+    stats = DeploymentStatsRegistry()
+    for _ in range(requests):
+        stats.finish_request(stats.start_request(model), True, latency=latency)
+    return stats
+
+
+async def fill(limiter, queued):
+    """Занять все слоты лимитера и поставить queued запросов в очередь"""
+    for _ in range(int(limiter.limit)):
+        await limiter.acquire()
+    waiters = [asyncio.ensure_future(limiter.acquire(timeout=10)) for _ in range(queued)]
+    await asyncio.sleep(0)
+    return waiters
+
+
+class TestAdmissionController:
+    """Оценка времени ответа и отказ 503"""
+
+    def make_limiter(self, limit=2):
+        return AIMDLimiter("m", ConcurrencyConfig(initial_limit=limit, min_limit=limit, max_limit=limit))
+
+    def test_free_slot_admitted(self):
+        controller = AdmissionController(SLOConfig(slo=1.0), stats=make_stats(latency=5.0))
+        controller.check("m", self.make_limiter())
+        assert controller.get_metrics()["m"]["admitted"] == 1
+
+    def test_not_enough_samples(self):
+        controller = AdmissionController(SLOConfig(slo=1.0, min_samples=50), stats=make_stats(latency=5.0))
+        limiter = self.make_limiter()
+
+        async def run():
+            waiters = await fill(limiter, queued=10)
+            controller.check("m", limiter)
+            for waiter in waiters:
+                waiter.cancel()
+
+        asyncio.run(run())
+        assert controller.get_metrics() == {}
+
+    def test_backlog_shed(self):
+        """10 запросов в очереди, лимит 2, задержка 2s: ожидание ~11s - больше SLO 10s"""
+        controller = AdmissionController(SLOConfig(slo=10.0), stats=make_stats(latency=2.0))
+        limiter = self.make_limiter()
+
+        async def run():
+            waiters = await fill(limiter, queued=10)
+            try:
+                controller.check("m", limiter)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+
+        with pytest.raises(AdmissionRejected) as error:
+            asyncio.run(run())
+        assert error.value.estimated == pytest.approx(13.0)
+        assert error.value.retry_after == 3
+        assert controller.get_metrics()["m"]["shed"] == 1
+
+    def test_short_queue_admitted(self):
+        controller = AdmissionController(SLOConfig(slo=10.0), stats=make_stats(latency=2.0))
+        limiter = self.make_limiter()
+
+        async def run():
+            waiters = await fill(limiter, queued=2)
+            controller.check("m", limiter)
+            for waiter in waiters:
+                waiter.cancel()
+
+        asyncio.run(run())
+        assert controller.get_metrics()["m"]["admitted"] == 1
+
+    def test_observed_wait(self):
+        """Фактическое ожидание слота учитывается, даже если очередь короткая"""
+        controller = AdmissionController(SLOConfig(slo=10.0), stats=make_stats(latency=2.0))
+        limiter = self.make_limiter()
+        controller.record_wait("m", 20.0)
+
+        async def run():
+            waiters = await fill(limiter, queued=0)
+            assert controller.estimate_wait("m", limiter, 2.0) == 20.0
+            with pytest.raises(AdmissionRejected):
+                controller.check("m", limiter)
+            for waiter in waiters:
+                waiter.cancel()
+
+        asyncio.run(run())
+
+    def test_model_overrides(self):
+        controller = AdmissionController(SLOConfig(slo=30), models={"group": {"slo": 60}, "m": {"enabled": False}})
+        assert controller.get_config("x", "group").slo == 60
+        assert controller.get_config("m", "group").enabled is False
+
+
+class TestAdmissionCallback:
+    """Ответ 503 с Retry-After из лимитера параллельности"""
+
+    def setup_method(self):
+        self.previous = admission._global_admission_controller
+
+    def teardown_method(self):
+        admission._global_admission_controller = self.previous
+
+    def test_fast_503(self):
+        from src.litellm_gigachat.callbacks.concurrency_callback import ConcurrencyLimitCallback
+
+        registry = concurrency.init_global_concurrency_limiters(
+            {"default": {"initial_limit": 1, "min_limit": 1, "max_limit": 1}}
+        )
+        admission._global_admission_controller = AdmissionController(
+            SLOConfig(slo=5.0), stats=make_stats(model="slow", latency=2.0)
+        )
+        callback = ConcurrencyLimitCallback()
+
+        async def run():
+            waiters = await fill(registry.get("slow"), queued=3)
+            try:
+                await callback.async_pre_call_hook(None, None, {"model": "slow"}, "completion")
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run())
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == "5"
+
+    def test_prometheus_output(self):
+        from src.litellm_gigachat.core.metrics import render_prometheus
+
+        admission._global_admission_controller = AdmissionController(SLOConfig(slo=5.0), stats=make_stats())
+        admission._global_admission_controller.record_wait("m", 0.5)
+
+        text = render_prometheus()
+        assert 'gigachat_admission_shed_total{deployment="m"} 0' in text
+        assert 'gigachat_admission_slo_seconds{deployment="m"} 5.0' in text
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Тесты пакетной обработки JSONL
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from src.litellm_gigachat.core.batch import (
+    COMPLETED,
+    IN_PROGRESS,
+    BatchCallError,
+    BatchInputError,
+    BatchJobManager,
+    BatchRunner,
+    load_completed,
+    parse_batch_line,
+)
+from src.litellm_gigachat.proxy.batches import to_batch_error
+
+
+def write_input(path, count):
+    with open(path, "w", encoding="utf-8") as file:
+        for index in range(count):
+            file.write(json.dumps({
+                "custom_id": f"q{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": "gigachat", "messages": [{"role": "user", "content": str(index)}]},
+            }) + "\n")
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+class MockCall:
+    """Модель с ограничением параллельности и сценарием ошибок"""
+
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, item):
+        self.calls.append(item.custom_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            errors = self.failures.get(item.custom_id)
+            if errors:
+                raise errors.pop(0)
+            return {"id": item.custom_id, "choices": [{"message": {"content": "ok"}}]}
+        finally:
+            self.active -= 1
+
+
+class TestBatchInput:
+    """Разбор входного файла"""
+
+    def test_openai_batch_line(self):
+        item = parse_batch_line(
+            '{"custom_id": "a", "url": "/v1/embeddings", "body": {"model": "emb", "input": "x"}}', 1
+        )
+        assert (item.custom_id, item.url, item.body["input"]) == ("a", "/v1/embeddings", "x")
+
+    def test_bare_body_line(self):
+        item = parse_batch_line('{"model": "gigachat", "messages": []}', 7)
+        assert item.custom_id == "line-7"
+        assert item.url == "/v1/chat/completions"
+
+    @pytest.mark.parametrize("line", ["not json", "[]", '{"body": {}}', '{"url": "/v1/images", "body": {"model": "m"}}'])
+    def test_invalid_lines(self, line):
+        with pytest.raises(BatchInputError):
+            parse_batch_line(line, 1)
+
+
+class TestBatchRunner:
+    """Пул worker, повторы и контрольные точки"""
+
+    def test_runs_all_with_bounded_concurrency(self, tmp_path):
+        write_input(tmp_path / "in.jsonl", 20)
+        call = MockCall(delay=0.01)
+
+        progress = asyncio.run(BatchRunner(call, concurrency=4).run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")))
+
+        output = read_output(tmp_path / "out.jsonl")
+        assert progress.completed == 20 and progress.failed == 0
+        assert sorted(record["custom_id"] for record in output) == sorted(f"q{index}" for index in range(20))
+        assert output[0]["response"]["status_code"] == 200
+        assert call.max_active == 4
+
+    def test_rate_limit_pauses_and_retries(self, tmp_path):
+        write_input(tmp_path / "in.jsonl", 3)
+        call = MockCall(failures={"q1": [BatchCallError(429, "quota", retry_after=0.05)]})
+
+        progress = asyncio.run(BatchRunner(call, concurrency=1).run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")))
+
+        assert progress.completed == 3
+        assert progress.retries == 1
+        assert call.calls == ["q0", "q1", "q1", "q2"]
+
+    def test_permanent_error_written(self, tmp_path):
+        write_input(tmp_path / "in.jsonl", 2)
+        call = MockCall(failures={"q0": [BatchCallError(400, "bad request")]})
+
+        progress = asyncio.run(BatchRunner(call, concurrency=2).run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")))
+
+        errors = {record["custom_id"]: record["error"] for record in read_output(tmp_path / "out.jsonl")}
+        assert progress.failed == 1
+        assert errors["q0"]["code"] == "400"
+        assert errors["q1"] is None
+
+    def test_resume_skips_completed_and_repairs_partial_line(self, tmp_path):
+        write_input(tmp_path / "in.jsonl", 4)
+        output = tmp_path / "out.jsonl"
+        output.write_text(
+            json.dumps({"custom_id": "q0", "response": {"status_code": 200}, "error": None}) + "\n"
+            + json.dumps({"custom_id": "q1", "response": None, "error": {"code": "500"}}) + "\n"
+            + '{"custom_id": "q2", "resp'
+        )
+        assert load_completed(str(output), retry_failed=True) == {"q0"}
+        call = MockCall()
+
+        progress = asyncio.run(BatchRunner(call).run(str(tmp_path / "in.jsonl"), str(output)))
+
+        assert sorted(call.calls) == ["q2", "q3"]
+        assert progress.skipped == 2
+        assert [record["custom_id"] for record in read_output(output)][:2] == ["q0", "q1"]
+
+
+class TestBatchJobManager:
+    """Задания прокси"""
+
+    def test_job_lifecycle(self, tmp_path):
+        call = MockCall()
+        manager = BatchJobManager(str(tmp_path), call_factory=lambda job: call)
+        content = b"".join(
+            json.dumps({"custom_id": f"q{index}", "body": {"model": "gigachat"}}).encode() + b"\n" for index in range(3)
+        )
+
+        async def run():
+            job = manager.create(content, owner={"token": "hash"})
+            assert job["status"] == IN_PROGRESS
+            await manager._tasks[job["id"]]
+            return job["id"]
+
+        job_id = asyncio.run(run())
+        job = manager.get(job_id)
+        assert job["status"] == COMPLETED
+        assert job["request_counts"]["completed"] == 3
+        assert len(read_output(manager.output_path(job_id))) == 3
+        assert [listed["id"] for listed in manager.list()] == [job_id]
+
+    def test_invalid_input_rejected(self, tmp_path):
+        manager = BatchJobManager(str(tmp_path), call_factory=lambda job: MockCall())
+        with pytest.raises(BatchInputError):
+            manager.create(b'{"custom_id": "a", "body": {"model": "m"}}\n{"custom_id": "a", "body": {"model": "m"}}\n')
+        assert manager.list() == []
+
+    def test_resume_in_progress_job(self, tmp_path):
+        call = MockCall()
+        manager = BatchJobManager(str(tmp_path), call_factory=lambda job: call)
+        content = json.dumps({"custom_id": "q0", "body": {"model": "gigachat"}}).encode()
+
+        async def create():
+            job = manager.create(content)
+            # Прокси остановлен до начала выполнения задания
+            manager._tasks.pop(job["id"]).cancel()
+            return job["id"]
+
+        job_id = asyncio.run(create())
+        restarted = BatchJobManager(str(tmp_path), call_factory=lambda job: call)
+
+        async def resume():
+            await restarted.resume()
+            await asyncio.gather(*restarted._tasks.values())
+
+        asyncio.run(resume())
+        assert restarted.get(job_id)["status"] == COMPLETED
+        assert call.calls == ["q0"]
+
+
+def test_proxy_error_conversion():
+    error = to_batch_error(HTTPException(status_code=503, detail="SLO", headers={"Retry-After": "7"}))
+    assert (error.status_code, error.retry_after, str(error)) == (503, 7.0, "SLO")
+
+
+def test_batch_model_access_checked():
+    """Модели строк задания проверяются по ключу и команде владельца"""
+    from litellm.proxy._types import UserAPIKeyAuth
+    from src.litellm_gigachat.proxy.batches import check_model_access
+
+    content = b"".join(
+        json.dumps({"custom_id": f"q{index}", "body": {"model": model}}).encode() + b"\n"
+        for index, model in enumerate(["gigachat", "gigachat", "gpt-4-p2"])
+    )
+
+    def check(**key):
+        asyncio.run(check_model_access(content, UserAPIKeyAuth(token="hash", **key)))
+
+    check()
+    check(models=["gigachat", "gpt-4-p2"])
+
+    with pytest.raises(HTTPException) as exc_info:
+        check(models=["gigachat"])
+    assert exc_info.value.status_code == 400
+    assert "q2" in exc_info.value.detail and "gpt-4-p2" in exc_info.value.detail
+
+    with pytest.raises(HTTPException):
+        check(team_id="team", team_models=["gigachat"], models=["all-team-models"])
+    check(team_id="team", team_models=["gigachat", "gpt-4-p2"], models=["all-team-models"])
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Тесты отмены запроса к модели при отключении клиента
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from src.litellm_gigachat.callbacks.cancellation_callback import CancellationCallback
+from src.litellm_gigachat.callbacks.concurrency_callback import ConcurrencyLimitCallback
+from src.litellm_gigachat.core import concurrency
+from src.litellm_gigachat.core.cancellation import (
+    CancellationConfig,
+    CancellationStats,
+    CancelOnDisconnectMiddleware,
+    RequestScope,
+)
+
+
+def make_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class MockStreamingProvider:
+    """Провайдер модели, фиксирующий соединения, прерванные до конца ответа"""
+
+    def __init__(self, chunks=50, delay=0.01):
+        self.chunks = chunks
+        self.delay = delay
+        self.aborted = []
+        self.completed = []
+
+    def stream(self, model):
+        provider = self
+
+        class Stream:
+            def __init__(self):
+                self.sent = 0
+                self.finished = False
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                if self.sent == provider.chunks:
+                    self.finished = True
+                    provider.completed.append(model)
+                    raise StopAsyncIteration
+                await asyncio.sleep(provider.delay)
+                self.sent += 1
+                return make_chunk("abcd")
+
+            async def aclose(self):
+                if not self.finished:
+                    provider.aborted.append(model)
+
+        return Stream()
+
+    async def complete(self, model):
+        try:
+            await asyncio.sleep(self.chunks * self.delay)
+        except asyncio.CancelledError:
+            self.aborted.append(model)
+            raise
+        self.completed.append(model)
+        return "abcd" * self.chunks
+
+
+def make_proxy(provider, stats):
+    """Приложение с хуками как у LiteLLM Proxy: лимит параллельности и отмена"""
+    app = FastAPI()
+    hooks = [ConcurrencyLimitCallback(), CancellationCallback()]
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        data = await request.json()
+        for hook in hooks:
+            data = await hook.async_pre_call_hook(None, None, data, "completion")
+        if data.get("stream"):
+            stream = hooks[1].async_post_call_streaming_iterator_hook(None, provider.stream(data["model"]), data)
+
+            async def events():
+                async for chunk in stream:
+                    yield f"data: {chunk.choices[0].delta.content}\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return {"content": await provider.complete(data["model"])}
+
+    return CancelOnDisconnectMiddleware(app, CancellationConfig(), stats=stats)
+
+
+async def send_request(app, body, disconnect_after):
+    """
+    Запрос к ASGI приложению; клиент отключается через disconnect_after секунд.
+
+    Returns:
+        Сообщения ответа, отправленные клиенту
+    """
+    messages = asyncio.Queue()
+    messages.put_nowait({"type": "http.request", "body": json.dumps(body).encode(), "more_body": False})
+    sent = []
+
+    async def receive():
+        return await messages.get()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/v1/chat/completions", "raw_path": b"/v1/chat/completions",
+        "root_path": "", "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 4000),
+    }
+    task = asyncio.ensure_future(app(scope, receive, send))
+    await asyncio.sleep(disconnect_after)
+    messages.put_nowait({"type": "http.disconnect"})
+    await asyncio.wait_for(task, timeout=2)
+    return sent
+
+
+class TestCancelOnDisconnect:
+    """Отключение клиента прерывает запрос к модели и освобождает слот"""
+
+    def setup_method(self):
+        self.registry = concurrency.init_global_concurrency_limiters({"default": {"initial_limit": 4}})
+        self.stats = CancellationStats()
+
+    def test_streaming_aborted(self):
+        provider = MockStreamingProvider(chunks=50, delay=0.01)
+        app = make_proxy(provider, self.stats)
+        body = {"model": "m", "stream": True, "max_tokens": 100, "messages": [{"role": "user", "content": "hi"}]}
+
+        sent = asyncio.run(send_request(app, body, disconnect_after=0.1))
+
+        assert provider.aborted == ["m"]
+        assert provider.completed == []
+        assert self.registry.get("m").get_metrics()["inflight"] == 0
+        streamed = sum(1 for message in sent if message.get("body"))
+        metrics = self.stats.get_metrics()
+        assert metrics["cancelled_streaming"] == 1
+        assert 0 < metrics["generated_tokens"] <= streamed + 1
+        assert metrics["saved_tokens"]["m"] == 100 - metrics["generated_tokens"]
+
+    def test_non_streaming_aborted(self):
+        provider = MockStreamingProvider(chunks=50, delay=0.01)
+        app = make_proxy(provider, self.stats)
+        body = {"model": "m", "max_tokens": 100, "messages": [{"role": "user", "content": "hi"}]}
+
+        sent = asyncio.run(send_request(app, body, disconnect_after=0.1))
+
+        assert sent == []
+        assert provider.aborted == ["m"]
+        assert self.registry.get("m").get_metrics()["inflight"] == 0
+        assert self.stats.get_metrics()["cancelled_non_streaming"] == 1
+        assert self.stats.get_metrics()["saved_tokens"] == {"m": 100}
+
+    def test_completed_request_not_cancelled(self):
+        """Отключение после полного ответа - обычное завершение"""
+        provider = MockStreamingProvider(chunks=3, delay=0.001)
+        app = make_proxy(provider, self.stats)
+        body = {"model": "m", "stream": True, "messages": [{"role": "user", "content": "hi"}]}
+
+        sent = asyncio.run(send_request(app, body, disconnect_after=0.2))
+
+        assert provider.completed == ["m"]
+        assert provider.aborted == []
+        assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+        assert self.stats.get_metrics()["cancelled_streaming"] == 0
+
+    def test_untracked_path_passes_through(self):
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append(scope["path"])
+
+        middleware = CancelOnDisconnectMiddleware(app, stats=self.stats)
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/health"}, None, None))
+        assert calls == ["/health"]
+
+    def test_cancel_actions_isolated(self):
+        """Ошибка одного действия отмены не мешает остальным"""
+        scope = RequestScope(expected_tokens=10, generated_chars=9)
+        done = []
+
+        def broken(_):
+            raise RuntimeError("boom")
+
+        scope.on_cancel(broken)
+        scope.on_cancel(lambda request: done.append(request.saved_tokens))
+        scope.run_cancel_actions()
+        assert done == [7]
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Тесты асинхронного клиента GigaChat (без прокси)
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.litellm_gigachat.core.client import GigaChatClient, ProviderUnavailableError
+from src.litellm_gigachat.core.health import ProviderHealthManager
+from src.litellm_gigachat.core.proxy_provider_manager import MultiProxyProviderManager, ProxyProviderConfig
+from src.litellm_gigachat.core.rate_limits import RateLimiterRegistry, RateLimitConfig
+
+
+class FakeTokenManager:
+    """TokenManager с предсказуемыми токенами"""
+
+    def __init__(self):
+        self.issued = 0
+        self.invalidated = 0
+
+    def get_token(self, force_refresh=False):
+        return f"token-{self.issued}"
+
+    def invalidate_token(self):
+        self.invalidated += 1
+        self.issued += 1
+
+
+def chat_response(content="ok", model="GigaChat", function_call=None):
+    message = {"role": "assistant", "content": content}
+    if function_call:
+        message["function_call"] = function_call
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+    }
+
+
+class MockAPI:
+    """OpenAI-совместимый API со сценарием ответов"""
+
+    def __init__(self, statuses=None, delay=0.0):
+        self.requests = []
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def handler(self, request):
+        body = json.loads(request.content)
+        self.requests.append((request, body))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if self.statuses:
+            status = self.statuses.pop(0)
+            return httpx.Response(status, json={"error": {"message": f"status {status}"}},
+                                  headers={"retry-after": "0"})
+        if request.url.path.endswith("/embeddings"):
+            return httpx.Response(200, json={
+                "object": "list", "model": body["model"],
+                "data": [{"object": "embedding", "index": 0, "embedding": [0.1, 0.2]}],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            })
+        content = body["messages"][-1]["content"]
+        return httpx.Response(200, json=chat_response(f"echo: {content}", body["model"]))
+
+    def client(self, **kwargs):
+        kwargs.setdefault("token_manager", FakeTokenManager())
+        kwargs.setdefault("provider_manager", MultiProxyProviderManager())
+        kwargs.setdefault("rate_limiters", RateLimiterRegistry(default=RateLimitConfig(enabled=False)))
+        return GigaChatClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handler)), **kwargs)
+
+
+def make_provider():
+    return ProxyProviderConfig(name="internal", url="https://internal.example/api/v1", auth_header="X-Client-Id",
+                               auth_value="secret", suffix="internal")
+
+
+class TestRouting:
+    """Токен, преобразование запроса и маршрут к провайдеру"""
+
+    def test_gigachat_request(self):
+        api = MockAPI()
+        client = api.client()
+        messages = [{"role": "user", "content": [{"type": "text", "text": "Привет"}]}]
+
+        response = asyncio.run(client.acompletion("GigaChat-2-Max", messages))
+
+        request, body = api.requests[0]
+        assert str(request.url) == "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
+        assert request.headers["authorization"] == "Bearer token-0"
+        assert body["model"] == "GigaChat-2-Max"
+        # Контент-массив преобразован в строку для GigaChat
+        assert body["messages"][0]["content"] == "Привет"
+        assert response.choices[0].message.content == "echo: Привет"
+
+    def test_function_call_converted_to_tool_calls(self):
+        async def handler(request):
+            return httpx.Response(200, json=chat_response(
+                None, function_call={"name": "get_weather", "arguments": '{"city": "Москва"}'}
+            ))
+
+        client = GigaChatClient(token_manager=FakeTokenManager(), provider_manager=MultiProxyProviderManager(),
+                                http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        tools = [{"type": "function", "function": {"name": "get_weather", "parameters": {"type": "object"}}}]
+
+        response = asyncio.run(client.acompletion("GigaChat", [{"role": "user", "content": "погода"}], tools=tools))
+
+        assert response.choices[0].finish_reason == "tool_calls"
+        assert response.choices[0].message.tool_calls[0].function.name == "get_weather"
+
+    def test_proxy_provider_route(self):
+        api = MockAPI()
+        provider_manager = MultiProxyProviderManager()
+        provider_manager.providers = [make_provider()]
+        client = api.client(provider_manager=provider_manager)
+
+        asyncio.run(client.acompletion("llama-3-internal", [{"role": "user", "content": "q"}]))
+
+        request, body = api.requests[0]
+        assert str(request.url) == "https://internal.example/api/v1/chat/completions"
+        assert request.headers["x-client-id"] == "secret"
+        assert body["model"] == "llama-3"
+
+    def test_open_circuit_rejects_request(self, monkeypatch):
+        import src.litellm_gigachat.core.health as health
+
+        provider = make_provider()
+        provider_manager = MultiProxyProviderManager()
+        provider_manager.providers = [provider]
+        health_manager = ProviderHealthManager(provider_manager)
+        for _ in range(provider.circuit_failure_threshold):
+            health_manager.record_result(provider, Exception("connection refused"))
+        monkeypatch.setattr(health, "_global_provider_health_manager", health_manager)
+
+        api = MockAPI()
+        with pytest.raises(ProviderUnavailableError):
+            asyncio.run(api.client(provider_manager=provider_manager).acompletion("m-internal", []))
+        assert api.requests == []
+
+
+class TestRetries:
+    """Обновление токена и повторы"""
+
+    def test_unauthorized_refreshes_token(self):
+        api = MockAPI(statuses=[401])
+        token_manager = FakeTokenManager()
+
+        asyncio.run(api.client(token_manager=token_manager).acompletion("GigaChat", [{"role": "user", "content": "q"}]))
+
+        assert token_manager.invalidated == 1
+        assert [request.headers["authorization"] for request, _ in api.requests] == ["Bearer token-0", "Bearer token-1"]
+
+    def test_rate_limited_request_retried(self):
+        api = MockAPI(statuses=[429, 503])
+
+        response = asyncio.run(api.client().acompletion("GigaChat", [{"role": "user", "content": "q"}]))
+
+        assert len(api.requests) == 3
+        assert response.choices[0].message.content == "echo: q"
+
+    def test_client_error_not_retried(self):
+        api = MockAPI(statuses=[400])
+        with pytest.raises(Exception) as error:
+            asyncio.run(api.client().acompletion("GigaChat", [{"role": "user", "content": "q"}]))
+        assert getattr(error.value, "status_code", None) == 400
+        assert len(api.requests) == 1
+
+
+class TestMap:
+    """Параллельное выполнение множества запросов"""
+
+    def test_map_preserves_order_and_bounds_concurrency(self):
+        api = MockAPI(delay=0.01)
+        progress = []
+
+        async def run():
+            async with api.client() as client:
+                return await client.map([f"q{index}" for index in range(12)], model="GigaChat", concurrency=3,
+                                        on_progress=lambda p: progress.append(p.done))
+
+        results = asyncio.run(run())
+
+        assert [result.choices[0].message.content for result in results] == [f"echo: q{index}" for index in range(12)]
+        assert api.max_active == 3
+        assert progress[-1] == 12
+
+    def test_map_returns_exceptions(self):
+        api = MockAPI(statuses=[400])
+
+        results = asyncio.run(api.client().map(
+            [{"input": "текст", "model": "Embeddings"}, "q"], model="GigaChat", concurrency=1
+        ))
+
+        assert getattr(results[0], "status_code", None) == 400
+        assert results[1].choices[0].message.content == "echo: q"
+
+    def test_map_embeddings_and_rate_limits(self):
+        api = MockAPI()
+        registry = RateLimiterRegistry(default=RateLimitConfig(requests_per_minute=6000))
+
+        results = asyncio.run(api.client(rate_limiters=registry).map(
+            [{"input": "a"}, {"input": "b"}], model="Embeddings"
+        ))
+
+        assert results[0].data[0]["embedding"] == [0.1, 0.2]
+        assert api.requests[0][0].url.path.endswith("/embeddings")
+        assert "gigachat/Embeddings" in registry.get_metrics()
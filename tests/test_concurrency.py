@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Тесты адаптивного ограничения параллельности (AIMD)
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.litellm_gigachat.core import concurrency
+from src.litellm_gigachat.core.concurrency import (
+    SUCCESS,
+    THROTTLED,
+    AIMDLimiter,
+    ConcurrencyConfig,
+    ConcurrencyLimiterRegistry,
+    ConcurrencyLimitExceeded,
+)
+
+
+class StatusError(Exception):
+    """Ошибка с HTTP статусом (как исключения LiteLLM)"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestAIMDLimiter:
+    """Рост и снижение лимита, очередь"""
+
+    def test_additive_increase_multiplicative_decrease(self):
+        """Успехи увеличивают лимит примерно на 1 за окно, 429 уменьшает вдвое"""
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=4, decrease_cooldown=0.0))
+
+        async def run():
+            for _ in range(4):
+                await limiter.acquire()
+                limiter.release(SUCCESS)
+
+        asyncio.run(run())
+        assert 4.9 < limiter.limit < 5.1
+
+        limiter.release(THROTTLED)
+        assert limiter.limit == pytest.approx(limiter.get_metrics()["limit"], abs=0.01)
+        assert 2.4 < limiter.limit < 2.6
+
+    def test_decrease_cooldown(self):
+        """Пачка отказов из одного окна снижает лимит один раз"""
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=16, decrease_cooldown=10.0))
+        for _ in range(5):
+            limiter.release(THROTTLED)
+
+        assert limiter.limit == 8
+        assert limiter.get_metrics()["throttled"] == 5
+
+    def test_latency_spike_decreases_limit(self):
+        """Задержка намного выше базовой считается перегрузкой"""
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=10, decrease_cooldown=0.0))
+        for _ in range(12):
+            limiter.release(SUCCESS, latency=0.01)
+        before = limiter.limit
+
+        limiter.release(SUCCESS, latency=0.1)
+        assert limiter.limit == pytest.approx(before * 0.5)
+
+    def test_bounded_queue(self):
+        """Запросы сверх лимита ждут в очереди, при переполнении - отказ"""
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=1, max_queue=1, queue_timeout=5))
+
+        async def run():
+            await limiter.acquire()
+            waiting = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            assert limiter.queued == 1
+
+            with pytest.raises(ConcurrencyLimitExceeded):
+                await limiter.acquire()
+
+            limiter.release(SUCCESS)
+            await asyncio.wait_for(waiting, 1)
+            assert limiter.inflight == 1
+            assert limiter.queued == 0
+
+        asyncio.run(run())
+        assert limiter.get_metrics()["rejected"] == 1
+
+    def test_queue_deadline(self):
+        """Запрос не ждёт слот дольше queue_timeout, слот не теряется"""
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=1, queue_timeout=0.05))
+
+        async def run():
+            await limiter.acquire()
+            with pytest.raises(ConcurrencyLimitExceeded):
+                await limiter.acquire()
+            limiter.release(SUCCESS)
+            await limiter.acquire()
+
+        asyncio.run(run())
+        metrics = limiter.get_metrics()
+        assert metrics["timeouts"] == 1
+        assert metrics["inflight"] == 1
+        assert metrics["queued"] == 0
+
+    def test_registry_overrides(self):
+        """Переопределения из config.yml поверх default, отключение для deployment"""
+        registry = ConcurrencyLimiterRegistry.from_config({
+            "default": {"initial_limit": 4, "max_queue": 10},
+            "deployments": {"small": {"max_limit": 2}, "off": {"enabled": False}},
+        })
+
+        assert registry.get("small").config.max_queue == 10
+        assert registry.get("small").limit == 2
+        assert registry.get("big").limit == 4
+        assert registry.get("off") is None
+
+
+class MockProvider:
+    """Mock-провайдер с фиксированной ёмкостью: сверх capacity запросов отвечает 429"""
+
+    def __init__(self, capacity, service_time=0.01):
+        self.capacity = capacity
+        self.service_time = service_time
+        self.active = 0
+        self.throttled = 0
+        self.served = 0
+
+    async def handle(self):
+        if self.active >= self.capacity:
+            self.throttled += 1
+            await asyncio.sleep(0.001)
+            raise StatusError(429)
+        self.active += 1
+        try:
+            await asyncio.sleep(self.service_time)
+            self.served += 1
+        finally:
+            self.active -= 1
+
+
+async def run_clients(provider, limiter=None, clients=32, requests_per_client=15):
+    """Клиенты отправляют запросы без пауз; с limiter - через адаптивный лимит"""
+
+    async def client():
+        for _ in range(requests_per_client):
+            if limiter is not None:
+                await limiter.acquire(timeout=10)
+            try:
+                await provider.handle()
+                outcome = SUCCESS
+            except StatusError:
+                outcome = THROTTLED
+            if limiter is not None:
+                limiter.release(outcome)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+
+class TestFixedCapacityProvider:
+    """Лимитер против провайдера с фиксированной ёмкостью"""
+
+    def test_limiter_converges_to_capacity(self):
+        """Лимит колеблется около ёмкости провайдера, отказов 429 в разы меньше"""
+        unlimited = MockProvider(capacity=4)
+        asyncio.run(run_clients(unlimited))
+
+        limited = MockProvider(capacity=4)
+        limiter = AIMDLimiter("mock", ConcurrencyConfig(initial_limit=16, decrease_cooldown=0.02))
+        asyncio.run(run_clients(limited, limiter))
+
+        total = 32 * 15
+        assert unlimited.throttled > total * 0.5
+        assert limited.served == total - limited.throttled
+        # AIMD периодически проверяет ёмкость, поэтому отдельные 429 остаются
+        assert limited.throttled < unlimited.throttled / 3
+        assert 2 <= limiter.limit <= 8
+        assert limiter.get_metrics()["inflight"] == 0
+
+
+class TestConcurrencyMetrics:
+    """Метрики лимитеров"""
+
+    def setup_method(self):
+        self.previous = concurrency._global_concurrency_limiters
+
+    def teardown_method(self):
+        concurrency._global_concurrency_limiters = self.previous
+
+    def test_prometheus_output(self):
+        """Лимит и очередь deployment попадают в /gigachat/metrics"""
+        from src.litellm_gigachat.core.metrics import render_prometheus
+
+        registry = concurrency.init_global_concurrency_limiters({"default": {"initial_limit": 3}})
+        registry.get("gigachat-max")
+
+        text = render_prometheus()
+        assert 'gigachat_concurrency_limit{deployment="gigachat-max"} 3' in text
+        assert 'gigachat_concurrency_queued{deployment="gigachat-max"} 0' in text
+
+    def test_limits_enabled_by_section(self, tmp_path):
+        """Без секции concurrency_limits лимиты не создаются и запросы не ограничиваются"""
+        from src.litellm_gigachat.callbacks.concurrency_callback import ConcurrencyLimitCallback
+        from src.litellm_gigachat.core import config_loader
+        from src.litellm_gigachat.proxy.server import setup_concurrency_limits
+
+        config_file = tmp_path / "config.yml"
+        concurrency._global_concurrency_limiters = None
+        for text in ("model_list: []\n", "concurrency_limits:\n  enabled: false\n"):
+            config_file.write_text(text, encoding="utf-8")
+            config_loader.clear_config_cache()
+            setup_concurrency_limits(str(config_file))
+            assert concurrency.get_global_concurrency_limiters() is None
+
+        data = asyncio.run(ConcurrencyLimitCallback().async_pre_call_hook(None, None, {"model": "m"}, "completion"))
+        assert "metadata" not in data
+
+        config_file.write_text("concurrency_limits:\n  default:\n    initial_limit: 2\n", encoding="utf-8")
+        config_loader.clear_config_cache()
+        setup_concurrency_limits(str(config_file))
+        assert concurrency.get_global_concurrency_limiters().get("m").get_metrics()["limit"] == 2
+        config_loader.clear_config_cache()
+
+    def test_callback_releases_slot_once(self):
+        """Слот освобождается один раз, даже если завершение приходит из нескольких хуков"""
+        from src.litellm_gigachat.callbacks.concurrency_callback import ConcurrencyLimitCallback
+
+        registry = concurrency.init_global_concurrency_limiters({"default": {"initial_limit": 2}})
+        callback = ConcurrencyLimitCallback()
+
+        async def run():
+            data = await callback.async_pre_call_hook(None, None, {"model": "m"}, "completion")
+            kwargs = {"litellm_params": {"metadata": data["metadata"]}, "exception": StatusError(503)}
+            now = datetime.now()
+            await callback.async_log_failure_event(kwargs, None, now, now + timedelta(seconds=1))
+            await callback.async_post_call_failure_hook(data, StatusError(503), None)
+
+        asyncio.run(run())
+        metrics = registry.get("m").get_metrics()
+        assert metrics["inflight"] == 0
+        assert metrics["throttled"] == 1
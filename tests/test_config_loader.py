@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Тесты для config_loader - однократная загрузка config.yml
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from src.litellm_gigachat.core import config_loader
+from src.litellm_gigachat.core.config_loader import ConfigError, expand_env_vars, load_config
+from src.litellm_gigachat.core.proxy_provider_manager import MultiProxyProviderManager
+from src.litellm_gigachat.proxy.server import has_official_gigachat_models, share_config_with_litellm
+
+CONFIG = """
+proxy_providers:
+  - name: provider1
+    url: http://localhost:8001/v1
+    auth_header: X-Client-Id
+    auth_value: ${CONFIG_LOADER_TOKEN}
+    suffix: p1
+
+model_list:
+  - model_name: gigachat
+    litellm_params:
+      model: gigachat/GigaChat
+      api_base: https://gigachat.devices.sberbank.ru/api/v1
+  - model_name: local
+    litellm_params:
+      model: openai/local
+      api_base: ${CONFIG_LOADER_BASE:-http://localhost:9000/v1}
+"""
+
+
+class TestConfigLoader:
+    """Тесты загрузки конфигурации"""
+
+    def setup_method(self):
+        config_loader.clear_config_cache()
+        os.environ["CONFIG_LOADER_TOKEN"] = "secret"
+
+    def teardown_method(self):
+        os.environ.pop("CONFIG_LOADER_TOKEN", None)
+        config_loader.clear_config_cache()
+
+    def write_config(self, tmp_path, text=CONFIG):
+        config_file = tmp_path / "config.yml"
+        config_file.write_text(text, encoding="utf-8")
+        return str(config_file)
+
+    def test_env_vars_expanded(self, tmp_path):
+        """${VAR} и ${VAR:-default} подставляются во всём файле"""
+        config = load_config(self.write_config(tmp_path))
+
+        assert config["proxy_providers"][0]["auth_value"] == "secret"
+        assert config["model_list"][1]["litellm_params"]["api_base"] == "http://localhost:9000/v1"
+
+    def test_missing_env_var_is_empty(self):
+        """Не установленная переменная заменяется пустой строкой"""
+        missing = set()
+        assert expand_env_vars({"key": "a${CONFIG_LOADER_UNSET}b"}, missing) == {"key": "ab"}
+        assert missing == {"CONFIG_LOADER_UNSET"}
+
+    def test_invalid_config_rejected(self, tmp_path):
+        """Ошибки схемы собираются и возвращаются одним исключением"""
+        config_file = self.write_config(tmp_path, """
+proxy_providers:
+  - name: a
+    url: http://a/v1
+    suffix: p1
+  - name: b
+    url: http://b/v1
+    suffix: p1
+    routing_mode: magic
+model_list:
+  - model_name: broken
+""")
+        with pytest.raises(ConfigError) as exc_info:
+            load_config(config_file)
+
+        errors = " ".join(exc_info.value.errors)
+        assert "суффикс -p1" in errors
+        assert "routing_mode" in errors
+        assert "litellm_params.model" in errors
+
+    def test_includes_merged(self, tmp_path):
+        """Файлы из include добавляются к основной конфигурации"""
+        (tmp_path / "models.yml").write_text(
+            "model_list:\n  - model_name: extra\n    litellm_params:\n      model: openai/extra\n",
+            encoding="utf-8",
+        )
+        config = load_config(self.write_config(tmp_path, CONFIG + "include:\n  - models.yml\n"))
+
+        assert [model["model_name"] for model in config["model_list"]] == ["gigachat", "local", "extra"]
+        assert "include" not in config
+
+    def test_reloaded_after_change(self, tmp_path):
+        """Изменение файла сбрасывает кэш"""
+        config_file = self.write_config(tmp_path)
+        first = load_config(config_file)
+        assert load_config(config_file) is first
+
+        self.write_config(tmp_path, CONFIG.replace("model_name: local", "model_name: local-2"))
+        os.utime(config_file, ns=(0, 0))
+
+        assert load_config(config_file)["model_list"][1]["model_name"] == "local-2"
+
+    def test_single_parse_for_all_consumers(self, tmp_path, monkeypatch):
+        """Проверка окружения, провайдеры и LiteLLM используют один разбор файла"""
+        import litellm.proxy.proxy_server as proxy_server
+
+        calls = []
+        parse = config_loader.parse_config_file
+        monkeypatch.setattr(config_loader, "parse_config_file", lambda path: calls.append(path) or parse(path))
+        config_file = self.write_config(tmp_path)
+
+        assert has_official_gigachat_models(config_file)
+
+        manager = MultiProxyProviderManager()
+        manager.load_from_config(config_file)
+        assert manager.providers[0].auth_value == "secret"
+
+        share_config_with_litellm(config_file)
+        try:
+            litellm_config = asyncio.run(proxy_server.proxy_config._get_config_from_file(config_file))
+        finally:
+            del proxy_server.proxy_config._get_config_from_file
+
+        assert litellm_config == load_config(config_file)
+        assert litellm_config is not load_config(config_file)
+        assert len(calls) == 1
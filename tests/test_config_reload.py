@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Тесты горячей перезагрузки proxy_providers
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from src.litellm_gigachat.core import config_loader
+from src.litellm_gigachat.core.config_loader import ConfigError
+from src.litellm_gigachat.core.config_watcher import ConfigWatcher, _load_inotify
+from src.litellm_gigachat.core.multi_model_sync import MultiModelSyncManager
+from src.litellm_gigachat.core.proxy_provider_manager import MultiProxyProviderManager
+
+PROVIDER_TEMPLATE = """
+  - name: {name}
+    url: {url}
+    suffix: {suffix}
+    sync_enabled: true
+"""
+
+
+def make_config(*providers):
+    """Текст config.yml с указанными провайдерами (name, url, suffix)"""
+    return "proxy_providers:" + "".join(
+        PROVIDER_TEMPLATE.format(name=name, url=url, suffix=suffix) for name, url, suffix in providers
+    )
+
+
+def write_config(config_file, text):
+    """Запись файла с гарантированно новой версией (mtime_ns может совпасть)"""
+    previous = config_file.stat().st_mtime_ns if config_file.exists() else 0
+    config_file.write_text(text, encoding="utf-8")
+    stat = config_file.stat()
+    if stat.st_mtime_ns == previous:
+        os.utime(config_file, ns=(stat.st_atime_ns, previous + 1_000_000))
+
+
+class TestProviderReload:
+    """Перезагрузка таблицы провайдеров"""
+
+    def setup_method(self):
+        config_loader.clear_config_cache()
+
+    def teardown_method(self):
+        config_loader.clear_config_cache()
+
+    def load_manager(self, tmp_path, *providers):
+        config_file = tmp_path / "config.yml"
+        write_config(config_file, make_config(*providers))
+        manager = MultiProxyProviderManager()
+        manager.load_from_config(str(config_file))
+        return manager, config_file
+
+    def test_reload_diff_keeps_unchanged_objects(self, tmp_path):
+        """Неизменённые провайдеры сохраняют прежние объекты, изменения классифицируются"""
+        manager, config_file = self.load_manager(
+            tmp_path, ("a", "http://a:1/v1", "a"), ("b", "http://b:1/v1", "b"), ("c", "http://c:1/v1", "c")
+        )
+        provider_a = manager.get_provider_by_name("a")
+        received = []
+        manager.add_reload_listener(lambda old, new, changes: received.append(changes))
+
+        write_config(config_file, make_config(
+            ("a", "http://a:1/v1", "a"), ("b", "http://b:2/v1", "b"), ("d", "http://d:1/v1", "d")
+        ))
+        changes = manager.reload_from_config()
+
+        assert changes == {"added": ["d"], "removed": ["c"], "changed": ["b"], "unchanged": ["a"]}
+        assert manager.get_provider_by_name("a") is provider_a
+        assert manager.get_provider_by_name("b").url == "http://b:2/v1"
+        assert received == [changes]
+
+    def test_ssl_verify_defaults_to_litellm_settings(self, tmp_path):
+        """Без ssl_verify провайдер наследует litellm_settings.ssl_verify"""
+        config_file = tmp_path / "config.yml"
+        write_config(config_file, make_config(("a", "https://a:1/v1", "a"), ("b", "https://b:1/v1", "b"))
+                     + "    ssl_verify: /etc/ssl/b.pem\n")
+        manager = MultiProxyProviderManager()
+        manager.load_from_config(str(config_file))
+        assert [p.ssl_verify for p in manager.providers] == [True, "/etc/ssl/b.pem"]
+
+        write_config(config_file, "litellm_settings:\n  ssl_verify: false\n" + config_file.read_text())
+        changes = manager.reload_from_config()
+        assert changes["changed"] == ["a"]
+        assert [p.ssl_verify for p in manager.providers] == [False, "/etc/ssl/b.pem"]
+
+    def test_invalid_config_keeps_old_table(self, tmp_path):
+        """Некорректная конфигурация не применяется"""
+        manager, config_file = self.load_manager(tmp_path, ("a", "http://a:1/v1", "a"))
+        providers = manager.providers
+
+        # Повторяющийся суффикс
+        write_config(config_file, make_config(("a", "http://a:1/v1", "x"), ("b", "http://b:1/v1", "x")))
+        with pytest.raises(ConfigError):
+            manager.reload_from_config()
+
+        assert manager.providers is providers
+        assert manager.get_reload_info()["last_reload_error"]
+
+    def test_no_changes_skips_listeners(self, tmp_path):
+        """Перезапись файла тем же содержимым не вызывает обработчиков"""
+        manager, config_file = self.load_manager(tmp_path, ("a", "http://a:1/v1", "a"))
+        received = []
+        manager.add_reload_listener(lambda *args: received.append(args))
+
+        write_config(config_file, make_config(("a", "http://a:1/v1", "a")))
+        changes = manager.reload_from_config()
+
+        assert changes["unchanged"] == ["a"]
+        assert received == []
+
+
+class TestReconcileProviders:
+    """Перенастройка менеджеров синхронизации"""
+
+    def test_reconcile_keeps_unchanged_and_seeds_changed(self, tmp_path):
+        """Неизменённый менеджер сохраняется, изменённый получает прежний каталог"""
+        config_file = tmp_path / "config.yml"
+        write_config(config_file, make_config(("a", "http://a:1/v1", "a"), ("b", "http://b:1/v1", "b")))
+        config_loader.clear_config_cache()
+        providers = MultiProxyProviderManager()
+        providers.load_from_config(str(config_file))
+
+        multi_sync = MultiModelSyncManager()
+        for provider in providers.get_all_providers():
+            multi_sync.add_provider(provider)
+        manager_a = multi_sync._sync_managers["a"]
+        manager_b = multi_sync._sync_managers["b"]
+        manager_b.apply_catalog([{"id": "Model-1"}, {"id": "Model-2"}])
+
+        write_config(config_file, make_config(("a", "http://a:1/v1", "a"), ("b", "http://b:2/v1", "b")))
+        providers.reload_from_config()
+        result = multi_sync.reconcile_providers(providers.get_all_providers())
+
+        assert multi_sync._sync_managers["a"] is manager_a
+        new_b = multi_sync._sync_managers["b"]
+        assert new_b is not manager_b
+        assert new_b.api_base == "http://b:2/v1"
+        assert {m["original_id"] for m in new_b.get_known_models()} == {"Model-1", "Model-2"}
+        assert result == {"started": [], "stopped": ["b"]}
+        config_loader.clear_config_cache()
+
+
+    def test_stale_sync_does_not_register_old_url(self, tmp_path):
+        """Синхронизация прежнего менеджера, завершившаяся после перенастройки, не попадает в Router"""
+        config_file = tmp_path / "config.yml"
+        write_config(config_file, make_config(("b", "http://b:1/v1", "b")))
+        config_loader.clear_config_cache()
+        providers = MultiProxyProviderManager()
+        providers.load_from_config(str(config_file))
+
+        multi_sync = MultiModelSyncManager()
+        registered = []
+        multi_sync.set_update_callback(
+            lambda models, *args: registered.extend(m["litellm_params"]["api_base"] for m in models)
+        )
+        multi_sync.add_provider(providers.get_all_providers()[0])
+        manager_b = multi_sync._sync_managers["b"]
+        manager_b.apply_catalog([{"id": "Model-1"}])
+
+        fetching, release = threading.Event(), threading.Event()
+
+        def slow_fetch():
+            fetching.set()
+            release.wait(5)
+            return [{"id": "Model-1"}]
+
+        manager_b.fetch_models = slow_fetch
+        sync = threading.Thread(target=manager_b.sync_models)
+        sync.start()
+        assert fetching.wait(5)
+
+        write_config(config_file, make_config(("b", "http://b:2/v1", "b")))
+        providers.reload_from_config()
+        registered.clear()
+        multi_sync.reconcile_providers(providers.get_all_providers())
+        release.set()
+        sync.join(5)
+
+        assert registered == ["http://b:2/v1"]
+        config_loader.clear_config_cache()
+
+
+class TestRouterReload:
+    """Применение перезагруженных провайдеров к LiteLLM Router"""
+
+    def test_switch_to_wildcard_routes_by_pattern(self, monkeypatch):
+        """После перехода провайдера с deployments на wildcard модель находится по шаблону"""
+        from dataclasses import replace
+
+        import litellm.proxy.proxy_server as proxy_server
+        from litellm import Router
+
+        import src.litellm_gigachat.core.multi_model_sync as multi_model_sync
+        from src.litellm_gigachat.callbacks.model_sync_callback import apply_provider_changes
+        from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+
+        old = ProxyProviderConfig(name="p1", url="http://p1:1/v1", auth_header="X-Client-Id",
+                                  auth_value="token", suffix="p1")
+        new = replace(old, routing_mode="wildcard")
+        router = Router(model_list=[
+            {"model_name": "gigachat", "litellm_params": {"model": "openai/GigaChat"}},
+            {"model_name": "llama-p1", "litellm_params": {"model": "openai/llama", "api_base": old.url}},
+        ])
+        monkeypatch.setattr(proxy_server, "llm_router", router)
+        monkeypatch.setattr(multi_model_sync, "_global_multi_model_sync_manager", None)
+
+        apply_provider_changes([old], [new], {"changed": ["p1"]})
+
+        assert router.model_names == ["gigachat", "*-p1"]
+        model, deployments = router._common_checks_available_deployment(model="llama-p1")
+        assert deployments[0]["litellm_params"]["model"] == "openai/llama"
+        assert deployments[0]["litellm_params"]["api_base"] == new.url
+
+        # Обратный переход: шаблон удалён, модель снова регистрируется синхронизацией
+        apply_provider_changes([new], [old], {"changed": ["p1"]})
+        assert router.model_names == ["gigachat"]
+        assert not router.pattern_router.patterns
+
+
+class TestConfigWatcher:
+    """Отслеживание изменений файла"""
+
+    @pytest.mark.parametrize("use_inotify", [False, True])
+    def test_change_detected(self, tmp_path, use_inotify):
+        """Изменение файла приводит к вызову callback (inotify и polling)"""
+        if use_inotify and _load_inotify() is None:
+            pytest.skip("inotify недоступен")
+
+        config_file = tmp_path / "config.yml"
+        write_config(config_file, "proxy_providers: []\n")
+        changed = threading.Event()
+
+        watcher = ConfigWatcher(
+            str(config_file), changed.set, poll_interval=0.05, debounce=0.05, use_inotify=use_inotify
+        )
+        watcher.start()
+        try:
+            assert watcher.mode == ("inotify" if use_inotify else "polling")
+            time.sleep(0.1)
+            write_config(config_file, "proxy_providers: []\nmodel_list: []\n")
+            assert changed.wait(5)
+        finally:
+            watcher.stop()
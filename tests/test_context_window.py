@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Тесты управления окном контекста
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from litellm import Router
+
+import src.litellm_gigachat.core.context_window as context_window
+import src.litellm_gigachat.core.model_groups as model_groups
+from src.litellm_gigachat.core.context_window import (
+    ContextWindowConfig,
+    ContextWindowExceeded,
+    ContextWindowManager,
+    init_global_context_window_manager,
+)
+from src.litellm_gigachat.core.model_groups import ModelGroupRouter
+from src.litellm_gigachat.core.retry import DEPLOYMENT_METADATA_KEY
+from src.litellm_gigachat.core.token_estimator import PROMPT_TOKENS_KEY, get_token_estimator
+
+MODEL_LIST = [
+    {"model_name": "gigachat", "litellm_params": {"model": "openai/GigaChat"}},
+    {"model_name": "gigachat-max", "litellm_params": {"model": "openai/GigaChat-2-Max"},
+     "model_info": {"max_input_tokens": 100000}},
+    {"model_name": "gigachat-p2", "litellm_params": {"model": "openai/GigaChat-2-Max"}},
+]
+
+
+@pytest.fixture(autouse=True)
+def llm_router(monkeypatch):
+    import litellm.proxy.proxy_server as proxy_server
+
+    router = Router(model_list=MODEL_LIST)
+    monkeypatch.setattr(proxy_server, "llm_router", router)
+    return router
+
+
+def conversation(tool_output_chars=4000, turns=5):
+    """Диалог агента: системный промпт и пары вызов функции - результат"""
+    messages = [{"role": "system", "content": "Ты агент разработки"}]
+    for turn in range(turns):
+        messages += [
+            {"role": "user", "content": f"Шаг {turn}"},
+            {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{turn}", "type": "function",
+                 "function": {"name": "read_file", "arguments": f'{{"path": "file{turn}.py"}}'}}]},
+            {"role": "tool", "tool_call_id": f"call_{turn}", "content": "x = 1\n" * (tool_output_chars // 6)},
+        ]
+    messages.append({"role": "user", "content": "Исправь ошибку"})
+    return {"model": "gigachat", "messages": messages, "metadata": {}}
+
+
+def prompt_tokens(data):
+    return get_token_estimator().count_messages(data["messages"])
+
+
+class TestContextWindow:
+    """Приведение промпта к окну контекста"""
+
+    def test_context_window_lookup(self):
+        manager = ContextWindowManager(ContextWindowConfig(models={"GigaChat-2-Max": 128000}))
+
+        assert manager.get_context_window("gigachat") is None
+        assert manager.get_context_window("gigachat-max") == 100000
+        assert manager.get_context_window("gigachat-p2") == 128000
+
+    def test_small_prompt_unchanged(self):
+        manager = ContextWindowManager(ContextWindowConfig(models={"gigachat": 100000}))
+        data = conversation()
+        messages = data["messages"]
+
+        assert manager.apply(data)["messages"] is messages
+        assert manager.get_metrics()["over_limit"] == 0
+
+    def test_old_tool_outputs_truncated(self):
+        data = conversation()
+        limit = prompt_tokens(data) * 3 // 4
+        manager = ContextWindowManager(ContextWindowConfig(
+            models={"gigachat": limit}, strategies=["truncate_tool_outputs"], keep_recent_messages=3,
+        ))
+        original = [dict(message) for message in data["messages"]]
+
+        result = manager.apply(data)
+
+        messages = result["messages"]
+        assert len(messages) == len(original)
+        assert messages[0] == original[0]
+        # Последние сообщения не изменяются, обрезка начинается с самых старых
+        assert messages[-3:] == original[-3:]
+        assert messages[3]["content"].endswith("символов]") and len(messages[3]["content"]) < 2100
+        assert messages[3]["tool_call_id"] == "call_0"
+        assert result["metadata"][PROMPT_TOKENS_KEY] <= limit
+        assert manager.get_metrics()["fitted"] == 1
+
+    def test_old_messages_dropped_with_tool_outputs(self):
+        data = conversation(turns=6)
+        limit = prompt_tokens(data) // 2
+        manager = ContextWindowManager(ContextWindowConfig(
+            models={"gigachat": limit}, strategies=["drop_old_messages"], keep_recent_messages=4,
+        ))
+
+        messages = manager.apply(data)["messages"]
+
+        assert messages[0]["role"] == "system"
+        assert messages[-1]["content"] == "Исправь ошибку"
+        # Результат функции не остаётся без вызова
+        calls = {call["id"] for message in messages for call in message.get("tool_calls") or []}
+        assert all(message["tool_call_id"] in calls for message in messages if message["role"] == "tool")
+        assert prompt_tokens({"messages": messages}) <= limit
+        assert manager.get_metrics()["dropped_messages"] > 0
+
+    def test_overflow_rejected_or_passed(self):
+        data = conversation()
+        config = ContextWindowConfig(models={"gigachat": 100}, keep_recent_messages=20)
+
+        with pytest.raises(ContextWindowExceeded) as exc:
+            ContextWindowManager(config).apply(conversation())
+        assert exc.value.limit == 100 and exc.value.status_code == 400
+
+        config.reject_overflow = False
+        assert len(ContextWindowManager(config).apply(data)["messages"]) == 17
+
+    def test_escalation_table(self):
+        data = conversation()
+        manager = ContextWindowManager(ContextWindowConfig(
+            models={"gigachat": 1000}, escalation={"gigachat": ["gigachat-max"]},
+        ))
+        messages = data["messages"]
+
+        assert manager.escalate(data) == "gigachat-max"
+        result = manager.apply(data)
+
+        assert result["model"] == "gigachat-max"
+        assert result["messages"] == messages
+        assert manager.get_metrics()["escalated"] == 1
+        # Без стратегии escalate запрос остаётся на прежнем deployment
+        manager.config.strategies = ["drop_old_messages"]
+        assert manager.escalate(conversation()) is None
+
+    def test_escalation_within_group(self, monkeypatch):
+        router = ModelGroupRouter()
+        router._apply_config({"model_list": MODEL_LIST, "model_groups": [
+            {"name": "agent", "models": ["gigachat", "gigachat-max"], "exploration": 0}]})
+        monkeypatch.setattr(model_groups, "_global_model_group_router", router)
+        manager = ContextWindowManager(ContextWindowConfig(models={"gigachat": 1000}))
+        data = conversation()
+
+        assert manager.escalate(data, router.get_group("agent")) == "gigachat-max"
+        assert data["model"] == "gigachat-max"
+
+
+class TestModelGroupStage:
+    """Переключение deployment до квот и лимитов параллельности"""
+
+    def test_limits_applied_to_escalated_deployment(self, monkeypatch):
+        from src.litellm_gigachat.callbacks.concurrency_callback import ConcurrencyLimitCallback
+        from src.litellm_gigachat.callbacks.model_group_callback import ModelGroupCallback
+        from src.litellm_gigachat.callbacks.rate_limit_callback import RateLimitCallback
+        from src.litellm_gigachat.core import concurrency, rate_limits
+
+        router = ModelGroupRouter()
+        router._apply_config({"model_list": MODEL_LIST, "model_groups": [
+            {"name": "agent", "models": ["gigachat", "gigachat-max"], "exploration": 0}]})
+        monkeypatch.setattr(model_groups, "_global_model_group_router", router)
+        monkeypatch.setattr(context_window, "_global_context_window_manager", None)
+        monkeypatch.setattr(concurrency, "_global_concurrency_limiters", None)
+        monkeypatch.setattr(rate_limits, "_global_rate_limiters", None)
+        init_global_context_window_manager({"models": {"gigachat": 1000}})
+        limiters = concurrency.init_global_concurrency_limiters({"default": {"initial_limit": 4}})
+        quotas = rate_limits.init_global_rate_limiters({"default": {"tokens_per_minute": 600000}})
+        callbacks = [ModelGroupCallback(), RateLimitCallback(), ConcurrencyLimitCallback()]
+        stats = callbacks[0].stats
+
+        async def pre_call(data):
+            for callback in callbacks:
+                data = await callback.async_pre_call_hook(None, None, data, "completion")
+            return data
+
+        # Запрос к deployment: таблица escalation, к группе - участник с большим окном
+        context_window.get_global_context_window_manager().config.escalation = {"gigachat": ["gigachat-max"]}
+        for model in ("gigachat", "agent"):
+            data = conversation()
+            data["model"] = model
+            data = asyncio.run(pre_call(data))
+
+            info = data["metadata"][DEPLOYMENT_METADATA_KEY]
+            assert data["model"] == info["deployment"] == "gigachat-max"
+            assert data["metadata"]["gigachat_rate_limit"]["model"] == "gigachat-max"
+            assert stats.cancel_request(info["request_id"]) == "gigachat-max"
+
+        assert limiters.get("gigachat-max").get_metrics()["inflight"] == 2
+        assert limiters.get("gigachat") is None or limiters.get("gigachat").get_metrics()["inflight"] == 0
+        full = quotas.get("gigachat", "gigachat").get_metrics()["tokens_available"]
+        assert quotas.get("gigachat", "gigachat-max").get_metrics()["tokens_available"] < full - 1000
+
+
+class TestTransformerStage:
+    """Этап окна контекста в GigaChatTransformer"""
+
+    def test_overflow_returns_400(self, monkeypatch):
+        from src.litellm_gigachat.callbacks.content_handler import GigaChatTransformer
+
+        monkeypatch.setattr(context_window, "_global_context_window_manager", None)
+        transformer = GigaChatTransformer(debug_mode=False)
+
+        def pre_call(data):
+            return asyncio.run(transformer.async_pre_call_hook(None, None, data, "completion"))
+
+        assert pre_call(conversation())["model"] == "gigachat"
+
+        init_global_context_window_manager({"models": {"gigachat": 50}, "keep_recent_messages": 20})
+        with pytest.raises(HTTPException) as exc:
+            pre_call(conversation())
+        assert exc.value.status_code == 400
+
+        assert init_global_context_window_manager({"enabled": False}) is None
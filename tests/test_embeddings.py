@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Тесты эмбеддингов: объединение запросов в пакеты и кэш векторов
+"""
+
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+from litellm import Router
+from openai import AsyncOpenAI
+
+from src.litellm_gigachat.core.embeddings import (
+    EmbeddingsConfig,
+    MicroBatchTransport,
+    VectorCache,
+    floats_to_bytes,
+    init_global_embedding_batcher,
+)
+
+URL = "https://gigachat.example/api/v1/embeddings"
+
+
+class MockEmbeddingsAPI:
+    """API эмбеддингов: вектор [длина текста, 0.5], 2 токена на текст"""
+
+    def __init__(self, status=200):
+        self.requests = []
+        self.status = status
+
+    async def handler(self, request):
+        body = json.loads(request.content)
+        self.requests.append((request, body))
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": {"message": "overloaded"}}, headers={"retry-after": "1"})
+        data = [{"object": "embedding", "index": index, "embedding": [float(len(text)), 0.5]}
+                for index, text in enumerate(body["input"])]
+        return httpx.Response(200, json={
+            "object": "list", "model": body["model"], "data": data,
+            "usage": {"prompt_tokens": 2 * len(data), "total_tokens": 2 * len(data)},
+        }, headers={"x-ratelimit-remaining-requests": "99"})
+
+    def transport(self, cache=None, **config):
+        return MicroBatchTransport(EmbeddingsConfig(**config), cache, transport=httpx.MockTransport(self.handler))
+
+
+async def post(client, text, key="token", **params):
+    response = await client.post(URL, json={"model": "Embeddings", "input": text, **params},
+                                 headers={"Authorization": f"Bearer {key}"})
+    return response.status_code, response.json()
+
+
+class TestMicroBatching:
+    """Объединение одновременных запросов"""
+
+    def test_concurrent_requests_share_upstream_call(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(batch_window_ms=20)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asyncio.gather(*(post(client, "x" * (index + 1)) for index in range(5)))
+
+        results = asyncio.run(run())
+
+        assert len(api.requests) == 1
+        assert api.requests[0][1]["input"] == ["x", "xx", "xxx", "xxxx", "xxxxx"]
+        for index, (status, body) in enumerate(results):
+            assert status == 200
+            assert body["data"] == [{"object": "embedding", "index": 0, "embedding": [float(index + 1), 0.5]}]
+        # Usage пакета делится между запросами
+        assert sum(body["usage"]["prompt_tokens"] for _, body in results) == 10
+
+    def test_max_batch_size_splits_batches(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(batch_window_ms=1000, max_batch_size=2)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asyncio.gather(*(post(client, f"t{index}") for index in range(4)))
+
+        asyncio.run(run())
+
+        assert [body["input"] for _, body in api.requests] == [["t0", "t1"], ["t2", "t3"]]
+
+    def test_different_keys_not_merged(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(batch_window_ms=20)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await asyncio.gather(post(client, "a", key="one"), post(client, "b", key="two"))
+
+        asyncio.run(run())
+
+        assert sorted(request.headers["authorization"] for request, _ in api.requests) == [
+            "Bearer one", "Bearer two"
+        ]
+
+    def test_upstream_error_returned_to_each_request(self):
+        api = MockEmbeddingsAPI(status=429)
+        transport = api.transport(batch_window_ms=20)
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asyncio.gather(post(client, "a"), post(client, "b"))
+
+        results = asyncio.run(run())
+
+        assert len(api.requests) == 1
+        assert [status for status, _ in results] == [429, 429]
+        assert transport.get_metrics()["upstream_errors"] == 1
+
+    def test_other_requests_passed_through(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport()
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await client.post(URL, json={"model": "Embeddings", "input": [[1, 2, 3]]})
+
+        assert asyncio.run(run()).status_code == 200
+        assert api.requests[0][1]["input"] == [[1, 2, 3]]
+        assert transport.get_metrics()["requests"] == 0
+
+
+class TestVectorCache:
+    """Кэш векторов"""
+
+    def test_cached_texts_not_sent(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(cache=VectorCache(10))
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await post(client, "известный")
+                return await post(client, ["известный", "новый"])
+
+        status, body = asyncio.run(run())
+
+        assert status == 200
+        assert [item["embedding"] for item in body["data"]] == [[9.0, 0.5], [5.0, 0.5]]
+        assert api.requests[-1][1]["input"] == ["новый"]
+        # Токены расходуются только на новый текст
+        assert body["usage"]["prompt_tokens"] == 2
+
+    def test_base64_format(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(cache=VectorCache(10))
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await post(client, "abc")
+                return await post(client, "abc", encoding_format="base64")
+
+        _, body = asyncio.run(run())
+
+        assert base64.b64decode(body["data"][0]["embedding"]) == floats_to_bytes([3.0, 0.5])
+
+    def test_other_params_not_shared(self):
+        """Вектор запроса с другими параметрами или к другому URL не берётся из кэша"""
+        api = MockEmbeddingsAPI()
+        transport = api.transport(cache=VectorCache(10))
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await post(client, "abc")
+                await post(client, "abc", dimensions=4)
+                await post(client, "abc", user="u1")
+                await client.post("https://other.example/v1/embeddings", json={"model": "Embeddings", "input": "abc"})
+                await post(client, "abc", dimensions=4)
+
+        asyncio.run(run())
+
+        assert len(api.requests) == 4
+        assert api.requests[1][1]["dimensions"] == 4
+        assert transport.get_metrics()["cached_texts"] == 1
+
+    def test_lru_eviction(self):
+        cache = VectorCache(max_entries=2)
+        keys = [VectorCache.make_key(text, {"model": "Embeddings"}) for text in ("a", "b", "c")]
+        cache.put(keys[0], floats_to_bytes([1.0]))
+        cache.put(keys[1], floats_to_bytes([2.0]))
+        cache.get(keys[0])
+        cache.put(keys[2], floats_to_bytes([3.0]))
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) == floats_to_bytes([1.0])
+        assert cache.get_metrics()["evictions"] == 1
+
+    def test_file_survives_restart(self, tmp_path):
+        key = VectorCache.make_key("текст", {"model": "Embeddings"})
+        cache = VectorCache(max_entries=4, directory=str(tmp_path))
+        cache.put(key, floats_to_bytes([0.25, 0.5]))
+        cache.close()
+
+        reopened = VectorCache(max_entries=4, directory=str(tmp_path))
+        reopened.put(VectorCache.make_key("другой", {"model": "Embeddings"}), floats_to_bytes([1.0, 2.0]))
+
+        assert reopened.get(key) == floats_to_bytes([0.25, 0.5])
+        assert reopened.get_metrics()["files"] == [str(tmp_path / "vectors-2.f32")]
+
+    def test_locked_file_falls_back_to_memory(self, tmp_path):
+        pytest.importorskip("fcntl")
+        first = VectorCache(max_entries=4, directory=str(tmp_path))
+        second = VectorCache(max_entries=4, directory=str(tmp_path))
+        first.put(b"k" * 16, floats_to_bytes([1.0]))
+        second.put(b"k" * 16, floats_to_bytes([2.0]))
+
+        assert first.get_metrics()["files"] and not second.get_metrics()["files"]
+        assert second.get(b"k" * 16) == floats_to_bytes([2.0])
+
+
+class TestRouterIntegration:
+    """Запросы LiteLLM Router через клиент на транспорте объединения"""
+
+    def test_router_embeddings_batched(self):
+        api = MockEmbeddingsAPI()
+        transport = api.transport(cache=VectorCache(10), batch_window_ms=20)
+        router = Router(model_list=[{"model_name": "gigachat-embeddings", "litellm_params": {
+            "model": "openai/Embeddings", "api_base": "https://gigachat.example/api/v1", "api_key": "auto",
+        }}])
+        client = AsyncOpenAI(api_key="token", base_url="https://gigachat.example/api/v1",
+                             http_client=httpx.AsyncClient(transport=transport), max_retries=0)
+
+        async def run():
+            return await asyncio.gather(*(
+                router.aembedding(model="gigachat-embeddings", input=f"текст {index}", client=client, api_key="token")
+                for index in range(4)
+            ))
+
+        responses = asyncio.run(run())
+
+        assert len(api.requests) == 1
+        assert [response.data[0]["embedding"] for response in responses] == [[7.0, 0.5]] * 4
+        assert all(response.usage.prompt_tokens == 2 for response in responses)
+
+    def test_callback_sets_batching_client(self, monkeypatch):
+        import litellm.proxy.proxy_server as proxy_server
+        import src.litellm_gigachat.core.embeddings as embeddings
+        from src.litellm_gigachat.callbacks.embeddings_callback import EmbeddingsCallback
+
+        monkeypatch.setattr(embeddings, "_global_embedding_batcher", None)
+        monkeypatch.setattr(proxy_server, "llm_router", Router(model_list=[
+            {"model_name": "gigachat-embeddings", "litellm_params": {
+                "model": "openai/Embeddings", "api_base": "https://gigachat.example/api/v1", "api_key": "auto"}},
+            {"model_name": "local", "litellm_params": {"model": "ollama/nomic-embed-text"}},
+        ]))
+        callback = EmbeddingsCallback()
+
+        def pre_call(data, call_type="embeddings"):
+            return asyncio.run(callback.async_pre_call_hook(None, None, data, call_type))
+
+        # Объединение не настроено
+        assert "client" not in pre_call({"model": "gigachat-embeddings", "input": "a", "api_key": "token"})
+
+        assert init_global_embedding_batcher({"enabled": False}) is None
+        batcher = init_global_embedding_batcher({"max_batch_size": 4, "cache_max_entries": 0, "unknown": 1})
+        assert batcher.config.max_batch_size == 4 and batcher.cache is None
+
+        data = pre_call({"model": "gigachat-embeddings", "input": "a", "api_key": "token"})
+        assert str(data["client"].base_url) == "https://gigachat.example/api/v1/"
+        assert data["client"].api_key == "token"
+        assert pre_call({"model": "gigachat-embeddings", "input": "b", "api_key": "token"})["client"] is data["client"]
+        # Не OpenAI-совместимый deployment и запросы чата - без изменений
+        assert "client" not in pre_call({"model": "local", "input": "a"})
+        assert "client" not in pre_call({"model": "gigachat-embeddings", "messages": []}, call_type="completion")
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Тесты дублирующих запросов (hedging) и гистограмм задержек deployments
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from src.litellm_gigachat.callbacks import model_group_callback
+from src.litellm_gigachat.core import model_groups
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry, LatencyHistogram
+from src.litellm_gigachat.core.hedging import Hedger, HedgingConfig
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.retry import RetryBudget
+
+
+class SlowCall:
+    """Вызов модели с заданной задержкой каждого deployment"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+        self.cancelled = []
+
+    async def __call__(self, **kwargs):
+        model = kwargs["model"]
+        self.calls.append(model)
+        try:
+            await asyncio.sleep(self.delays[model])
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        return model
+
+
+class TestLatencyHistogram:
+    """Гистограмма задержек"""
+
+    def test_percentile_and_buckets(self):
+        histogram = LatencyHistogram(buckets=(0.1, 1.0), window=100)
+        for value in [0.05] * 90 + [0.5] * 9 + [5.0]:
+            histogram.record(value)
+
+        assert histogram.percentile(0.5) == 0.05
+        assert histogram.percentile(0.95) == 0.5
+        assert histogram.percentile(1.0) == 5.0
+        assert histogram.cumulative_buckets() == [(0.1, 90), (1.0, 99), (float("inf"), 100)]
+
+    def test_registry_records_successes_only(self):
+        stats = DeploymentStatsRegistry()
+        for _ in range(5):
+            stats.finish_request(stats.start_request("a"), True, latency=0.2)
+        stats.finish_request(stats.start_request("a"), False, latency=9.0)
+
+        assert stats.get_latency_percentile("a", 0.99) == 0.2
+        assert stats.get_latency_percentile("a", 0.99, min_samples=10) is None
+        assert stats.get_latency_histograms()["a"].count == 5
+
+    def test_cancel_request(self):
+        stats = DeploymentStatsRegistry()
+        request_id = stats.start_request("a")
+        stats.cancel_request(request_id)
+
+        assert stats.get("a").inflight == 0
+        assert stats.get("a").requests == 0
+
+
+class HedgingTestBase:
+    """Группа моделей из двух deployments с накопленной статистикой"""
+
+    def setup_method(self):
+        self.previous = model_groups._global_model_group_router
+        self.stats = DeploymentStatsRegistry()
+        self.router = ModelGroupRouter(self.stats)
+        self.router.groups = {"g": ModelGroupConfig(name="g", models=["a", "b"], exploration=0.0)}
+        model_groups._global_model_group_router = self.router
+        for name in ("a", "b"):
+            for _ in range(20):
+                self.stats.finish_request(self.stats.start_request(name), True, latency=0.05)
+
+    def teardown_method(self):
+        model_groups._global_model_group_router = self.previous
+
+    def make_kwargs(self, model="a", **extra):
+        metadata = {"gigachat_deployment": {
+            "deployment": model, "group": "g", "request_id": self.stats.start_request(model),
+        }}
+        return {"model": model, "metadata": metadata, "messages": [], **extra}
+
+
+class TestHedger(HedgingTestBase):
+    """Дублирование медленных запросов"""
+
+    def make_hedger(self, ratio=1.0, **config):
+        return Hedger(
+            default=HedgingConfig(**{"min_delay": 0.01, **config}),
+            budget=RetryBudget(ratio=ratio, min_retries_per_second=0.0),
+        )
+
+    def test_fast_primary_not_hedged(self):
+        hedger = self.make_hedger()
+        call = SlowCall({"a": 0.01, "b": 0.01})
+
+        assert asyncio.run(hedger.call(call, self.make_kwargs())) == "a"
+        assert call.calls == ["a"]
+        assert hedger.get_metrics()["hedged"] == 0
+
+    def test_slow_primary_hedged_and_cancelled(self):
+        """Дублирующий запрос отвечает первым, основной отменяется"""
+        hedger = self.make_hedger()
+        call = SlowCall({"a": 2.0, "b": 0.01})
+        kwargs = self.make_kwargs(litellm_call_id="primary")
+
+        assert asyncio.run(hedger.call(call, kwargs)) == "b"
+        assert call.calls == ["a", "b"]
+        assert call.cancelled == ["a"]
+        assert kwargs["model"] == "a"  # параметры основного запроса не меняются
+        assert self.stats.get("a").inflight == 0
+        assert self.stats.get("b").inflight == 1  # завершит callback групп моделей
+        metrics = hedger.get_metrics()
+        assert metrics["hedged"] == 1
+        assert metrics["hedge_won"] == 1
+
+    def test_failed_hedge_waits_for_primary(self):
+        hedger = self.make_hedger()
+
+        async def call(**kwargs):
+            if kwargs["model"] == "b":
+                raise ConnectionResetError("reset")
+            await asyncio.sleep(0.1)
+            return "a"
+
+        assert asyncio.run(hedger.call(call, self.make_kwargs())) == "a"
+        assert hedger.get_metrics()["hedge_won"] == 0
+
+    def test_cancelled_call_released(self):
+        """Квота и слот отменённого основного запроса освобождаются, у дублирующего - свои"""
+        hedger = self.make_hedger()
+        call = SlowCall({"a": 2.0, "b": 0.01})
+        kwargs = self.make_kwargs()
+        kwargs["metadata"]["slot"] = "a"
+        released = []
+
+        async def prepare(data, previous_model, deployment, release_previous=True):
+            assert not release_previous
+            data["metadata"]["slot"] = deployment
+
+        def release(data):
+            released.append(data["metadata"]["slot"])
+
+        assert asyncio.run(hedger.call(call, kwargs, prepare, release)) == "b"
+        assert released == ["a"]
+
+    def test_rejected_hedge_waits_for_primary(self):
+        """Отказ лимитов нового deployment не прерывает основной запрос"""
+        hedger = self.make_hedger()
+        call = SlowCall({"a": 0.1, "b": 0.01})
+        released = []
+
+        async def prepare(data, previous_model, deployment, release_previous=True):
+            raise RuntimeError("Очередь deployment b переполнена")
+
+        assert asyncio.run(hedger.call(call, self.make_kwargs(), prepare, released.append)) == "a"
+        assert call.calls == ["a"]
+        assert [data["model"] for data in released] == ["b"]
+        assert self.stats.get("b").inflight == 0
+
+    def test_streaming_not_hedged(self):
+        hedger = self.make_hedger()
+        call = SlowCall({"a": 0.1, "b": 0.01})
+
+        assert asyncio.run(hedger.call(call, self.make_kwargs(stream=True))) == "a"
+        assert call.calls == ["a"]
+
+    def test_not_enough_samples(self):
+        hedger = self.make_hedger(min_samples=100)
+        call = SlowCall({"a": 0.1, "b": 0.01})
+
+        assert asyncio.run(hedger.call(call, self.make_kwargs())) == "a"
+        assert hedger.get_metrics()["eligible"] == 0
+
+    def test_budget_limits_hedges(self):
+        """При общей деградации дублируется не больше budget_ratio запросов"""
+        hedger = self.make_hedger(ratio=0.1)
+        call = SlowCall({"a": 0.2, "b": 0.2})
+
+        async def run():
+            await asyncio.gather(*(hedger.call(call, self.make_kwargs()) for _ in range(50)))
+
+        asyncio.run(run())
+        metrics = hedger.get_metrics()
+        assert metrics["hedged"] <= 5
+        assert metrics["budget_exhausted"] >= 45
+
+    def test_heavy_tail_p99_reduced(self):
+        """На распределении с тяжёлым хвостом hedging снижает p99"""
+        rng = random.Random(1)
+
+        async def call(**kwargs):
+            await asyncio.sleep(0.5 if rng.random() < 0.05 else 0.01)
+            return kwargs["model"]
+
+        async def measure(hedger):
+            loop = asyncio.get_running_loop()
+            latencies = []
+
+            async def one():
+                started = loop.time()
+                await hedger.call(call, self.make_kwargs()) if hedger else await call(model="a")
+                latencies.append(loop.time() - started)
+
+            await asyncio.gather(*(one() for _ in range(200)))
+            return sorted(latencies)[int(0.99 * len(latencies))]
+
+        hedger = self.make_hedger(ratio=0.2, min_delay=0.05)
+        assert asyncio.run(measure(hedger)) < asyncio.run(measure(None)) / 2
+
+
+class TestPrepareRequestForDeployment:
+    """Перенастройка параметров запроса на другой deployment"""
+
+    def test_provider_settings_replaced(self, monkeypatch):
+        from src.litellm_gigachat.callbacks import proxy_provider_callback, token_callback
+
+        class Provider:
+            def __init__(self, url, header):
+                self.url, self.header = url, header
+
+            def get_auth_headers(self):
+                return [self.header]
+
+        providers = {
+            "p1": Provider("https://p1/api/v1", "X-P1-Key"),
+            "p2": Provider("https://p2/api/v1", "X-P2-Key"),
+        }
+
+        class Manager:
+            def get_provider_by_suffix(self, model):
+                return providers.get(model.rsplit("-", 1)[-1])
+
+        class ProviderCallback:
+            async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+                provider = Manager().get_provider_by_suffix(data["model"])
+                data["api_base"] = provider.url
+                data.setdefault("extra_headers", {})[provider.header] = "secret"
+                data["api_key"] = "none"
+                return data
+
+        class TokenCallback:
+            async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+                return data
+
+        monkeypatch.setattr(model_group_callback, "get_global_multi_proxy_provider_manager", lambda: Manager())
+        monkeypatch.setattr(proxy_provider_callback, "get_proxy_provider_callback", lambda: ProviderCallback())
+        monkeypatch.setattr(token_callback, "get_gigachat_callback", lambda: TokenCallback())
+
+        data = {
+            "model": "max-p1",
+            "api_base": "https://p1/api/v1",
+            "api_key": "none",
+            "extra_headers": {"X-P1-Key": "secret", "X-Trace": "1"},
+        }
+        asyncio.run(model_group_callback.prepare_request_for_deployment(data, "max-p1", "max-p2"))
+
+        assert data["model"] == "max-p2"
+        assert data["api_base"] == "https://p2/api/v1"
+        assert data["extra_headers"] == {"X-Trace": "1", "X-P2-Key": "secret"}
+
+    def test_limits_moved_to_new_deployment(self, monkeypatch):
+        """Квота и слот параллельности переходят на новый deployment"""
+        from src.litellm_gigachat.callbacks import (
+            concurrency_callback,
+            proxy_provider_callback,
+            rate_limit_callback,
+            token_callback,
+        )
+        from fastapi import HTTPException
+        from src.litellm_gigachat.core import concurrency, context_window, rate_limits
+
+        class PassThrough:
+            async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+                return data
+
+        class Manager:
+            def get_provider_by_suffix(self, model):
+                return None
+
+        rate_limit = rate_limit_callback.RateLimitCallback()
+        slots = concurrency_callback.ConcurrencyLimitCallback()
+        monkeypatch.setattr(model_group_callback, "get_global_multi_proxy_provider_manager", lambda: Manager())
+        monkeypatch.setattr(proxy_provider_callback, "get_proxy_provider_callback", lambda: PassThrough())
+        monkeypatch.setattr(token_callback, "get_gigachat_callback", lambda: PassThrough())
+        monkeypatch.setattr(rate_limit_callback, "get_rate_limit_callback", lambda: rate_limit)
+        monkeypatch.setattr(concurrency_callback, "get_concurrency_limit_callback", lambda: slots)
+        monkeypatch.setattr(concurrency, "_global_concurrency_limiters", None)
+        monkeypatch.setattr(rate_limits, "_global_rate_limiters", None)
+        limiters = concurrency.init_global_concurrency_limiters({"default": {"initial_limit": 4}})
+        quotas = rate_limits.init_global_rate_limiters({"default": {"tokens_per_minute": 60000}})
+
+        def state(model):
+            return (limiters.get(model).get_metrics()["inflight"],
+                    quotas.get("gigachat", model).get_metrics()["tokens_available"])
+
+        async def run():
+            data = {"model": "gigachat-max", "messages": [{"role": "user", "content": "текст " * 200}]}
+            for callback in (rate_limit, slots):
+                data = await callback.async_pre_call_hook(None, None, data, "completion")
+            full, held = state("gigachat-pro"), state("gigachat-max")
+            assert held[1] < full[1] - 100
+
+            # Дублирующий запрос занимает свои квоту и слот, основной сохраняет прежние
+            hedge = {**data, "metadata": dict(data["metadata"])}
+            await model_group_callback.prepare_request_for_deployment(
+                hedge, "gigachat-max", "gigachat-pro", release_previous=False)
+            assert state("gigachat-max")[0] == held[0] == 1
+            assert state("gigachat-max")[1] == pytest.approx(held[1], abs=5)
+            assert state("gigachat-pro")[0] == 1
+            assert state("gigachat-pro")[1] == pytest.approx(held[1], abs=5)
+            model_group_callback.release_request_for_deployment(hedge)
+            assert state("gigachat-pro")[0] == 0
+
+            # Переключение основного запроса освобождает квоту и слот прежнего deployment
+            await model_group_callback.prepare_request_for_deployment(data, "gigachat-max", "gigachat-pro")
+            assert state("gigachat-max")[0] == 0
+            assert state("gigachat-max")[1] == pytest.approx(full[1], abs=5)
+            assert data["metadata"]["gigachat_rate_limit"]["model"] == "gigachat-pro"
+            assert state("gigachat-pro")[0] == 1
+
+            # Окно контекста проверяется для нового deployment
+            context_window.init_global_context_window_manager({"models": {"gigachat-lite": 50}})
+            with pytest.raises(HTTPException) as exc:
+                await model_group_callback.prepare_request_for_deployment(data, "gigachat-pro", "gigachat-lite")
+            assert exc.value.status_code == 400
+
+        monkeypatch.setattr(context_window, "_global_context_window_manager", None)
+        asyncio.run(run())
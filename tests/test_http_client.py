@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Тесты для HTTPClient - переиспользование TLS соединений
+
+Локальный TLS сервер считает принятые соединения: каждое соединение
+означает одно TCP+TLS рукопожатие.
+"""
+
+import datetime
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from src.litellm_gigachat.core.http_client import HTTPClient
+
+REQUESTS_COUNT = 20
+
+
+def write_self_signed_cert(directory):
+    """Создание самоподписанного сертификата для localhost"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_file = directory / "cert.pem"
+    key_file = directory / "key.pem"
+    cert_file.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_file.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    return str(cert_file), str(key_file)
+
+
+class ModelsHandler(BaseHTTPRequestHandler):
+    """Обработчик, имитирующий /v1/models провайдера"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"data": [{"id": "GigaChat"}]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HandshakeCountingServer(ThreadingHTTPServer):
+    """HTTPS сервер, считающий TLS рукопожатия"""
+
+    daemon_threads = True
+
+    def __init__(self, cert_file, key_file):
+        super().__init__(("localhost", 0), ModelsHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_file, key_file)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.handshakes = 0
+        self._count_lock = threading.Lock()
+
+    def get_request(self):
+        request = super().get_request()
+        with self._count_lock:
+            self.handshakes += 1
+        return request
+
+
+@pytest.fixture
+def tls_server(tmp_path):
+    """Локальный TLS сервер-заглушка"""
+    cert_file, key_file = write_self_signed_cert(tmp_path)
+    server = HandshakeCountingServer(cert_file, key_file)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, cert_file
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPClient:
+    """Тесты пулов соединений"""
+
+    def test_module_level_requests_handshake_per_call(self, tls_server):
+        """Базовая линия: requests.get открывает новое соединение на каждый запрос"""
+        server, cert_file = tls_server
+        url = f"https://localhost:{server.server_address[1]}/v1/models"
+
+        for _ in range(REQUESTS_COUNT):
+            assert requests.get(url, verify=cert_file, timeout=5).status_code == 200
+
+        assert server.handshakes == REQUESTS_COUNT
+
+    def test_pooled_client_reuses_connection(self, tls_server):
+        """HTTPClient выполняет одно рукопожатие на серию запросов"""
+        server, cert_file = tls_server
+        url = f"https://localhost:{server.server_address[1]}/v1/models"
+        client = HTTPClient(verify=cert_file)
+
+        for _ in range(REQUESTS_COUNT):
+            assert client.get(url, timeout=5).json()["data"][0]["id"] == "GigaChat"
+        client.close()
+
+        assert server.handshakes == 1
+        assert client.get_stats()["requests_by_host"] == {f"localhost:{server.server_address[1]}": REQUESTS_COUNT}
+
+    def test_pool_limits_bound_connections(self, tls_server):
+        """Параллельные запросы не открывают больше pool_maxsize соединений"""
+        server, cert_file = tls_server
+        url = f"https://localhost:{server.server_address[1]}/v1/models"
+        client = HTTPClient(pool_maxsize=2, verify=cert_file)
+
+        def worker():
+            for _ in range(5):
+                client.get(url, timeout=5)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Без pool_block лишние соединения закрываются, но повторно используется не больше 2
+        first_wave = server.handshakes
+        for _ in range(REQUESTS_COUNT):
+            client.get(url, timeout=5)
+        client.close()
+
+        assert server.handshakes - first_wave <= 2
+
+    def test_verify_from_environment(self, monkeypatch):
+        """TLS настройки берутся из переменных окружения"""
+        monkeypatch.setenv("GIGACHAT_CA_BUNDLE", "/etc/ssl/russian-ca.pem")
+        assert HTTPClient().verify == "/etc/ssl/russian-ca.pem"
+
+        monkeypatch.setenv("GIGACHAT_SSL_VERIFY", "false")
+        assert HTTPClient().verify is False
+
+    def test_request_verify_override(self, monkeypatch):
+        """verify=True использует общую настройку клиента, False и путь передаются как есть"""
+        client = HTTPClient(verify="/etc/ssl/russian-ca.pem")
+        sent = []
+        monkeypatch.setattr(client.session, "request", lambda method, url, **kwargs: sent.append(kwargs["verify"]))
+
+        for verify in (None, True, False, "/etc/ssl/provider-ca.pem"):
+            kwargs = {} if verify is None else {"verify": verify}
+            client.get("https://provider.example/v1/models", **kwargs)
+
+        assert sent == ["/etc/ssl/russian-ca.pem", "/etc/ssl/russian-ca.pem", False, "/etc/ssl/provider-ca.pem"]
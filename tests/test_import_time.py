@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Тесты времени импорта пакета и CLI (python -X importtime)
+
+Лёгкие команды CLI не должны загружать LiteLLM Proxy. Бюджет задан
+с запасом относительно ~0.1-0.2 с на типичной машине (полная загрузка
+LiteLLM Proxy занимает несколько секунд).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Бюджет суммарного времени импорта в секундах
+IMPORT_BUDGET_SECONDS = 1.0
+# Модули callbacks загружают ядро LiteLLM (~2.5 с), но не LiteLLM Proxy (~4.5 с)
+CALLBACK_IMPORT_BUDGET_SECONDS = 10.0
+
+
+def run_with_importtime(*args, env=None):
+    """
+    Запуск интерпретатора с -X importtime.
+
+    Returns:
+        (код возврата, {модуль: cumulative мкс} для модулей верхнего уровня, все модули)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+        env=env,
+    )
+
+    top_level = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        modules.add(name.strip())
+        # Модули верхнего уровня выводятся с отступом в один пробел
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative)
+
+    return result.returncode, top_level, modules
+
+
+def total_seconds(top_level):
+    """Суммарное время импорта в секундах"""
+    return sum(top_level.values()) / 1_000_000
+
+
+class TestImportTime:
+    """Бюджет времени импорта"""
+
+    def test_package_import_is_lazy(self):
+        """Импорт пакета не загружает callbacks, прокси и LiteLLM"""
+        code, top_level, modules = run_with_importtime("-c", "import src.litellm_gigachat")
+
+        assert code == 0
+        assert "litellm" not in modules
+        assert "src.litellm_gigachat.callbacks.token_callback" not in modules
+        assert total_seconds(top_level) < IMPORT_BUDGET_SECONDS
+
+    @pytest.mark.parametrize("command", [["--version"], ["env-check", "--help"], ["token-info", "--help"]])
+    def test_light_commands_skip_litellm(self, command):
+        """--version, env-check и token-info не загружают LiteLLM"""
+        code, top_level, modules = run_with_importtime("-m", "src.litellm_gigachat.cli.main", *command)
+
+        assert code == 0
+        assert "litellm" not in modules
+        assert not any(name.startswith("litellm.proxy") for name in modules)
+        assert total_seconds(top_level) < IMPORT_BUDGET_SECONDS
+
+    def test_lazy_attributes_resolve(self):
+        """Публичные атрибуты пакета доступны при обращении"""
+        import src.litellm_gigachat as package
+
+        assert package.TokenManager.__name__ == "TokenManager"
+        assert callable(package.start_proxy_server)
+        assert "cli_main" in dir(package)
+        with pytest.raises(AttributeError):
+            package.missing_attribute
+
+    def test_command_attributes_resolve(self):
+        """Команды доступны из пакета cli.commands, в том числе после загрузки группой CLI"""
+        import click
+        from click.testing import CliRunner
+
+        from src.litellm_gigachat.cli import commands
+        from src.litellm_gigachat.cli.main import cli
+
+        assert CliRunner().invoke(cli, ["test", "--help"]).exit_code == 0
+        from src.litellm_gigachat.cli.commands import test, version_cmd
+
+        assert isinstance(test, click.Command) and test.name == "test"
+        assert isinstance(version_cmd, click.Command)
+        assert "start" in dir(commands)
+        with pytest.raises(ImportError):
+            from src.litellm_gigachat.cli.commands import missing_command  # noqa: F401
+
+    def test_callback_modules_import_without_side_effects(self):
+        """Модули callbacks импортируются без GIGACHAT_AUTH_KEY и без LiteLLM Proxy"""
+        env = {key: value for key, value in os.environ.items() if key != "GIGACHAT_AUTH_KEY"}
+        code, top_level, modules = run_with_importtime(
+            "-c",
+            "import src.litellm_gigachat.callbacks.token_callback as t, "
+            "src.litellm_gigachat.callbacks.content_handler as c, "
+            "src.litellm_gigachat.callbacks.proxy_provider_callback as p; "
+            "assert not (t.gigachat_callback_instance.is_initialized "
+            "or c.gigachat_transformer_instance.is_initialized "
+            "or p.proxy_provider_callback_instance.is_initialized)",
+            env=env,
+        )
+
+        assert code == 0
+        assert "src.litellm_gigachat.core.token_manager" in modules
+        assert "litellm.proxy.proxy_server" not in modules
+        assert total_seconds(top_level) < CALLBACK_IMPORT_BUDGET_SECONDS
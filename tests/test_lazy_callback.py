@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тесты для LazyCallback - отложенная инициализация callback-экземпляров
+"""
+
+import pytest
+from litellm.integrations.custom_logger import CustomLogger
+
+from src.litellm_gigachat.callbacks.lazy_callback import LazyCallback
+
+
+class RecordingCallback(CustomLogger):
+    """Callback, записывающий вызовы хука"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.flag = "recording"
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+        self.calls.append(data["model"])
+        data["hooked"] = True
+        return data
+
+
+class TestLazyCallback:
+    """Тесты прокси callback"""
+
+    def setup_method(self):
+        self.created = 0
+
+        def factory():
+            self.created += 1
+            return RecordingCallback()
+
+        self.callback = LazyCallback(factory, "RecordingCallback")
+
+    def test_not_created_on_construction(self):
+        """Целевой callback не создаётся при создании прокси"""
+        assert not self.callback.is_initialized
+        assert self.created == 0
+        assert isinstance(self.callback, CustomLogger)
+
+    def test_visible_to_litellm_pre_call_dispatch(self):
+        """LiteLLM вызывает async_pre_call_hook только если он объявлен в классе"""
+        assert "async_pre_call_hook" in vars(type(self.callback))
+        assert type(self.callback).async_pre_call_hook is not CustomLogger.async_pre_call_hook
+
+    @pytest.mark.asyncio
+    async def test_created_once_on_first_hook(self):
+        """Первый вызов хука создаёт callback, повторные используют его же"""
+        for model in ("gigachat", "gigachat-pro"):
+            data = await self.callback.async_pre_call_hook(None, None, {"model": model}, "completion")
+            assert data["hooked"]
+
+        assert self.created == 1
+        assert self.callback.get_instance().calls == ["gigachat", "gigachat-pro"]
+
+    def test_attributes_delegated(self):
+        """Атрибуты читаются и записываются у целевого экземпляра"""
+        assert self.callback.flag == "recording"
+        self.callback.flag = "changed"
+        assert self.callback.get_instance().flag == "changed"
+
+    def test_distinct_callbacks_not_deduplicated(self):
+        """Разные LazyCallback не считаются LiteLLM одним и тем же callback"""
+        import litellm
+
+        other = LazyCallback(RecordingCallback, "OtherCallback")
+        manager = litellm.logging_callback_manager
+
+        assert manager._get_custom_logger_key(self.callback) != manager._get_custom_logger_key(other)
+        assert not self.callback.is_initialized
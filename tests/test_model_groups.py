@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Тесты групп моделей и маршрутизации по EWMA задержки
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.litellm_gigachat.core import config_loader, multi_model_sync
+from src.litellm_gigachat.core.config_loader import ConfigError, load_config
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.multi_model_sync import MultiModelSyncManager
+from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+
+CONFIG = """
+model_list:
+  - model_name: gigachat-max
+    litellm_params:
+      model: openai/GigaChat-2-Max
+  - model_name: gigachat-pro
+    litellm_params:
+      model: openai/GigaChat-2-Pro
+
+model_groups:
+  - name: gigachat-2-max
+    model_id: GigaChat-2-Max
+    models: [gigachat-2-max-internal]
+"""
+
+
+class TestDeploymentStats:
+    """Статистика deployments"""
+
+    def test_ewma_and_inflight(self):
+        """EWMA задержки и доли ошибок, учёт запросов в работе"""
+        stats = DeploymentStatsRegistry(alpha=0.5)
+
+        first = stats.start_request("a")
+        second = stats.start_request("a")
+        assert stats.get("a").inflight == 2
+
+        stats.finish_request(first, True, latency=1.0)
+        stats.finish_request(second, True, latency=3.0)
+        assert stats.get("a").ewma_latency == pytest.approx(2.0)
+        assert stats.get("a").inflight == 0
+
+        stats.record("a", False, latency=60.0, error="timeout")
+        a = stats.get("a")
+        assert a.ewma_latency == pytest.approx(2.0)  # задержка ошибок не учитывается
+        assert a.ewma_error_rate == pytest.approx(0.5)
+        assert a.failures == 1
+
+    def test_finish_is_idempotent(self):
+        """Повторное завершение запроса игнорируется"""
+        stats = DeploymentStatsRegistry()
+        request_id = stats.start_request("a")
+
+        assert stats.finish_request(request_id, False) == "a"
+        assert stats.finish_request(request_id, False) is None
+        assert stats.get("a").requests == 1
+        assert stats.get("a").inflight == 0
+
+
+class TestModelGroupRouter:
+    """Выбор deployment в группе"""
+
+    def setup_method(self):
+        config_loader.clear_config_cache()
+        self.previous_sync_manager = multi_model_sync._global_multi_model_sync_manager
+
+    def teardown_method(self):
+        multi_model_sync._global_multi_model_sync_manager = self.previous_sync_manager
+        config_loader.clear_config_cache()
+
+    def test_members_match_model_id(self, tmp_path):
+        """В группу входят явный список, model_list и каталоги провайдеров с тем же model_id"""
+        config_file = tmp_path / "config.yml"
+        config_file.write_text(CONFIG, encoding="utf-8")
+
+        sync = MultiModelSyncManager()
+        for suffix in ("p1", "p2"):
+            sync.add_provider(ProxyProviderConfig(
+                name=suffix, url=f"http://{suffix}/v1", auth_header="X", auth_value="", suffix=suffix, sync_enabled=True,
+            ))
+            sync._sync_managers[suffix].apply_catalog([{"id": "GigaChat-2-Max"}, {"id": "Other"}])
+        multi_model_sync._global_multi_model_sync_manager = sync
+
+        router = ModelGroupRouter(DeploymentStatsRegistry())
+        assert router.load_from_config(str(config_file))
+        members = router.get_members(router.get_group("gigachat-2-max"))
+
+        assert members[:2] == ["gigachat-2-max-internal", "gigachat-max"]
+        assert set(members[2:]) == {"gigachat-2-max-p1", "gigachat-2-max-p2"}
+        assert router.get_group("gigachat-max") is None
+
+    def test_invalid_groups_rejected(self, tmp_path):
+        """Группа без участников и группа с именем модели из model_list отклоняются"""
+        config_file = tmp_path / "config.yml"
+        config_file.write_text(CONFIG + "  - name: gigachat-pro\n    models: [gigachat-max]\n  - name: empty\n",
+                               encoding="utf-8")
+
+        with pytest.raises(ConfigError) as exc_info:
+            load_config(str(config_file))
+        assert any("gigachat-pro" in error for error in exc_info.value.errors)
+        assert any("empty" in error for error in exc_info.value.errors)
+
+    def test_choose_prefers_fast_healthy_idle(self):
+        """Выбирается быстрый deployment; ошибки и очередь снижают его приоритет"""
+        stats = DeploymentStatsRegistry(alpha=1.0)
+        router = ModelGroupRouter(stats)
+        group = ModelGroupConfig(name="g", models=["fast", "slow"], exploration=0.0)
+
+        stats.record("fast", True, 0.1)
+        stats.record("slow", True, 0.3)
+        assert router.choose(group) == "fast"
+
+        # Три запроса в работе: 0.1 * 4 > 0.3
+        for _ in range(3):
+            stats.start_request("fast")
+        assert router.choose(group) == "slow"
+        assert router.choose(group, exclude=["slow"]) == "fast"
+
+        stats.reset()
+        stats.record("fast", True, 0.1)
+        stats.record("fast", False, 60.0)
+        stats.record("slow", True, 0.3)
+        assert router.choose(group) == "slow"
+
+    def test_unmeasured_member_gets_traffic(self):
+        """Deployment без измерений оценивается оптимистично"""
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        stats.record("known", True, 0.2)
+        stats.start_request("known")
+
+        # Новый deployment оценивается как лучший из измеренных (0.2 < 0.2 * 2)
+        assert router.choose(ModelGroupConfig(name="g", models=["known", "new"], exploration=0.0)) == "new"
+
+
+class TestModelGroupSimulation:
+    """Симуляция: mock-провайдеры с разной задержкой"""
+
+    LATENCIES = {"gigachat-max": 0.040, "gigachat-2-max-p1": 0.010, "gigachat-2-max-p2": 0.025}
+
+    async def run_requests(self, pick, stats, latencies, total=240, concurrency=8):
+        """
+        Выполнить total запросов; pick() выбирает deployment, задержка растёт с нагрузкой.
+
+        Returns:
+            Список (deployment, задержка) в порядке завершения
+        """
+        inflight = {name: 0 for name in latencies}
+        results = []
+        remaining = [total]
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                deployment = pick()
+                request_id = stats.start_request(deployment)
+                inflight[deployment] += 1
+                latency = latencies[deployment] * (1 + 0.25 * (inflight[deployment] - 1))
+                await asyncio.sleep(latency)
+                inflight[deployment] -= 1
+                stats.finish_request(request_id, True, latency=latency)
+                results.append((deployment, latency))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    @staticmethod
+    def mean_latency(results):
+        return sum(latency for _, latency in results) / len(results)
+
+    def test_routing_beats_round_robin(self):
+        """Маршрутизация по EWMA даёт меньшую задержку, чем равномерное распределение"""
+        random.seed(0)
+        group = ModelGroupConfig(name="gigachat-2-max", models=list(self.LATENCIES))
+
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        routed = asyncio.run(self.run_requests(lambda: router.choose(group), stats, self.LATENCIES))
+
+        members = list(self.LATENCIES)
+        counter = iter(range(10 ** 6))
+        round_robin = asyncio.run(self.run_requests(
+            lambda: members[next(counter) % len(members)], DeploymentStatsRegistry(), self.LATENCIES
+        ))
+
+        assert self.mean_latency(routed) < self.mean_latency(round_robin) * 0.8
+        assert stats.get("gigachat-2-max-p1").requests > stats.get("gigachat-max").requests
+
+    def test_routing_adapts_to_degradation(self):
+        """После замедления лучшего провайдера трафик уходит на другие deployments"""
+        random.seed(0)
+        group = ModelGroupConfig(name="gigachat-2-max", models=list(self.LATENCIES))
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+
+        before = asyncio.run(self.run_requests(lambda: router.choose(group), stats, self.LATENCIES, total=120))
+        degraded = dict(self.LATENCIES, **{"gigachat-2-max-p1": 0.080})
+        after = asyncio.run(self.run_requests(lambda: router.choose(group), stats, degraded))
+
+        def share(results):
+            return sum(deployment == "gigachat-2-max-p1" for deployment, _ in results) / len(results)
+
+        assert share(before) > 0.5
+        assert share(after[-80:]) < 0.2
+
+
+class TestModelGroupCallback:
+    """Callback групп моделей"""
+
+    def test_pre_call_rewrites_model_and_records(self, monkeypatch):
+        """Имя группы заменяется на deployment, завершение запроса учитывается"""
+        from src.litellm_gigachat.callbacks import model_group_callback
+
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        router.groups = {"g": ModelGroupConfig(name="g", models=["only"])}
+        monkeypatch.setattr(model_group_callback, "get_global_model_group_router", lambda: router)
+
+        callback = model_group_callback.ModelGroupCallback()
+        callback.stats = stats
+
+        data = asyncio.run(callback.async_pre_call_hook(None, None, {"model": "g"}, "completion"))
+        assert data["model"] == "only"
+        assert data["metadata"]["gigachat_deployment"]["group"] == "g"
+        assert stats.get("only").inflight == 1
+
+        start = datetime.now()
+        asyncio.run(callback.async_log_success_event(
+            {"litellm_params": {"metadata": data["metadata"]}}, None, start, start + timedelta(seconds=0.5)
+        ))
+        only = stats.get("only")
+        assert only.inflight == 0
+        assert only.ewma_latency == pytest.approx(0.5)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Тесты для ModelSyncManager - внеплановая синхронизация и адаптивное расписание
+"""
+
+import threading
+import time
+
+from src.litellm_gigachat.core.model_sync import ModelSyncManager
+from src.litellm_gigachat.core.multi_model_sync import MultiModelSyncManager
+from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+
+
+class CountingModelSyncManager(ModelSyncManager):
+    """ModelSyncManager с подменённым запросом каталога"""
+
+    def __init__(self, catalog, fetch_delay: float = 0.0, **kwargs):
+        super().__init__(
+            api_base="http://localhost:8002/v1",
+            auth_header_name="X-API-Key",
+            auth_header_value="token",
+            model_suffix="-p2",
+            provider_name="provider2",
+            **kwargs
+        )
+        self.catalog = catalog
+        self.fetch_delay = fetch_delay
+        self.fetch_calls = 0
+
+    def fetch_models(self):
+        self.fetch_calls += 1
+        time.sleep(self.fetch_delay)
+        return [{"id": model_id} for model_id in self.catalog]
+
+
+class TestSyncOnMiss:
+    """Тесты внеплановой синхронизации"""
+
+    def test_known_model_does_not_sync(self):
+        """Известная модель не вызывает запрос к провайдеру"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"])
+        manager.sync_models()
+
+        assert manager.sync_on_miss("llama-3.1-70b-p2")
+        assert manager.fetch_calls == 1
+
+    def test_new_upstream_model_is_found(self):
+        """Модель, добавленная у провайдера после синхронизации, находится сразу"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], on_miss_min_interval=0)
+        manager.sync_models()
+
+        manager.catalog.append("new-model")
+        assert manager.sync_on_miss("new-model-p2", wait_timeout=2)
+        assert manager.fetch_calls == 2
+
+    def test_concurrent_misses_are_single_flight(self):
+        """Одновременные промахи объединяются в одну синхронизацию"""
+        manager = CountingModelSyncManager(["new-model"], fetch_delay=0.2)
+        results = []
+
+        def request_model():
+            results.append(manager.sync_on_miss("new-model-p2", wait_timeout=2))
+
+        threads = [threading.Thread(target=request_model) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [True] * 10
+        assert manager.fetch_calls == 1
+
+    def test_unknown_model_is_negative_cached(self):
+        """Несуществующее имя не вызывает повторных синхронизаций"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], on_miss_min_interval=0)
+
+        for _ in range(5):
+            assert not manager.sync_on_miss("bogus-p2", wait_timeout=2)
+
+        assert manager.fetch_calls == 1
+
+    def test_negative_cache_expires(self):
+        """После истечения negative cache модель проверяется снова"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], on_miss_min_interval=0, negative_cache_ttl=0.05)
+
+        assert not manager.sync_on_miss("new-model-p2", wait_timeout=2)
+        manager.catalog.append("new-model")
+        time.sleep(0.1)
+
+        assert manager.sync_on_miss("new-model-p2", wait_timeout=2)
+        assert manager.fetch_calls == 2
+
+    def test_negative_cache_bounded(self):
+        """Негативный кэш очищается от устаревших записей и не превышает предельный размер"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], on_miss_min_interval=60, negative_cache_ttl=0.05)
+        manager.NEGATIVE_CACHE_MAX_ENTRIES = 3
+
+        for index in range(5):
+            assert not manager.sync_on_miss(f"bogus-{index}-p2", wait_timeout=2)
+        assert list(manager._negative_cache) == ["bogus-2-p2", "bogus-3-p2", "bogus-4-p2"]
+
+        time.sleep(0.1)
+        assert not manager.sync_on_miss("other-p2", wait_timeout=2)
+        assert list(manager._negative_cache) == ["other-p2"]
+
+    def test_rate_limit_between_on_demand_syncs(self):
+        """Разные неизвестные имена не синхронизируют чаще on_miss_min_interval"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], on_miss_min_interval=60)
+
+        assert not manager.sync_on_miss("first-p2", wait_timeout=2)
+        assert not manager.sync_on_miss("second-p2", wait_timeout=2)
+        assert manager.fetch_calls == 1
+
+
+class TestMultiModelSyncOnMiss:
+    """Тесты выбора провайдера для внеплановой синхронизации"""
+
+    def test_manager_resolved_by_suffix(self):
+        """Менеджер провайдера определяется по суффиксу модели"""
+        multi_manager = MultiModelSyncManager()
+        for name, suffix in (("provider1", "p1"), ("provider2", "p2")):
+            multi_manager.add_provider(ProxyProviderConfig(
+                name=name,
+                url=f"http://localhost/{name}/v1",
+                auth_header="X-API-Key",
+                auth_value="token",
+                suffix=suffix,
+                sync_enabled=True,
+            ))
+
+        assert multi_manager.get_manager_for_model("model-p2").provider_name == "provider2"
+        assert multi_manager.get_manager_for_model("model-p3") is None
+        assert not multi_manager.sync_on_miss("model-p3")
+
+    def test_catalog_request_uses_provider_ssl_verify(self, monkeypatch):
+        """Запрос каталога использует ssl_verify провайдера"""
+        from src.litellm_gigachat.core import model_sync
+
+        class Client:
+            def get(self, url, **kwargs):
+                self.verify = kwargs["verify"]
+                return type("Response", (), {"raise_for_status": lambda self: None,
+                                             "json": lambda self: {"data": [{"id": "llama"}]}})()
+
+        client = Client()
+        monkeypatch.setattr(model_sync, "get_global_http_client", lambda: client)
+        multi_manager = MultiModelSyncManager()
+        multi_manager.add_provider(ProxyProviderConfig(
+            name="provider2", url="https://provider.example/v1", auth_header="X-API-Key",
+            auth_value="token", suffix="p2", sync_enabled=True, ssl_verify="/etc/ssl/provider-ca.pem",
+        ))
+
+        assert multi_manager.get_manager_for_model("llama-p2").fetch_models() == [{"id": "llama"}]
+        assert client.verify == "/etc/ssl/provider-ca.pem"
+
+
+class FlakyModelSyncManager(CountingModelSyncManager):
+    """ModelSyncManager, у которого провайдер может быть недоступен"""
+
+    def __init__(self, catalog, **kwargs):
+        super().__init__(catalog, **kwargs)
+        self.available = True
+
+    def fetch_models(self):
+        if not self.available:
+            self.fetch_calls += 1
+            return None
+        return super().fetch_models()
+
+
+class TestAdaptiveSchedule:
+    """Тесты адаптивного расписания синхронизации"""
+
+    def test_backoff_on_failures(self):
+        """Интервал растёт экспоненциально при ошибках и ограничен сверху"""
+        manager = FlakyModelSyncManager(["llama-3.1-70b"], sync_interval=10, max_backoff_interval=50)
+        manager.available = False
+
+        intervals = []
+        for _ in range(5):
+            assert not manager.sync_models()
+            intervals.append(manager.get_schedule_info()["current_interval"])
+
+        assert intervals == [10, 20, 40, 50, 50]
+        assert manager.get_schedule_info()["failure_streak"] == 5
+
+    def test_first_sync_runs_immediately(self):
+        """Первая синхронизация после старта выполняется без задержки jitter"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], sync_interval=600, sync_jitter=0.5)
+        manager.start()
+        try:
+            deadline = time.time() + 1
+            while not manager.has_model("llama-3.1-70b-p2") and time.time() < deadline:
+                time.sleep(0.01)
+            assert manager.fetch_calls == 1
+        finally:
+            manager.stop()
+
+    def test_recovery_resets_backoff(self):
+        """Успешная синхронизация сбрасывает серию ошибок"""
+        manager = FlakyModelSyncManager(["llama-3.1-70b"], sync_interval=10)
+        manager.available = False
+        manager.sync_models()
+        manager.sync_models()
+
+        manager.available = True
+        assert manager.sync_models()
+
+        info = manager.get_schedule_info()
+        assert info["failure_streak"] == 0
+        assert info["current_interval"] == 10
+        assert info["last_error"] is None
+
+    def test_stable_catalog_lengthens_interval(self):
+        """Интервал увеличивается, пока каталог не меняется"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], sync_interval=10, max_sync_interval=30)
+
+        manager.sync_models()  # первая синхронизация - каталог изменился
+        assert manager.get_schedule_info()["current_interval"] == 10
+
+        intervals = []
+        for _ in range(4):
+            manager.sync_models()
+            intervals.append(manager.get_schedule_info()["current_interval"])
+        assert intervals == [15, 22.5, 30, 30]
+
+        manager.catalog.append("new-model")
+        manager.sync_models()
+        assert manager.get_schedule_info()["current_interval"] == 10
+
+    def test_jitter_spreads_delays(self):
+        """Задержки между синхронизациями отличаются в пределах jitter"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"], sync_interval=100, sync_jitter=0.2)
+
+        delays = [manager._next_delay() for _ in range(50)]
+
+        assert all(80 <= delay <= 120 for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_last_good_catalog_served_on_failure(self):
+        """При ошибке провайдера продолжает отдаваться последний каталог"""
+        manager = FlakyModelSyncManager(["llama-3.1-70b"])
+        manager.sync_models()
+
+        manager.available = False
+        assert not manager.sync_models()
+        assert manager.has_model("llama-3.1-70b-p2")
+
+    def test_catalog_readable_during_refresh(self):
+        """Чтение каталога не блокируется на время запроса к провайдеру"""
+        manager = CountingModelSyncManager(["llama-3.1-70b"])
+        manager.sync_models()
+        manager.fetch_delay = 0.5
+
+        refresh = threading.Thread(target=manager.sync_models)
+        refresh.start()
+        time.sleep(0.05)
+
+        started = time.time()
+        assert manager.has_model("llama-3.1-70b-p2")
+        assert time.time() - started < 0.1
+        refresh.join()
+
+    def test_status_reports_schedule(self):
+        """get_status содержит время следующего запуска и серию ошибок"""
+        multi_manager = MultiModelSyncManager()
+        multi_manager.add_provider(ProxyProviderConfig(
+            name="provider1",
+            url="http://localhost:8001/v1",
+            auth_header="X-Client-Id",
+            auth_value="token",
+            suffix="p1",
+            sync_enabled=True,
+            sync_interval=30,
+        ))
+        sync_manager = multi_manager.get_manager_for_model("model-p1")
+        sync_manager.fetch_models = lambda: None
+
+        multi_manager.start_all()
+        time.sleep(0.1)
+        status = multi_manager.get_status()["providers"]["provider1"]
+        multi_manager.stop_all()
+
+        assert status["next_run_at"] is not None
+        assert "failure_streak" in status
+        assert status["current_interval"] == 30
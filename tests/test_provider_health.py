@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Тесты отслеживания доступности прокси-провайдеров и circuit breaker
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from src.litellm_gigachat.core import health
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry
+from src.litellm_gigachat.core.health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    ProviderHealth,
+    ProviderHealthManager,
+)
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.proxy_provider_manager import MultiProxyProviderManager, ProxyProviderConfig
+
+
+def make_provider(name="p1", url="http://127.0.0.1:9/v1", **kwargs):
+    """Конфигурация провайдера с быстрым circuit breaker"""
+    options = dict(circuit_failure_threshold=3, circuit_open_seconds=0.05, timeout=1)
+    options.update(kwargs)
+    return ProxyProviderConfig(
+        name=name, url=url, auth_header="X-Client-Id", auth_value="token", suffix=name, **options
+    )
+
+
+class StatusError(Exception):
+    """Ошибка с HTTP статусом (как исключения LiteLLM)"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestCircuitBreaker:
+    """Переходы состояний circuit breaker"""
+
+    def test_opens_after_consecutive_failures(self):
+        """N ошибок подряд открывают цепь, запросы отклоняются"""
+        provider_health = ProviderHealth(make_provider())
+
+        for _ in range(3):
+            assert provider_health.allow_request()
+            provider_health.record_failure("timeout")
+
+        assert provider_health.state == OPEN
+        assert not provider_health.allow_request()
+        assert not provider_health.is_available()
+        assert provider_health.get_status()["rejected"] == 1
+
+    def test_half_open_trial(self):
+        """После паузы пропускается один пробный запрос; успех закрывает цепь"""
+        provider_health = ProviderHealth(make_provider())
+        for _ in range(3):
+            provider_health.record_failure()
+
+        time.sleep(0.06)
+        assert provider_health.allow_request()
+        assert provider_health.state == HALF_OPEN
+        assert not provider_health.allow_request()  # пробный запрос уже идёт
+
+        provider_health.record_success()
+        assert provider_health.state == CLOSED
+        assert provider_health.allow_request()
+
+    def test_failed_trial_doubles_pause(self):
+        """Неудачный пробный запрос снова открывает цепь с удвоенной паузой"""
+        provider_health = ProviderHealth(make_provider())
+        for _ in range(3):
+            provider_health.record_failure()
+
+        time.sleep(0.06)
+        assert provider_health.allow_request()
+        provider_health.record_failure()
+
+        assert provider_health.state == OPEN
+        assert provider_health.open_seconds == pytest.approx(0.1)
+
+    def test_error_rate_opens_circuit(self):
+        """Высокая доля ошибок в окне открывает цепь без ошибок подряд"""
+        provider_health = ProviderHealth(make_provider(circuit_failure_threshold=100))
+        for _ in range(5):
+            provider_health.record_success()
+            provider_health.record_failure()
+
+        assert provider_health.state == OPEN
+
+    def test_client_errors_do_not_count(self):
+        """Ошибки 4xx не считаются недоступностью провайдера"""
+        provider = make_provider()
+        manager = ProviderHealthManager(MultiProxyProviderManager())
+        for _ in range(5):
+            manager.record_result(provider, StatusError(400))
+            manager.record_result(provider, StatusError(429))
+
+        assert manager.get_health(provider).state == CLOSED
+
+        for _ in range(3):
+            manager.record_result(provider, StatusError(502))
+        assert manager.get_health(provider).state == OPEN
+
+    def test_url_change_resets_state(self):
+        """Смена URL провайдера (горячая перезагрузка) сбрасывает состояние"""
+        manager = ProviderHealthManager(MultiProxyProviderManager())
+        provider = make_provider()
+        for _ in range(3):
+            manager.record_result(provider, TimeoutError("timeout"))
+        assert not manager.is_available(provider)
+
+        assert manager.is_available(make_provider(url="http://127.0.0.1:10/v1"))
+
+
+class ProbeHandler(BaseHTTPRequestHandler):
+    """Mock-провайдер: статус ответа задаётся атрибутом сервера"""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(self.server.status)
+        self.end_headers()
+        self.wfile.write(b'{"data": []}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def probe_server():
+    server = HTTPServer(("127.0.0.1", 0), ProbeHandler)
+    server.status = 200
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestActiveProbes:
+    """Активные проверки провайдеров"""
+
+    def make_manager(self, provider):
+        provider_manager = MultiProxyProviderManager()
+        provider_manager.providers = [provider]
+        return ProviderHealthManager(provider_manager)
+
+    def test_successful_probe_half_opens_circuit(self, probe_server):
+        """Успешная проверка открытой цепи разрешает пробный запрос"""
+        provider = make_provider(
+            url=f"http://127.0.0.1:{probe_server.server_port}/v1", circuit_open_seconds=60
+        )
+        manager = self.make_manager(provider)
+        for _ in range(3):
+            manager.record_result(provider, TimeoutError("timeout"))
+
+        manager.check_all()
+
+        assert probe_server.paths == ["/v1/models"]
+        assert manager.get_health(provider).state == HALF_OPEN
+        assert manager.allow_request(provider)
+
+    def test_failed_probe_opens_idle_provider(self, probe_server):
+        """Неуспешные проверки провайдера без трафика открывают цепь"""
+        probe_server.status = 503
+        provider = make_provider(
+            url=f"http://127.0.0.1:{probe_server.server_port}/v1", health_check_interval=0.01
+        )
+        manager = self.make_manager(provider)
+
+        for _ in range(3):
+            manager.check_all()
+            time.sleep(0.02)
+
+        status = manager.get_status()["p1"]
+        assert status["state"] == OPEN
+        assert status["last_probe_ok"] is False
+        assert status["last_error"] == "HTTP 503"
+
+    def test_probe_uses_provider_ssl_verify(self, monkeypatch):
+        """Проверка использует ssl_verify провайдера"""
+        class Client:
+            def get(self, url, **kwargs):
+                self.verify = kwargs["verify"]
+                return type("Response", (), {"status_code": 200})()
+
+        client = Client()
+        monkeypatch.setattr(health, "get_global_http_client", lambda: client)
+        provider = make_provider(url="https://provider.example/v1", ssl_verify=False)
+
+        assert self.make_manager(provider).probe(provider)
+        assert client.verify is False
+
+    def test_probe_skipped_for_busy_provider(self, probe_server):
+        """Провайдер с недавним трафиком не проверяется"""
+        provider = make_provider(url=f"http://127.0.0.1:{probe_server.server_port}/v1")
+        manager = self.make_manager(provider)
+        manager.record_result(provider)
+
+        manager.check_all()
+
+        assert probe_server.paths == []
+
+
+class TestFailover:
+    """Быстрый отказ и переключение"""
+
+    def setup_method(self):
+        self.previous_manager = health._global_provider_health_manager
+
+    def teardown_method(self):
+        health._global_provider_health_manager = self.previous_manager
+
+    def test_model_group_skips_open_provider(self):
+        """Группа моделей не выбирает deployment провайдера с открытой цепью"""
+        provider_manager = MultiProxyProviderManager()
+        provider_manager.providers = [make_provider("p1"), make_provider("p2")]
+        manager = health._global_provider_health_manager = ProviderHealthManager(provider_manager)
+
+        stats = DeploymentStatsRegistry()
+        stats.record("m-p1", True, 0.01)
+        stats.record("m-p2", True, 1.0)
+        router = ModelGroupRouter(stats)
+        group = ModelGroupConfig(name="m", models=["m-p1", "m-p2"], exploration=0.0)
+        assert router.choose(group) == "m-p1"
+
+        for _ in range(3):
+            manager.record_result(provider_manager.providers[0], TimeoutError("timeout"))
+        assert router.choose(group) == "m-p2"
+
+    def test_callback_fails_fast(self):
+        """ProxyProviderCallback отклоняет запрос к недоступному провайдеру с 503"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks.proxy_provider_callback import ProxyProviderCallback
+
+        callback = ProxyProviderCallback()
+        callback.multi_manager = MultiProxyProviderManager()
+        provider = make_provider("p1", circuit_open_seconds=30, sync_on_miss=False)
+        callback.multi_manager.providers = [provider]
+        manager = health._global_provider_health_manager = ProviderHealthManager(callback.multi_manager)
+        for _ in range(3):
+            manager.record_result(provider, TimeoutError("timeout"))
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(callback.async_pre_call_hook(None, None, {"model": "llama-p1"}, "completion"))
+
+        assert exc_info.value.status_code == 503
+        assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+    def test_local_rejections_not_counted(self):
+        """Отказы самого прокси (circuit breaker, квоты) не меняют состояние провайдера"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks.proxy_provider_callback import ProxyProviderCallback
+
+        callback = ProxyProviderCallback()
+        callback.multi_manager = MultiProxyProviderManager()
+        provider = make_provider("p1", circuit_open_seconds=30, sync_on_miss=False)
+        callback.multi_manager.providers = [provider]
+        manager = health._global_provider_health_manager = ProviderHealthManager(callback.multi_manager)
+
+        def log_failure(exception):
+            kwargs = {"model": "llama-p1", "exception": exception, "litellm_params": {"metadata": {}}}
+            asyncio.run(callback.async_log_failure_event(kwargs, None, None, None))
+
+        # Отказы квоты при закрытой цепи не открывают её
+        for _ in range(5):
+            log_failure(HTTPException(status_code=503, detail="Провайдер p1 временно недоступен"))
+        assert manager.get_health(provider).state == CLOSED
+
+        for _ in range(3):
+            log_failure(TimeoutError("timeout"))
+        provider_health = manager.get_health(provider)
+        assert provider_health.state == OPEN
+
+        # Собственный 503 circuit breaker возвращается через failure event
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(callback.async_pre_call_hook(None, None, {"model": "llama-p1"}, "completion"))
+        log_failure(exc_info.value)
+        # Локальный 429 ограничителя квоты не закрывает открытую цепь
+        log_failure(HTTPException(status_code=429, detail="Квота p1/llama-p1 исчерпана",
+                                  headers={"Retry-After": "5"}))
+
+        assert provider_health.state == OPEN
+        assert provider_health.last_error == "timeout"
+        assert provider_health.consecutive_failures == 3
+
+    def test_local_rejection_releases_trial(self):
+        """Пробный запрос, отклонённый самим прокси, не блокирует провайдера до trial_timeout"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks.proxy_provider_callback import ProxyProviderCallback
+
+        callback = ProxyProviderCallback()
+        callback.multi_manager = MultiProxyProviderManager()
+        provider = make_provider("p1", circuit_open_seconds=0.05, timeout=60, sync_on_miss=False)
+        callback.multi_manager.providers = [provider]
+        manager = health._global_provider_health_manager = ProviderHealthManager(callback.multi_manager)
+        for _ in range(3):
+            manager.record_result(provider, TimeoutError("timeout"))
+        time.sleep(0.06)
+
+        def pre_call():
+            return asyncio.run(callback.async_pre_call_hook(None, None, {"model": "llama-p1"}, "completion"))
+
+        trial = pre_call()
+        with pytest.raises(HTTPException) as exc_info:
+            pre_call()
+        # Собственный 503 другого запроса не освобождает место пробного запроса
+        asyncio.run(callback.async_post_call_failure_hook({"model": "llama-p1", "metadata": {}}, exc_info.value, None))
+        with pytest.raises(HTTPException):
+            pre_call()
+
+        # Пробный запрос отклонён квотой после этого callback
+        asyncio.run(callback.async_post_call_failure_hook(
+            trial, HTTPException(status_code=429, detail="Квота p1/llama-p1 исчерпана"), None
+        ))
+        assert manager.get_health(provider).state == HALF_OPEN
+        pre_call()
+        with pytest.raises(HTTPException):
+            pre_call()
+
+    def test_group_request_rerouted(self, monkeypatch):
+        """Запрос к группе моделей при открытой цепи переходит на другой deployment группы"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks import model_group_callback, proxy_provider_callback, token_callback
+        from src.litellm_gigachat.callbacks.concurrency_callback import get_concurrency_limit_callback
+        from src.litellm_gigachat.core import concurrency, model_groups, rate_limits
+        from src.litellm_gigachat.core.retry import DEPLOYMENT_METADATA_KEY
+
+        class PassThrough:
+            async def async_pre_call_hook(self, user_api_key_dict, cache, data, call_type):
+                return data
+
+        provider_manager = MultiProxyProviderManager()
+        provider_manager.providers = [
+            make_provider(name, url=f"http://{name}:1/v1", circuit_open_seconds=30, sync_on_miss=False)
+            for name in ("p1", "p2", "p3")
+        ]
+        manager = health._global_provider_health_manager = ProviderHealthManager(provider_manager)
+        callback = proxy_provider_callback.ProxyProviderCallback()
+        callback.multi_manager = provider_manager
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        router.groups = {"llama": ModelGroupConfig(name="llama", models=["llama-p1", "llama-p2"], exploration=0.0)}
+        monkeypatch.setattr(model_groups, "_global_model_group_router", router)
+        monkeypatch.setattr(model_group_callback, "get_global_multi_proxy_provider_manager", lambda: provider_manager)
+        monkeypatch.setattr(proxy_provider_callback, "get_proxy_provider_callback", lambda: callback)
+        monkeypatch.setattr(token_callback, "get_gigachat_callback", lambda: PassThrough())
+        monkeypatch.setattr(rate_limits, "_global_rate_limiters", None)
+        monkeypatch.setattr(concurrency, "_global_concurrency_limiters", None)
+        rate_limits.init_global_rate_limiters({})
+        limiters = concurrency.init_global_concurrency_limiters({})
+
+        def pre_call(model, group="llama"):
+            data = {"model": model, "metadata": {DEPLOYMENT_METADATA_KEY: {
+                "deployment": model, "group": group, "request_id": stats.start_request(model),
+            }}}
+
+
+            async def run():
+                # Слот параллельности занят для выбранного группой deployment
+                await get_concurrency_limit_callback().async_pre_call_hook(None, None, data, "completion")
+                return await callback.async_pre_call_hook(None, None, data, "completion")
+
+            return asyncio.run(run())
+
+        # Цепь p1 открылась после выбора deployment группой
+        for _ in range(3):
+            manager.record_result(provider_manager.providers[0], TimeoutError("timeout"))
+        data = pre_call("llama-p1")
+
+        info = data["metadata"][DEPLOYMENT_METADATA_KEY]
+        assert data["model"] == info["deployment"] == "llama-p2"
+        assert data["api_base"] == "http://p2:1/v1"
+        assert info["rejected"] == ["llama-p1"]
+        assert stats.get("llama-p1").inflight == 0
+        assert stats.get("llama-p2").inflight == 1
+        assert limiters.get("llama-p1").get_metrics()["inflight"] == 0
+        assert limiters.get("llama-p2").get_metrics()["inflight"] == 1
+
+        # Доступных deployments в группе нет, и запрос вне группы - 503
+        for _ in range(3):
+            manager.record_result(provider_manager.providers[1], TimeoutError("timeout"))
+        for model, group in (("llama-p1", "llama"), ("llama-p3", None)):
+            if group is None:
+                for _ in range(3):
+                    manager.record_result(provider_manager.providers[2], TimeoutError("timeout"))
+            with pytest.raises(HTTPException) as exc_info:
+                pre_call(model, group)
+            assert exc_info.value.status_code == 503
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Тесты клиентских квот RPM/TPM (token bucket с калибровкой по заголовкам)
+"""
+
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from src.litellm_gigachat.core import rate_limits
+from src.litellm_gigachat.core.rate_limits import (
+    RateLimitConfig,
+    RateLimiter,
+    RateLimiterRegistry,
+    RateLimitExceeded,
+    estimate_request_tokens,
+    parse_duration,
+    parse_rate_limit_headers,
+)
+from src.litellm_gigachat.core.shared_state import SharedStateStore
+
+
+def make_limiter(rpm=None, tpm=None, store=None, **kwargs):
+    """Лимитер без запаса по квоте"""
+    options = dict(safety_margin=1.0, burst_seconds=0.01)
+    options.update(kwargs)
+    config = RateLimitConfig(requests_per_minute=rpm, tokens_per_minute=tpm, **options)
+    return RateLimiter("gigachat/m", config, store)
+
+
+class StatusError(Exception):
+    """Ошибка с HTTP статусом и заголовками (как исключения LiteLLM)"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.litellm_response_headers = headers or {}
+
+
+class TestHeaderParsing:
+    """Разбор заголовков квот"""
+
+    def test_durations(self):
+        """Секунды, длительности вида 6m0s, время UNIX и HTTP-дата"""
+        now = 1_700_000_000.0
+        assert parse_duration("1.5", now) == 1.5
+        assert parse_duration("6m0s", now) == 360
+        assert parse_duration("20ms", now) == pytest.approx(0.02)
+        assert parse_duration(str(now + 30), now) == pytest.approx(30)
+        assert parse_duration("Tue, 14 Nov 2023 22:13:50 GMT", now) == pytest.approx(30)
+        assert parse_duration("soon", now) is None
+
+    def test_rate_limit_headers(self):
+        """Заголовки LiteLLM (llm_provider-*) и общий X-RateLimit-*"""
+        info = parse_rate_limit_headers({
+            "llm_provider-x-ratelimit-limit-tokens": "10000",
+            "llm_provider-x-ratelimit-remaining-tokens": "250",
+            "X-RateLimit-Limit": "60",
+            "X-RateLimit-Reset": "2s",
+            "Retry-After": "3",
+        })
+
+        assert info["tokens"] == {"limit": 10000.0, "remaining": 250.0}
+        assert info["requests"] == {"limit": 60.0, "reset": 2.0}
+        assert info["retry_after"] == 3.0
+
+    def test_estimate_tokens(self):
+        """Оценка: токены промпта (TokenEstimator) плюс ожидаемый ответ"""
+        from src.litellm_gigachat.core.token_estimator import get_token_estimator
+
+        estimator = get_token_estimator()
+        messages = [{"role": "user", "content": "Привет, " * 50}]
+        data = {"messages": messages, "max_tokens": 100}
+        assert estimate_request_tokens(data) == estimator.count_messages(messages) + 100
+        assert estimate_request_tokens({"messages": messages}) == estimator.count_messages(messages) + 512
+        # embeddings - без токенов ответа
+        assert estimate_request_tokens({"input": ["abcd" * 10]}) == estimator.count_text("abcd" * 10)
+
+
+class TestTokenBucket:
+    """Сглаживание всплесков и резервирование"""
+
+    def test_burst_is_spread(self):
+        """Всплеск запросов выполняется с интервалом 1/скорость в порядке поступления"""
+        limiter = make_limiter(rpm=6000)  # 100 запросов в секунду, ёмкость 1
+
+        async def run():
+            return await asyncio.gather(*(limiter.acquire() for _ in range(5)))
+
+        delays = asyncio.run(run())
+        assert delays[0] == 0
+        assert delays[1:] == pytest.approx([0.01, 0.02, 0.03, 0.04], abs=0.005)
+        assert limiter.get_metrics()["delayed"] == 4
+
+    def test_rejects_beyond_max_wait(self):
+        """Запрос, которому пришлось бы ждать дольше max_wait, отклоняется сразу"""
+        limiter = make_limiter(rpm=60, max_wait=0.5)
+
+        asyncio.run(limiter.acquire())
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            asyncio.run(limiter.acquire())
+
+        assert exc_info.value.retry_after == pytest.approx(1.0, abs=0.05)
+        assert limiter.get_metrics()["rejected"] == 1
+
+    def test_tokens_settled_with_usage(self):
+        """Оценка токенов заменяется фактическим usage"""
+        limiter = make_limiter(tpm=60000, burst_seconds=1.0)  # 1000 токенов в секунду
+        asyncio.run(limiter.acquire(tokens=800))
+        assert limiter.get_metrics()["tokens_available"] == pytest.approx(200, abs=5)
+
+        limiter.settle(800, 100)
+        assert limiter.get_metrics()["tokens_available"] == pytest.approx(900, abs=5)
+
+    def test_oversized_request_passes_when_bucket_full(self):
+        """Запрос больше ёмкости ведра не ждёт бесконечно"""
+        limiter = make_limiter(tpm=60000, burst_seconds=1.0, max_wait=0.1)
+        assert asyncio.run(limiter.acquire(tokens=5000)) == 0
+
+
+class TestCalibration:
+    """Калибровка по заголовкам ответа"""
+
+    def test_limit_header_sets_quota(self):
+        """Квота из заголовка применяется, если она меньше настроенной"""
+        limiter = make_limiter(rpm=600)
+        limiter.observe_headers({"x-ratelimit-limit-requests": "120", "x-ratelimit-limit-tokens": "5000"})
+
+        metrics = limiter.get_metrics()
+        assert metrics["requests_per_minute"] == 120
+        assert metrics["tokens_per_minute"] == 5000
+
+    def test_retry_after_blocks_requests(self):
+        """429 с Retry-After приостанавливает запросы без настроенных квот"""
+        limiter = make_limiter(max_wait=0.05)
+        limiter.observe_headers({"retry-after": "2"}, status_code=429)
+
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            asyncio.run(limiter.acquire())
+        assert exc_info.value.retry_after == pytest.approx(2, abs=0.1)
+        assert limiter.get_metrics()["throttled"] == 1
+
+    def test_exhausted_remaining_waits_for_reset(self):
+        """remaining=0 - запросы ждут сброса окна"""
+        limiter = make_limiter(rpm=6000)
+        limiter.observe_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "50ms"})
+
+        delay = asyncio.run(limiter.acquire())
+        assert 0.03 < delay <= 0.05
+
+
+class TestSharedState:
+    """Общая квота для нескольких worker-процессов"""
+
+    def test_workers_share_bucket(self, tmp_path):
+        """Два лимитера на одном хранилище расходуют одну квоту"""
+        first = make_limiter(rpm=60, store=SharedStateStore(str(tmp_path)), max_wait=0.5)
+        second = make_limiter(rpm=60, store=SharedStateStore(str(tmp_path)), max_wait=0.5)
+
+        asyncio.run(first.acquire())
+        with pytest.raises(RateLimitExceeded):
+            asyncio.run(second.acquire())
+
+    def test_registry_attaches_store_only_when_shared(self, tmp_path):
+        """shared: false - состояние остаётся в процессе"""
+        local = RateLimiterRegistry.from_config({"default": {"requests_per_minute": 60}})
+        local.attach_shared_store(SharedStateStore(str(tmp_path)))
+        asyncio.run(local.get("gigachat", "m").acquire())
+
+        shared = RateLimiterRegistry.from_config({"shared": True, "default": {"requests_per_minute": 60}})
+        shared.attach_shared_store(SharedStateStore(str(tmp_path)))
+        asyncio.run(shared.get("gigachat", "m").acquire())
+
+        assert SharedStateStore(str(tmp_path)).keys("ratelimit-") == ["ratelimit-gigachat_m"]
+
+    def test_registry_overrides(self):
+        """default <- credentials <- models, отключение для модели"""
+        registry = RateLimiterRegistry.from_config({
+            "default": {"requests_per_minute": 60, "max_wait": 5},
+            "credentials": {"provider1": {"requests_per_minute": 300}},
+            "models": {"big-p1": {"tokens_per_minute": 1000}, "off": {"enabled": False}},
+        })
+
+        config = registry.get("provider1", "big-p1").config
+        assert (config.requests_per_minute, config.tokens_per_minute, config.max_wait) == (300, 1000, 5)
+        assert registry.get("gigachat", "gigachat").config.requests_per_minute == 60
+        assert registry.get("gigachat", "off") is None
+
+
+class QuotaProvider:
+    """Mock-провайдер с квотой: больше limit запросов за скользящее окно - 429"""
+
+    def __init__(self, limit, window=1.0):
+        self.limit = limit
+        self.window = window
+        self.recent = deque()
+        self.throttled = 0
+        self.served = 0
+
+    async def handle(self):
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] > self.window:
+            self.recent.popleft()
+        if len(self.recent) >= self.limit:
+            self.throttled += 1
+            raise StatusError(429, {"retry-after": "0.05"})
+        self.recent.append(now)
+        self.served += 1
+
+
+class TestQuotaProvider:
+    """Лимитер против провайдера с квотой запросов"""
+
+    def test_stays_under_quota(self):
+        """Без лимитера всплеск упирается в квоту, с лимитером 429 нет"""
+        total = 150
+
+        async def send(provider, limiter=None):
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                await provider.handle()
+            except StatusError as exc:
+                if limiter is not None:
+                    limiter.observe_headers(exc.litellm_response_headers, exc.status_code)
+
+        unlimited = QuotaProvider(limit=100)
+
+        async def run_unlimited():
+            await asyncio.gather(*(send(unlimited) for _ in range(total)))
+
+        asyncio.run(run_unlimited())
+        assert unlimited.throttled == total - 100
+
+        limited = QuotaProvider(limit=100)
+        limiter = RateLimiter("provider/m", RateLimitConfig(
+            requests_per_minute=6000, safety_margin=0.9, burst_seconds=0.1
+        ))
+
+        async def run_limited():
+            await asyncio.gather(*(send(limited, limiter) for _ in range(total)))
+
+        asyncio.run(run_limited())
+        assert limited.throttled == 0
+        assert limited.served == total
+
+
+class TestRateLimitCallback:
+    """Callback для LiteLLM Proxy"""
+
+    def setup_method(self):
+        self.previous = rate_limits._global_rate_limiters
+
+    def teardown_method(self):
+        rate_limits._global_rate_limiters = self.previous
+
+    def test_calibrates_from_response_and_settles(self):
+        """Заголовки ответа калибруют квоту, usage заменяет оценку токенов"""
+        from src.litellm_gigachat.callbacks.rate_limit_callback import RateLimitCallback
+
+        registry = rate_limits.init_global_rate_limiters({"default": {"tokens_per_minute": 60000}})
+        callback = RateLimitCallback()
+
+        async def run():
+            data = {"model": "gigachat-max", "messages": [{"role": "user", "content": "x" * 40}]}
+            data = await callback.async_pre_call_hook(None, None, data, "completion")
+            response = SimpleNamespace(
+                usage=SimpleNamespace(total_tokens=20),
+                _hidden_params={"additional_headers": {"llm_provider-x-ratelimit-limit-requests": "30"}},
+            )
+            kwargs = {"litellm_params": {"metadata": data["metadata"]}}
+            await callback.async_log_success_event(kwargs, response, None, None)
+            return data
+
+        data = asyncio.run(run())
+        assert data["metadata"]["gigachat_rate_limit"]["credential"] == "gigachat"
+
+        metrics = registry.get("gigachat", "gigachat-max").get_metrics()
+        assert metrics["requests_per_minute"] == 30
+        assert metrics["tokens_available"] == pytest.approx(4500 - 20, abs=5)
+
+    def test_rejection_is_429(self):
+        """Долгое ожидание квоты - HTTP 429 с Retry-After"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks.rate_limit_callback import RateLimitCallback
+
+        rate_limits.init_global_rate_limiters({"default": {"requests_per_minute": 6, "max_wait": 1}})
+        callback = RateLimitCallback()
+
+        async def run():
+            await callback.async_pre_call_hook(None, None, {"model": "gigachat"}, "completion")
+            await callback.async_pre_call_hook(None, None, {"model": "gigachat"}, "completion")
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(run())
+        assert exc_info.value.status_code == 429
+        assert int(exc_info.value.headers["Retry-After"]) >= 10
+
+    def test_local_rejection_does_not_block_quota(self):
+        """Retry-After отказа самого прокси (503 circuit breaker) не приостанавливает квоту"""
+        from fastapi import HTTPException
+        from src.litellm_gigachat.callbacks.rate_limit_callback import RateLimitCallback
+
+        registry = rate_limits.init_global_rate_limiters({})
+        callback = RateLimitCallback()
+
+        async def fail(exception):
+            data = await callback.async_pre_call_hook(None, None, {"model": "gigachat"}, "completion")
+            kwargs = {"litellm_params": {"metadata": data["metadata"]}, "exception": exception}
+            await callback.async_log_failure_event(kwargs, None, None, None)
+
+        asyncio.run(fail(HTTPException(status_code=503, detail="Провайдер временно недоступен",
+                                       headers={"Retry-After": "30"})))
+        limiter = registry.get("gigachat", "gigachat")
+        assert limiter.get_metrics()["blocked_for"] == 0
+
+        # 429 провайдера по-прежнему приостанавливает запросы
+        asyncio.run(fail(StatusError(429, {"retry-after": "30"})))
+        assert limiter.get_metrics()["blocked_for"] > 25
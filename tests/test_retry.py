@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Тесты движка повторов: классификация ошибок, Retry-After, бюджет и failover
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.litellm_gigachat.core import model_groups
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.retry import (
+    RetryBudget,
+    RetryEngine,
+    RetryPolicy,
+    classify_error,
+)
+
+
+class StatusError(Exception):
+    """Ошибка с HTTP статусом и заголовками (как исключения LiteLLM)"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.litellm_response_headers = headers or {}
+
+
+class FlakyCall:
+    """Вызов модели, возвращающий заданные ошибки перед успехом"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.models = []
+
+    async def __call__(self, **kwargs):
+        self.models.append(kwargs["model"])
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def make_engine(**policy):
+    options = dict(base_delay=0.001, max_delay=0.01)
+    options.update(policy)
+    return RetryEngine(default=RetryPolicy(**options))
+
+
+class TestClassification:
+    """Повторяемые и фатальные ошибки"""
+
+    def test_status_codes(self):
+        policy = RetryPolicy()
+        assert classify_error(StatusError(429), policy) == (True, "http_429")
+        assert classify_error(StatusError(502), policy) == (True, "http_502")
+        assert classify_error(StatusError(400), policy) == (False, "http_400")
+        assert classify_error(StatusError(401), policy) == (False, "http_401")
+
+    def test_connection_errors(self):
+        policy = RetryPolicy()
+        assert classify_error(ConnectionResetError("reset"), policy) == (True, "connection")
+        assert classify_error(asyncio.TimeoutError(), policy) == (True, "connection")
+        assert classify_error(ValueError("bad"), policy) == (False, "error")
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+        delays = [policy.backoff(10) for _ in range(200)]
+        assert max(delays) <= 4.0
+        assert len(set(delays)) > 100
+
+
+class TestRetryEngine:
+    """Повторы одного вызова"""
+
+    def test_retries_until_success(self):
+        """Временные ошибки повторяются, счётчики учитывают причины"""
+        engine = make_engine()
+        call = FlakyCall(StatusError(503), ConnectionResetError("reset"))
+
+        assert asyncio.run(engine.call(call, {"model": "m"})) == "ok"
+
+        metrics = engine.get_metrics()
+        assert metrics["retries"] == 2
+        assert metrics["recovered"] == 1
+        assert metrics["retries_by_reason"] == {"http_503": 1, "connection": 1}
+
+    def test_fatal_error_not_retried(self):
+        engine = make_engine()
+        call = FlakyCall(StatusError(400))
+
+        with pytest.raises(StatusError):
+            asyncio.run(engine.call(call, {"model": "m"}))
+        assert len(call.models) == 1
+
+    def test_max_retries(self):
+        engine = make_engine(max_retries=2)
+        call = FlakyCall(*(StatusError(500) for _ in range(5)))
+
+        with pytest.raises(StatusError):
+            asyncio.run(engine.call(call, {"model": "m"}))
+        assert len(call.models) == 3
+        assert engine.get_metrics()["gave_up"] == 1
+
+    def test_retry_after_is_honored(self):
+        """Пауза не меньше Retry-After ответа"""
+        engine = make_engine()
+        call = FlakyCall(StatusError(429, {"retry-after": "0.2"}))
+
+        started = time.monotonic()
+        asyncio.run(engine.call(call, {"model": "m"}))
+        assert time.monotonic() - started >= 0.2
+
+    def test_long_retry_after_fails_fast(self):
+        """Retry-After больше max_retry_after - ошибка возвращается сразу"""
+        engine = make_engine(max_retry_after=1)
+        call = FlakyCall(StatusError(429, {"llm_provider-retry-after": "60"}))
+
+        with pytest.raises(StatusError):
+            asyncio.run(engine.call(call, {"model": "m"}))
+        assert len(call.models) == 1
+
+    def test_model_policy_overrides(self):
+        """Политика модели переопределяет общую"""
+        engine = RetryEngine(
+            default=RetryPolicy(base_delay=0.001),
+            models={"strict": {"retry_on": [503]}},
+        )
+        call = FlakyCall(StatusError(429))
+
+        with pytest.raises(StatusError):
+            asyncio.run(engine.call(call, {"model": "strict"}))
+        assert engine.get_policy("other").retry_on == [408, 429, 500, 502, 503, 504]
+
+
+class TestRetryBudget:
+    """Общий бюджет повторов"""
+
+    def test_budget_limits_retry_share(self):
+        """При сплошных ошибках повторов не больше ratio от запросов плюс минимум"""
+        engine = RetryEngine(
+            default=RetryPolicy(base_delay=0.0, max_delay=0.0, max_retries=3),
+            budget=RetryBudget(ratio=0.1, min_retries_per_second=0.5, window=10),
+        )
+
+        async def always_fails(**kwargs):
+            raise StatusError(503)
+
+        async def run():
+            for _ in range(100):
+                with pytest.raises(StatusError):
+                    await engine.call(always_fails, {"model": "m"})
+
+        asyncio.run(run())
+        metrics = engine.get_metrics()
+        assert metrics["retries"] <= 100 * 0.1 + 5
+        assert metrics["budget_exhausted"] > 80
+
+    def test_budget_window_expires(self):
+        budget = RetryBudget(ratio=0.0, min_retries_per_second=1.0, window=0.05)
+        assert budget.try_spend()
+        assert not budget.try_spend()
+        time.sleep(0.06)
+        assert budget.try_spend()
+
+
+class TestFailover:
+    """Повтор на другом deployment группы моделей"""
+
+    def setup_method(self):
+        self.previous = model_groups._global_model_group_router
+
+    def teardown_method(self):
+        model_groups._global_model_group_router = self.previous
+
+    def test_retry_switches_deployment(self):
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        router.groups = {"g": ModelGroupConfig(name="g", models=["a", "b"], exploration=0.0)}
+        model_groups._global_model_group_router = router
+
+        engine = make_engine()
+        call = FlakyCall(StatusError(503, {"retry-after": "30"}))
+        metadata = {"gigachat_deployment": {"deployment": "a", "group": "g", "request_id": stats.start_request("a")}}
+
+        started = time.monotonic()
+        asyncio.run(engine.call(call, {"model": "a", "metadata": metadata}))
+
+        assert call.models == ["a", "b"]
+        assert time.monotonic() - started < 1  # Retry-After прежнего deployment не ждём
+        assert metadata["gigachat_deployment"]["deployment"] == "b"
+        assert stats.get("a").failures == 1
+        assert stats.get("b").inflight == 1
+        assert engine.get_metrics()["failovers"] == 1
+
+
+class TestRouterInstall:
+    """Установка в LiteLLM Router"""
+
+    def test_replaces_router_retries(self):
+        class FakeRouter:
+            async def make_call(self, original_function, *args, **kwargs):
+                return await original_function(**kwargs)
+
+        router = FakeRouter()
+        engine = make_engine()
+        engine.install(router)
+        call = FlakyCall(StatusError(500))
+
+        response = asyncio.run(router.async_function_with_retries(
+            original_function=call, model="m", num_retries=5, fallbacks=[], messages=[],
+        ))
+
+        assert response == "ok"
+        assert call.models == ["m", "m"]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Тесты справедливой очереди по ключам API и полос приоритета
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.litellm_gigachat.core.concurrency import AIMDLimiter, ConcurrencyConfig, ConcurrencyLimitExceeded
+from src.litellm_gigachat.core.scheduler import FairQueue, FairScheduler, LaneConfig
+
+
+def make_key(team_id=None, key_alias=None, metadata=None, team_metadata=None):
+    """Ключ API как UserAPIKeyAuth LiteLLM"""
+    return SimpleNamespace(team_id=team_id, key_alias=key_alias, token="sk-hash-0123456789abcdef",
+                           metadata=metadata or {}, team_metadata=team_metadata or {})
+
+
+class TestFairQueue:
+    """Порядок выхода из очереди"""
+
+    def test_single_flow_is_fifo(self):
+        queue = FairQueue()
+        for item in range(5):
+            queue.push(item)
+        assert [queue.popleft() for _ in range(5)] == [0, 1, 2, 3, 4]
+        assert not queue
+
+    def test_weighted_share(self):
+        """Поток с весом 3 получает втрое больше мест, чем поток с весом 1"""
+        queue = FairQueue()
+        for item in range(20):
+            queue.push(("a", item), flow="a", weight=1.0)
+        for item in range(20):
+            queue.push(("b", item), flow="b", weight=3.0)
+
+        served = [queue.popleft()[0] for _ in range(16)]
+        assert served.count("b") == 12
+        assert served.count("a") == 4
+
+    def test_late_flow_not_starved(self):
+        """Поток, пришедший после длинной очереди другого потока, обслуживается сразу"""
+        queue = FairQueue()
+        for item in range(100):
+            queue.push(("batch", item), flow="batch")
+        queue.popleft()
+        queue.push(("interactive", 0), flow="interactive")
+        assert queue.popleft()[0] == "interactive"
+
+    def test_remove(self):
+        queue = FairQueue()
+        queue.push("a")
+        queue.push("b")
+        queue.remove("a")
+        assert len(queue) == 1
+        assert queue.popleft() == "b"
+        with pytest.raises(ValueError):
+            queue.remove("a")
+        with pytest.raises(IndexError):
+            queue.popleft()
+
+
+class TestFairScheduler:
+    """Полоса, поток и дедлайн запроса"""
+
+    def test_lane_selection(self):
+        scheduler = FairScheduler()
+        header = {"metadata": {"headers": {"X-Priority": "batch"}}}
+
+        assert scheduler.get_lane({}, make_key()) == "interactive"
+        assert scheduler.get_lane(header, make_key()) == "batch"
+        # metadata ключа важнее заголовка
+        assert scheduler.get_lane(header, make_key(metadata={"priority": "interactive"})) == "interactive"
+        assert scheduler.get_lane({}, make_key(team_metadata={"priority": "batch"})) == "batch"
+        assert scheduler.get_lane({"metadata": {"headers": {"x-priority": "urgent"}}}, make_key()) == "interactive"
+
+    def test_flow_and_weight(self):
+        scheduler = FairScheduler(weights={"nightly": 0.5})
+
+        ticket = scheduler.get_ticket({}, make_key(key_alias="nightly"))
+        assert ticket.flow == "interactive/key:nightly"
+        assert ticket.weight == 8 * 0.5
+        assert scheduler.get_ticket({}, make_key(team_id="t1")).flow == "interactive/team:t1"
+        assert scheduler.get_ticket({}, make_key(metadata={"scheduling_weight": 2})).weight == 16
+
+    def test_client_deadline_limits_wait(self):
+        scheduler = FairScheduler(lanes={"interactive": LaneConfig(queue_timeout=30)})
+        data = {"metadata": {"headers": {"x-request-timeout": "10"}}}
+
+        assert scheduler.get_ticket({}, make_key()).timeout == 30
+        assert scheduler.get_ticket(data, make_key(), expected_latency=4.0).timeout == pytest.approx(6.0, abs=0.1)
+        assert scheduler.get_ticket(data, make_key(), expected_latency=12.0).timeout < 0
+
+
+class TestPriorityAdmission:
+    """Очередь лимитера параллельности с полосами"""
+
+    def test_interactive_overtakes_batch_queue(self):
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=1, min_limit=1, max_limit=1))
+        scheduler = FairScheduler()
+        batch = {"metadata": {"headers": {"x-priority": "batch"}}}
+        order = []
+
+        async def request(name, data):
+            await scheduler.admit(limiter, scheduler.get_ticket(data, make_key(key_alias=name.split("-")[0])))
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        async def run():
+            await limiter.acquire()
+            tasks = [asyncio.ensure_future(request(f"batch-{index}", batch)) for index in range(5)]
+            await asyncio.sleep(0.01)
+            tasks.append(asyncio.ensure_future(request("ide-0", {})))
+            await asyncio.sleep(0.01)
+            limiter.release()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        assert order[:2] == ["batch-0", "ide-0"]
+        metrics = scheduler.get_metrics()
+        assert metrics["batch"]["admitted"] == 5
+        assert metrics["interactive"]["queued"] == 1
+
+    def test_shed_when_deadline_cannot_be_met(self):
+        limiter = AIMDLimiter("d", ConcurrencyConfig(initial_limit=1, min_limit=1, max_limit=1))
+        scheduler = FairScheduler()
+        data = {"metadata": {"headers": {"x-request-timeout": "1"}}}
+
+        async def run():
+            await limiter.acquire()
+            await scheduler.admit(limiter, scheduler.get_ticket(data, make_key(), expected_latency=5.0))
+
+        with pytest.raises(ConcurrencyLimitExceeded):
+            asyncio.run(run())
+        assert scheduler.get_metrics()["interactive"]["shed"] == 1
+        assert limiter.queued == 0
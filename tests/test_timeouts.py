@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Тесты раздельных таймаутов (connect/first_byte/idle/total) и дедлайна клиента
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.litellm_gigachat.core import proxy_provider_manager, timeouts
+from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+from src.litellm_gigachat.core.retry import RetryEngine, RetryPolicy
+from src.litellm_gigachat.core.timeouts import (
+    DeadlineExceeded,
+    StreamIdleTimeout,
+    TimeoutConfig,
+    TimeoutSettings,
+    build_httpx_timeout,
+    parse_deadline_headers,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.litellm_response_headers = headers or {}
+
+
+class FakeStream:
+    """Streaming-ответ с заданными паузами перед каждым chunk"""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.delays:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delays.pop(0))
+        return "chunk"
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_router_lookup(monkeypatch):
+    """Таймаут попытки по умолчанию без обращения к LiteLLM Router"""
+    monkeypatch.setattr(timeouts, "get_attempt_timeout", lambda model: 60.0)
+
+
+class TestDeadlineHeaders:
+    """Дедлайн клиента из заголовков"""
+
+    def test_relative_and_absolute(self):
+        now = 1000.0
+        assert parse_deadline_headers({"X-Request-Timeout": "2.5"}, now) == 2.5
+        assert parse_deadline_headers({"x-request-deadline": "1004"}, now) == 4.0
+        assert parse_deadline_headers({"X-Request-Timeout": "10", "X-Request-Deadline": "1003"}, now) == 3.0
+
+    def test_missing_or_invalid(self):
+        assert parse_deadline_headers(None) is None
+        assert parse_deadline_headers({"X-Request-Timeout": "soon"}) is None
+
+
+class TestTimeoutConfig:
+    """Источники таймаутов и таймауты HTTP клиента"""
+
+    def test_resolve_order(self, monkeypatch):
+        provider = ProxyProviderConfig(
+            name="p1", url="http://p1", auth_header="X", auth_value="", suffix="p1",
+            connect_timeout=3, idle_timeout=10,
+        )
+
+        class Manager:
+            def get_provider_by_suffix(self, model):
+                return provider if model.endswith("-p1") else None
+
+        monkeypatch.setattr(proxy_provider_manager, "get_global_multi_proxy_provider_manager", lambda: Manager())
+        settings = TimeoutSettings(
+            default=TimeoutConfig(connect=5, first_byte=30),
+            models={"group": {"first_byte": 45}, "max-p1": {"idle": 20, "total": None}},
+        )
+
+        assert settings.resolve("max-p1", "group") == TimeoutConfig(connect=3, first_byte=45, idle=20)
+        assert settings.resolve("other") == TimeoutConfig(connect=5, first_byte=30)
+
+    def test_httpx_timeout(self):
+        config = TimeoutConfig(connect=2, first_byte=30, idle=5)
+
+        non_stream = build_httpx_timeout(config, remaining=None, attempt_timeout=60, stream=False)
+        assert (non_stream.connect, non_stream.read, non_stream.write) == (2, 30, 60)
+
+        stream = build_httpx_timeout(config, remaining=10, attempt_timeout=60, stream=True)
+        assert (stream.connect, stream.read, stream.write) == (2, 10, 10)
+
+    def test_untouched_without_config(self):
+        kwargs = {"model": "m", "timeout": 60}
+        TimeoutSettings().prepare_attempt(kwargs, deadline=None)
+        assert kwargs["timeout"] == 60
+
+    def test_stream_timeout_set(self):
+        kwargs = {"model": "m", "stream": True}
+        TimeoutSettings(default=TimeoutConfig(connect=1)).prepare_attempt(kwargs, deadline=None)
+        assert kwargs["timeout"].connect == 1
+        assert kwargs["stream_timeout"] is kwargs["timeout"]
+
+    def test_expired_client_deadline(self):
+        settings = TimeoutSettings()
+        kwargs = {"model": "m", "metadata": {"headers": {"x-request-timeout": "0"}}}
+
+        with pytest.raises(DeadlineExceeded):
+            settings.start(kwargs)
+        assert settings.get_metrics() == {"deadline_exceeded": 1, "client_deadlines": 1}
+
+
+class TestEngineDeadlines:
+    """Дедлайны в RetryEngine"""
+
+    def make_engine(self, **config):
+        engine = RetryEngine(default=RetryPolicy(base_delay=0.001, max_delay=0.01))
+        engine.timeouts = TimeoutSettings(default=TimeoutConfig(**config))
+        return engine
+
+    def test_total_interrupts_call(self):
+        """Вызов дольше total прерывается с 504, мощность провайдера освобождается"""
+        engine = self.make_engine(total=0.1)
+        cancelled = []
+
+        async def slow(**kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(kwargs["model"])
+                raise
+
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as error:
+            asyncio.run(engine.call(slow, {"model": "m"}))
+        assert error.value.status_code == 504
+        assert time.monotonic() - started < 1
+        assert cancelled == ["m"]
+
+    def test_no_retry_after_deadline(self):
+        """Повтор, который не успеет до дедлайна клиента, не выполняется"""
+        engine = self.make_engine()
+        calls = []
+
+        async def busy(**kwargs):
+            calls.append(kwargs["model"])
+            raise StatusError(429, {"retry-after": "5"})
+
+        kwargs = {"model": "m", "metadata": {"headers": {"X-Request-Timeout": "1"}}}
+        started = time.monotonic()
+        with pytest.raises(StatusError):
+            asyncio.run(engine.call(busy, kwargs))
+        assert calls == ["m"]
+        assert time.monotonic() - started < 0.5
+
+    def test_first_byte_restarts_stream(self):
+        engine = self.make_engine(first_byte=0.05)
+        streams = [FakeStream([5.0]), FakeStream([0.0, 0.0])]
+        pending = iter(streams)
+
+        async def open_stream(**kwargs):
+            return next(pending)
+
+        async def run():
+            stream = await engine.call(open_stream, {"model": "m", "stream": True})
+            return [chunk async for chunk in stream]
+
+        assert asyncio.run(run()) == ["chunk", "chunk"]
+        assert streams[0].closed
+        assert engine.get_metrics()["retries_by_reason"] == {"ttft_timeout": 1}
+
+    def test_idle_timeout_mid_stream(self):
+        engine = self.make_engine(idle=0.05)
+        stream = FakeStream([0.0, 5.0])
+
+        async def open_stream(**kwargs):
+            return stream
+
+        async def run():
+            chunks = []
+            async for chunk in await engine.call(open_stream, {"model": "m", "stream": True}):
+                chunks.append(chunk)
+            return chunks
+
+        with pytest.raises(StreamIdleTimeout):
+            asyncio.run(run())
+        assert stream.closed
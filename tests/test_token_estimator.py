@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Тесты локальной оценки токенов и её калибровки
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.token_estimator import (
+    PRIOR_WEIGHTS,
+    PROMPT_TOKENS_KEY,
+    TokenEstimator,
+    TokenEstimatorConfig,
+    estimate_prompt_tokens,
+    estimate_response_tokens,
+    fit_weights,
+    text_features,
+)
+
+# "Настоящий" токенизатор тестов: линейный с весами, отличными от исходных
+TRUE_WEIGHTS = (0.3, 0.25, 1.0, 0.8, 1.5, 0.1)
+
+
+def true_count(text):
+    return max(1, round(sum(w * value for w, value in zip(TRUE_WEIGHTS, text_features(text)))))
+
+
+class CountingAPI:
+    """Точный подсчёт токенов (аналог /tokens/count)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [true_count(text) for text in texts]
+
+
+class TestEstimate:
+    """Оценка текстов и запросов"""
+
+    def test_features(self):
+        assert text_features("Привет, world 42! 🙂") == (6, 5, 2, 2, 1, 4)
+
+    def test_batch_matches_single(self):
+        estimator = TokenEstimator()
+        texts = ["Привет", "Hello world", "Привет", ""]
+
+        counts = estimator.count_texts(texts)
+
+        assert counts == [estimator.count_text(text) for text in texts]
+        assert counts[3] == 0
+        assert all(count > 0 for count in counts[:3])
+
+    def test_messages_include_tools_and_overhead(self):
+        estimator = TokenEstimator(TokenEstimatorConfig(message_overhead=4))
+        messages = [
+            {"role": "system", "content": "Ты помощник"},
+            {"role": "user", "content": [{"type": "text", "text": "Какая погода?"}]},
+            {"role": "assistant", "content": None,
+             "tool_calls": [{"function": {"name": "get_weather", "arguments": '{"city": "Москва"}'}}]},
+        ]
+        tools = [{"type": "function", "function": {"name": "get_weather", "parameters": {"type": "object"}}}]
+
+        plain = estimator.count_messages(messages[:2])
+        full = estimator.count_messages(messages, tools)
+
+        assert plain == estimator.count_text("Ты помощник") + estimator.count_text("Какая погода?") + 8
+        assert full > plain + 4 + estimator.count_text("get_weather")
+
+    def test_prompt_estimate_memoized_in_metadata(self):
+        data = {"messages": [{"role": "user", "content": "текст " * 100}], "metadata": {}}
+
+        tokens = estimate_prompt_tokens(data)
+        data["messages"] = []
+
+        assert data["metadata"][PROMPT_TOKENS_KEY] == tokens
+        assert estimate_prompt_tokens(data) == tokens
+
+    def test_response_tokens(self):
+        response = {"choices": [{"message": {"role": "assistant", "content": "Ответ модели " * 20}}]}
+        assert estimate_response_tokens(response) > 20
+        assert estimate_response_tokens({"choices": []}) == 0
+
+
+class TestCalibration:
+    """Калибровка по точному подсчёту"""
+
+    def test_fit_recovers_weights(self):
+        rng = random.Random(1)
+        samples = []
+        for _ in range(200):
+            features = tuple(rng.randint(0, 300) for _ in TRUE_WEIGHTS)
+            samples.append((features, round(sum(w * value for w, value in zip(TRUE_WEIGHTS, features)))))
+
+        weights = fit_weights(samples, PRIOR_WEIGHTS, regularization=0.01)
+
+        assert weights == pytest.approx(TRUE_WEIGHTS, abs=0.02)
+
+    def test_calibration_improves_estimate_and_caches_exact(self):
+        api = CountingAPI()
+        estimator = TokenEstimator(TokenEstimatorConfig(calibration_enabled=True, sample_rate=1.0, calibration_batch=64), counter=api)
+        rng = random.Random(2)
+        words = ["документ", "модель", "GigaChat", "token", "2024", "—", "ответ", "{}", "🙂"]
+        texts = [" ".join(rng.choice(words) for _ in range(rng.randint(20, 80))) for _ in range(64)]
+        probe = " ".join(rng.choice(words) for _ in range(500))
+
+        def error():
+            return abs(estimator.estimate_text(probe) - true_count(probe)) / true_count(probe)
+
+        before = error()
+        estimator.count_texts(texts, sample=True)
+        assert asyncio.run(estimator.calibrate())
+
+        assert error() < before / 2
+        assert len(api.calls) == 1 and len(api.calls[0]) == 64
+        # Откалиброванные тексты считаются точно
+        assert estimator.count_texts(texts[:3]) == [true_count(text) for text in texts[:3]]
+        metrics = estimator.get_metrics()
+        assert metrics["cache_hits"] == 3
+        assert metrics["calibrations"] == 1
+        assert metrics["last_error"] is not None
+
+    def test_calibration_scheduled_at_most_once_per_interval(self):
+        api = CountingAPI()
+        estimator = TokenEstimator(TokenEstimatorConfig(calibration_enabled=True, sample_rate=1.0, calibration_interval=3600), counter=api)
+
+        async def run():
+            estimator.count_text("первый текст для калибровки", sample=True)
+            await asyncio.sleep(0.05)
+            estimator.count_text("второй текст для калибровки", sample=True)
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+
+        assert api.calls == [["первый текст для калибровки"]]
+        assert estimator.get_metrics()["pending_samples"] == 1
+
+    def test_only_gigachat_prompts_sampled(self, monkeypatch):
+        """На калибровку отправляются только промпты запросов к GigaChat и только при включённой калибровке"""
+        from src.litellm_gigachat.core import model_groups
+        from src.litellm_gigachat.core.proxy_provider_manager import get_global_multi_proxy_provider_manager
+
+        class Provider:
+            name = "p1"
+
+        manager = get_global_multi_proxy_provider_manager()
+        get_provider = manager.get_provider_by_suffix
+        monkeypatch.setattr(manager, "get_provider_by_suffix",
+                            lambda model: Provider() if model.endswith("-p1") else get_provider(model))
+        router = ModelGroupRouter()
+        router.groups = {"agent": ModelGroupConfig(name="agent", models=["gigachat"])}
+        monkeypatch.setattr(model_groups, "_global_model_group_router", router)
+
+        def sampled(model, enabled=True):
+            estimator = TokenEstimator(
+                TokenEstimatorConfig(calibration_enabled=enabled, sample_rate=1.0, calibration_interval=3600),
+                counter=CountingAPI(),
+            )
+            estimator.estimate_request({"model": model, "messages": [{"role": "user", "content": "секретный текст"}]})
+            return estimator.get_metrics()["pending_samples"]
+
+        assert sampled("gigachat-max") == 1
+        assert sampled("gigachat-max", enabled=False) == 0
+        for model in ("llama-p1", "gigachat-p1", "gpt-4o", "agent"):
+            assert sampled(model) == 0
+        assert TokenEstimatorConfig().calibration_enabled is False
+
+    def test_calibration_error_counted(self):
+        def broken(texts):
+            raise ConnectionError("нет соединения")
+
+        estimator = TokenEstimator(TokenEstimatorConfig(calibration_enabled=True, sample_rate=1.0), counter=broken)
+        estimator.count_text("текст", sample=True)
+
+        assert not asyncio.run(estimator.calibrate())
+        assert estimator.get_metrics()["calibration_errors"] == 1
+        assert estimator.weights == list(PRIOR_WEIGHTS)
+
+
+class TestRouting:
+    """Выбор deployment группы по окну контекста"""
+
+    def test_small_context_deployment_skipped(self):
+        router = ModelGroupRouter()
+        router._apply_config({"model_list": [
+            {"model_name": "small", "litellm_params": {"model": "openai/GigaChat"},
+             "model_info": {"max_input_tokens": 1000}},
+            {"model_name": "large", "litellm_params": {"model": "openai/GigaChat"},
+             "model_info": {"max_input_tokens": 32000}},
+        ], "model_groups": [{"name": "g", "models": ["small", "large"], "exploration": 0}]})
+        group = router.get_group("g")
+
+        assert {router.choose(group, prompt_tokens=5000) for _ in range(20)} == {"large"}
+        # Ни один не подходит - выбор среди всех
+        assert router.choose(group, prompt_tokens=100000) in ("small", "large")
+        assert router.choose(ModelGroupConfig(name="x", models=["small"]), prompt_tokens=5000) == "small"
+
+
+class TestGigaChatTokenCounter:
+    """Запрос /tokens/count"""
+
+    def test_retries_once_with_new_token(self, monkeypatch):
+        import src.litellm_gigachat.core.http_client as http_client
+        from src.litellm_gigachat.core.token_estimator import GigaChatTokenCounter
+
+        class Response:
+            def __init__(self, status_code, data=None):
+                self.status_code = status_code
+                self.data = data
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return self.data
+
+        class TokenManager:
+            token = "old"
+
+            def get_token(self):
+                return self.token
+
+            def invalidate_token(self):
+                self.token = "new"
+
+        requests = []
+
+        class Session:
+            def post(self, url, json, headers, timeout):
+                requests.append((url, json, headers["Authorization"]))
+                if headers["Authorization"] == "Bearer old":
+                    return Response(401)
+                return Response(200, [{"object": "tokens", "tokens": 7, "characters": 20}])
+
+        monkeypatch.setattr(http_client, "get_global_http_client", lambda: Session())
+        counter = GigaChatTokenCounter("https://gigachat.example/api/v1/", token_manager=TokenManager())
+
+        assert counter(["текст"]) == [7]
+        assert requests == [
+            ("https://gigachat.example/api/v1/tokens/count", {"model": "GigaChat", "input": ["текст"]}, "Bearer old"),
+            ("https://gigachat.example/api/v1/tokens/count", {"model": "GigaChat", "input": ["текст"]}, "Bearer new"),
+        ]
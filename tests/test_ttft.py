@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Тесты дедлайна первого токена streaming-запросов и перезапуска потока
+"""
+
+import asyncio
+
+import pytest
+
+from src.litellm_gigachat.core import model_groups
+from src.litellm_gigachat.core.deployment_stats import DeploymentStatsRegistry
+from src.litellm_gigachat.core.model_groups import ModelGroupConfig, ModelGroupRouter
+from src.litellm_gigachat.core.retry import FirstTokenTimeout, RetryEngine, RetryPolicy, classify_error
+from src.litellm_gigachat.core.ttft import TTFTConfig, TTFTWatchdog
+
+
+class FakeStream:
+    """Streaming-ответ: первый chunk через first_delay, затем остальные сразу"""
+
+    def __init__(self, model, first_delay, chunks=("a", "b")):
+        self.model = model
+        self.first_delay = first_delay
+        self.chunks = list(chunks)
+        self.closed = False
+        self._hidden_params = {"model": model}
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.first_delay:
+            await asyncio.sleep(self.first_delay)
+            self.first_delay = 0
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamCall:
+    """Вызов модели, открывающий FakeStream с задержкой первого chunk deployment"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.streams = []
+
+    async def __call__(self, **kwargs):
+        delay = self.delays[kwargs["model"]]
+        stream = FakeStream(kwargs["model"], delay.pop(0) if isinstance(delay, list) else delay)
+        self.streams.append(stream)
+        return stream
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestTTFTWatchdog:
+    """Дедлайн первого chunk"""
+
+    def make_watchdog(self, **config):
+        return TTFTWatchdog(default=TTFTConfig(**config), stats=DeploymentStatsRegistry())
+
+    def test_stream_passes_through(self):
+        """Первый chunk не теряется, TTFT учитывается в статистике"""
+        watchdog = self.make_watchdog(max_deadline=1.0)
+        call = StreamCall({"m": 0.01})
+
+        async def run():
+            stream = await watchdog.call(call, {"model": "m", "stream": True})
+            return stream._hidden_params, await collect(stream)
+
+        hidden_params, chunks = asyncio.run(run())
+        assert chunks == ["a", "b"]
+        assert hidden_params == {"model": "m"}
+        assert watchdog.stats.get_ttft_histograms()["m"].count == 1
+
+    def test_empty_stream(self):
+        watchdog = self.make_watchdog(max_deadline=1.0)
+
+        async def call(**kwargs):
+            return FakeStream("m", 0, chunks=())
+
+        async def run():
+            return await collect(await watchdog.call(call, {"model": "m", "stream": True}))
+
+        assert asyncio.run(run()) == []
+
+    def test_timeout_closes_stream(self):
+        watchdog = self.make_watchdog(min_deadline=0.05, max_deadline=0.05)
+        call = StreamCall({"m": 5.0})
+
+        with pytest.raises(FirstTokenTimeout):
+            asyncio.run(watchdog.call(call, {"model": "m", "stream": True}))
+        assert call.streams[0].closed
+        assert watchdog.get_metrics()["timeouts"] == 1
+
+    def test_deadline_from_histogram(self):
+        """Дедлайн - перцентиль TTFT * multiplier в пределах min..max"""
+        watchdog = self.make_watchdog(percentile=0.9, multiplier=2.0, min_deadline=0.5,
+                                      max_deadline=10.0, min_samples=10)
+        config = watchdog.get_config("m")
+        assert watchdog.get_deadline("m", config) == 10.0  # мало данных
+
+        for _ in range(10):
+            watchdog.stats.record_ttft("m", 1.5)
+        assert watchdog.get_deadline("m", config) == 3.0
+
+        for _ in range(200):
+            watchdog.stats.record_ttft("m", 0.01)
+        assert watchdog.get_deadline("m", config) == 0.5
+
+    def test_model_overrides(self):
+        watchdog = TTFTWatchdog(
+            default=TTFTConfig(max_deadline=20),
+            models={"group": {"max_deadline": 30, "multiplier": 3}, "slow": {"max_deadline": 60}},
+            stats=DeploymentStatsRegistry(),
+        )
+        config = watchdog.get_config("slow", "group")
+        assert config.max_deadline == 60
+        assert config.multiplier == 3
+        assert watchdog.get_config("other").max_deadline == 20
+
+    def test_classified_as_retryable(self):
+        assert classify_error(FirstTokenTimeout(), RetryPolicy(retry_on_connection_errors=False)) == \
+            (True, "ttft_timeout")
+
+
+class TestStreamRestart:
+    """Перезапуск зависшего потока через RetryEngine"""
+
+    def setup_method(self):
+        self.previous = model_groups._global_model_group_router
+
+    def teardown_method(self):
+        model_groups._global_model_group_router = self.previous
+
+    def make_engine(self, stats):
+        engine = RetryEngine(default=RetryPolicy(base_delay=5.0))
+        engine.ttft_watchdog = TTFTWatchdog(default=TTFTConfig(min_deadline=0.05, max_deadline=0.05), stats=stats)
+        return engine
+
+    def test_restart_on_other_deployment(self):
+        """Зависший поток перезапускается на другом deployment группы без паузы"""
+        stats = DeploymentStatsRegistry()
+        router = ModelGroupRouter(stats)
+        router.groups = {"g": ModelGroupConfig(name="g", models=["a", "b"], exploration=0.0)}
+        model_groups._global_model_group_router = router
+
+        engine = self.make_engine(stats)
+        call = StreamCall({"a": 5.0, "b": 0.01})
+        metadata = {"gigachat_deployment": {"deployment": "a", "group": "g", "request_id": stats.start_request("a")}}
+
+        async def run():
+            stream = await engine.call(call, {"model": "a", "stream": True, "metadata": metadata})
+            return await collect(stream)
+
+        assert asyncio.run(run()) == ["a", "b"]
+        assert [stream.model for stream in call.streams] == ["a", "b"]
+        assert call.streams[0].closed
+        assert stats.get("a").failures == 1
+        assert engine.get_metrics()["retries_by_reason"] == {"ttft_timeout": 1}
+
+    def test_restart_same_deployment(self):
+        """Без группы моделей поток перезапускается на том же deployment"""
+        engine = self.make_engine(DeploymentStatsRegistry())
+        call = StreamCall({"m": [5.0, 0.01]})
+
+        async def run():
+            return await collect(await engine.call(call, {"model": "m", "stream": True}))
+
+        assert asyncio.run(asyncio.wait_for(run(), timeout=2)) == ["a", "b"]
+        assert len(call.streams) == 2
+
+    def test_non_streaming_not_watched(self):
+        engine = self.make_engine(DeploymentStatsRegistry())
+
+        async def call(**kwargs):
+            await asyncio.sleep(0.1)
+            return "ok"
+
+        assert asyncio.run(engine.call(call, {"model": "m"})) == "ok"
+        assert engine.ttft_watchdog.get_metrics()["streams"] == 0
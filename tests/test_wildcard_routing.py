@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Тесты для wildcard-маршрутизации моделей прокси-провайдеров
+"""
+
+import pytest
+from fastapi import HTTPException
+from litellm import Router
+
+import litellm.proxy.proxy_server as proxy_server
+from src.litellm_gigachat.callbacks.model_sync_callback import register_wildcard_deployment
+from src.litellm_gigachat.callbacks.proxy_provider_callback import ProxyProviderCallback
+from src.litellm_gigachat.core import multi_model_sync
+from src.litellm_gigachat.core.multi_model_sync import init_global_multi_model_sync_manager
+from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+
+
+def make_provider(**kwargs) -> ProxyProviderConfig:
+    """Конфигурация wildcard-провайдера для тестов"""
+    params = dict(
+        name="provider2",
+        url="http://localhost:8002/v1",
+        auth_header="X-API-Key",
+        auth_value="token",
+        suffix="p2",
+        sync_enabled=True,
+        routing_mode="wildcard",
+    )
+    params.update(kwargs)
+    return ProxyProviderConfig(**params)
+
+
+class TestWildcardRouting:
+    """Тесты wildcard-маршрутизации"""
+
+    def setup_method(self):
+        """Настройка перед каждым тестом"""
+        self.provider = make_provider()
+        self.multi_manager = init_global_multi_model_sync_manager()
+        self.multi_manager.add_provider(self.provider)
+        self.sync_manager = self.multi_manager.get_manager_for_model("x-p2")
+        self.sync_manager.fetch_models = lambda: [{"id": "GigaChat-2-Max"}, {"id": "llama-3.1-70b"}]
+
+        self.router_updates = []
+        self.multi_manager.set_update_callback(lambda *args: self.router_updates.append(args))
+
+        self.original_router = proxy_server.llm_router
+        proxy_server.llm_router = Router(model_list=[{
+            "model_name": "gigachat",
+            "litellm_params": {"model": "openai/GigaChat", "api_key": "auto"},
+        }])
+
+    def teardown_method(self):
+        """Очистка после каждого теста"""
+        proxy_server.llm_router = self.original_router
+        multi_model_sync._global_multi_model_sync_manager = None
+
+    def test_sync_does_not_touch_router(self):
+        """Синхронизация wildcard-провайдера не регистрирует модели в Router"""
+        assert self.sync_manager.sync_models()
+        assert self.router_updates == []
+        assert self.multi_manager.resolve_model_id("gigachat-2-max-p2") == "GigaChat-2-Max"
+
+    def test_single_deployment_routes_any_model(self):
+        """Один шаблонный deployment маршрутизирует любую модель провайдера"""
+        assert register_wildcard_deployment(self.provider)
+
+        router = proxy_server.llm_router
+        assert len(router.model_list) == 2
+
+        deployment = router.get_available_deployment(
+            model="GigaChat-2-Max-p2", messages=[{"role": "user", "content": "Привет"}]
+        )
+        assert deployment["litellm_params"]["model"] == "openai/GigaChat-2-Max"
+        assert deployment["litellm_params"]["api_base"] == self.provider.url
+
+    def test_catalog_models_listed(self):
+        """Модели из каталога попадают в список моделей Router"""
+        register_wildcard_deployment(self.provider)
+        self.sync_manager.sync_models()
+
+        model_names = proxy_server.llm_router.get_model_names()
+        assert "gigachat-2-max-p2" in model_names
+        assert "llama-3.1-70b-p2" in model_names
+
+    def test_known_model_resolved_to_original_id(self):
+        """Имя модели сопоставляется с исходным идентификатором провайдера"""
+        self.sync_manager.sync_models()
+        callback = ProxyProviderCallback()
+        data = {"model": "gigachat-2-max-p2"}
+
+        resolved = callback._resolve_wildcard_model(data, data["model"], self.provider)
+
+        assert resolved == "GigaChat-2-Max-p2"
+        assert data["model"] == "GigaChat-2-Max-p2"
+
+    def test_model_case_ignored(self):
+        """Имя модели в исходном регистре находится в каталоге без внеплановой синхронизации"""
+        self.sync_manager.sync_models()
+        self.sync_manager.fetch_models = lambda: pytest.fail("каталог уже содержит модель")
+        callback = ProxyProviderCallback()
+        data = {"model": "GigaChat-2-Max-p2"}
+
+        assert self.multi_manager.sync_on_miss(data["model"], wait_timeout=1)
+        assert callback._resolve_wildcard_model(data, data["model"], self.provider) == "GigaChat-2-Max-p2"
+
+    def test_unknown_model_rejected(self):
+        """Неизвестная модель отклоняется, если каталог синхронизирован"""
+        self.sync_manager.sync_models()
+        callback = ProxyProviderCallback()
+
+        with pytest.raises(HTTPException) as exc_info:
+            callback._resolve_wildcard_model({"model": "bogus-p2"}, "bogus-p2", self.provider)
+        assert exc_info.value.status_code == 404
+
+    def test_unsynced_catalog_passes_through(self):
+        """Пока каталог не получен, имя модели передаётся как есть"""
+        callback = ProxyProviderCallback()
+        data = {"model": "new-model-p2"}
+
+        assert callback._resolve_wildcard_model(data, data["model"], self.provider) == "new-model-p2"
+        assert data["model"] == "new-model-p2"
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Тесты для режима нескольких worker - общее состояние, выбор лидера и координация
+"""
+
+import multiprocessing
+import time
+
+from src.litellm_gigachat.core.multi_model_sync import MultiModelSyncManager
+from src.litellm_gigachat.core.proxy_provider_manager import ProxyProviderConfig
+from src.litellm_gigachat.core.shared_state import LeaderElection, SharedStateStore
+from src.litellm_gigachat.core.token_manager import TokenManager
+from src.litellm_gigachat.core.worker_coordinator import WorkerCoordinator
+
+
+def hold_leader_lock(lock_path, acquired, release):
+    """Процесс-лидер: захватывает блокировку и держит её до сигнала"""
+    election = LeaderElection(lock_path)
+    acquired.value = election.try_acquire()
+    release.wait(10)
+
+
+def make_multi_manager(catalog=None):
+    """MultiModelSyncManager с одним провайдером без сетевых запросов"""
+    multi_manager = MultiModelSyncManager()
+    multi_manager.add_provider(ProxyProviderConfig(
+        name="provider1",
+        url="http://localhost:8001/v1",
+        auth_header="X-Client-Id",
+        auth_value="token",
+        suffix="p1",
+        sync_enabled=True,
+    ))
+    sync_manager = multi_manager.get_manager_for_model("model-p1")
+    sync_manager.fetch_models = lambda: [{"id": model_id} for model_id in (catalog or [])]
+    return multi_manager, sync_manager
+
+
+class CountingTokenManager(TokenManager):
+    """TokenManager с подменённым запросом токена"""
+
+    def __init__(self):
+        super().__init__(auth_key="test-key")
+        self.requests = 0
+
+    def _request_new_token(self):
+        self.requests += 1
+        return f"token-{self.requests}", time.time() + 1800
+
+
+class TestSharedStateStore:
+    """Тесты файлового хранилища"""
+
+    def test_publish_and_read(self, tmp_path):
+        """Опубликованное значение читается другим экземпляром хранилища"""
+        SharedStateStore(str(tmp_path)).publish("catalog-provider1", {"models": [{"id": "a"}]})
+
+        reader = SharedStateStore(str(tmp_path))
+        assert reader.read("catalog-provider1") == {"models": [{"id": "a"}]}
+        assert reader.keys("catalog-") == ["catalog-provider1"]
+        assert reader.read("missing") is None
+
+    def test_version_changes_on_publish(self, tmp_path):
+        """Версия ключа меняется при каждой публикации"""
+        store = SharedStateStore(str(tmp_path))
+        store.publish("key", 1)
+        first = store.get_version("key")
+        time.sleep(0.01)
+        store.publish("key", 2)
+
+        assert store.get_version("key") != first
+        assert store.read("key") == 2
+
+
+class TestLeaderElection:
+    """Тесты выбора лидера"""
+
+    def test_single_leader(self, tmp_path):
+        """Блокировку удерживает только один участник"""
+        lock_path = str(tmp_path / "leader.lock")
+        ctx = multiprocessing.get_context("fork")
+        acquired = ctx.Value("b", False)
+        release = ctx.Event()
+        leader = ctx.Process(target=hold_leader_lock, args=(lock_path, acquired, release))
+        leader.start()
+
+        try:
+            deadline = time.time() + 5
+            while not acquired.value and time.time() < deadline:
+                time.sleep(0.01)
+            assert acquired.value
+
+            follower = LeaderElection(lock_path)
+            assert not follower.try_acquire()
+            assert not follower.is_leader
+        finally:
+            release.set()
+            leader.join(5)
+
+    def test_takeover_after_leader_exit(self, tmp_path):
+        """После завершения лидера блокировку захватывает другой процесс"""
+        lock_path = str(tmp_path / "leader.lock")
+        ctx = multiprocessing.get_context("fork")
+        acquired = ctx.Value("b", False)
+        release = ctx.Event()
+        leader = ctx.Process(target=hold_leader_lock, args=(lock_path, acquired, release))
+        leader.start()
+
+        deadline = time.time() + 5
+        while not acquired.value and time.time() < deadline:
+            time.sleep(0.01)
+
+        follower = LeaderElection(lock_path)
+        assert not follower.try_acquire()
+
+        # Имитация падения лидера - блокировка снимается ядром
+        leader.kill()
+        leader.join(5)
+
+        assert follower.try_acquire()
+        follower.release()
+
+
+class TestWorkerCoordinator:
+    """Тесты распределения задач между worker"""
+
+    def test_leader_publishes_catalog_and_follower_applies(self, tmp_path):
+        """Каталог лидера применяется ведомым без запроса к провайдеру"""
+        leader_multi, leader_sync = make_multi_manager(["llama-3.1-70b"])
+        follower_multi, follower_sync = make_multi_manager()
+        follower_sync.fetch_models = lambda: (_ for _ in ()).throw(AssertionError("ведомый не синхронизирует"))
+
+        leader = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")), leader_multi
+        )
+        follower = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")), follower_multi
+        )
+
+        # Внутри одного процесса flock для разных fd тоже взаимоисключающий
+        leader.tick()
+        follower.tick()
+        try:
+            assert leader.is_leader
+            assert not follower.is_leader
+
+            leader_sync.sync_models()
+            follower.tick()
+
+            assert follower_sync.has_model("llama-3.1-70b-p1")
+            assert follower.get_status()["applied_catalogs"] == ["catalog-provider1"]
+        finally:
+            leader.stop()
+            follower.stop()
+
+    def test_follower_reuses_leader_token(self, tmp_path):
+        """Ведомый берёт токен из общего хранилища вместо нового запроса"""
+        leader_tokens = CountingTokenManager()
+        follower_tokens = CountingTokenManager()
+
+        leader = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")),
+            token_manager_getter=lambda: leader_tokens,
+        )
+        follower = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")),
+            token_manager_getter=lambda: follower_tokens,
+        )
+
+        leader.tick()
+        follower.tick()
+        try:
+            assert follower_tokens.get_token() == "token-1"
+            assert leader_tokens.requests == 1
+            assert follower_tokens.requests == 0
+        finally:
+            leader.stop()
+            follower.stop()
+
+    def test_invalidated_shared_token_is_not_reused(self, tmp_path):
+        """Отклонённый API токен не берётся повторно из хранилища"""
+        store = SharedStateStore(str(tmp_path))
+        store.publish("gigachat-token", {
+            "token": "stale", "expires_at": time.time() + 1800, "scope": "GIGACHAT_API_PERS",
+        })
+
+        tokens = CountingTokenManager()
+        tokens.attach_shared_store(store)
+        assert tokens.get_token() == "stale"
+
+        tokens.invalidate_token()
+        assert tokens.get_token() == "token-1"
+        assert store.read("gigachat-token")["token"] == "token-1"
+
+    def test_follower_takes_over_sync(self, tmp_path):
+        """После остановки лидера синхронизацию запускает ведомый"""
+        leader_multi, _ = make_multi_manager(["llama-3.1-70b"])
+        follower_multi, follower_sync = make_multi_manager(["llama-3.1-70b"])
+
+        leader = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")), leader_multi
+        )
+        follower = WorkerCoordinator(
+            SharedStateStore(str(tmp_path)), LeaderElection(str(tmp_path / "leader.lock")), follower_multi
+        )
+
+        leader.tick()
+        follower.tick()
+        assert not follower.is_leader
+
+        leader.stop()
+        follower.tick()
+        try:
+            assert follower.is_leader
+            assert follower_sync._running
+        finally:
+            follower.stop()
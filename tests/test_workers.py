@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Тесты перезапуска worker-процессов
+"""
+
+import os
+import time
+
+import pytest
+
+import src.litellm_gigachat.proxy.server as server
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork недоступен")
+class TestServeWorkers:
+    """Перезапуск упавших worker"""
+
+    def test_crash_loop_stops_parent(self, monkeypatch, tmp_path):
+        """Постоянно падающие worker перезапускаются с задержкой, затем главный процесс завершается"""
+        def crash(*args):
+            raise RuntimeError("ошибка запуска")
+
+        monkeypatch.setenv("LITELLM_GIGACHAT_STATE_DIR", str(tmp_path))
+        monkeypatch.setattr(server, "_run_worker", crash)
+        monkeypatch.setattr(server, "WORKER_MAX_RESTARTS", 3)
+        monkeypatch.setattr(server, "WORKER_RESTART_BACKOFF", 0.05)
+        started = time.time()
+
+        assert server._serve_workers("127.0.0.1", 0, 1, "error", access_log=False) is False
+
+        # Задержки 0.05 + 0.1 + 0.2 перед тремя перезапусками
+        assert time.time() - started >= 0.35